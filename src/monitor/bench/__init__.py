@@ -0,0 +1,12 @@
+"""
+Benchmarks reprodutíveis do monitor.
+
+- traffic: construtores de pacotes (IPv4/IPv6, TCP/UDP/ICMP, HTTP, DNS),
+  misturas de tráfego sintético com semente fixa e uma fonte de captura em
+  memória (MemoryCapture) que alimenta o Monitor sem socket nem arquivo.
+- suite: micro-benchmarks (parse_ip, decode, identify_app, Stats.add_packet,
+  Stats.snapshot, CsvLogger) e o pipeline ponta a ponta (_loop_capture),
+  com saída JSON e comparação contra uma linha de base.
+
+Uso: python -m src.monitor.bench --help
+"""
@@ -0,0 +1,95 @@
+"""
+CLI dos benchmarks.
+
+  python -m src.monitor.bench -o base.json                 # mede e grava a linha de base
+  python -m src.monitor.bench --baseline base.json         # mede e compara (código 1 se regrediu)
+  python -m src.monitor.bench --only decode,e2e_csv --packets 50000 --json
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from .suite import BENCHMARKS, DEFAULT_TOLERANCE, BenchConfig, compare, config_mismatch, run_suite
+from .traffic import MIXES
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog='python -m src.monitor.bench',
+                                description='Benchmarks reprodutíveis do monitor (tráfego sintético)')
+    p.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='Mistura de tráfego (padrão: mixed)')
+    p.add_argument('--packets', type=int, default=20000, help='Pacotes sintéticos (padrão: 20000)')
+    p.add_argument('--endpoints', type=int, default=4096, help='Endpoints remotos distintos (padrão: 4096)')
+    p.add_argument('--clients', type=int, default=16, help='Clientes distintos (padrão: 16)')
+    p.add_argument('--seed', type=int, default=1, help='Semente do gerador (padrão: 1)')
+    p.add_argument('--repeat', type=int, default=5, help='Repetições de cada medição (padrão: 5)')
+    p.add_argument('--batch-size', type=int, default=64, help='Quadros por lote no ponta a ponta (padrão: 64)')
+    p.add_argument('--only', help=f"Benchmarks separados por vírgula ({','.join(BENCHMARKS)})")
+    p.add_argument('-o', '--output', help='Grava o resultado em JSON neste arquivo')
+    p.add_argument('--json', action='store_true', help='Escreve o JSON na saída padrão em vez da tabela')
+    p.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    p.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                   help='Piora relativa da mediana aceita antes de acusar regressão (padrão: 0.10)')
+    return p
+
+
+def _fmt_ns(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+
+def _print_result(name: str, res: dict) -> None:
+    print(f"{name:<18} {_fmt_ns(res['median_ns']):>10}/{res['unit']:<9} "
+          f"(melhor {_fmt_ns(res['best_ns'])}) {res['ops_per_sec']:>12,.0f}/s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_argparser().parse_args(argv)
+    cfg = BenchConfig(args.mix, args.packets, args.endpoints, args.clients, args.seed, args.repeat, args.batch_size)
+    only = [n.strip() for n in args.only.split(',') if n.strip()] if args.only else None
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding='utf-8') as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as e:
+            print(f"Falha ao ler a linha de base {args.baseline}: {e}", file=sys.stderr)
+            return 2
+    try:
+        report = run_suite(cfg, only, progress=None if args.json else _print_result)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    rc = 0
+    if baseline is not None:
+        rows = compare(report, baseline, args.tolerance)
+        if only:
+            rows = [row for row in rows if row['status'] != 'ausente']  # não selecionados com --only
+        report['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance, 'rows': rows}
+        changed = config_mismatch(report, baseline)
+        if changed:
+            print(f"Aviso: configuração diferente da linha de base ({', '.join(changed)})", file=sys.stderr)
+        if not args.json:
+            print()
+            for row in rows:
+                if 'ratio' in row:
+                    print(f"{row['name']:<18} {_fmt_ns(row['baseline_ns']):>10} -> {_fmt_ns(row['current_ns']):>10} "
+                          f"x{row['ratio']:.2f}  {row['status']}")
+                else:
+                    print(f"{row['name']:<18} {row['status']}")
+        if any(row['status'] == 'regressão' for row in rows):
+            rc = 1
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    if args.json:
+        print(text)
+    return rc
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
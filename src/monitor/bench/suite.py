@@ -0,0 +1,271 @@
+"""
+Micro-benchmarks e benchmark ponta a ponta do monitor.
+
+Cada benchmark prepara os dados fora da medição e cronometra só o trecho de
+interesse, `repeat` vezes, com o coletor de lixo desligado (como o timeit).
+O resultado guarda a mediana e o melhor tempo por operação (ns) e a vazão
+correspondente à mediana; a comparação com a linha de base usa a mediana.
+
+O tráfego vem de traffic.synthetic_traffic com semente fixa, então duas
+execuções com as mesmas opções medem exatamente os mesmos pacotes.
+"""
+import gc
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from ..logging_csv import CsvLogger
+from ..main import Monitor
+from ..parsers.app import identify_app
+from ..parsers.decoder import PacketRecord, decode
+from ..parsers.ip import parse_ip
+from ..stats import Stats
+from .traffic import MemoryCapture, synthetic_traffic
+
+SCHEMA = 1
+DEFAULT_TOLERANCE = 0.10  # mediana até 10% pior que a base não é regressão
+
+
+class BenchConfig:
+    def __init__(self, mix: str = 'mixed', packets: int = 20000, endpoints: int = 4096, clients: int = 16,
+                 seed: int = 1, repeat: int = 5, batch_size: int = 64) -> None:
+        self.mix = mix
+        self.packets = packets
+        self.endpoints = endpoints
+        self.clients = clients
+        self.seed = seed
+        self.repeat = max(1, repeat)
+        self.batch_size = batch_size
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    gc_was = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        fn()
+        return time.perf_counter() - t0
+    finally:
+        if gc_was:
+            gc.enable()
+
+
+def _result(times: List[float], n: int, unit: str, **extra) -> Dict:
+    per_op = [t / n * 1e9 for t in times]
+    median = statistics.median(per_op)
+    out = {'unit': unit, 'n': n, 'repeat': len(times), 'median_ns': round(median, 1),
+           'best_ns': round(min(per_op), 1), 'ops_per_sec': round(1e9 / median, 1) if median else 0.0}
+    out.update(extra)
+    return out
+
+
+def _frames(cfg: BenchConfig) -> List[bytes]:
+    return synthetic_traffic(cfg.packets, cfg.mix, cfg.endpoints, cfg.clients, seed=cfg.seed)
+
+
+def bench_parse_ip(cfg: BenchConfig, frames: List[bytes]) -> Dict:
+    def run():
+        for f in frames:
+            parse_ip(f)
+    return _result([_timed(run) for _ in range(cfg.repeat)], len(frames), 'pacote')
+
+
+def bench_decode(cfg: BenchConfig, frames: List[bytes]) -> Dict:
+    rec = PacketRecord()
+
+    def run():
+        for f in frames:
+            decode(rec, f)
+    return _result([_timed(run) for _ in range(cfg.repeat)], len(frames), 'pacote')
+
+
+def bench_identify_app(cfg: BenchConfig, frames: List[bytes]) -> Dict:
+    rec = PacketRecord()
+    items = []
+    for f in frames:
+        if decode(rec, f) and rec.src_port is not None and len(rec.payload):
+            items.append((rec.src_port, rec.dst_port, bytes(rec.payload), rec.ip_proto))
+
+    def run():
+        for sp, dp, payload, proto in items:
+            identify_app(sp, dp, payload, proto)
+    return _result([_timed(run) for _ in range(cfg.repeat)], max(1, len(items)), 'payload')
+
+
+def _stats_calls(frames: List[bytes]) -> List[tuple]:
+    # Argumentos de add_packet como o Monitor os montaria (cliente = lado 172.31.66.x/fd00:66::)
+    rec = PacketRecord()
+    calls = []
+    ts = 1_700_000_000.0
+    for i, f in enumerate(frames):
+        if not decode(rec, f):
+            continue
+        client_src = rec.src.startswith('172.31.66.') or rec.src.startswith('fd00:66:')
+        client, remote = (rec.src, rec.dst) if client_src else (rec.dst, rec.src)
+        proto = rec.l4_name or rec.ip_name
+        calls.append((client, remote, proto, rec.total_length, rec.dst_port,
+                      bool(rec.tcp_flags & 0x002), ts + i * 1e-5))
+    return calls
+
+
+def bench_stats_add_packet(cfg: BenchConfig, frames: List[bytes]) -> Dict:
+    calls = _stats_calls(frames)
+
+    def run():
+        add = Stats().add_packet
+        for client, remote, proto, size, port, syn, ts in calls:
+            add(client, remote, proto, size, dst_port=port, is_tcp_syn=syn, ts=ts)
+    return _result([_timed(run) for _ in range(cfg.repeat)], len(calls), 'pacote')
+
+
+def bench_stats_snapshot(cfg: BenchConfig, frames: List[bytes], dirty: int = 256) -> Dict:
+    """Snapshot de um Stats já povoado depois de `dirty` pacotes novos (caso da UI)."""
+    calls = _stats_calls(frames)
+    stats = Stats()
+    for client, remote, proto, size, port, syn, ts in calls:
+        stats.add_packet(client, remote, proto, size, dst_port=port, is_tcp_syn=syn, ts=ts)
+    now = calls[-1][-1] if calls else 0.0
+    first = _timed(lambda: stats.snapshot(now))  # primeira vista: tudo sujo
+    rounds = 20
+    times = []
+    for _ in range(cfg.repeat):
+        spent = 0.0
+        for r in range(rounds):
+            start = r * dirty % max(1, len(calls))
+            for client, remote, proto, size, port, syn, ts in calls[start:start + dirty]:
+                stats.add_packet(client, remote, proto, size, dst_port=port, is_tcp_syn=syn, ts=now)
+            now += 1.0
+            spent += _timed(lambda: stats.snapshot(now))
+        times.append(spent)
+    endpoints = sum(len(cs.endpoints) for cs in stats.clients.values())
+    return _result(times, rounds, 'snapshot', dirty=dirty, endpoints=endpoints, first_ns=round(first * 1e9, 1))
+
+
+def bench_csv_logger(cfg: BenchConfig, frames: List[bytes]) -> Dict:
+    """Linhas por segundo do CsvLogger com índice, incluindo o esvaziamento da fila no close()."""
+    rec = PacketRecord()
+    rows = []
+    stamp = datetime.now().isoformat(timespec='seconds')
+    for f in frames:
+        if decode(rec, f) and rec.src_port is not None:
+            rows.append([stamp, rec.l4_name, rec.src, rec.src_port, rec.dst, rec.dst_port, rec.total_length])
+    headers = ['timestamp', 'protocolo', 'src_ip', 'src_port', 'dst_ip', 'dst_port', 'tamanho_bytes']
+    times = []
+    for _ in range(cfg.repeat):
+        tmp = tempfile.mkdtemp(prefix='bench-csv-')
+        try:
+            logger = CsvLogger(os.path.join(tmp, 'transporte.csv'), headers, index=True, ip_cols=(2, 4))
+
+            def run():
+                write = logger.write_row
+                for row in rows:
+                    write(row)
+                logger.close()
+            times.append(_timed(run))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return _result(times, max(1, len(rows)), 'linha')
+
+
+def bench_end_to_end(cfg: BenchConfig, frames: List[bytes], log_format: str = 'csv') -> Dict:
+    """Monitor._loop_capture sobre uma MemoryCapture; `drain_ns` inclui o stop() (fila dos logs)."""
+    loop_times, total_times = [], []
+    detections = dropped = 0
+    for _ in range(cfg.repeat):
+        tmp = tempfile.mkdtemp(prefix='bench-e2e-')
+        try:
+            cap = MemoryCapture(frames, batch_size=cfg.batch_size)
+            mon = Monitor('memory', client_subnet=['172.31.66.0/24', 'fd00:66::/64'], capture=cap,
+                          log_dir=tmp, log_format=log_format)
+            mon.open()
+
+            def run():
+                t0 = time.perf_counter()
+                mon._loop_capture()
+                loop_times.append(time.perf_counter() - t0)
+                mon.stop()
+            total_times.append(_timed(run))
+            detections = mon.apps.detections
+            dropped = mon.snapshot()['log_dropped']
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    n = len(frames)
+    res = _result(loop_times, n, 'pacote', log_format=log_format, detections=detections,
+                  log_dropped=dropped)
+    res['drain_ns'] = round(statistics.median(total_times) / n * 1e9, 1)
+    res['mbit_per_sec'] = round(sum(map(len, frames)) * 8 / statistics.median(loop_times) / 1e6, 1)
+    return res
+
+
+BENCHMARKS: Dict[str, Callable[[BenchConfig, List[bytes]], Dict]] = {
+    'parse_ip': bench_parse_ip,
+    'decode': bench_decode,
+    'identify_app': bench_identify_app,
+    'stats_add_packet': bench_stats_add_packet,
+    'stats_snapshot': bench_stats_snapshot,
+    'csv_logger': bench_csv_logger,
+    'e2e_csv': bench_end_to_end,
+    'e2e_binary': lambda cfg, frames: bench_end_to_end(cfg, frames, 'binary'),
+}
+
+
+def run_suite(cfg: BenchConfig, only: Optional[List[str]] = None,
+              progress: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    names = only or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Benchmark desconhecido: {', '.join(unknown)}")
+    frames = _frames(cfg)
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](cfg, frames)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'schema': SCHEMA,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                        'platform': platform.platform(), 'machine': platform.machine(),
+                        'cpus': os.cpu_count(), 'executable': sys.executable},
+        'config': cfg.as_dict(),
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """Compara as medianas por benchmark; status 'regressão' quando piora além da tolerância."""
+    rows = []
+    base = baseline.get('results', {})
+    for name, res in current.get('results', {}).items():
+        old = base.get(name)
+        if old is None:
+            rows.append({'name': name, 'status': 'novo', 'current_ns': res['median_ns']})
+            continue
+        ratio = res['median_ns'] / old['median_ns'] if old['median_ns'] else 1.0
+        if ratio > 1 + tolerance:
+            status = 'regressão'
+        elif ratio < 1 - tolerance:
+            status = 'melhora'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'status': status, 'baseline_ns': old['median_ns'],
+                     'current_ns': res['median_ns'], 'ratio': round(ratio, 3)})
+    for name in base:
+        if name not in current.get('results', {}):
+            rows.append({'name': name, 'status': 'ausente', 'baseline_ns': base[name]['median_ns']})
+    return rows
+
+
+def config_mismatch(current: Dict, baseline: Dict) -> List[str]:
+    # Campos da configuração que mudam o que é medido (semente, tamanho, mistura...)
+    cur, old = current.get('config', {}), baseline.get('config', {})
+    return sorted(k for k in cur if k != 'repeat' and k in old and cur[k] != old[k])
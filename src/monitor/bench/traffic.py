@@ -0,0 +1,272 @@
+"""
+Tráfego sintético para benchmarks e testes.
+
+Os construtores montam pacotes L3 crus (sem Ethernet), como os que chegam do
+tun0. synthetic_traffic() gera uma mistura de fluxos com semente fixa: cada
+fluxo começa pelo handshake (SYN, ClientHello, pergunta DNS...) e segue com
+dados nos dois sentidos até ser trocado por outro, então a mesma semente
+produz sempre os mesmos bytes. Os clientes ficam em 172.31.66.0/24 e
+fd00:66::/64 (sub-redes padrão do monitor) e os endpoints remotos em
+10.0.0.0/8 e 2001:db8::/32, até `endpoints` distintos.
+
+MemoryCapture entrega uma lista de quadros ao Monitor com a interface das
+outras fontes (open/recv_batch/l3_offset/close), sem socket nem arquivo;
+write_pcap grava quadros num arquivo pcap para o caminho de leitura (-r).
+"""
+import random
+import struct
+from typing import Dict, List, Optional, Tuple
+
+CLIENT_V4 = 0xAC1F4200  # 172.31.66.0/24
+CLIENT_V6 = 0xFD000066 << 96  # fd00:66::/64
+REMOTE_V4 = 0x0A000000  # 10.0.0.0/8
+REMOTE_V6 = 0x20010DB8 << 96  # 2001:db8::/32
+
+TCP_SYN, TCP_ACK, TCP_PSH = 0x002, 0x010, 0x008
+
+# Peso de cada tipo de fluxo; o sufixo 6 indica IPv6
+MIXES: Dict[str, Dict[str, int]] = {
+    'mixed': {'tcp': 25, 'http': 10, 'tls': 15, 'dns': 15, 'udp': 10, 'icmp': 5,
+              'tcp6': 10, 'tls6': 5, 'dns6': 5},
+    'web': {'http': 40, 'tls': 45, 'dns': 15},
+    'dns': {'dns': 80, 'dns6': 20},
+    'ipv6': {'tcp6': 40, 'tls6': 20, 'dns6': 25, 'icmp6': 15},
+}
+
+
+def build_ipv4(proto: int, src: bytes, dst: bytes, payload: bytes, ident: int = 0, flags_fragment: int = 0) -> bytes:
+    header = struct.pack('!BBHHHBBH4s4s', (4 << 4) | 5, 0, 20 + len(payload), ident, flags_fragment,
+                         64, proto, 0, src, dst)
+    return header + payload
+
+
+def build_ipv6(next_header: int, payload: bytes, src: bytes, dst: bytes) -> bytes:
+    return struct.pack('!IHBB', 6 << 28, len(payload), next_header, 64) + src + dst + payload
+
+
+def build_udp(src_port: int, dst_port: int, app_payload: bytes) -> bytes:
+    return struct.pack('!HHH', src_port, dst_port, 8 + len(app_payload)) + b'\x00\x00' + app_payload
+
+
+def build_tcp(src_port: int, dst_port: int, seq: int, flags: int, data: bytes = b'', ack: int = 0) -> bytes:
+    return struct.pack('!HHIIHHHH', src_port, dst_port, seq & 0xFFFFFFFF, ack & 0xFFFFFFFF,
+                       (5 << 12) | flags, 65535, 0, 0) + data
+
+
+def build_icmp(icmp_type: int, code: int, data: bytes = b'') -> bytes:
+    # Vale para ICMP e ICMPv6 (mesmo formato de cabeçalho; checksum zerado)
+    return struct.pack('!BBH', icmp_type, code, 0) + data
+
+
+def http_request(host: str, path: str = '/') -> bytes:
+    return f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: bench\r\nAccept: */*\r\n\r\n".encode()
+
+
+def http_response(body_len: int) -> bytes:
+    head = f"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: {body_len}\r\n\r\n".encode()
+    return head + b'x' * body_len
+
+
+def qname(name: str) -> bytes:
+    return b''.join(bytes([len(p)]) + p.encode() for p in name.split('.')) + b'\x00'
+
+
+def dns_query(name: str, tid: int = 0x4242, qtype: int = 1) -> bytes:
+    return struct.pack('!HHHHHH', tid, 0x0100, 1, 0, 0, 0) + qname(name) + struct.pack('!HH', qtype, 1)
+
+
+def dns_response(name: str, addr: bytes, tid: int = 0x4242, ttl: int = 300) -> bytes:
+    """Resposta A/AAAA (conforme o tamanho de `addr`) com o dono comprimido."""
+    qtype = 1 if len(addr) == 4 else 28
+    out = struct.pack('!HHHHHH', tid, 0x8180, 1, 1, 0, 0) + qname(name) + struct.pack('!HH', qtype, 1)
+    return out + b'\xc0\x0c' + struct.pack('!HHIH', qtype, 1, ttl, len(addr)) + addr
+
+
+def client_hello(sni: str) -> bytes:
+    """Registro TLS com um ClientHello mínimo (SNI, ALPN h2 e TLS 1.3)."""
+    name = sni.encode()
+    ext = lambda etype, data: struct.pack('!HH', etype, len(data)) + data
+    exts = ext(0, struct.pack('!HBH', len(name) + 3, 0, len(name)) + name)
+    exts += ext(16, b'\x00\x03\x02h2')
+    exts += ext(43, b'\x02\x03\x04')
+    body = b'\x03\x03' + b'\x00' * 32 + b'\x00' + b'\x00\x02\x13\x01' + b'\x01\x00'
+    body += struct.pack('!H', len(exts)) + exts
+    hs = b'\x01' + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(hs)) + hs
+
+
+class _Flow:
+    __slots__ = ('kind', 'v6', 'client', 'remote', 'sport', 'dport', 'seq_c', 'seq_s', 'left', 'step', 'host')
+
+    def __init__(self, kind: str, client: bytes, remote: bytes, sport: int, left: int, host: str) -> None:
+        self.kind = kind.rstrip('6')
+        self.v6 = kind.endswith('6')
+        self.client = client
+        self.remote = remote
+        self.sport = sport
+        self.dport = {'http': 80, 'tls': 443, 'dns': 53, 'udp': 5004, 'tcp': 9000, 'icmp': 0}[self.kind]
+        self.seq_c = self.seq_s = 1
+        self.left = left
+        self.step = 0
+        self.host = host
+
+
+class TrafficGenerator:
+    """Gera quadros L3 de uma mistura de fluxos (ver MIXES) de forma determinística."""
+
+    def __init__(self, mix: str = 'mixed', endpoints: int = 1024, clients: int = 16,
+                 flows: int = 256, seed: int = 1) -> None:
+        if mix not in MIXES:
+            raise ValueError(f"Mistura de tráfego inválida: {mix}")
+        self.rng = random.Random(seed)
+        self.kinds, self.weights = zip(*MIXES[mix].items())
+        self.endpoints = max(1, endpoints)
+        self.clients = max(1, clients)
+        self._next_port = 20000
+        self._flows: List[_Flow] = [self._new_flow() for _ in range(max(1, flows))]
+
+    def _new_flow(self) -> _Flow:
+        rng = self.rng
+        kind = rng.choices(self.kinds, self.weights)[0]
+        c = rng.randrange(self.clients) + 10
+        r = rng.randrange(self.endpoints) + 1
+        if kind.endswith('6'):
+            client, remote = (CLIENT_V6 | c).to_bytes(16, 'big'), (REMOTE_V6 | r).to_bytes(16, 'big')
+        else:
+            client, remote = (CLIENT_V4 | c).to_bytes(4, 'big'), (REMOTE_V4 | r).to_bytes(4, 'big')
+        self._next_port = self._next_port + 1 if self._next_port < 60999 else 20000
+        return _Flow(kind, client, remote, self._next_port, rng.randrange(4, 48), f"h{r}.example.com")
+
+    def _ip(self, f: _Flow, reply: bool, proto: int, l4: bytes) -> bytes:
+        src, dst = (f.remote, f.client) if reply else (f.client, f.remote)
+        if f.v6:
+            return build_ipv6(58 if proto == 1 else proto, l4, src, dst)
+        return build_ipv4(proto, src, dst, l4)
+
+    def _tcp(self, f: _Flow, reply: bool, flags: int, data: bytes = b'') -> bytes:
+        if reply:
+            seg = build_tcp(f.dport, f.sport, f.seq_s, flags, data, f.seq_c)
+            f.seq_s += len(data) + (1 if flags & TCP_SYN else 0)
+        else:
+            seg = build_tcp(f.sport, f.dport, f.seq_c, flags, data, f.seq_s)
+            f.seq_c += len(data) + (1 if flags & TCP_SYN else 0)
+        return self._ip(f, reply, 6, seg)
+
+    def _packet(self, f: _Flow) -> bytes:
+        rng = self.rng
+        step = f.step
+        f.step += 1
+        kind = f.kind
+        if kind == 'dns':
+            tid = (f.sport * 7 + step // 2) & 0xFFFF
+            if step % 2 == 0:
+                return self._ip(f, False, 17, build_udp(f.sport, 53, dns_query(f.host, tid, 28 if f.v6 else 1)))
+            return self._ip(f, True, 17, build_udp(53, f.sport, dns_response(f.host, f.remote, tid)))
+        if kind == 'udp':
+            reply = rng.random() < 0.5
+            data = bytes(rng.randrange(40, 1200))
+            ports = (f.dport, f.sport) if reply else (f.sport, f.dport)
+            return self._ip(f, reply, 17, build_udp(ports[0], ports[1], data))
+        if kind == 'icmp':
+            reply = step % 2 == 1
+            if f.v6:
+                return self._ip(f, reply, 1, build_icmp(129 if reply else 128, 0, bytes(56)))
+            return self._ip(f, reply, 1, build_icmp(0 if reply else 8, 0, bytes(56)))
+        # TCP: SYN, SYN-ACK, ACK e depois dados
+        if step == 0:
+            return self._tcp(f, False, TCP_SYN)
+        if step == 1:
+            return self._tcp(f, True, TCP_SYN | TCP_ACK)
+        if step == 2:
+            if kind == 'http':
+                return self._tcp(f, False, TCP_ACK | TCP_PSH, http_request(f.host, f"/p{rng.randrange(100)}"))
+            if kind == 'tls':
+                return self._tcp(f, False, TCP_ACK | TCP_PSH, client_hello(f.host))
+            return self._tcp(f, False, TCP_ACK)
+        reply = rng.random() < 0.6
+        size = rng.randrange(0, 1400) if rng.random() < 0.7 else 0
+        if kind == 'http' and step == 3:
+            return self._tcp(f, True, TCP_ACK | TCP_PSH, http_response(rng.randrange(200, 1200)))
+        if kind == 'tls' and size:
+            data = b'\x17\x03\x03' + struct.pack('!H', size) + bytes(size)
+        else:
+            data = bytes(size)
+        return self._tcp(f, reply, TCP_ACK | (TCP_PSH if data else 0), data)
+
+    def packets(self, n: int) -> List[bytes]:
+        out = []
+        flows = self._flows
+        rng = self.rng
+        for _ in range(n):
+            i = rng.randrange(len(flows))
+            f = flows[i]
+            out.append(self._packet(f))
+            f.left -= 1
+            if f.left <= 0:
+                flows[i] = self._new_flow()
+        return out
+
+
+def synthetic_traffic(n: int, mix: str = 'mixed', endpoints: int = 1024, clients: int = 16,
+                      flows: int = 256, seed: int = 1) -> List[bytes]:
+    return TrafficGenerator(mix, endpoints, clients, flows, seed).packets(n)
+
+
+def write_pcap(path: str, linktype: int, packets: List[bytes]) -> None:
+    """Grava `packets` num pcap clássico (µs), um pacote por segundo a partir de t=1000."""
+    with open(path, 'wb') as fh:
+        fh.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, linktype))
+        for i, pkt in enumerate(packets):
+            fh.write(struct.pack('<IIII', 1000 + i, 500, len(pkt), len(pkt)))
+            fh.write(pkt)
+
+
+class MemoryCapture:
+    """Fonte de captura que entrega quadros L3 já em memória, em lotes.
+
+    `interval` é o espaço entre os timestamps sintéticos dos pacotes (o relógio
+    de fluxos e taxas do Monitor). Ao fim da lista, recv_batch lança EOFError.
+    """
+
+    def __init__(self, frames: List[bytes], batch_size: int = 64, start_ts: float = 1_700_000_000.0,
+                 interval: float = 1e-5) -> None:
+        self.frames = frames
+        self.batch_size = max(1, batch_size)
+        self.start_ts = start_ts
+        self.interval = interval
+        self.mode = 'memory'
+        self.interface = 'memory'
+        self.replay = 'max'
+        self.packets = 0
+        self.bytes = 0
+        self.last_ts = 0.0
+        self._batches: List[List[bytes]] = []
+        self._sizes: List[int] = []
+        self._pos = 0
+
+    def open(self) -> None:
+        bs = self.batch_size
+        self._batches = [self.frames[i:i + bs] for i in range(0, len(self.frames), bs)]
+        self._sizes = [sum(map(len, b)) for b in self._batches]
+        self._pos = 0
+
+    def close(self) -> None:
+        self._pos = len(self._batches)
+
+    @staticmethod
+    def l3_offset(frame: bytes) -> int:
+        return 0
+
+    @staticmethod
+    def split_l2_l3(frame: bytes) -> Tuple[Optional[bytes], bytes]:
+        return None, frame
+
+    def recv_batch(self) -> List[bytes]:
+        if self._pos >= len(self._batches):
+            raise EOFError("Fim do tráfego em memória")
+        batch = self._batches[self._pos]
+        self.bytes += self._sizes[self._pos]
+        self._pos += 1
+        self.packets += len(batch)
+        self.last_ts = self.start_ts + self.packets * self.interval
+        return batch
@@ -0,0 +1,364 @@
+"""
+Logs binários em segmentos append-only com rodapé colunar.
+
+Cada segmento (logs/<tipo>-NNNNNN.seg) começa com um cabeçalho
+(b'MSEG', versão, tipo) seguido de registros prefixados pelo tamanho (u16).
+Os campos fixos vêm primeiro (timestamp em ns, códigos de protocolo, portas,
+tamanho), depois os endereços crus (4 ou 16 bytes conforme a versão IP) e,
+por fim, o texto livre (info) quando o tipo tem.
+
+Ao fechar, o segmento recebe um rodapé colunar: cada campo fixo de todos os
+registros gravado contíguo (timestamps, offsets dos registros, códigos,
+endereços em 16 bytes...), terminado por um trailer com o offset do rodapé,
+a contagem e o intervalo de tempo. Filtros leem só as colunas; o registro
+só é lido quando precisa do texto. Segmentos ainda abertos (ou de um
+processo interrompido) não têm rodapé e são lidos sequencialmente.
+"""
+import glob
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .logging_csv import QueuedWriter
+from .parsers.decoder import PacketRecord, format_ipv4, format_ipv6
+
+MAGIC = b'MSEG'
+FOOTER_MAGIC = b'MCOL'
+END_MAGIC = b'MEND'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sBB2x')
+_LEN = struct.Struct('<H')
+_TRAILER = struct.Struct('<QIqq4s')  # offset do rodapé, registros, ts mínimo, ts máximo, magia
+
+KINDS = {'internet': 1, 'transporte': 2, 'aplicacao': 3}
+KIND_NAMES = {v: k for k, v in KINDS.items()}
+
+# Códigos pequenos para os nomes de protocolo gravados nos logs
+PROTO_CODES = {'IPv4': 1, 'IPv6': 2, 'ICMP': 3, 'TCP': 4, 'UDP': 5}
+PROTO_NAMES = {v: k for k, v in PROTO_CODES.items()}
+APP_CODES = {'HTTP': 1, 'DNS': 2, 'DHCP': 3, 'NTP': 4}
+APP_NAMES = {v: k for k, v in APP_CODES.items()}
+
+# Parte fixa de cada tipo de registro
+_FIXED = {
+    'internet': struct.Struct('<qBBBI'),  # ts_ns, protocolo, versão, ip_proto, tamanho
+    'transporte': struct.Struct('<qBBHHI'),  # ts_ns, protocolo, versão, src_port, dst_port, tamanho
+    'aplicacao': struct.Struct('<qB'),  # ts_ns, código da aplicação (0 = nome no texto)
+}
+
+# Colunas do rodapé: (nome, typecode do array ou None para endereços de 16 bytes)
+COLUMNS = {
+    'internet': [('ts', 'q'), ('offset', 'Q'), ('proto', 'B'), ('version', 'B'), ('ip_proto', 'B'),
+                 ('size', 'I'), ('src', None), ('dst', None)],
+    'transporte': [('ts', 'q'), ('offset', 'Q'), ('proto', 'B'), ('version', 'B'), ('src_port', 'H'),
+                   ('dst_port', 'H'), ('size', 'I'), ('src', None), ('dst', None)],
+    'aplicacao': [('ts', 'q'), ('offset', 'Q'), ('app', 'B')],
+}
+
+# Cabeçalhos dos CSVs equivalentes (logging_csv), usados na exportação
+HEADERS = {
+    'internet': ['timestamp', 'protocolo', 'src_ip', 'dst_ip', 'ip_proto', 'info', 'tamanho_bytes'],
+    'transporte': ['timestamp', 'protocolo', 'src_ip', 'src_port', 'dst_ip', 'dst_port', 'tamanho_bytes'],
+    'aplicacao': ['timestamp', 'protocolo', 'info'],
+}
+
+
+def _native(arr: array) -> bytes:
+    if sys.byteorder != 'little':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le(typecode: str, raw: bytes) -> array:
+    arr = array(typecode)
+    arr.frombytes(raw)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr
+
+
+def addr_bytes(version: int, addr: int) -> bytes:
+    return addr.to_bytes(4 if version == 4 else 16, 'big')
+
+
+def addr_str(version: int, raw: bytes) -> str:
+    n = int.from_bytes(raw, 'big')
+    return format_ipv4(n) if version == 4 else format_ipv6(n)
+
+
+def _col16(version: int, raw: bytes) -> bytes:
+    # Endereços na coluna ocupam sempre 16 bytes (IPv4 alinhado à direita)
+    return raw if version == 6 else b'\x00' * 12 + raw
+
+
+class SegmentWriter(QueuedWriter):
+    """Grava linhas (tuplas) de um tipo em segmentos com rodapé colunar."""
+
+    def __init__(self, base_dir: str, kind: str, segment_records: int = 262144,
+                 segment_bytes: int = 64 * 1024 * 1024, **opts) -> None:
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de log inválido: {kind}")
+        self.base_dir = base_dir
+        self.kind = kind
+        self.segment_records = segment_records
+        self.segment_bytes = segment_bytes
+        self._fixed = _FIXED[kind]
+        os.makedirs(base_dir, exist_ok=True)
+        self._seq = max((segment_seq(p) for p in list_segments(base_dir, kind)), default=0)
+        self._fh = None
+        super().__init__(self._next_path(), **opts)
+        self._open()
+        self._start()
+
+    def _next_path(self) -> str:
+        self._seq += 1
+        return os.path.join(self.base_dir, f"{self.kind}-{self._seq:06d}.seg")
+
+    def _open(self) -> None:
+        self._fh = open(self.path, 'wb', buffering=max(self.flush_bytes, 8192))
+        self._fh.write(_HEADER.pack(MAGIC, FORMAT_VERSION, KINDS[self.kind]))
+        self._pos = self._size = _HEADER.size
+        self._cols: Dict[str, object] = {
+            name: (array(tc) if tc else bytearray()) for name, tc in COLUMNS[self.kind]
+        }
+
+    def _finish_segment(self) -> None:
+        cols = self._cols
+        count = len(cols['ts'])
+        parts = [FOOTER_MAGIC]
+        for name, tc in COLUMNS[self.kind]:
+            raw = _native(cols[name]) if tc else bytes(cols[name])
+            parts.append(struct.pack('<I', len(raw)))
+            parts.append(raw)
+        ts = cols['ts']
+        parts.append(_TRAILER.pack(self._pos, count, min(ts) if count else 0, max(ts) if count else 0, END_MAGIC))
+        self._fh.write(b''.join(parts))
+        self._fh.close()
+
+    def _write(self, row: tuple) -> int:
+        kind = self.kind
+        cols = self._cols
+        if kind == 'aplicacao':
+            ts, app, info = row
+            code = APP_CODES.get(app, 0)
+            text = info.encode('utf-8', 'replace')
+            if not code:
+                name = app.encode('utf-8', 'replace')[:255]
+                text = bytes([len(name)]) + name + text
+            body = self._fixed.pack(ts, code) + text[:65000]
+            cols['app'].append(code)
+        else:
+            if kind == 'internet':
+                ts, proto, version, src, dst, ip_proto, info, size = row
+                fixed = self._fixed.pack(ts, proto, version, ip_proto, size)
+                cols['ip_proto'].append(ip_proto)
+                tail = info.encode('utf-8', 'replace')[:60000] if info else b''
+            else:
+                ts, proto, version, src, sport, dst, dport, size = row
+                fixed = self._fixed.pack(ts, proto, version, sport, dport, size)
+                cols['src_port'].append(sport)
+                cols['dst_port'].append(dport)
+                tail = b''
+            sb, db = addr_bytes(version, src), addr_bytes(version, dst)
+            body = fixed + sb + db + tail
+            cols['proto'].append(proto)
+            cols['version'].append(version)
+            cols['size'].append(size)
+            cols['src'] += _col16(version, sb)
+            cols['dst'] += _col16(version, db)
+        cols['ts'].append(row[0])
+        cols['offset'].append(self._pos)
+        rec = _LEN.pack(len(body)) + body
+        self._fh.write(rec)
+        self._pos += len(rec)
+        if len(cols['ts']) >= self.segment_records or self._pos >= self.segment_bytes:
+            self._rotate()
+            self._opened_at = time.time()
+        return len(rec)
+
+    def _written_since_open(self) -> bool:
+        return len(self._cols['ts']) > 0
+
+    def _rotate(self) -> None:
+        # Segmentos já são arquivos independentes: sela com o rodapé e abre o
+        # próximo. Não são comprimidos, para manter o acesso direto às colunas.
+        self._finish_segment()
+        self.path = self._next_path()
+        self._open()
+        if self.rotation is not None and self.rotation.keep >= 0:
+            sealed = [p for p in list_segments(self.base_dir, self.kind) if p != self.path]
+            for old in sealed[:max(0, len(sealed) - self.rotation.keep)]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _close_file(self) -> None:
+        if self._fh is not None and not self._fh.closed:
+            self._finish_segment()
+
+
+def _port(p: int) -> int:
+    return p if p >= 0 else 0
+
+
+class BinInternetLogger:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        self.logger = SegmentWriter(base_dir, 'internet', **opts)
+
+    def log_rec(self, rec: PacketRecord, proto_name: str, info: str, size: int) -> None:
+        self.logger.write_row((time.time_ns(), PROTO_CODES.get(proto_name, 0), rec.version,
+                               rec.src_int, rec.dst_int, rec.ip_proto, info, size))
+
+    def close(self) -> None:
+        self.logger.close()
+
+
+class BinTransporteLogger:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        self.logger = SegmentWriter(base_dir, 'transporte', **opts)
+
+    def log_rec(self, rec: PacketRecord, size: int) -> None:
+        self.logger.write_row((time.time_ns(), PROTO_CODES.get(rec.l4_name, 0), rec.version,
+                               rec.src_int, _port(rec.src_port), rec.dst_int, _port(rec.dst_port), size))
+
+    def close(self) -> None:
+        self.logger.close()
+
+
+class BinAplicacaoLogger:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        self.logger = SegmentWriter(base_dir, 'aplicacao', **opts)
+
+    def log(self, app_name: str, info: str) -> None:
+        self.logger.write_row((time.time_ns(), app_name, info))
+
+    def close(self) -> None:
+        self.logger.close()
+
+
+# -- leitura ---------------------------------------------------------------
+
+_SEG_RE = re.compile(r'-(\d+)\.seg$')
+
+
+def segment_seq(path: str) -> int:
+    m = _SEG_RE.search(path)
+    return int(m.group(1)) if m else 0
+
+
+def list_segments(base_dir: str, kind: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(base_dir, f"{kind}-*.seg")), key=segment_seq)
+
+
+class Segment:
+    """Leitor de um segmento; usa o rodapé colunar quando existe."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as fh:
+            magic, version, kind = _HEADER.unpack(fh.read(_HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Segmento inválido: {path}")
+            self.kind = KIND_NAMES[kind]
+            fh.seek(0, os.SEEK_END)
+            size = fh.tell()
+            self.footer_offset: Optional[int] = None
+            self.count = self.min_ts = self.max_ts = 0
+            if size >= _HEADER.size + _TRAILER.size:
+                fh.seek(size - _TRAILER.size)
+                off, count, tmin, tmax, end = _TRAILER.unpack(fh.read(_TRAILER.size))
+                if end == END_MAGIC:
+                    self.footer_offset, self.count, self.min_ts, self.max_ts = off, count, tmin, tmax
+        self._columns: Optional[Dict[str, object]] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.footer_offset is not None
+
+    def columns(self) -> Dict[str, object]:
+        """Colunas do rodapé (arrays; endereços como bytes de 16 em 16)."""
+        if self._columns is None:
+            if not self.complete:
+                self._columns = self._columns_from_scan()
+            else:
+                with open(self.path, 'rb') as fh:
+                    fh.seek(self.footer_offset)
+                    if fh.read(4) != FOOTER_MAGIC:
+                        raise ValueError(f"Rodapé inválido: {self.path}")
+                    cols: Dict[str, object] = {}
+                    for name, tc in COLUMNS[self.kind]:
+                        (n,) = struct.unpack('<I', fh.read(4))
+                        raw = fh.read(n)
+                        cols[name] = _from_le(tc, raw) if tc else raw
+                    self._columns = cols
+        return self._columns
+
+    def _columns_from_scan(self) -> Dict[str, object]:
+        # Segmento sem rodapé: monta as mesmas colunas lendo os registros
+        cols: Dict[str, object] = {name: (array(tc) if tc else bytearray()) for name, tc in COLUMNS[self.kind]}
+        for off, row in self.records():
+            cols['ts'].append(row['ts'])
+            cols['offset'].append(off)
+            if self.kind == 'aplicacao':
+                cols['app'].append(row['app_code'])
+                continue
+            for name, tc in COLUMNS[self.kind][2:]:
+                if tc:
+                    cols[name].append(row[name])
+                else:
+                    cols[name] += _col16(row['version'], row[name + '_raw'])
+        return cols
+
+    def _decode(self, body: bytes) -> Dict:
+        fixed = _FIXED[self.kind]
+        vals = fixed.unpack_from(body)
+        rest = body[fixed.size:]
+        if self.kind == 'aplicacao':
+            ts, code = vals
+            if code:
+                return {'ts': ts, 'app_code': code, 'app': APP_NAMES.get(code, str(code)),
+                        'info': rest.decode('utf-8', 'replace')}
+            n = rest[0] if rest else 0
+            return {'ts': ts, 'app_code': 0, 'app': rest[1:1 + n].decode('utf-8', 'replace'),
+                    'info': rest[1 + n:].decode('utf-8', 'replace')}
+        if self.kind == 'internet':
+            ts, proto, version, ip_proto, size = vals
+            row = {'ts': ts, 'proto': proto, 'version': version, 'ip_proto': ip_proto, 'size': size}
+        else:
+            ts, proto, version, sport, dport, size = vals
+            row = {'ts': ts, 'proto': proto, 'version': version, 'src_port': sport, 'dst_port': dport, 'size': size}
+        alen = 4 if version == 4 else 16
+        row['src_raw'] = rest[:alen]
+        row['dst_raw'] = rest[alen:2 * alen]
+        if self.kind == 'internet':
+            row['info'] = rest[2 * alen:].decode('utf-8', 'replace')
+        return row
+
+    def records(self, offsets=None) -> Iterator[Tuple[int, Dict]]:
+        """(offset, campos) de todos os registros ou só dos offsets dados."""
+        end = self.footer_offset
+        with open(self.path, 'rb') as fh:
+            if offsets is not None:
+                for off in offsets:
+                    fh.seek(off)
+                    (n,) = _LEN.unpack(fh.read(2))
+                    yield off, self._decode(fh.read(n))
+                return
+            pos = _HEADER.size
+            fh.seek(pos)
+            while end is None or pos < end:
+                head = fh.read(2)
+                if len(head) < 2:
+                    return
+                (n,) = _LEN.unpack(head)
+                body = fh.read(n)
+                if len(body) < n:
+                    return  # registro parcial no fim de um segmento vivo
+                yield pos, self._decode(body)
+                pos += 2 + n
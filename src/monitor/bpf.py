@@ -0,0 +1,394 @@
+"""
+Filtro de pacotes por expressão, compilado para BPF clássico (kernel) ou
+avaliado em espaço de usuário.
+
+Gramática (subconjunto da sintaxe do tcpdump):
+
+    expr      := termo (('or' | '||') termo)*
+    termo     := fator (('and' | '&&') fator)*
+    fator     := ('not' | '!') fator | '(' expr ')' | primitiva
+    primitiva := [src | dst] host ENDEREÇO
+               | [src | dst] net PREFIXO
+               | [src | dst] port N
+               | proto (tcp | udp | icmp | icmp6) | tcp | udp | icmp | icmp6
+               | ip | ip6
+
+Ex.: "net 172.31.66.0/24 and (port 53 or port 80)", "not tcp".
+
+O código BPF usa cargas relativas ao cabeçalho de rede (SKF_NET_OFF) e o
+protocolo do skb (SKF_AD_PROTOCOL), então independe do tipo de enlace.
+Portas só casam em TCP/UDP não fragmentados; em IPv6 o transporte deve vir
+logo após o cabeçalho fixo.
+"""
+import ctypes
+import ipaddress
+import socket
+import struct
+from typing import Callable, List, Optional, Tuple
+
+from .parsers.decoder import PacketRecord
+
+# Nó da AST: ('and', a, b) | ('or', a, b) | ('not', a) | ('host', dir, versão, int)
+# | ('net', dir, versão, rede, prefixo) | ('port', dir, n) | ('proto', nome) | ('ip', versão)
+Node = tuple
+
+_PROTOS = {'tcp': (6, None), 'udp': (17, None), 'icmp': (1, 4), 'icmp6': (58, 6)}
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def _tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for raw in text.replace('(', ' ( ').replace(')', ' ) ').replace('!', ' ! ').split():
+        if raw == '&&':
+            out.append('and')
+        elif raw == '||':
+            out.append('or')
+        elif raw == '!':
+            out.append('not')
+        else:
+            out.append(raw.lower() if raw.isalpha() else raw)
+    return out
+
+
+class _Parser:
+    def __init__(self, tokens: List[str]) -> None:
+        self.toks = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.toks[self.pos] if self.pos < len(self.toks) else None
+
+    def take(self) -> str:
+        tok = self.peek()
+        if tok is None:
+            raise FilterSyntaxError("Expressão de filtro incompleta")
+        self.pos += 1
+        return tok
+
+    def parse(self) -> Node:
+        node = self.expr()
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"Token inesperado no filtro: {self.peek()!r}")
+        return node
+
+    def expr(self) -> Node:
+        node = self.term()
+        while self.peek() == 'or':
+            self.take()
+            node = ('or', node, self.term())
+        return node
+
+    def term(self) -> Node:
+        node = self.factor()
+        while self.peek() == 'and':
+            self.take()
+            node = ('and', node, self.factor())
+        return node
+
+    def factor(self) -> Node:
+        tok = self.peek()
+        if tok == 'not':
+            self.take()
+            return ('not', self.factor())
+        if tok == '(':
+            self.take()
+            node = self.expr()
+            if self.take() != ')':
+                raise FilterSyntaxError("Parêntese não fechado no filtro")
+            return node
+        return self.primitive()
+
+    def primitive(self) -> Node:
+        tok = self.take()
+        direction = 'any'
+        if tok in ('src', 'dst'):
+            direction = tok
+            tok = self.take()
+        if tok == 'host':
+            try:
+                addr = ipaddress.ip_address(self.take())
+            except ValueError as e:
+                raise FilterSyntaxError(str(e)) from None
+            return ('host', direction, addr.version, int(addr))
+        if tok == 'net':
+            try:
+                net = ipaddress.ip_network(self.take(), strict=False)
+            except ValueError as e:
+                raise FilterSyntaxError(str(e)) from None
+            return ('net', direction, net.version, int(net.network_address), net.prefixlen)
+        if tok == 'port':
+            val = self.take()
+            if not val.isdigit() or int(val) > 65535:
+                raise FilterSyntaxError(f"Porta inválida: {val}")
+            return ('port', direction, int(val))
+        if direction != 'any':
+            raise FilterSyntaxError(f"'{direction}' deve ser seguido de host, net ou port")
+        if tok == 'proto':
+            tok = self.take()
+        if tok in _PROTOS:
+            return ('proto', tok)
+        if tok == 'ip':
+            return ('ip', 4)
+        if tok == 'ip6':
+            return ('ip', 6)
+        raise FilterSyntaxError(f"Primitiva de filtro desconhecida: {tok!r}")
+
+
+def parse_filter(text: str) -> Node:
+    toks = _tokenize(text)
+    if not toks:
+        raise FilterSyntaxError("Filtro vazio")
+    return _Parser(toks).parse()
+
+
+# --------------------------------------------------------------------------
+# Avaliação em espaço de usuário (TUN, pcap, fallback)
+
+def make_predicate(node: Node) -> Callable[[PacketRecord], bool]:
+    """Converte a AST em uma função rec -> bool (fechamentos aninhados)."""
+    kind = node[0]
+    if kind == 'and':
+        a, b = make_predicate(node[1]), make_predicate(node[2])
+        return lambda r: a(r) and b(r)
+    if kind == 'or':
+        a, b = make_predicate(node[1]), make_predicate(node[2])
+        return lambda r: a(r) or b(r)
+    if kind == 'not':
+        a = make_predicate(node[1])
+        return lambda r: not a(r)
+    if kind == 'ip':
+        version = node[1]
+        return lambda r: r.version == version
+    if kind == 'proto':
+        num, version = _PROTOS[node[1]]
+        if version is None:
+            return lambda r: r.ip_proto == num
+        return lambda r: r.ip_proto == num and r.version == version
+    direction = node[1]
+    if kind == 'host':
+        _k, _d, version, addr = node
+        if direction == 'src':
+            return lambda r: r.version == version and r.src_int == addr
+        if direction == 'dst':
+            return lambda r: r.version == version and r.dst_int == addr
+        return lambda r: r.version == version and (r.src_int == addr or r.dst_int == addr)
+    if kind == 'net':
+        _k, _d, version, net, plen = node
+        shift = (32 if version == 4 else 128) - plen
+        net >>= shift
+        if direction == 'src':
+            return lambda r: r.version == version and (r.src_int >> shift) == net
+        if direction == 'dst':
+            return lambda r: r.version == version and (r.dst_int >> shift) == net
+        return lambda r: r.version == version and ((r.src_int >> shift) == net or (r.dst_int >> shift) == net)
+    if kind == 'port':
+        port = node[2]
+        if direction == 'src':
+            return lambda r: r.src_port == port and r.l4_name in ('TCP', 'UDP')
+        if direction == 'dst':
+            return lambda r: r.dst_port == port and r.l4_name in ('TCP', 'UDP')
+        return lambda r: (r.src_port == port or r.dst_port == port) and r.l4_name in ('TCP', 'UDP')
+    raise FilterSyntaxError(f"Nó de filtro desconhecido: {kind}")
+
+
+# --------------------------------------------------------------------------
+# Compilação para BPF clássico
+
+# Classes e modos de instrução (linux/filter.h)
+BPF_LD, BPF_LDX, BPF_ALU, BPF_JMP, BPF_RET, BPF_MISC = 0x00, 0x01, 0x04, 0x05, 0x06, 0x07
+BPF_W, BPF_H, BPF_B = 0x00, 0x08, 0x10
+BPF_ABS, BPF_IND, BPF_MSH, BPF_K = 0x20, 0x40, 0xA0, 0x00
+BPF_AND, BPF_JA, BPF_JEQ, BPF_JSET = 0x50, 0x00, 0x10, 0x40
+SKF_AD_PROTOCOL = 0xFFFFF000  # SKF_AD_OFF + SKF_AD_PROTOCOL
+SKF_NET_OFF = 0xFFF00000
+SO_ATTACH_FILTER = 26
+
+ETH_P_IP, ETH_P_IPV6 = 0x0800, 0x86DD
+
+Instruction = Tuple[int, int, int, int]
+
+
+class _Label:
+    __slots__ = ('pos',)
+
+    def __init__(self) -> None:
+        self.pos = -1
+
+
+class _Asm:
+    def __init__(self) -> None:
+        self.code: list = []
+
+    def place(self, label: _Label) -> None:
+        label.pos = len(self.code)
+
+    def stmt(self, code: int, k: int = 0) -> None:
+        self.code.append([code, 0, 0, k & 0xFFFFFFFF])
+
+    def jump(self, code: int, k: int, jt, jf) -> None:
+        # jt/jf: _Label ou None (próxima instrução)
+        self.code.append([BPF_JMP | code | BPF_K, jt, jf, k & 0xFFFFFFFF])
+
+    def goto(self, label: _Label) -> None:
+        self.code.append([BPF_JMP | BPF_JA, 0, 0, label])
+
+    def load(self, size: int, off: int) -> None:
+        self.stmt(BPF_LD | size | BPF_ABS, SKF_NET_OFF + off)
+
+    def assemble(self) -> List[Instruction]:
+        out: List[Instruction] = []
+        for i, (code, jt, jf, k) in enumerate(self.code):
+            if isinstance(k, _Label):
+                k = k.pos - (i + 1)
+            jt = jt.pos - (i + 1) if isinstance(jt, _Label) else (jt or 0)
+            jf = jf.pos - (i + 1) if isinstance(jf, _Label) else (jf or 0)
+            if not (0 <= jt <= 255 and 0 <= jf <= 255):
+                raise FilterSyntaxError("Filtro grande demais para saltos BPF")
+            out.append((code, jt, jf, k))
+        return out
+
+
+def _emit_version(asm: _Asm, version: int, f: _Label) -> None:
+    asm.stmt(BPF_LD | BPF_W | BPF_ABS, SKF_AD_PROTOCOL)
+    asm.jump(BPF_JEQ, ETH_P_IP if version == 4 else ETH_P_IPV6, None, f)
+
+
+def _emit_addr(asm: _Asm, version: int, direction: str, addr: int, plen: int, t: _Label, f: _Label) -> None:
+    # Compara o endereço (ou prefixo) com src e/ou dst, palavra de 32 bits por vez
+    _emit_version(asm, version, f)
+    width = 32 if version == 4 else 128
+    fields = {'src': [12 if version == 4 else 8], 'dst': [16 if version == 4 else 24]}
+    offsets = fields['src'] + fields['dst'] if direction == 'any' else fields[direction]
+    words = []
+    for w in range(width // 32):
+        bits = min(32, max(0, plen - 32 * w))
+        if bits == 0:
+            break
+        mask = (0xFFFFFFFF << (32 - bits)) & 0xFFFFFFFF
+        words.append((w * 4, mask, (addr >> (width - 32 * (w + 1))) & mask))
+    for n, base in enumerate(offsets):
+        miss = f if n == len(offsets) - 1 else _Label()
+        if not words:
+            asm.goto(t)  # prefixo /0 casa qualquer endereço da versão
+            return
+        for i, (woff, mask, val) in enumerate(words):
+            asm.load(BPF_W, base + woff)
+            if mask != 0xFFFFFFFF:
+                asm.stmt(BPF_ALU | BPF_AND | BPF_K, mask)
+            asm.jump(BPF_JEQ, val, t if i == len(words) - 1 else None, miss)
+        if miss is not f:
+            asm.place(miss)
+
+
+def _emit_port(asm: _Asm, direction: str, port: int, t: _Label, f: _Label) -> None:
+    v6 = _Label()
+    asm.stmt(BPF_LD | BPF_W | BPF_ABS, SKF_AD_PROTOCOL)
+    asm.jump(BPF_JEQ, ETH_P_IP, None, v6)
+    # IPv4: TCP/UDP, sem fragmento, porta após IHL
+    is_l4 = _Label()
+    asm.load(BPF_B, 9)
+    asm.jump(BPF_JEQ, 6, is_l4, None)
+    asm.jump(BPF_JEQ, 17, None, f)
+    asm.place(is_l4)
+    asm.load(BPF_H, 6)
+    asm.jump(BPF_JSET, 0x1FFF, f, None)
+    asm.stmt(BPF_LDX | BPF_B | BPF_MSH, SKF_NET_OFF)
+    offs = {'src': [0], 'dst': [2], 'any': [0, 2]}[direction]
+    for i, off in enumerate(offs):
+        asm.stmt(BPF_LD | BPF_H | BPF_IND, SKF_NET_OFF + off)
+        asm.jump(BPF_JEQ, port, t, f if i == len(offs) - 1 else None)
+    # IPv6: transporte logo após o cabeçalho fixo
+    asm.place(v6)
+    is_l4_6 = _Label()
+    asm.jump(BPF_JEQ, ETH_P_IPV6, None, f)
+    asm.load(BPF_B, 6)
+    asm.jump(BPF_JEQ, 6, is_l4_6, None)
+    asm.jump(BPF_JEQ, 17, None, f)
+    asm.place(is_l4_6)
+    for i, off in enumerate(offs):
+        asm.load(BPF_H, 40 + off)
+        asm.jump(BPF_JEQ, port, t, f if i == len(offs) - 1 else None)
+
+
+def _emit_proto(asm: _Asm, name: str, t: _Label, f: _Label) -> None:
+    num, version = _PROTOS[name]
+    v6 = _Label()
+    asm.stmt(BPF_LD | BPF_W | BPF_ABS, SKF_AD_PROTOCOL)
+    if version == 6:
+        asm.jump(BPF_JEQ, ETH_P_IPV6, None, f)
+    else:
+        asm.jump(BPF_JEQ, ETH_P_IP, None, v6 if version is None else f)
+        asm.load(BPF_B, 9)
+        asm.jump(BPF_JEQ, num, t, f)
+        if version == 4:
+            return
+        asm.place(v6)
+        asm.jump(BPF_JEQ, ETH_P_IPV6, None, f)
+    asm.load(BPF_B, 6)
+    asm.jump(BPF_JEQ, num, t, f)
+
+
+def _emit(asm: _Asm, node: Node, t: _Label, f: _Label) -> None:
+    kind = node[0]
+    if kind == 'and':
+        mid = _Label()
+        _emit(asm, node[1], mid, f)
+        asm.place(mid)
+        _emit(asm, node[2], t, f)
+    elif kind == 'or':
+        mid = _Label()
+        _emit(asm, node[1], t, mid)
+        asm.place(mid)
+        _emit(asm, node[2], t, f)
+    elif kind == 'not':
+        _emit(asm, node[1], f, t)
+    elif kind == 'ip':
+        asm.stmt(BPF_LD | BPF_W | BPF_ABS, SKF_AD_PROTOCOL)
+        asm.jump(BPF_JEQ, ETH_P_IP if node[1] == 4 else ETH_P_IPV6, t, f)
+    elif kind == 'proto':
+        _emit_proto(asm, node[1], t, f)
+    elif kind == 'host':
+        _emit_addr(asm, node[2], node[1], node[3], 32 if node[2] == 4 else 128, t, f)
+    elif kind == 'net':
+        _emit_addr(asm, node[2], node[1], node[3], node[4], t, f)
+    elif kind == 'port':
+        _emit_port(asm, node[1], node[2], t, f)
+    else:
+        raise FilterSyntaxError(f"Nó de filtro desconhecido: {kind}")
+
+
+def compile_bpf(node: Node, snaplen: int = 0x40000) -> List[Instruction]:
+    """Gera o programa BPF clássico (lista de (code, jt, jf, k))."""
+    asm = _Asm()
+    accept, reject = _Label(), _Label()
+    _emit(asm, node, accept, reject)
+    asm.place(accept)
+    asm.stmt(BPF_RET | BPF_K, snaplen)
+    asm.place(reject)
+    asm.stmt(BPF_RET | BPF_K, 0)
+    return asm.assemble()
+
+
+def attach_filter(sock: socket.socket, program: List[Instruction]) -> None:
+    """Anexa o programa ao socket com SO_ATTACH_FILTER."""
+    insns = b''.join(struct.pack('=HBBI', *ins) for ins in program)
+    buf = ctypes.create_string_buffer(insns)
+    # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+    fprog = struct.pack('HL', len(program), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+class PacketFilter:
+    """Expressão compilada nas duas formas: BPF para o kernel e predicado Python."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.ast = parse_filter(text)
+        self.program = compile_bpf(self.ast)
+        self.match = make_predicate(self.ast)
+
+    def __str__(self) -> str:
+        return self.text
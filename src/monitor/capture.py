@@ -3,25 +3,95 @@ import struct
 import sys
 import os
 import fcntl
-from typing import Optional, Tuple
+import mmap
+import select
+import threading
+from typing import List, Optional, Tuple
+
+
+# Constantes de PACKET_MMAP (linux/if_packet.h)
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_STATISTICS = 6
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# tpacket_block_desc: version, offset_to_priv, depois tpacket_hdr_v1
+# (block_status, num_pkts, offset_to_first_pkt, ...)
+_BLOCK_STATUS_OFF = 8
+_BLOCK_HDR = struct.Struct('=III')  # block_status, num_pkts, offset_to_first_pkt
+# tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_TP3_HDR = struct.Struct('=IIIIIIH')
+_BLOCK_STATUS = struct.Struct('=I')
+# tpacket_stats(_v3): tp_packets, tp_drops (o v3 acrescenta tp_freeze_q_cnt)
+_TP_STATS = struct.Struct('=II')
 
 
 class RawCapture:
     """Captura pacotes na interface informada.
 
-    Dois modos:
-    - AF_PACKET (camada 2) para interfaces "normais" (ex.: eth0).
+    Modos:
+    - AF_PACKET (camada 2) para interfaces "normais" (ex.: eth0), lendo quadro a
+      quadro com recvfrom ('af_packet') ou por um anel TPACKET_V3 mapeado em
+      memória ('mmap'), em que o kernel entrega blocos inteiros de quadros.
     - Leitura direta do /dev/net/tun quando interface começa com "tun".
 
     O modo TUN permite observar pacotes injetados e recebidos mesmo quando o
     AF_PACKET não entrega quadros (caso comum em túnel criado manualmente).
+
+    No modo 'mmap', recv() devolve memoryviews para dentro do anel; cada quadro
+    só é válido até a próxima chamada de recv() que devolve o bloco ao kernel.
+
+    recv_batch() devolve vários quadros por chamada em todos os modos. Fora do
+    anel, os quadros são lidos em um pool de bytearrays pré-alocados, sem
+    alocação por pacote; as memoryviews devolvidas só valem até a próxima
+    chamada de recv_batch().
     """
 
-    def __init__(self, interface: str) -> None:
+    def __init__(self, interface: str, engine: str = 'auto', ring_size: int = 16 * 1024 * 1024,
+                 block_size: int = 1024 * 1024, block_timeout_ms: int = 64,
+                 batch_size: int = 64, snaplen: int = 65535, fanout_group: Optional[int] = None,
+                 idle_timeout: Optional[float] = None, bpf_program: Optional[list] = None) -> None:
+        if engine not in ('auto', 'mmap', 'socket'):
+            raise ValueError(f"Motor de captura inválido: {engine}")
         self.interface = interface
         self.sock: Optional[socket.socket] = None
         self.tun_fd: Optional[int] = None
         self.mode: str = 'af_packet'
+        self.engine = engine
+        self.ring_size = ring_size
+        self.block_size = block_size
+        self.block_timeout_ms = block_timeout_ms
+        # Grupo PACKET_FANOUT: sockets do mesmo grupo dividem os quadros por hash de fluxo
+        self.fanout_group = fanout_group
+        # Estado do anel TPACKET_V3
+        self._ring: Optional[mmap.mmap] = None
+        self._ring_view: Optional[memoryview] = None
+        self._block_nr = 0
+        self._block_idx = 0
+        self._block_held = False
+        self._frames: List[memoryview] = []
+        self._frame_idx = 0
+        self._poll: Optional[select.poll] = None
+        # Pool de buffers para recv_batch() (recv_into/readv)
+        self.batch_size = max(1, batch_size)
+        self.snaplen = snaplen
+        self._pool: List[bytearray] = []
+        self._pool_views: List[memoryview] = []
+        # Se definido, recv_batch() devolve lote vazio após esse tempo sem tráfego
+        self.idle_timeout = idle_timeout
+        # Programa BPF clássico (ver bpf.compile_bpf); kernel_filter indica se foi anexado
+        self.bpf_program = bpf_program
+        self.kernel_filter = False
+        # Totais acumulados de PACKET_STATISTICS (o kernel zera a cada leitura)
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+        self._stats_lock = threading.Lock()  # leitura pela captura (amostragem) e pelas métricas
 
     def open(self) -> None:
         # Usa modo TUN se nome da interface começa com 'tun'
@@ -31,12 +101,30 @@ class RawCapture:
         try:
             ETH_P_ALL = 0x0003
             self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+            if self.bpf_program:
+                self._attach_filter()
+            if self.engine != 'socket':
+                try:
+                    # O anel precisa ser configurado antes do bind
+                    self._setup_ring()
+                except OSError as e:
+                    if self.engine == 'mmap':
+                        raise
+                    print(f"Anel TPACKET_V3 indisponível ({e}); usando recvfrom.", file=sys.stderr)
             self.sock.bind((self.interface, 0))
-            self.mode = 'af_packet'
-            try:
-                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
-            except OSError:
-                pass
+            if self.fanout_group is not None:
+                # Hash simétrico de fluxo; DEFRAG mantém fragmentos no mesmo socket
+                arg = (self.fanout_group & 0xFFFF) | ((PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG) << 16)
+                self.sock.setsockopt(SOL_PACKET, PACKET_FANOUT, struct.pack('=I', arg))
+            if self._ring is None:
+                self.mode = 'af_packet'
+                try:
+                    self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+                except OSError:
+                    pass
+                if self.idle_timeout is not None:
+                    self._poll = select.poll()
+                    self._poll.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
         except PermissionError:
             print("Permissão negada para abrir socket raw. Execute com sudo ou conceda CAP_NET_RAW.", file=sys.stderr)
             raise
@@ -56,45 +144,165 @@ class RawCapture:
         try:
             fd = os.open('/dev/net/tun', os.O_RDWR)
             fcntl.ioctl(fd, TUNSETIFF, ifr)
+            # Não bloqueante: recv_batch() esvazia a fila até EAGAIN
+            os.set_blocking(fd, False)
             self.tun_fd = fd
             self.mode = 'tun'
+            self._poll = select.poll()
+            self._poll.register(fd, select.POLLIN | select.POLLERR)
         except OSError as e:
             print(f"Falha ao abrir /dev/net/tun para {self.interface}: {e}", file=sys.stderr)
             raise
 
+    def _attach_filter(self) -> None:
+        # Anexa antes do bind para não enfileirar quadros que o filtro descartaria
+        from .bpf import attach_filter
+        try:
+            attach_filter(self.sock, self.bpf_program)
+            self.kernel_filter = True
+        except OSError as e:
+            print(f"Falha ao anexar filtro BPF ({e}); filtrando em espaço de usuário.", file=sys.stderr)
+
+    def _setup_ring(self) -> None:
+        # Bloco: múltiplo de página e grande o bastante para o maior quadro
+        page = mmap.PAGESIZE
+        block_size = max(self.block_size, 128 * 1024)
+        block_size = (block_size + page - 1) // page * page
+        block_nr = max(2, self.ring_size // block_size)
+        frame_size = 2048  # só usado na contabilidade do kernel no V3
+        frame_nr = (block_size // frame_size) * block_nr
+        self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        req = struct.pack('=7I', block_size, block_nr, frame_size, frame_nr,
+                          self.block_timeout_ms, 0, 0)
+        self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        self._ring = mmap.mmap(self.sock.fileno(), block_size * block_nr,
+                               mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._ring_view = memoryview(self._ring)
+        self.block_size = block_size
+        self._block_nr = block_nr
+        self._block_idx = 0
+        self._poll = select.poll()
+        self._poll.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        self.mode = 'mmap'
+
+    @staticmethod
+    def block_frames(view: memoryview, base: int) -> List[memoryview]:
+        """Lista os quadros (a partir do cabeçalho L2) de um bloco TPACKET_V3."""
+        _status, num_pkts, off = _BLOCK_HDR.unpack_from(view, base + _BLOCK_STATUS_OFF)
+        frames: List[memoryview] = []
+        off += base
+        unpack = _TP3_HDR.unpack_from
+        for _ in range(num_pkts):
+            next_off, _sec, _nsec, snaplen, _len, _st, mac = unpack(view, off)
+            start = off + mac
+            frames.append(view[start:start + snaplen])
+            if not next_off:
+                break
+            off += next_off
+        return frames
+
+    def _idle_ms(self) -> int:
+        return 200 if self.idle_timeout is None else max(1, int(self.idle_timeout * 1000))
+
+    def _next_block(self, idle: bool = False) -> List[memoryview]:
+        # Devolve o bloco anterior ao kernel e espera o próximo ficar pronto.
+        # Com idle=True, desiste após um intervalo ocioso e devolve lista vazia.
+        view = self._ring_view
+        if view is None:
+            raise RuntimeError("Anel não inicializado")
+        if self._block_held:
+            self._frames = []
+            _BLOCK_STATUS.pack_into(view, self._block_idx * self.block_size + _BLOCK_STATUS_OFF, TP_STATUS_KERNEL)
+            self._block_idx = (self._block_idx + 1) % self._block_nr
+            self._block_held = False
+        base = self._block_idx * self.block_size
+        while True:
+            status = _BLOCK_STATUS.unpack_from(view, base + _BLOCK_STATUS_OFF)[0]
+            if status & TP_STATUS_USER:
+                break
+            if self._poll is None:
+                raise RuntimeError("Anel fechado")
+            if not self._poll.poll(self._idle_ms()) and idle:
+                return []
+        self._block_held = True
+        return self.block_frames(view, base)
+
     def close(self) -> None:
-        if self.mode == 'af_packet' and self.sock:
+        if self.mode in ('af_packet', 'mmap') and self.sock:
+            self._poll = None
+            self._frames = []
+            if self._ring_view is not None:
+                try:
+                    self._ring_view.release()
+                except BufferError:
+                    pass
+                self._ring_view = None
+            if self._ring is not None:
+                try:
+                    self._ring.close()
+                except BufferError:
+                    # Ainda há quadros referenciados; o GC desfaz o mapeamento
+                    pass
+                self._ring = None
             try:
                 self.sock.close()
             finally:
                 self.sock = None
         if self.mode == 'tun' and self.tun_fd is not None:
+            self._poll = None
             try:
                 os.close(self.tun_fd)
             finally:
                 self.tun_fd = None
 
+    def read_kernel_stats(self) -> None:
+        """Soma PACKET_STATISTICS a kernel_packets/kernel_drops.
+
+        Os totais só crescem: cada consumidor (amostragem, auto-instrumentação,
+        métricas) guarda o último valor que viu e calcula a própria diferença.
+        Só há contador no AF_PACKET; em TUN não faz nada.
+        """
+        with self._stats_lock:
+            if self.sock is None:
+                return
+            try:
+                raw = self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12)
+            except OSError:
+                return
+            packets, drops = _TP_STATS.unpack_from(raw)
+            self.kernel_packets += packets
+            self.kernel_drops += drops
+
+    @staticmethod
+    def l3_offset(frame: bytes) -> int:
+        """Deslocamento do cabeçalho IP no quadro (0 se não houver Ethernet)."""
+        # Tentativa 1: Verificar se os primeiros bytes parecem um cabeçalho Ethernet
+        # (0x0800 IPv4, 0x86DD IPv6 — EtherTypes mais comuns)
+        if len(frame) >= 14 and ((frame[12] << 8) | frame[13]) in (0x0800, 0x86DD):
+            return 14
+        # Caso contrário (TUN ou heurística do primeiro nibble 4/6), assume que o
+        # quadro já começa no IP; se não for, o parser descarta
+        return 0
+
     @staticmethod
     def split_l2_l3(frame: bytes) -> Tuple[Optional[bytes], bytes]:
         """
         Retorna (l2, l3). Se não houver cabeçalho Ethernet (caso típico TUN),
         retorna (None, frame) assumindo que começa em IPv4/IPv6.
         """
-        # Tentativa 1: Verificar se os primeiros bytes parecem um cabeçalho Ethernet
-        if len(frame) >= 14:
-            eth_proto = struct.unpack('!H', frame[12:14])[0]
-            # 0x0800 IPv4, 0x86DD IPv6 (EtherType mais comuns)
-            if eth_proto in (0x0800, 0x86DD):
-                return frame[:14], frame[14:]
-        # Tentativa 2: Heurística: primeiro nibble 4 (IPv4) ou 6 (IPv6)
-        if frame:
-            version = (frame[0] >> 4) & 0xF
-            if version in (4, 6):
-                return None, frame
-        # Caso contrário, retorna tudo como L3 para não descartar
+        off = RawCapture.l3_offset(frame)
+        if off:
+            return frame[:off], frame[off:]
         return None, frame
 
     def recv(self) -> bytes:
+        if self.mode == 'mmap':
+            while self._frame_idx >= len(self._frames):
+                self._frames = self._next_block()
+                self._frame_idx = 0
+            frame = self._frames[self._frame_idx]
+            self._frame_idx += 1
+            return frame
         if self.mode == 'af_packet':
             if not self.sock:
                 raise RuntimeError("Socket não inicializado")
@@ -104,5 +312,71 @@ class RawCapture:
             if self.tun_fd is None:
                 raise RuntimeError("FD TUN não inicializado")
             # Leitura direta do pacote IP (sem Ethernet); tamanho máximo típico MTU
-            return os.read(self.tun_fd, 65535)
+            while True:
+                try:
+                    return os.read(self.tun_fd, 65535)
+                except BlockingIOError:
+                    self._wait_tun()
+        raise RuntimeError("Modo de captura inválido")
+
+    def _wait_tun(self) -> bool:
+        if self._poll is None:
+            raise RuntimeError("FD TUN fechado")
+        return bool(self._poll.poll(self._idle_ms()))
+
+    def _ensure_pool(self) -> None:
+        if not self._pool:
+            self._pool = [bytearray(self.snaplen) for _ in range(self.batch_size)]
+            self._pool_views = [memoryview(b) for b in self._pool]
+
+    def recv_batch(self) -> List[memoryview]:
+        """Recebe um lote de quadros (memoryviews válidas até a próxima chamada).
+
+        Bloqueia até o primeiro quadro e depois lê sem bloquear o que já estiver
+        na fila do kernel, até `batch_size` quadros (estilo recvmmsg).
+        """
+        if self.mode == 'mmap':
+            if self._frame_idx < len(self._frames):
+                rest = self._frames[self._frame_idx:]
+            else:
+                rest = self._next_block(idle=self.idle_timeout is not None)
+            self._frames = rest
+            self._frame_idx = len(rest)
+            return rest
+        self._ensure_pool()
+        views = self._pool_views
+        out: List[memoryview] = []
+        if self.mode == 'af_packet':
+            sock = self.sock
+            if not sock:
+                raise RuntimeError("Socket não inicializado")
+            if self._poll is not None and not self._poll.poll(self._idle_ms()):
+                return out
+            n = sock.recv_into(views[0])
+            out.append(views[0][:n])
+            for i in range(1, self.batch_size):
+                try:
+                    n = sock.recv_into(views[i], 0, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    break
+                out.append(views[i][:n])
+            return out
+        if self.mode == 'tun':
+            fd = self.tun_fd
+            if fd is None:
+                raise RuntimeError("FD TUN não inicializado")
+            pool = self._pool
+            i = 0
+            while i < self.batch_size:
+                try:
+                    n = os.readv(fd, (pool[i],))
+                except BlockingIOError:
+                    if out:
+                        break
+                    if not self._wait_tun() and self.idle_timeout is not None:
+                        break
+                    continue
+                out.append(views[i][:n])
+                i += 1
+            return out
         raise RuntimeError("Modo de captura inválido")
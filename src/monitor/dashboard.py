@@ -0,0 +1,265 @@
+"""
+Painel de terminal com redesenho por diferença.
+
+Em vez de limpar a tela a cada atualização, o painel guarda as linhas do
+quadro anterior e reescreve (com posicionamento ANSI do cursor) só as que
+mudaram. Usa a tela alternativa do terminal e restaura tudo ao sair.
+
+Teclas: s alterna a ordenação (pps, bytes, conexões, pacotes), p/espaço
+pausa, ↑/↓ ou k/j rolam a tabela, PgUp/PgDn rolam uma página, +/- mudam o
+intervalo de atualização e q encerra.
+
+Quando stdout não é TTY, json_lines() emite um snapshot compacto por linha.
+"""
+import heapq
+import json
+import os
+import select
+import shutil
+import sys
+import time
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from .ui import human_bytes, human_rate, render_rates
+
+SORT_KEYS = ('pps', 'bytes', 'connections', 'packets')
+
+CSI = '\x1b['
+_KEYS = {
+    f'{CSI}A': 'up', f'{CSI}B': 'down', f'{CSI}5~': 'pgup', f'{CSI}6~': 'pgdn',
+    'k': 'up', 'j': 'down', 's': 'sort', 'p': 'pause', ' ': 'pause',
+    '+': 'faster', '-': 'slower', 'q': 'quit',
+}
+
+
+def _sort_value(key: str, es: Dict) -> float:
+    if key == 'pps':
+        # Só os endpoints mais ativos de cada cliente trazem taxas (ver Stats); os demais contam como 0
+        r = es.get('rates')
+        return r['pps'] if r else 0
+    if key == 'bytes':
+        return es['bytes']
+    if key == 'connections':
+        return es['tcp_connections']
+    return es['packets']
+
+
+def top_rows(snap: Dict, key: str, n: int) -> List[Tuple[str, str, Dict]]:
+    """Os n pares (cliente, endpoint) com maior valor de `key` entre todos os clientes."""
+    rows = ((cip, rip, es) for cip, cs in snap.get('clients', {}).items()
+            for rip, es in cs.get('endpoints', {}).items())
+    return heapq.nlargest(n, rows, key=lambda r: _sort_value(key, r[2]))
+
+
+def summary(snap: Dict, sort: str = 'bytes', top_n: int = 10) -> Dict:
+    """Resumo compacto (totais + top-N endpoints) serializável em JSON."""
+    out = {k: v for k, v in snap.items() if k != 'clients'}
+    clients = {}
+    for cip, cs in snap.get('clients', {}).items():
+        entry = {k: cs[k] for k in ('total_packets', 'total_bytes') if k in cs}
+        if cs.get('rates'):
+            entry['pps'] = cs['rates']['pps']
+            entry['bps'] = cs['rates']['bps']
+        clients[cip] = entry
+    out['clients'] = clients
+    out['top'] = [
+        {'client': cip, 'endpoint': rip, 'packets': es['packets'], 'bytes': es['bytes'],
+         'conns': es['tcp_connections'], 'pps': (es.get('rates') or {}).get('pps', 0)}
+        for cip, rip, es in top_rows(snap, sort, top_n)
+    ]
+    return out
+
+
+def json_lines(get_snapshot_fn: Callable[[], Dict], interval: float = 1.0, until=None,
+               sort: str = 'bytes', top_n: int = 10, out: Optional[TextIO] = None) -> None:
+    """Emite um snapshot compacto por linha (stdout não interativo)."""
+    out = out or sys.stdout
+    while until is None or not until():
+        line = summary(get_snapshot_fn(), sort, top_n)
+        line['ts'] = round(time.time(), 3)
+        out.write(json.dumps(line, separators=(',', ':'), default=str) + '\n')
+        out.flush()
+        time.sleep(interval)
+
+
+class Dashboard:
+    def __init__(self, get_snapshot_fn: Callable[[], Dict], interval: float = 1.0, top_n: int = 20,
+                 sort: str = 'bytes', out: Optional[TextIO] = None, inp: Optional[TextIO] = None) -> None:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Ordenação inválida: {sort}")
+        self.get_snapshot = get_snapshot_fn
+        self.interval = interval
+        self.top_n = top_n
+        self.sort = sort
+        self.out = out or sys.stdout
+        self.inp = inp
+        self.paused = False
+        self.offset = 0
+        self.snap: Dict = {}
+        self._prev: List[str] = []
+        self._size: Tuple[int, int] = (0, 0)
+        self._table_rows = 10
+
+    # -- montagem do quadro -------------------------------------------------
+
+    def build_lines(self, width: int = 120, height: int = 40) -> List[str]:
+        snap = self.snap
+        state = '  [PAUSADO]' if self.paused else ''
+        lines = [f"Monitor de Tráfego  ordenação: {self.sort}  atualização: {self.interval:g}s{state}"]
+        if snap.get('rates'):
+            lines.append("Taxa: " + render_rates(snap['rates']))
+        gp = snap.get('global_proto', {})
+        lines.append("Protocolos: " + ("  ".join(f"{k}:{v}" for k, v in sorted(gp.items())) or "(sem dados)"))
+        extras = []
+        if snap.get('log_dropped'):
+            extras.append(f"log descartado={snap['log_dropped']}")
+        if 'flows_active' in snap:
+            extras.append(f"fluxos={snap['flows_active']}/{snap['flows_exported']}")
+        if snap.get('sampling'):
+            extras.append(f"amostragem=1/{snap['sampling']['rate']}")
+        prof = snap.get('self_stats')
+        if prof:
+            frame = prof['stages'].get('quadro')
+            if frame:
+                extras.append(f"quadro p50/p99={frame['p50_us']:.1f}/{frame['p99_us']:.1f}µs")
+            if prof.get('kernel'):
+                extras.append(f"descartes kernel={prof['kernel']['drops']}")
+        if extras:
+            lines.append("  ".join(extras))
+        clients = snap.get('clients', {})
+        lines.append("")
+        for cip, cs in sorted(clients.items(), key=lambda kv: -kv[1]['total_bytes'])[:5]:
+            rate = f"  {human_rate(cs['rates']['bps'])}" if cs.get('rates') else ''
+            lines.append(f"Cliente {cip}: pkts={cs['total_packets']} bytes={human_bytes(cs['total_bytes'])}{rate}")
+        lines.append("")
+        header = len(lines)
+        # Espaço restante para a tabela (reserva o cabeçalho e o rodapé)
+        self._table_rows = max(1, min(self.top_n, height - header - 3))
+        total = sum(len(cs.get('endpoints', {})) for cs in clients.values())
+        self.offset = max(0, min(self.offset, max(0, min(total, self.top_n) - self._table_rows)))
+        rows = top_rows(snap, self.sort, min(self.top_n, self.offset + self._table_rows))[self.offset:]
+        # Endpoint pelo nome do DNS passivo, quando conhecido
+        labels = [es.get('name') or rip for _, rip, es in rows]
+        # Colunas crescem com os endereços/nomes visíveis (IPv6 tem até 39 caracteres)
+        cw = min(39, max([18] + [len(cip) for cip, _, _ in rows]))
+        ew = min(39, max([28] + [len(label) for label in labels]))
+        lines.append(f"{'#':>3} {'Cliente':<{cw}} {'Endpoint':<{ew}} {'pps':>8} {'taxa':>12} {'pkts':>10} "
+                     f"{'bytes':>9} {'conns':>6}  portas")
+        for i, ((cip, rip, es), label) in enumerate(zip(rows, labels), start=self.offset + 1):
+            r = es.get('rates') or {}
+            ports = ','.join(str(p) for p, _ in es.get('top_ports', [])[:3])
+            lines.append(f"{i:>3} {cip:<{cw}} {label[:ew]:<{ew}} {r.get('pps', 0):>8.0f} {human_rate(r.get('bps', 0)):>12} "
+                         f"{es['packets']:>10} {human_bytes(es['bytes']):>9} {es['tcp_connections']:>6}  {ports}")
+        lines.append("")
+        shown = f"{self.offset + 1}-{self.offset + len(rows)} de {min(total, self.top_n)}" if rows else "0"
+        lines.append(f"s: ordenar  p: pausar  ↑/↓: rolar  +/-: intervalo  q: sair   linhas {shown}")
+        return [ln[:width] for ln in lines[:height]]
+
+    # -- saída ------------------------------------------------------------------
+
+    def draw(self, lines: List[str]) -> int:
+        """Reescreve só as linhas que mudaram; retorna quantas foram escritas."""
+        buf = []
+        prev = self._prev
+        for i, line in enumerate(lines):
+            if i >= len(prev) or prev[i] != line:
+                buf.append(f"{CSI}{i + 1};1H{line}{CSI}K")
+        for i in range(len(lines), len(prev)):
+            buf.append(f"{CSI}{i + 1};1H{CSI}K")
+        self._prev = list(lines)
+        if buf:
+            self.out.write(''.join(buf))
+            self.out.flush()
+        return len(buf)
+
+    def redraw(self) -> None:
+        size = shutil.get_terminal_size((120, 40))
+        if (size.columns, size.lines) != self._size:
+            # Terminal redimensionado: limpa e redesenha tudo
+            self._size = (size.columns, size.lines)
+            self._prev = []
+            self.out.write(f"{CSI}2J")
+        self.draw(self.build_lines(size.columns, size.lines))
+
+    # -- teclado ------------------------------------------------------------------
+
+    def handle_key(self, key: str) -> bool:
+        """Aplica uma tecla; retorna False para encerrar."""
+        action = _KEYS.get(key)
+        if action == 'quit':
+            return False
+        if action == 'sort':
+            self.sort = SORT_KEYS[(SORT_KEYS.index(self.sort) + 1) % len(SORT_KEYS)]
+            self.offset = 0
+        elif action == 'pause':
+            self.paused = not self.paused
+        elif action == 'up':
+            self.offset = max(0, self.offset - 1)
+        elif action == 'down':
+            self.offset += 1
+        elif action == 'pgup':
+            self.offset = max(0, self.offset - self._table_rows)
+        elif action == 'pgdn':
+            self.offset += self._table_rows
+        elif action == 'faster':
+            self.interval = max(0.1, round(self.interval / 2, 2))
+        elif action == 'slower':
+            self.interval = min(60.0, self.interval * 2)
+        return True
+
+    def _read_keys(self, timeout: float) -> List[str]:
+        if self.inp is None:
+            time.sleep(timeout)
+            return []
+        fd = self.inp.fileno()
+        ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(fd, 32).decode('utf-8', 'ignore')
+        keys = []
+        i = 0
+        while i < len(data):
+            if data.startswith(CSI, i):
+                end = i + 2
+                while end < len(data) and not ('A' <= data[end] <= 'Z' or data[end] == '~'):
+                    end += 1
+                keys.append(data[i:end + 1])
+                i = end + 1
+            else:
+                keys.append(data[i])
+                i += 1
+        return keys
+
+    def run(self, until=None) -> None:
+        old_attrs = None
+        if self.inp is not None and self.inp.isatty():
+            import termios
+            import tty
+            fd = self.inp.fileno()
+            old_attrs = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+        else:
+            self.inp = None
+        # Tela alternativa e cursor oculto
+        self.out.write(f"{CSI}?1049h{CSI}?25l")
+        try:
+            next_at = 0.0
+            while until is None or not until():
+                now = time.monotonic()
+                if now >= next_at:
+                    if not self.paused or not self.snap:
+                        self.snap = self.get_snapshot()
+                    self.redraw()
+                    next_at = now + self.interval
+                keys = self._read_keys(max(0.0, min(next_at - time.monotonic(), 0.25)))
+                if keys:
+                    for key in keys:
+                        if not self.handle_key(key):
+                            return
+                    self.redraw()
+        finally:
+            self.out.write(f"{CSI}?25h{CSI}?1049l")
+            self.out.flush()
+            if old_attrs is not None:
+                import termios
+                termios.tcsetattr(self.inp.fileno(), termios.TCSADRAIN, old_attrs)
@@ -0,0 +1,81 @@
+"""
+Cache de DNS passivo: endereço IP -> nome, aprendido das respostas DNS vistas.
+
+Cada resposta com registros A/AAAA associa o endereço ao nome perguntado
+(seguindo a cadeia de CNAMEs até a pergunta). A entrada vale pelo TTL do
+registro mais uma folga (`grace`), porque as conexões costumam durar mais que
+o TTL de quem as resolveu. O tamanho é limitado por LRU: ao passar de
+`max_entries`, sai o endereço consultado há mais tempo.
+
+lookup() é um get em dicionário mais a checagem de validade (O(1)); entradas
+vencidas são removidas quando consultadas ou quando o LRU as alcança.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .parsers.dns import TYPE_A, TYPE_AAAA, TYPE_CNAME, DnsMessage
+
+_V6_TAG = 1 << 128  # distingue chaves IPv6 das IPv4 (como em SubnetClassifier)
+MAX_CNAME_CHAIN = 8
+
+
+class PassiveDnsCache:
+    def __init__(self, max_entries: int = 65536, grace: float = 300.0, max_ttl: float = 86400.0) -> None:
+        self.max_entries = max_entries
+        self.grace = grace
+        self.max_ttl = max_ttl
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()  # chave -> (nome, validade)
+        self.learned = 0
+        self.hits = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, version: int, addr: int, name: str, ttl: float, now: float) -> None:
+        key = addr if version == 4 else addr | _V6_TAG
+        entries = self._entries
+        entries[key] = (name, now + min(ttl, self.max_ttl) + self.grace)
+        entries.move_to_end(key)
+        self.learned += 1
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def learn(self, msg: DnsMessage, now: float) -> int:
+        """Guarda os A/AAAA de uma resposta; retorna quantos endereços aprendeu."""
+        if not msg.qr or msg.rcode or not msg.answers:
+            return 0
+        # alvo do CNAME -> dono, para voltar do nome canônico ao perguntado
+        alias: Dict[str, str] = {a.value: a.name for a in msg.answers if a.rtype == TYPE_CNAME}
+        n = 0
+        for a in msg.answers:
+            if a.rtype != TYPE_A and a.rtype != TYPE_AAAA:
+                continue
+            name = a.name
+            for _ in range(MAX_CNAME_CHAIN):
+                prev = alias.get(name)
+                if prev is None:
+                    break
+                name = prev
+            self.add(4 if a.rtype == TYPE_A else 6, a.value, name, a.ttl, now)
+            n += 1
+        return n
+
+    def lookup(self, version: int, addr: int, now: float) -> Optional[str]:
+        key = addr if version == 4 else addr | _V6_TAG
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'learned': self.learned, 'hits': self.hits,
+                'expired': self.expired, 'evicted': self.evicted}
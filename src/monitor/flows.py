@@ -0,0 +1,320 @@
+"""
+Tabela de fluxos bidirecionais com estado TCP e exportação de registros.
+
+Cada fluxo é identificado pela 5-tupla normalizada (a ponta "menor" primeiro),
+então os dois sentidos caem na mesma entrada. O sentido "ida" é o de quem
+enviou o primeiro pacote visto (normalmente o SYN).
+
+A expiração usa uma roda de temporização (timer wheel) com ranhuras de 1 s:
+cada fluxo fica agendado uma única vez; quando sua ranhura vence, o prazo é
+recalculado (ociosidade, tempo ativo máximo ou espera após FIN/RST) e o fluxo
+é reagendado ou exportado. Assim o custo por pacote é O(1).
+"""
+import os
+import struct
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .logging_csv import CsvLogger, QueuedWriter
+from .logindex import IP_COLUMNS, open_data
+from .parsers.decoder import PacketRecord, format_ipv4, format_ipv6
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK = 0x01, 0x02, 0x04, 0x10
+
+# Estados TCP (valor gravado no registro) e códigos para o formato binário
+TCP_STATES = ('-', 'NEW', 'SYN_SENT', 'SYN_RECEIVED', 'ESTABLISHED', 'FIN_WAIT', 'CLOSING', 'CLOSED', 'RESET')
+END_REASONS = ('idle', 'active', 'fin', 'rst', 'capacity', 'shutdown')
+_STATE_CODE = {s: i for i, s in enumerate(TCP_STATES)}
+_REASON_CODE = {r: i for i, r in enumerate(END_REASONS)}
+
+FlowKey = Tuple[int, int, int, int, int, int]  # versão, proto, addr_a, porta_a, addr_b, porta_b
+
+
+class Flow:
+    __slots__ = (
+        'key', 'version', 'proto', 'src', 'sport', 'dst', 'dport',
+        'first_ts', 'last_ts', 'pkts_fwd', 'bytes_fwd', 'pkts_rev', 'bytes_rev',
+        'state', 'fin_fwd', 'fin_rev', 'tcp_flags', 'tick',
+    )
+
+    def __init__(self, key: FlowKey, rec: PacketRecord, now: float) -> None:
+        self.key = key
+        self.version = rec.version
+        self.proto = rec.ip_proto
+        self.src = rec.src_int
+        self.sport = rec.src_port  # -1 sem portas (ICMP, outros)
+        self.dst = rec.dst_int
+        self.dport = rec.dst_port
+        self.first_ts = now
+        self.last_ts = now
+        self.pkts_fwd = self.bytes_fwd = self.pkts_rev = self.bytes_rev = 0
+        self.state = 'NEW' if rec.l4_name == 'TCP' else '-'
+        self.fin_fwd = self.fin_rev = False
+        self.tcp_flags = 0  # OR de todas as flags vistas
+        self.tick = -1  # ranhura em que está agendado na roda
+
+    @property
+    def closed(self) -> bool:
+        return self.state in ('CLOSED', 'RESET')
+
+    def update_tcp(self, flags: int, forward: bool) -> None:
+        self.tcp_flags |= flags
+        st = self.state
+        if flags & TCP_RST:
+            self.state = 'RESET'
+            return
+        if flags & TCP_SYN:
+            if flags & TCP_ACK:
+                if st in ('NEW', 'SYN_SENT'):
+                    self.state = 'SYN_RECEIVED'
+            elif st == 'NEW':
+                self.state = 'SYN_SENT'
+            return
+        if flags & TCP_FIN:
+            if forward:
+                self.fin_fwd = True
+            else:
+                self.fin_rev = True
+            self.state = 'CLOSING' if self.fin_fwd and self.fin_rev else 'FIN_WAIT'
+            return
+        if flags & TCP_ACK:
+            if st in ('NEW', 'SYN_RECEIVED'):
+                # NEW + ACK: fluxo já estabelecido quando a captura começou
+                self.state = 'ESTABLISHED'
+            elif st == 'CLOSING':
+                self.state = 'CLOSED'
+
+    def src_ip(self) -> str:
+        return format_ipv4(self.src) if self.version == 4 else format_ipv6(self.src)
+
+    def dst_ip(self) -> str:
+        return format_ipv4(self.dst) if self.version == 4 else format_ipv6(self.dst)
+
+
+class TimerWheel:
+    """Roda de temporização com ranhuras de `tick` segundos (com voltas)."""
+
+    def __init__(self, slots: int = 1024, tick: float = 1.0) -> None:
+        self.n = slots
+        self.tick = tick
+        self.slots: List[List[Tuple[int, object]]] = [[] for _ in range(slots)]
+        self.cur: Optional[int] = None
+        self.size = 0
+
+    def schedule(self, item: object, when: float) -> int:
+        """Agenda `item` e retorna o tick usado (nunca no passado)."""
+        t = int(when // self.tick)
+        if self.cur is not None and t <= self.cur:
+            t = self.cur + 1
+        self.slots[t % self.n].append((t, item))
+        self.size += 1
+        return t
+
+    def advance(self, now: float) -> Iterator[Tuple[int, object]]:
+        """Gera (tick, item) das ranhuras que venceram até `now`."""
+        target = int(now // self.tick)
+        if self.cur is None:
+            self.cur = target
+            return
+        if target <= self.cur:
+            return
+        # Salto maior que a roda (ex.: lacuna num pcap): cada ranhura uma vez
+        ticks = range(self.cur + 1, target + 1) if target - self.cur < self.n else range(target - self.n + 1, target + 1)
+        self.cur = target
+        for t in ticks:
+            idx = t % self.n
+            slot = self.slots[idx]
+            if not slot:
+                continue
+            keep = [e for e in slot if e[0] > target]
+            due = [e for e in slot if e[0] <= target]
+            self.slots[idx] = keep
+            self.size -= len(due)
+            yield from due
+
+    def drain(self) -> Iterator[object]:
+        for idx, slot in enumerate(self.slots):
+            self.slots[idx] = []
+            for _t, item in slot:
+                yield item
+        self.size = 0
+
+
+class FlowTable:
+    """Agrega pacotes em fluxos e chama `sink(flow, motivo)` ao exportar cada um."""
+
+    def __init__(self, sink: Callable[[Flow, str], None], idle_timeout: float = 60.0,
+                 active_timeout: float = 1800.0, close_linger: float = 2.0,
+                 max_flows: int = 262144) -> None:
+        self.sink = sink
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.close_linger = close_linger
+        self.max_flows = max_flows
+        self.flows: Dict[FlowKey, Flow] = {}
+        self.wheel = TimerWheel()
+        self.exported = 0
+
+    def _deadline(self, fl: Flow) -> float:
+        if fl.closed:
+            return fl.last_ts + self.close_linger
+        return min(fl.last_ts + self.idle_timeout, fl.first_ts + self.active_timeout)
+
+    def _schedule(self, fl: Flow) -> None:
+        fl.tick = self.wheel.schedule(fl, self._deadline(fl))
+
+    def update(self, rec: PacketRecord, length: int, now: float) -> Flow:
+        s, d = rec.src_int, rec.dst_int
+        sp, dp = rec.src_port, rec.dst_port
+        if (s, sp) <= (d, dp):
+            key = (rec.version, rec.ip_proto, s, sp, d, dp)
+        else:
+            key = (rec.version, rec.ip_proto, d, dp, s, sp)
+        fl = self.flows.get(key)
+        if fl is None:
+            if len(self.flows) >= self.max_flows:
+                # Tabela cheia: exporta o fluxo mais antigo
+                old = self.flows.pop(next(iter(self.flows)))
+                self._export(old, 'capacity')
+            fl = Flow(key, rec, now)
+            self.flows[key] = fl
+            self._schedule(fl)
+        forward = s == fl.src and sp == fl.sport
+        if forward:
+            fl.pkts_fwd += 1
+            fl.bytes_fwd += length
+        else:
+            fl.pkts_rev += 1
+            fl.bytes_rev += length
+        fl.last_ts = now
+        if rec.l4_name == 'TCP' and not fl.closed:
+            fl.update_tcp(rec.tcp_flags, forward)
+            if fl.closed:
+                # O prazo só encurta ao fechar: reagenda (a entrada antiga fica obsoleta)
+                self._schedule(fl)
+        return fl
+
+    def expire(self, now: float) -> int:
+        """Exporta fluxos vencidos até `now`; retorna quantos foram exportados."""
+        n = 0
+        flows = self.flows
+        for tick, fl in self.wheel.advance(now):
+            if tick != fl.tick or flows.get(fl.key) is not fl:
+                continue  # entrada obsoleta ou fluxo já exportado
+            if self._deadline(fl) > now:
+                self._schedule(fl)
+                continue
+            del flows[fl.key]
+            if fl.closed:
+                reason = 'rst' if fl.state == 'RESET' else 'fin'
+            elif fl.first_ts + self.active_timeout <= now:
+                reason = 'active'
+            else:
+                reason = 'idle'
+            self._export(fl, reason)
+            n += 1
+        return n
+
+    def flush(self) -> None:
+        """Exporta todos os fluxos restantes (encerramento)."""
+        for fl in list(self.flows.values()):
+            self._export(fl, 'rst' if fl.state == 'RESET' else 'fin' if fl.closed else 'shutdown')
+        self.flows.clear()
+        for _ in self.wheel.drain():
+            pass
+
+    def _export(self, fl: Flow, reason: str) -> None:
+        self.exported += 1
+        self.sink(fl, reason)
+
+
+def _iso(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).isoformat()
+
+
+class FlowCsvLogger:
+    """Registros de fluxo em logs/fluxos.csv."""
+
+    HEADERS = [
+        'inicio', 'fim', 'duracao_s', 'protocolo', 'src_ip', 'src_port', 'dst_ip', 'dst_port',
+        'pacotes_ida', 'bytes_ida', 'pacotes_volta', 'bytes_volta', 'estado_tcp', 'flags_tcp', 'motivo_fim',
+    ]
+
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        self.logger = CsvLogger(os.path.join(base_dir, 'fluxos.csv'), self.HEADERS,
+                                ip_cols=IP_COLUMNS['fluxos.csv'], **opts)
+
+    def log(self, fl: Flow, reason: str) -> None:
+        self.logger.write_row([
+            _iso(fl.first_ts), _iso(fl.last_ts), round(fl.last_ts - fl.first_ts, 6), fl.proto,
+            fl.src_ip(), max(fl.sport, 0), fl.dst_ip(), max(fl.dport, 0),
+            fl.pkts_fwd, fl.bytes_fwd, fl.pkts_rev, fl.bytes_rev, fl.state, fl.tcp_flags, reason,
+        ])
+
+    def close(self) -> None:
+        self.logger.close()
+
+
+class FlowBinaryLogger(QueuedWriter):
+    """Registros de fluxo binários de tamanho fixo em logs/fluxos.bin.
+
+    Arquivo: cabeçalho b'FLW1' seguido de registros RECORD (little-endian):
+    inicio_ns, fim_ns, versão, proto, estado, motivo, src(16), dst(16),
+    sport, dport, pacotes/bytes ida e volta, flags TCP.
+
+    A captura só empacota e enfileira o registro; a escrita, a durabilidade
+    e a rotação são as do QueuedWriter (cada arquivo rotacionado começa com
+    o próprio cabeçalho).
+    """
+
+    MAGIC = b'FLW1'
+    RECORD = struct.Struct('<qqBBBB16s16sHHQQQQH')
+
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        super().__init__(os.path.join(base_dir, 'fluxos.bin'), **opts)
+        self._open()
+        self._start()
+
+    def _open(self) -> None:
+        self._fh = open(self.path, 'ab', buffering=max(self.flush_bytes, 8192))
+        if self._fh.tell() == 0:
+            self._fh.write(self.MAGIC)
+            self._fh.flush()
+        self._header_size = self._size = self._fh.tell()
+
+    def _write(self, rec: bytes) -> int:
+        return self._fh.write(rec)
+
+    def _written_since_open(self) -> bool:
+        return self._size > self._header_size
+
+    def log(self, fl: Flow, reason: str) -> None:
+        size = 4 if fl.version == 4 else 16
+        self.write_row(self.RECORD.pack(
+            int(fl.first_ts * 1e9), int(fl.last_ts * 1e9), fl.version, fl.proto,
+            _STATE_CODE[fl.state], _REASON_CODE[reason],
+            fl.src.to_bytes(size, 'big'), fl.dst.to_bytes(size, 'big'), max(fl.sport, 0), max(fl.dport, 0),
+            fl.pkts_fwd, fl.bytes_fwd, fl.pkts_rev, fl.bytes_rev, fl.tcp_flags,
+        ))
+
+    @classmethod
+    def read(cls, path: str) -> Iterator[dict]:
+        """Registros de um fluxos.bin (vivo ou rotacionado, inclusive .gz/.zst)."""
+        with open_data(path) as fh:
+            if fh.read(4) != cls.MAGIC:
+                raise ValueError("Arquivo de fluxos inválido")
+            while True:
+                raw = fh.read(cls.RECORD.size)
+                if len(raw) < cls.RECORD.size:
+                    return
+                (first, last, version, proto, state, reason, src, dst, sport, dport,
+                 pf, bf, pr, br, flags) = cls.RECORD.unpack(raw)
+                size = 4 if version == 4 else 16
+                fmt = format_ipv4 if version == 4 else format_ipv6
+                yield {
+                    'inicio_ns': first, 'fim_ns': last, 'protocolo': proto,
+                    'src_ip': fmt(int.from_bytes(src[:size], 'big')), 'src_port': sport,
+                    'dst_ip': fmt(int.from_bytes(dst[:size], 'big')), 'dst_port': dport,
+                    'pacotes_ida': pf, 'bytes_ida': bf, 'pacotes_volta': pr, 'bytes_volta': br,
+                    'estado_tcp': TCP_STATES[state], 'flags_tcp': flags, 'motivo_fim': END_REASONS[reason],
+                }
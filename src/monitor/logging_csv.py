@@ -1,67 +1,295 @@
 import csv
 import os
 import threading
+import time
+from collections import deque
 from datetime import datetime
 from typing import Dict, Optional
 
+from .logindex import IP_COLUMNS, IndexWriter
+from .rotation import COMPRESSOR, INDEX_SUFFIX, Rotation, prune, rotated_path
 
-class CsvLogger:
+
+DURABILITY_MODES = ('sync', 'batch', 'fsync')
+
+
+class QueuedWriter:
     """
-    Logger CSV com flush imediato, thread-safe.
+    Base thread-safe com commit em grupo para os logs.
+
+    As linhas são enfileiradas numa fila limitada e gravadas por uma thread de
+    escrita, que descarrega o buffer quando acumula `flush_bytes` ou quando
+    passam `flush_interval` segundos. Se a fila estiver cheia a linha é
+    descartada e contada em `dropped` (a captura nunca espera pelo disco).
+
+    Modos de durabilidade:
+    - 'sync': grava e faz flush a cada linha na própria thread chamadora.
+    - 'batch': flush para o SO a cada commit em grupo (padrão).
+    - 'fsync': como 'batch', mas também chama os.fsync a cada commit.
+
+    Com `rotation` (ver rotation.Rotation), a própria thread de escrita troca
+    o arquivo quando ele passa do tamanho ou do intervalo configurado; as
+    linhas que chegam nesse meio tempo esperam na fila.
+
+    Subclasses implementam `_open()` (abre `_fh` em `path`) e `_write(row)`,
+    que grava uma linha e retorna quantos bytes/caracteres escreveu.
     """
-    def __init__(self, path: str, headers: list[str]) -> None:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        self._fh = open(path, 'a', newline='', encoding='utf-8')
-        self._csv = csv.writer(self._fh)
+    def __init__(self, path: str, durability: str = 'batch', queue_size: int = 65536,
+                 flush_bytes: int = 64 * 1024, flush_interval: float = 0.2,
+                 rotation: Optional[Rotation] = None) -> None:
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Modo de durabilidade inválido: {durability}")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.durability = durability
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.dropped = 0
         self._lock = threading.Lock()
-        # Escreve cabeçalho se arquivo está vazio
-        if self._fh.tell() == 0:
-            self._csv.writerow(headers)
-            self._fh.flush()
+        self._queue: deque = deque()
+        self._queue_size = queue_size
+        self._high_water = max(1, queue_size // 2)
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.rotation = rotation if rotation is not None and rotation.enabled else None
+        self.rotations = 0
+        self._size = 0  # bytes/caracteres no arquivo atual
+        self._opened_at = time.time()
 
-    def write_row(self, row: list) -> None:
-        with self._lock:
-            self._csv.writerow(row)
-            self._fh.flush()
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def _start(self) -> None:
+        # Chamado pela subclasse depois de abrir o arquivo
+        if self.durability != 'sync':
+            self._thread = threading.Thread(target=self._writer_loop, name=f"log-writer:{os.path.basename(self.path)}", daemon=True)
+            self._thread.start()
+
+    def _write(self, row) -> int:
+        raise NotImplementedError
+
+    def write_row(self, row) -> None:
+        if self._thread is None:
+            with self._lock:
+                if not self._closed:
+                    self._size += self._write(row)
+                    self._commit()  # flush por linha (e checkpoint do índice, se houver)
+                    if self.rotation is not None:
+                        self._maybe_rotate()
+            return
+        q = self._queue
+        if len(q) >= self._queue_size:
+            self.dropped += 1
+            return
+        q.append(row)
+        # Acorda a escrita antes do prazo só quando a fila começa a encher
+        if len(q) == self._high_water:
+            self._wake.set()
+
+    def _drain(self) -> int:
+        # Grava tudo que está na fila; retorna quantidade escrita
+        q = self._queue
+        write = self._write
+        written = 0
+        while q:
+            written += write(q.popleft())
+        return written
+
+    def _commit(self) -> None:
+        self._fh.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._fh.fileno())
+
+    def _writer_loop(self) -> None:
+        pending = 0
+        last_commit = time.monotonic()
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                if self._closed:
+                    break
+                written = self._drain()
+                self._size += written
+                pending += written
+                now = time.monotonic()
+                if pending and (pending >= self.flush_bytes or now - last_commit >= self.flush_interval):
+                    self._commit()
+                    pending = 0
+                    last_commit = now
+                if self.rotation is not None and self._maybe_rotate():
+                    pending = 0
+
+    def _maybe_rotate(self) -> bool:
+        if not self._written_since_open() or not self.rotation.due(self._size, self._opened_at, time.time()):
+            return False
+        self._commit()
+        self._rotate()
+        self.rotations += 1
+        self._opened_at = time.time()
+        return True
+
+    def _written_since_open(self) -> bool:
+        return self._size > 0
+
+    def _rotate(self) -> None:
+        # Renomeia o arquivo cheio (atômico no mesmo diretório) e reabre o caminho
+        self._close_file()
+        target = rotated_path(self.path)
+        os.rename(self.path, target)
+        if os.path.exists(self.path + INDEX_SUFFIX):
+            os.rename(self.path + INDEX_SUFFIX, target + INDEX_SUFFIX)
+        self._size = 0
+        self._open()
+        rot = self.rotation
+        COMPRESSOR.submit(target, rot.compress, lambda: prune(self.path, rot.keep))
+
+    def _close_file(self) -> None:
+        self._fh.close()
 
     def close(self) -> None:
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+            try:
+                self._drain()
+                self._commit()
+            except (OSError, ValueError):
+                pass
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
         try:
-            self._fh.close()
+            self._close_file()
         except Exception:
             pass
 
 
+class CsvLogger(QueuedWriter):
+    """
+    Logger CSV com commit em grupo e rotação opcional (ver QueuedWriter).
+
+    Com `index=True` mantém o índice auxiliar <arquivo>.idx (ver logindex):
+    checkpoints de tempo/offset a cada bloco de linhas e um filtro de Bloom
+    com os valores das colunas `ip_cols`.
+    """
+
+    def __init__(self, path: str, headers: list[str], index: bool = False, ip_cols: tuple = (), **opts) -> None:
+        super().__init__(path, **opts)
+        self.headers = headers
+        self.index = index
+        self.ip_cols = ip_cols
+        self._index: Optional[IndexWriter] = None
+        self._open()
+        self._start()
+
+    def _open(self) -> None:
+        self._fh = open(self.path, 'a', newline='', encoding='utf-8', buffering=max(self.flush_bytes, 8192))
+        self._csv = csv.writer(self._fh)
+        # Escreve cabeçalho se arquivo está vazio
+        if self._fh.tell() == 0:
+            self._csv.writerow(self.headers)
+            self._fh.flush()
+        self._header_size = self._size = self._fh.tell()
+        self._write = self._csv.writerow
+        if self.index:
+            self._index = IndexWriter(self.path, self.ip_cols)
+            self._index.begin(self._size, time.monotonic())
+            self._write = self._write_indexed
+
+    def _write_indexed(self, row) -> int:
+        n = self._csv.writerow(row)
+        idx = self._index
+        idx.add(row)
+        if idx.rows >= idx.block_rows:
+            idx.checkpoint(self._fh.tell(), time.monotonic())
+        return n
+
+    def _commit(self) -> None:
+        super()._commit()
+        idx = self._index
+        if idx is not None:
+            # O índice só é descarregado depois dos dados que ele aponta
+            if idx.due(time.monotonic()):
+                idx.checkpoint(self._fh.tell(), time.monotonic())
+            idx.flush()
+
+    def _close_file(self) -> None:
+        if self._index is not None and not self._fh.closed:
+            self._index.checkpoint(self._fh.tell(), time.monotonic())
+            self._index.close()
+        self._fh.close()
+
+    def _written_since_open(self) -> bool:
+        return self._size > self._header_size
+
+
 class InternetLogger:
-    def __init__(self, base_dir: str = 'logs') -> None:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
         self.logger = CsvLogger(os.path.join(base_dir, 'internet.csv'), [
             'timestamp', 'protocolo', 'src_ip', 'dst_ip', 'ip_proto', 'info', 'tamanho_bytes'
-        ])
+        ], ip_cols=IP_COLUMNS['internet.csv'], **opts)
 
     def log(self, proto_name: str, src_ip: str, dst_ip: str, ip_proto: int, info: str, size: int) -> None:
         self.logger.write_row([
             datetime.utcnow().isoformat(), proto_name, src_ip, dst_ip, ip_proto, info, size
         ])
 
+    def log_rec(self, rec, proto_name: str, info: str, size: int) -> None:
+        self.log(proto_name, rec.src, rec.dst, rec.ip_proto, info, size)
+
+    def close(self) -> None:
+        self.logger.close()
+
 
 class TransporteLogger:
-    def __init__(self, base_dir: str = 'logs') -> None:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
         self.logger = CsvLogger(os.path.join(base_dir, 'transporte.csv'), [
             'timestamp', 'protocolo', 'src_ip', 'src_port', 'dst_ip', 'dst_port', 'tamanho_bytes'
-        ])
+        ], ip_cols=IP_COLUMNS['transporte.csv'], **opts)
 
     def log(self, proto_name: str, src_ip: str, src_port: int, dst_ip: str, dst_port: int, size: int) -> None:
         self.logger.write_row([
             datetime.utcnow().isoformat(), proto_name, src_ip, src_port, dst_ip, dst_port, size
         ])
 
+    def log_rec(self, rec, size: int) -> None:
+        self.log(rec.l4_name, rec.src, rec.src_port, rec.dst, rec.dst_port, size)
+
+    def close(self) -> None:
+        self.logger.close()
+
 
 class AplicacaoLogger:
-    def __init__(self, base_dir: str = 'logs') -> None:
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
         self.logger = CsvLogger(os.path.join(base_dir, 'aplicacao.csv'), [
             'timestamp', 'protocolo', 'info'
-        ])
+        ], **opts)
 
     def log(self, app_name: str, info: str) -> None:
         self.logger.write_row([
             datetime.utcnow().isoformat(), app_name, info
         ])
+
+    def close(self) -> None:
+        self.logger.close()
+
+
+class AmostragemLogger:
+    """Linha do tempo da taxa de amostragem; as linhas dos demais CSVs entre
+    duas mudanças representam 1 a cada `taxa` pacotes (ou fluxos)."""
+
+    def __init__(self, base_dir: str = 'logs', **opts) -> None:
+        self.logger = CsvLogger(os.path.join(base_dir, 'amostragem.csv'), [
+            'timestamp', 'modo', 'taxa', 'motivo', 'descartes_kernel', 'carga'
+        ], **opts)
+
+    def log(self, mode: str, rate: int, reason: str, drops: int, load: float) -> None:
+        self.logger.write_row([
+            datetime.utcnow().isoformat(), mode, rate, reason, drops, round(load, 3)
+        ])
+
+    def close(self) -> None:
+        self.logger.close()
@@ -0,0 +1,284 @@
+"""
+Índices auxiliares dos logs CSV e consulta por tempo/IP.
+
+Enquanto grava, cada CsvLogger mantém ao lado do arquivo um índice
+<arquivo>.idx só de acréscimo. A cada bloco de linhas (até `block_rows`
+linhas ou `block_seconds` de idade) o índice recebe um registro com o
+intervalo de tempo do bloco (menor e maior timestamp), os offsets de início e fim no CSV e um filtro
+de Bloom com os IPs de origem/destino vistos no bloco.
+
+A consulta lê só o índice, descarta blocos fora do intervalo ou cujo Bloom
+não contém o IP, e lê do CSV apenas os blocos restantes (seek direto no
+offset). Trechos sem índice (cauda do arquivo vivo, dados de antes do
+índice existir) são lidos por inteiro e filtrados linha a linha. Na rotação
+o índice é renomeado junto com o arquivo; os offsets se referem ao conteúdo
+descomprimido, então .gz/.zst também são consultáveis.
+"""
+import csv
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import os
+import struct
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .rotation import INDEX_SUFFIX, rotated_files, sidecar_of
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional
+    zstandard = None
+
+MAGIC = b'MIDX'
+INDEX_VERSION = 1
+_HEADER = struct.Struct('<4sBBH')  # magia, versão, funções de hash, bytes do Bloom
+_BLOCK = struct.Struct('<qqQQI')  # ts inicial/final (ns), offsets [início, fim), linhas
+
+BLOOM_BYTES = 512
+BLOOM_HASHES = 4
+
+# Colunas de IP (origem, destino) de cada CSV gerado pelo monitor
+IP_COLUMNS = {
+    'internet.csv': (2, 3),
+    'transporte.csv': (2, 4),
+    'fluxos.csv': (4, 6),
+    'aplicacao.csv': (),
+}
+
+
+def _positions(key: str, m: int, k: int) -> Iterator[int]:
+    h = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    h1 = int.from_bytes(h[:4], 'little')
+    h2 = int.from_bytes(h[4:], 'little') | 1
+    for i in range(k):
+        yield (h1 + i * h2) % m
+
+
+def bloom_add(bits: bytearray, key: str, k: int = BLOOM_HASHES) -> None:
+    m = len(bits) * 8
+    for p in _positions(key, m, k):
+        bits[p >> 3] |= 1 << (p & 7)
+
+
+def bloom_contains(bits: bytes, key: str, k: int = BLOOM_HASHES) -> bool:
+    m = len(bits) * 8
+    return all(bits[p >> 3] & (1 << (p & 7)) for p in _positions(key, m, k))
+
+
+def iso_to_ns(text: str) -> int:
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 10 ** 9 + dt.microsecond * 1000
+
+
+class IndexWriter:
+    """Acumula o bloco atual e acrescenta um registro a <path>.idx a cada checkpoint."""
+
+    def __init__(self, data_path: str, ip_cols: Sequence[int] = (), block_rows: int = 1024,
+                 block_seconds: float = 5.0) -> None:
+        self.path = data_path + INDEX_SUFFIX
+        self.ip_cols = tuple(ip_cols)
+        self.block_rows = block_rows
+        self.block_seconds = block_seconds
+        self.blocks = 0
+        self._fh = open(self.path, 'ab')
+        if self._fh.tell() == 0:
+            self._fh.write(_HEADER.pack(MAGIC, INDEX_VERSION, BLOOM_HASHES, BLOOM_BYTES))
+        self._start = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.rows = 0
+        self._min = self._max = ''
+        self._ips: set = set()
+        self._opened = None
+
+    def begin(self, offset: int, now: float) -> None:
+        """Marca o offset onde o próximo bloco começa."""
+        self._start = offset
+        self._opened = now
+
+    def add(self, row: list) -> None:
+        # Menor e maior timestamp do bloco: linhas nem sempre chegam em ordem
+        # (fluxos.csv é gravado no fim de cada fluxo, com o início dele)
+        ts = row[0]
+        if not self.rows:
+            self._min = self._max = ts
+        elif ts < self._min:
+            self._min = ts
+        elif ts > self._max:
+            self._max = ts
+        self.rows += 1
+        ips = self._ips
+        for c in self.ip_cols:
+            ips.add(row[c])
+
+    def due(self, now: float) -> bool:
+        return self.rows >= self.block_rows or (self.rows > 0 and now - self._opened >= self.block_seconds)
+
+    def checkpoint(self, offset: int, now: float) -> None:
+        """Fecha o bloco [início, offset) e começa o próximo em `offset`."""
+        if self.rows:
+            bits = bytearray(BLOOM_BYTES)
+            for ip in self._ips:
+                bloom_add(bits, ip)
+            try:
+                t0, t1 = iso_to_ns(self._min), iso_to_ns(self._max)
+            except (TypeError, ValueError):
+                t0, t1 = 0, 2 ** 63 - 1  # timestamp ilegível: bloco sempre consultado
+            self._fh.write(_BLOCK.pack(t0, t1, self._start, offset, self.rows) + bits)
+            self.blocks += 1
+        self._reset()
+        self.begin(offset, now)
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class Block:
+    __slots__ = ('t0', 't1', 'start', 'end', 'rows', 'bloom')
+
+    def __init__(self, t0: int, t1: int, start: int, end: int, rows: int, bloom: Optional[bytes]) -> None:
+        self.t0, self.t1, self.start, self.end, self.rows, self.bloom = t0, t1, start, end, rows, bloom
+
+
+def read_index(data_path: str) -> List[Block]:
+    """Blocos do índice de `data_path` (arquivo vivo ou rotacionado); [] se não houver."""
+    try:
+        with open(sidecar_of(data_path), 'rb') as fh:
+            raw = fh.read()
+    except OSError:
+        return []
+    if len(raw) < _HEADER.size:
+        return []
+    magic, version, _k, nbloom = _HEADER.unpack_from(raw)
+    if magic != MAGIC or version != INDEX_VERSION:
+        return []
+    size = _BLOCK.size + nbloom
+    blocks = []
+    for off in range(_HEADER.size, len(raw) - size + 1, size):  # ignora registro parcial no fim
+        t0, t1, start, end, rows = _BLOCK.unpack_from(raw, off)
+        blocks.append(Block(t0, t1, start, end, rows, raw[off + _BLOCK.size:off + size]))
+    return blocks
+
+
+def open_data(path: str):
+    """Abre um log para leitura binária, descomprimindo .gz/.zst."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise OSError(f"{path}: requer o pacote zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def plan(blocks: List[Block], size: Optional[int], since: Optional[int], until: Optional[int],
+         ip: Optional[str]) -> List[Tuple[int, Optional[int], bool]]:
+    """Trechos a ler: (início, fim ou None para até o fim, indexado?)."""
+    ranges = []
+    pos = 0
+    for b in sorted(blocks, key=lambda b: b.start):
+        if b.start > pos:
+            ranges.append((pos, b.start, False))  # lacuna sem índice
+        pos = max(pos, b.end)
+        if since is not None and b.t1 < since:
+            continue
+        if until is not None and b.t0 > until:
+            continue
+        if ip is not None and not (b.bloom and bloom_contains(b.bloom, ip)):
+            continue
+        ranges.append((b.start, b.end, True))
+    if size is None or pos < size:
+        ranges.append((pos, None, False))
+    return ranges
+
+
+def ns_to_iso(ns: int) -> str:
+    """Timestamp em ns para ISO 8601 em UTC sem fuso (como nos CSVs)."""
+    sec, rest = divmod(ns, 10 ** 9)
+    return datetime.fromtimestamp(sec, timezone.utc).replace(tzinfo=None, microsecond=rest // 1000).isoformat()
+
+
+def query_file(path: str, since: Optional[int] = None, until: Optional[int] = None, ip: Optional[str] = None,
+               ip_cols: Sequence[int] = (), stats: Optional[dict] = None) -> Iterator[list]:
+    """Linhas de um CSV (vivo ou rotacionado) no intervalo [since, until] envolvendo `ip`."""
+    blocks = read_index(path)
+    compressed = path.endswith(('.gz', '.zst'))
+    size = None if compressed else os.path.getsize(path)
+    lo = ns_to_iso(since) if since is not None else None
+    hi = ns_to_iso(until) if until is not None else None
+    with open_data(path) as fh:
+        pos = 0
+        for start, end, indexed in plan(blocks, size, since, until, ip):
+            if start != pos:
+                fh.seek(start)  # em .gz/.zst o seek para frente descomprime sem guardar
+            if end is None:
+                data = fh.read()
+                # Cauda do arquivo vivo: ignora uma linha ainda incompleta
+                data = data[:data.rfind(b'\n') + 1]
+            else:
+                data = fh.read(end - start)
+            pos = start + len(data)
+            if stats is not None:
+                key = 'blocks_read' if indexed else 'unindexed_reads'
+                stats[key] = stats.get(key, 0) + 1
+                stats['bytes_read'] = stats.get('bytes_read', 0) + len(data)
+            for row in csv.reader(io.StringIO(data.decode('utf-8', 'replace'))):
+                if not row or row[0] == 'timestamp' or row[0] == 'inicio':
+                    continue  # cabeçalho
+                ts = row[0]
+                if (lo is not None and ts < lo) or (hi is not None and ts > hi):
+                    continue
+                if ip is not None and not any(c < len(row) and row[c] == ip for c in ip_cols):
+                    continue
+                yield row
+        if stats is not None and blocks:
+            stats['blocks_total'] = stats.get('blocks_total', 0) + len(blocks)
+
+
+def log_files(log_dir: str, name: str) -> List[str]:
+    """Rotacionados (do mais antigo ao mais novo) seguidos do arquivo vivo."""
+    live = os.path.join(log_dir, name)
+    files = rotated_files(live)
+    if os.path.exists(live):
+        files.append(live)
+    return files
+
+
+def query(log_dirs: Iterable[str], name: str, since: Optional[int] = None, until: Optional[int] = None,
+          ip: Optional[str] = None, stats: Optional[dict] = None) -> Iterator[list]:
+    """Consulta um log (ex.: 'transporte.csv') em um ou mais diretórios.
+
+    Cada diretório é lido arquivo a arquivo (já em ordem de tempo); vários
+    diretórios (ex.: logs/worker-*/) são intercalados pelo timestamp.
+    """
+    ip_cols = IP_COLUMNS.get(name, ())
+    if ip is not None and not ip_cols:
+        return
+    streams = [_query_dir(d, name, since, until, ip, ip_cols, stats) for d in log_dirs]
+    # Timestamps ISO 8601 ordenam lexicograficamente
+    yield from heapq.merge(*streams, key=itemgetter(0))
+
+
+def _query_dir(log_dir: str, name: str, since: Optional[int], until: Optional[int], ip: Optional[str],
+               ip_cols: Sequence[int], stats: Optional[dict]) -> Iterator[list]:
+    for path in log_files(log_dir, name):
+        yield from query_file(path, since, until, ip, ip_cols, stats)
+
+
+def expand_dirs(paths: Iterable[str]) -> List[str]:
+    """Diretórios informados mais os logs/worker-*/ de cada um."""
+    out = []
+    for p in paths:
+        out.append(p)
+        out.extend(sorted(glob.glob(os.path.join(p, 'worker-*'))))
+    return out
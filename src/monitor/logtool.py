@@ -0,0 +1,264 @@
+"""
+Ferramenta de linha de comando para os logs.
+
+    python -m src.monitor.logtool info [logs ...]
+    python -m src.monitor.logtool export --kind internet [-o internet.csv] [logs ...]
+    python -m src.monitor.logtool filter --kind transporte --ip 10.0.0.1 --port 443 --since 2024-05-01T12:00 [logs ...]
+    python -m src.monitor.logtool query --ip 172.31.66.5 --since 14:00 --until 14:05 [logs ...]
+
+info/export/filter tratam os segmentos binários (binlog); query consulta os
+CSVs (vivos e rotacionados, inclusive .gz/.zst) pelos índices auxiliares
+.idx (ver logindex) e recorre aos segmentos (ou a fluxos.bin) quando o log
+é binário.
+
+Os caminhos podem ser diretórios (ex.: logs, logs/worker-0) ou arquivos .seg;
+com vários diretórios as linhas saem intercaladas por timestamp. A saída usa
+o mesmo esquema dos CSVs gerados com --log-format csv.
+
+O filtro avalia primeiro o intervalo de tempo de cada segmento (trailer) e
+depois as colunas do rodapé; só os registros que passam são lidos do disco.
+"""
+import argparse
+import csv
+import heapq
+import ipaddress
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+from .binlog import (APP_CODES, HEADERS, KINDS, PROTO_CODES, PROTO_NAMES, Segment,
+                     addr_str, list_segments)
+from .flows import FlowBinaryLogger, FlowCsvLogger
+from .logindex import expand_dirs, iso_to_ns, log_files, query
+from .logindex import ns_to_iso as iso
+
+_TIME_ONLY = re.compile(r'^\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?$')
+
+
+def parse_time(text: str) -> int:
+    """Epoch em segundos, ISO 8601 ou só HH:MM[:SS] (hoje) para ns; UTC quando sem fuso."""
+    try:
+        return int(float(text) * 10 ** 9)
+    except ValueError:
+        pass
+    if _TIME_ONLY.match(text):
+        text = f"{datetime.now(timezone.utc).date().isoformat()}T{text}"
+    return iso_to_ns(text)
+
+
+def segments_for(paths: List[str], kind: str) -> List[List[Segment]]:
+    """Um grupo de segmentos (em ordem) por caminho informado."""
+    groups = []
+    for p in paths:
+        if os.path.isdir(p):
+            segs = [Segment(f) for f in list_segments(p, kind)]
+        else:
+            segs = [s for s in (Segment(p),) if s.kind == kind]
+        if segs:
+            groups.append(segs)
+    return groups
+
+
+def _match_fn(kind: str, cols, ip: Optional[bytes], proto: Optional[int],
+              port: Optional[int]) -> Callable[[int], bool]:
+    src, dst = cols.get('src'), cols.get('dst')
+    proto_col = cols.get('app') if kind == 'aplicacao' else cols.get('proto')
+    sport, dport = cols.get('src_port'), cols.get('dst_port')
+
+    def match(i: int) -> bool:
+        if proto is not None and proto_col[i] != proto:
+            return False
+        if ip is not None:
+            a = i * 16
+            if src[a:a + 16] != ip and dst[a:a + 16] != ip:
+                return False
+        if port is not None and sport[i] != port and dport[i] != port:
+            return False
+        return True
+    return match
+
+
+def _scan(segs: List[Segment], kind: str, since: Optional[int], until: Optional[int],
+          ip: Optional[bytes], proto: Optional[int], port: Optional[int]) -> Iterator[tuple]:
+    for seg in segs:
+        if seg.complete and seg.count == 0:
+            continue
+        if seg.complete and ((since is not None and seg.max_ts < since) or
+                             (until is not None and seg.min_ts > until)):
+            continue  # segmento inteiro fora do intervalo
+        cols = seg.columns()
+        ts = cols['ts']
+        match = _match_fn(kind, cols, ip, proto, port)
+        offsets = [cols['offset'][i] for i in range(len(ts))
+                   if (since is None or ts[i] >= since) and (until is None or ts[i] <= until) and match(i)]
+        for _, row in seg.records(offsets):
+            yield row['ts'], row
+
+
+def format_row(kind: str, row: dict) -> list:
+    ts = iso(row['ts'])
+    if kind == 'aplicacao':
+        return [ts, row['app'], row['info']]
+    proto = PROTO_NAMES.get(row['proto'], str(row['proto']))
+    src, dst = addr_str(row['version'], row['src_raw']), addr_str(row['version'], row['dst_raw'])
+    if kind == 'internet':
+        return [ts, proto, src, dst, row['ip_proto'], row['info'], row['size']]
+    return [ts, proto, src, row['src_port'], dst, row['dst_port'], row['size']]
+
+
+def iter_rows(paths: List[str], kind: str, since: Optional[int] = None, until: Optional[int] = None,
+              ip: Optional[str] = None, proto: Optional[str] = None, port: Optional[int] = None) -> Iterator[list]:
+    """Linhas no esquema CSV de `kind` que passam pelos filtros, em ordem de tempo."""
+    ip_key = None
+    if ip is not None:
+        addr = ipaddress.ip_address(ip)
+        ip_key = addr.packed if addr.version == 6 else b'\x00' * 12 + addr.packed
+    if ip_key is not None and kind == 'aplicacao':
+        return  # registros de aplicação não guardam endereços
+    proto_code = None
+    if proto is not None:
+        codes = APP_CODES if kind == 'aplicacao' else PROTO_CODES
+        proto_code = codes.get(proto.upper() if proto.upper() in codes else proto, 0)
+        if kind == 'aplicacao' and not proto_code:
+            # Aplicação sem código próprio: filtra pelo nome gravado no registro
+            for row in iter_rows(paths, kind, since, until):
+                if row[1] == proto:
+                    yield row
+            return
+    if port is not None and kind != 'transporte':
+        return
+    streams = [_scan(g, kind, since, until, ip_key, proto_code, port) for g in segments_for(paths, kind)]
+    for _, row in heapq.merge(*streams, key=lambda item: item[0]):
+        yield format_row(kind, row)
+
+
+def _flow_rows(path: str, since: Optional[int], until: Optional[int], ip: Optional[str]) -> Iterator[list]:
+    for r in FlowBinaryLogger.read(path):
+        first, last = r['inicio_ns'], r['fim_ns']
+        if (since is not None and first < since) or (until is not None and first > until):
+            continue
+        if ip is not None and ip not in (r['src_ip'], r['dst_ip']):
+            continue
+        yield [iso(first), iso(last), round((last - first) / 1e9, 6), r['protocolo'],
+               r['src_ip'], r['src_port'], r['dst_ip'], r['dst_port'], r['pacotes_ida'], r['bytes_ida'],
+               r['pacotes_volta'], r['bytes_volta'], r['estado_tcp'], r['flags_tcp'], r['motivo_fim']]
+
+
+def iter_flows(dirs: List[str], since: Optional[int] = None, until: Optional[int] = None,
+               ip: Optional[str] = None) -> Iterator[list]:
+    """Registros de fluxos.bin (vivos e rotacionados) no esquema de fluxos.csv.
+
+    Cada diretório é lido arquivo a arquivo; vários são intercalados pelo início.
+    """
+    streams = [(row for path in log_files(d, 'fluxos.bin') for row in _flow_rows(path, since, until, ip))
+               for d in dirs]
+    yield from heapq.merge(*streams, key=lambda row: row[0])
+
+
+QUERY_LOGS = ('internet', 'transporte', 'aplicacao', 'fluxos')
+
+
+def query_rows(paths: List[str], log: str, since: Optional[int] = None, until: Optional[int] = None,
+               ip: Optional[str] = None, stats: Optional[dict] = None) -> Iterator[list]:
+    """Consulta um log pelos índices dos CSVs; sem CSVs, usa os segmentos binários ou fluxos.bin."""
+    dirs = expand_dirs(paths)
+    name = f"{log}.csv"
+    if not any(log_files(d, name) for d in dirs):
+        if log in KINDS:
+            return iter_rows(dirs, log, since, until, ip)
+        if log == 'fluxos':
+            return iter_flows(dirs, since, until, ip)
+    return query(dirs, name, since, until, ip, stats)
+
+
+def write_csv(rows: Iterator[list], kind: str, out) -> int:
+    w = csv.writer(out)
+    w.writerow(FlowCsvLogger.HEADERS if kind == 'fluxos' else HEADERS[kind])
+    n = 0
+    for row in rows:
+        w.writerow(row)
+        n += 1
+    return n
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog='python -m src.monitor.logtool', description='Consulta e exporta os logs binários')
+    sub = p.add_subparsers(dest='cmd', required=True)
+
+    info = sub.add_parser('info', help='Resumo dos segmentos (registros, intervalo de tempo, rodapé)')
+    info.add_argument('paths', nargs='*', default=['logs'], help='Diretórios ou arquivos .seg (padrão: logs)')
+
+    for name, text in (('export', 'Converte os segmentos de um tipo para CSV'),
+                       ('filter', 'Exporta para CSV só os registros que passam pelos filtros')):
+        sp = sub.add_parser(name, help=text)
+        sp.add_argument('paths', nargs='*', default=['logs'], help='Diretórios ou arquivos .seg (padrão: logs)')
+        sp.add_argument('--kind', choices=list(KINDS), required=True, help='Tipo de log')
+        sp.add_argument('-o', '--output', metavar='ARQUIVO', help='CSV de saída (padrão: stdout)')
+        if name == 'filter':
+            sp.add_argument('--ip', help='Endereço de origem ou destino')
+            sp.add_argument('--proto', help='Protocolo (IPv4, IPv6, ICMP, TCP, UDP) ou aplicação (HTTP, DNS...)')
+            sp.add_argument('--port', type=int, help='Porta de origem ou destino (só transporte)')
+            sp.add_argument('--since', help='Início (ISO 8601 em UTC ou epoch em segundos)')
+            sp.add_argument('--until', help='Fim (ISO 8601 em UTC ou epoch em segundos)')
+
+    q = sub.add_parser('query', help='Consulta por IP e intervalo de tempo usando os índices .idx dos CSVs')
+    q.add_argument('paths', nargs='*', default=['logs'], help='Diretórios de log; inclui os worker-*/ (padrão: logs)')
+    q.add_argument('--log', choices=list(QUERY_LOGS), default='transporte', help='Log consultado (padrão: transporte)')
+    q.add_argument('--ip', help='Endereço de origem ou destino')
+    q.add_argument('--since', help='Início (HH:MM[:SS] de hoje, ISO 8601 em UTC ou epoch em segundos)')
+    q.add_argument('--until', help='Fim (HH:MM[:SS] de hoje, ISO 8601 em UTC ou epoch em segundos)')
+    q.add_argument('-o', '--output', metavar='ARQUIVO', help='CSV de saída (padrão: stdout)')
+    q.add_argument('--stats', action='store_true', help='Mostra em stderr quantos blocos/bytes foram lidos')
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_argparser().parse_args(argv)
+    if args.cmd == 'info':
+        for kind in KINDS:
+            for group in segments_for(args.paths, kind):
+                for seg in group:
+                    if seg.complete:
+                        span = f"{iso(seg.min_ts)} .. {iso(seg.max_ts)}" if seg.count else '-'
+                        print(f"{seg.path}\t{kind}\t{seg.count} registros\t{span}")
+                    else:
+                        n = sum(1 for _ in seg.records())
+                        print(f"{seg.path}\t{kind}\t{n} registros\t(aberto, sem rodapé)")
+        return 0
+    filters = {}
+    if args.cmd in ('filter', 'query'):
+        try:
+            filters = {
+                'since': parse_time(args.since) if args.since else None,
+                'until': parse_time(args.until) if args.until else None,
+                'ip': str(ipaddress.ip_address(args.ip)) if args.ip else None,
+            }
+            if args.cmd == 'filter':
+                filters.update(proto=args.proto, port=args.port)
+        except ValueError as e:
+            print(f"Filtro inválido: {e}", file=sys.stderr)
+            return 2
+    stats: dict = {}
+    if args.cmd == 'query':
+        kind = args.log
+        rows = query_rows(args.paths, kind, stats=stats, **filters)
+    else:
+        kind = args.kind
+        rows = iter_rows(args.paths, kind, **filters)
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as out:
+            n = write_csv(rows, kind, out)
+        print(f"{n} linhas em {args.output}", file=sys.stderr)
+    else:
+        write_csv(rows, kind, sys.stdout)
+    if args.cmd == 'query' and args.stats:
+        print(f"blocos lidos: {stats.get('blocks_read', 0)}/{stats.get('blocks_total', 0)}  "
+              f"trechos sem índice: {stats.get('unindexed_reads', 0)}  bytes lidos: {stats.get('bytes_read', 0)}",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,37 +1,206 @@
 import argparse
-import ipaddress
 import signal
 import sys
 import threading
+import time
 from datetime import datetime
 
 from .capture import RawCapture
-from .parsers.ip import parse_ip, parse_icmpv4, parse_icmpv6
-from .parsers.transport import parse_tcp, parse_udp
-from .parsers.app import identify_app
-from .logging_csv import InternetLogger, TransporteLogger, AplicacaoLogger
-from .stats import Stats
+from .pcap import PcapCapture
+from .bpf import FilterSyntaxError, PacketFilter, parse_filter
+from .parsers.decoder import PacketRecord, decode, decode_transport
+from .parsers.app import FlowClassifier
+from .logging_csv import InternetLogger, TransporteLogger, AplicacaoLogger, AmostragemLogger
+from .binlog import BinAplicacaoLogger, BinInternetLogger, BinTransporteLogger
+from .rotation import COMPRESS_MODES, COMPRESSOR, Rotation
+from .flows import FlowBinaryLogger, FlowCsvLogger, FlowTable
+from .reassembly import FragmentReassembler, StreamReassembler
+from .dnscache import PassiveDnsCache
+from .sampling import FLOW_MODES, SAMPLING_MODES, Sampler
+from .selfstats import StageProfiler, dump as dump_self_stats
+from .stats import ConcurrentStats
+from .subnets import SubnetClassifier
 from . import ui
 
 
+DEFAULT_CLIENT_SUBNET = '172.31.66.0/24'
+LOG_MODES = ('packets', 'flows', 'both')
+LOG_FORMATS = ('csv', 'binary')
+
+
 class Monitor:
-    def __init__(self, interface: str, client_subnet: str | None = None) -> None:
+    def __init__(self, interface: str, client_subnet: str | list[str] | None = None,
+                 read_file: str | None = None, replay: str = 'max', log_dir: str = 'logs',
+                 log_durability: str = 'batch', capture_opts: dict | None = None, capture=None,
+                 packet_filter: str | None = None, log_mode: str = 'packets',
+                 flow_opts: dict | None = None, sampling: str = 'off', sample_rate: int = 1,
+                 stats_opts: dict | None = None, ui_opts: dict | None = None,
+                 log_format: str = 'csv', log_rotation: dict | None = None, log_index: bool = True,
+                 reassembly: bool = True, reassembly_memory: int = 32 * 1024 * 1024,
+                 dns_cache: int = 65536, self_stats: int = 0) -> None:
         self.interface = interface
-        # Sub-rede padrão (pode ser ajustada via CLI)
-        self.client_net = ipaddress.ip_network(client_subnet or '172.31.66.0/24', strict=False)
-        self.cap = RawCapture(interface)
-        self.stats = Stats()
-        self.internet_log = InternetLogger()
-        self.transp_log = TransporteLogger()
-        self.app_log = AplicacaoLogger()
+        # Opções do painel (interval, top_n, sort), repassadas a ui.print_periodic
+        self.ui_opts = {'interval': 1.0, **(ui_opts or {})}
+        # Sub-redes dos clientes (IPv4/IPv6); padrão pode ser ajustado via CLI
+        if isinstance(client_subnet, str):
+            client_subnet = [client_subnet]
+        self.clients = SubnetClassifier(client_subnet or [DEFAULT_CLIENT_SUBNET])
+        # Com read_file, reproduz um pcap/pcapng em vez de capturar ao vivo
+        capture_opts = dict(capture_opts or {})
+        # Filtro: BPF no kernel quando a fonte é AF_PACKET, senão avaliado aqui
+        self.filter = PacketFilter(packet_filter) if packet_filter else None
+        self._match = self.filter.match if self.filter else None
+        if self.filter and capture is None and not read_file:
+            capture_opts['bpf_program'] = self.filter.program
+        if capture is not None:
+            # Fonte já construída (ex.: fila de um despachante em modo multi-worker)
+            self.cap = capture
+        elif read_file:
+            self.cap = PcapCapture(read_file, replay, batch_size=capture_opts.get('batch_size', 64))
+        else:
+            self.cap = RawCapture(interface, **capture_opts)
+        # stats_opts: max_endpoints/max_ports limitam a memória (ver Stats)
+        # Escrita pela(s) thread(s) de captura, leitura pela UI sem travas no caminho quente;
+        # com amostragem por fluxo o erro por pacote não vale (ver sampling)
+        self.stats = ConcurrentStats(**(stats_opts or {}), packet_variance=sampling not in FLOW_MODES)
+        # A UI aplica só os deltas do Stats desde a última versão vista
+        self._mirror = ui.SnapshotMirror()
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Formato de log inválido: {log_format}")
+        # log_rotation: max_bytes/interval/keep/compress (ver rotation.Rotation)
+        log_opts = {'durability': log_durability, 'rotation': Rotation(**log_rotation) if log_rotation else None}
+        # CSVs ganham índice auxiliar .idx (tempo/offset + Bloom de IPs) para logtool query
+        csv_opts = {**log_opts, 'index': log_index}
+        if log_format == 'binary':
+            # Segmentos binários com rodapé colunar; CSV via python -m src.monitor.logtool
+            self.internet_log = BinInternetLogger(log_dir, **log_opts)
+            self.transp_log = BinTransporteLogger(log_dir, **log_opts)
+            self.app_log = BinAplicacaoLogger(log_dir, **log_opts)
+        else:
+            self.internet_log = InternetLogger(log_dir, **csv_opts)
+            self.transp_log = TransporteLogger(log_dir, **csv_opts)
+            self.app_log = AplicacaoLogger(log_dir, **csv_opts)
+        # Modo 'flows' troca o log por pacote de transporte por registros de fluxo
+        if log_mode not in LOG_MODES:
+            raise ValueError(f"Modo de log inválido: {log_mode}")
+        self._log_transport = log_mode != 'flows'
+        self.flows = None
+        self.flow_log = None
+        if log_mode != 'packets':
+            flow_opts = dict(flow_opts or {})
+            fmt = flow_opts.pop('format', 'csv')
+            if fmt == 'binary':
+                self.flow_log = FlowBinaryLogger(log_dir, **log_opts)
+            else:
+                self.flow_log = FlowCsvLogger(log_dir, **csv_opts)
+            self.flows = FlowTable(self.flow_log.log, **flow_opts)
+        self._now = 0.0
+        # Amostragem: pesos escalam os contadores; mudanças de taxa vão para amostragem.csv
+        self.sampler = Sampler(sampling, sample_rate, on_change=self._log_sampling)
+        self.sampling_log = None
+        if self.sampler.enabled:
+            self.sampling_log = AmostragemLogger(log_dir, **log_opts)
+            self._log_sampling(self.sampler, 'inicio')
+        # Remontagem de fragmentos IP e fluxos TCP para os parsers de aplicação;
+        # o orçamento de memória é dividido 1/4 fragmentos, 3/4 fluxos
+        self.frags = self.streams = None
+        if reassembly:
+            self.frags = FragmentReassembler(max_bytes=reassembly_memory // 4)
+            self.streams = StreamReassembler(max_bytes=reassembly_memory - reassembly_memory // 4)
+        # Protocolo de aplicação por fluxo: fluxos já identificados pulam a detecção
+        self.apps = FlowClassifier()
+        # DNS passivo: respostas vistas dão nome aos endpoints remotos (0 desliga)
+        self.dns = PassiveDnsCache(dns_cache) if dns_cache else None
+        # PACKET_STATISTICS só é lido pela thread de captura (totais em cap.kernel_*)
+        self._read_kernel = None
+        self._kernel_due = 0.0
+        # Contadores do laço de captura; só medidos com o exportador de métricas ativo
+        self.pipeline: dict | None = None
         self._stop = threading.Event()
+        # Registro de decodificação reutilizado a cada pacote
+        self._rec = PacketRecord()
+        # Auto-instrumentação: 1 a cada `self_stats` quadros cronometrado por estágio (0 desliga)
+        self.profiler = None
+        if self_stats:
+            self.profiler = StageProfiler(self_stats)
+            self.profiler.bind(self)
 
-    def start(self) -> None:
+    def open(self) -> None:
         self.cap.open()
+        if getattr(self.cap, 'kernel_filter', False):
+            self._match = None
+        self._read_kernel = getattr(self.cap, 'read_kernel_stats', None)
+
+    def start(self) -> None:
+        self.open()
         t = threading.Thread(target=self._loop_capture, daemon=True)
+        t0 = time.perf_counter()
         t.start()
+        if self.cap.mode == 'pcap':
+            self._run_replay(t, t0)
+            return
         # Mantém execução contínua até interrupção externa (Ctrl+C / signal)
-        ui.print_periodic(self.stats.snapshot, interval=1.0)
+        ui.print_periodic(self.snapshot, **self.ui_opts)
+
+    def snapshot(self) -> dict:
+        snap = dict(self._mirror.apply(self.stats.delta(self._mirror.version, self._clock())))
+        return self._add_extras(snap)
+
+    def metrics_snapshot(self) -> dict:
+        """Snapshot completo para o exportador de métricas (independente do espelho da UI)."""
+        snap = self.stats.snapshot(self._clock())
+        snap.update(self.metrics_extras())
+        return snap
+
+    def metrics_extras(self) -> dict:
+        """Contadores do exportador além do Stats (kernel, logs, pipeline, remontagem...)."""
+        extras = self._add_extras({})
+        if self._read_kernel is not None:
+            # Só os totais acumulados; quem lê o socket é a thread de captura
+            extras['capture'] = {'kernel_packets': self.cap.kernel_packets, 'kernel_drops': self.cap.kernel_drops}
+        if self.pipeline is not None:
+            extras['pipeline'] = dict(self.pipeline)
+        if self.frags is not None:
+            extras['reassembly'] = {'fragments': self.frags.stats(), 'streams': self.streams.stats()}
+        if self.dns is not None:
+            extras['dns_cache'] = self.dns.stats()
+        extras['app_flows'] = self.apps.stats()
+        return extras
+
+    def _add_extras(self, snap: dict) -> dict:
+        snap['log_dropped'] = sum(lg.logger.dropped for lg in (self.internet_log, self.transp_log, self.app_log))
+        if self.flows is not None:
+            snap['flows_active'] = len(self.flows.flows)
+            snap['flows_exported'] = self.flows.exported
+        if self.sampler.enabled:
+            sp = self.sampler
+            snap['sampling'] = {
+                'mode': sp.mode, 'rate': sp.rate, 'seen': sp.seen, 'sampled': sp.sampled,
+                'kernel_drops': getattr(self.cap, 'kernel_drops', 0),
+            }
+        if self.profiler is not None:
+            snap['self_stats'] = self.profiler.summary()
+        return snap
+
+    def _log_sampling(self, sampler: Sampler, reason: str) -> None:
+        if self.sampling_log is not None:
+            self.sampling_log.log(sampler.mode, sampler.rate, reason, sampler.last_drops, sampler.load)
+
+    def _kernel_drops(self) -> int:
+        """Atualiza e devolve o total acumulado de descartes do kernel."""
+        self._read_kernel()
+        return self.cap.kernel_drops
+
+    def _run_replay(self, t: threading.Thread, t0: float) -> None:
+        # Em velocidade máxima não há UI periódica: mede só o pipeline
+        if self.cap.replay == 'max':
+            t.join()
+        else:
+            ui.print_periodic(self.snapshot, until=lambda: not t.is_alive(), **self.ui_opts)
+        elapsed = time.perf_counter() - t0
+        print(ui.render(self.snapshot()))
+        print()
+        print(ui.render_throughput(self.cap.packets, self.cap.bytes, elapsed))
 
     def stop(self) -> None:
         self._stop.set()
@@ -39,130 +208,358 @@ class Monitor:
             self.cap.close()
         except Exception:
             pass
+        # Exporta os fluxos ainda abertos e descarrega as filas de escrita dos logs
+        if self.flows is not None:
+            self.flows.flush()
+            self.flow_log.close()
+        if self.sampling_log is not None:
+            self.sampling_log.close()
+        for lg in (self.internet_log, self.transp_log, self.app_log):
+            lg.close()
+        # Termina as compressões pendentes para não deixar .tmp para trás
+        COMPRESSOR.wait()
 
     def _loop_capture(self) -> None:
+        if self.profiler is not None:
+            self.profiler.run(self)  # mesmo laço, com a captura e os lotes cronometrados
+            return
         while not self._stop.is_set():
             try:
-                frame = self.cap.recv()
+                # Um lote por iteração; os quadros só valem até o próximo lote
+                batch = self.cap.recv_batch()
             except Exception:
                 break
-            # Separa L2/L3
-            _l2, l3 = self.cap.split_l2_l3(frame)
-            ip_pkt, ip_name = parse_ip(l3)
-            if not ip_pkt or not ip_name:
-                continue
+            self.process_batch(batch)
 
-            if ip_pkt['version'] == 4:
-                ip_src = ip_pkt['src']
-                ip_dst = ip_pkt['dst']
-                ip_proto = ip_pkt['proto']
-                ip_payload = ip_pkt['payload']
-            else:
-                ip_src = ip_pkt['src']
-                ip_dst = ip_pkt['dst']
-                ip_proto = ip_pkt['next_header']
-                ip_payload = ip_pkt['payload']
-
-            total_len = ip_pkt['total_length']
-
-            # Log da camada de internet (IPv4/IPv6/ICMP)
-            info_internet = ''
-            if ip_name == 'IPv4' and ip_proto == 1:  # ICMPv4
-                icmp = parse_icmpv4(ip_payload)
-                if icmp:
-                    info_internet = f"ICMP type={icmp['type']} code={icmp['code']}"
-                self.internet_log.log('ICMP', ip_src, ip_dst, ip_proto, info_internet, total_len)
-            elif ip_name == 'IPv6' and ip_proto == 58:  # ICMPv6
-                icmp6 = parse_icmpv6(ip_payload)
-                if icmp6:
-                    info_internet = f"ICMPv6 type={icmp6['type']} code={icmp6['code']}"
-                self.internet_log.log('ICMP', ip_src, ip_dst, ip_proto, info_internet, total_len)
-            else:
-                self.internet_log.log(ip_name, ip_src, ip_dst, ip_proto, info_internet, total_len)
-
-            # Camada de transporte
-            transp = None
-            proto_name = None
-            dst_port = None
-            is_tcp_syn = False
-
-            if ip_proto == 6:  # TCP
-                transp = parse_tcp(ip_payload)
-                if transp:
-                    proto_name = 'TCP'
-                    dst_port = transp['dst_port']
-                    # SYN flag: bit 1 (mask 0x002) na nossa máscara de 9 bits (0..8) -> 0x002
-                    is_tcp_syn = bool(transp['flags'] & 0x002)
-                    self.transp_log.log('TCP', ip_src, transp['src_port'], ip_dst, transp['dst_port'], total_len)
-                    app = identify_app(transp['src_port'], transp['dst_port'], transp['payload'])
-                    if app:
-                        self.app_log.log(app['name'], app.get('info', '')[:300])
-            elif ip_proto == 17:  # UDP
-                transp = parse_udp(ip_payload)
-                if transp:
-                    proto_name = 'UDP'
-                    dst_port = transp['dst_port']
-                    self.transp_log.log('UDP', ip_src, transp['src_port'], ip_dst, transp['dst_port'], total_len)
-                    app = identify_app(transp['src_port'], transp['dst_port'], transp['payload'])
-                    if app:
-                        self.app_log.log(app['name'], app.get('info', '')[:300])
-            elif (ip_proto == 1 and ip_name == 'IPv4') or (ip_proto == 58 and ip_name == 'IPv6'):
-                # ICMP (v4 ou v6), já logado em internet
-                proto_name = 'ICMP'
-            else:
-                proto_name = ip_name  # Outros mantêm nome IP
+    def _clock(self) -> float:
+        # Timestamps gravados na reprodução de pcap, relógio de parede ao vivo
+        return getattr(self.cap, 'last_ts', 0.0) or time.time()
 
-            # Estatísticas por cliente (IP na rede túnel)
-            try:
-                src_ip_obj = ipaddress.ip_address(ip_src)
-                dst_ip_obj = ipaddress.ip_address(ip_dst)
-                # Considera cliente se src está na sub-rede do túnel
-                if src_ip_obj.version == 4 and src_ip_obj in self.client_net:
-                    client_ip = ip_src
-                    remote_ip = ip_dst
-                elif dst_ip_obj.version == 4 and dst_ip_obj in self.client_net:
-                    # Conta tráfego de retorno para o cliente também
-                    client_ip = ip_dst
-                    remote_ip = ip_src
-                else:
-                    client_ip = None
-                    remote_ip = None
-            except ValueError:
-                client_ip = None
-                remote_ip = None
-
-            if client_ip and remote_ip and proto_name:
-                self.stats.add_packet(client_ip, remote_ip, proto_name, total_len, dst_port=dst_port, is_tcp_syn=is_tcp_syn)
+    def process_batch(self, batch) -> None:
+        flows = self.flows
+        # Relógio de fluxos e taxas: um valor por lote
+        self._now = self._clock()
+        process = self._process_frame
+        adaptive = self.sampler.mode == 'adaptive'
+        pipe = self.pipeline
+        timed = adaptive or pipe is not None
+        if timed:
+            t0 = time.perf_counter()
+        prof = self.profiler
+        if prof is None:
+            for frame in batch:
+                process(frame)
+        else:
+            prof.process(self, batch)
+        if flows is not None:
+            flows.expire(self._now)
+        if self.frags is not None:
+            self.frags.expire(self._now)
+            self.streams.expire(self._now)
+        if timed:
+            busy = time.perf_counter() - t0
+            if pipe is not None:
+                pipe['batches'] += 1
+                pipe['frames'] += len(batch)
+                pipe['busy_seconds'] += busy
+            if adaptive:
+                self.sampler.observe(busy, self._kernel_drops if self._read_kernel else None)
+        if self._read_kernel is not None:
+            # Atualiza os totais do kernel (para as métricas) no máximo 1x/s
+            now = time.monotonic()
+            if now >= self._kernel_due:
+                self._kernel_due = now + 1.0
+                self._read_kernel()
+
+    def _process_frame(self, frame) -> None:
+        # Decodifica IP e transporte direto no quadro, sem cópias
+        rec = self._rec
+        off = self.cap.l3_offset(frame)
+        if off < 0 or not decode(rec, frame, off):
+            return
+        if self._match is not None and not self._match(rec):
+            return
+        weight = self.sampler.weight(rec)
+        if not weight:
+            return
+        ip_name = rec.ip_name
+        ip_proto = rec.ip_proto
+        total_len = rec.total_length
+        # Fragmento: guarda até completar; o que fecha o datagrama passa a
+        # descrever o transporte do datagrama inteiro (rec.buf = remontado)
+        fragment = rec.is_fragment
+        reassembled = False
+        if fragment and self.frags is not None:
+            whole = self.frags.add(rec, self._now)
+            if whole is not None:
+                reassembled = decode_transport(rec, whole, 0, len(whole))
+        l4_name = rec.l4_name
+
+        # Log da camada de internet (IPv4/IPv6/ICMP)
+        if l4_name == 'ICMP':
+            prefix = 'ICMP' if ip_name == 'IPv4' else 'ICMPv6'
+            info_internet = f"{prefix} type={rec.icmp_type} code={rec.icmp_code}"
+            self.internet_log.log_rec(rec, 'ICMP', info_internet, total_len)
+        elif (ip_proto == 1 and ip_name == 'IPv4') or (ip_proto == 58 and ip_name == 'IPv6'):
+            # ICMP truncado: registra sem detalhes
+            self.internet_log.log_rec(rec, 'ICMP', '', total_len)
+        else:
+            self.internet_log.log_rec(rec, ip_name, '', total_len)
+
+        # Camada de transporte
+        proto_name = None
+        dst_port = None
+        is_tcp_syn = False
+
+        if l4_name == 'TCP' or l4_name == 'UDP':
+            proto_name = l4_name
+            dst_port = rec.dst_port
+            # SYN flag: bit 1 (mask 0x002) na nossa máscara de 9 bits (0..8) -> 0x002
+            is_tcp_syn = bool(rec.tcp_flags & 0x002)
+            # Com remontagem, um datagrama fragmentado é registrado uma vez, ao completar
+            whole = not fragment or reassembled
+            if self._log_transport and (whole or self.frags is None):
+                self.transp_log.log_rec(rec, total_len)
+            if whole:
+                self._identify_app(rec)
+        elif rec.frag_off and (ip_proto == 6 or ip_proto == 17):
+            # Fragmento não inicial: conta no protocolo, sem porta
+            proto_name = 'TCP' if ip_proto == 6 else 'UDP'
+        elif ip_proto == 6 or ip_proto == 17:
+            pass  # cabeçalho de transporte truncado: não contabiliza
+        elif (ip_proto == 1 and ip_name == 'IPv4') or (ip_proto == 58 and ip_name == 'IPv6'):
+            # ICMP (v4 ou v6), já logado em internet
+            proto_name = 'ICMP'
+        else:
+            proto_name = ip_name  # Outros mantêm nome IP
+
+        if self.flows is not None and not (l4_name is None and (ip_proto == 6 or ip_proto == 17)):
+            self.flows.update(rec, total_len, self._now)
+
+        # Estatísticas por cliente (IP na rede túnel), classificado pelos inteiros
+        side = self.clients.classify(rec.version, rec.src_int, rec.dst_int)
+        if side is None or not proto_name:
+            return
+        # Texto dos IPs só aqui: o log binário grava os inteiros
+        if side:
+            client_ip, remote_ip = rec.src, rec.dst
+        else:
+            # Conta tráfego de retorno para o cliente também
+            client_ip, remote_ip = rec.dst, rec.src
+        remote_name = None
+        if self.dns is not None:
+            remote_name = self.dns.lookup(rec.version, rec.dst_int if side else rec.src_int, self._now)
+        self.stats.add_packet(client_ip, remote_ip, proto_name, total_len, dst_port=dst_port,
+                              is_tcp_syn=is_tcp_syn, weight=weight, ts=self._now, remote_name=remote_name)
+
+    def _identify_app(self, rec: PacketRecord) -> None:
+        apps = self.apps
+        key = apps.key(rec)
+        if rec.tcp_flags & 0x012 == 0x002:
+            apps.forget(key)  # SYN: conexão nova na mesma 5-tupla, classifica de novo
+        elif apps.skip(key):
+            return
+        sp, dp = rec.src_port, rec.dst_port
+        tcp_streams = self.streams if rec.l4_name == 'TCP' else None
+        if tcp_streams is not None:
+            # Mensagens completas do fluxo (podem juntar vários segmentos)
+            payloads = tcp_streams.feed(rec, self._now)
+        else:
+            payloads = (rec.payload,)
+        for payload in payloads:
+            if not len(payload):
+                continue
+            app = apps.classify(key, sp, dp, payload, rec.ip_proto)
+            if app:
+                self.app_log.log(app['name'], app.get('info', '')[:300])
+                if self.dns is not None and app.get('dns') is not None:
+                    self.dns.learn(app['dns'], self._now)
+        if tcp_streams is not None and apps.done(key):
+            tcp_streams.forget(rec)  # fluxo resolvido: não precisa mais remontar
 
 
 def build_argparser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description='Monitor de Tráfego em Tempo Real (raw socket)')
     p.add_argument('-i', '--interface', default='tun0', help='Interface de captura (padrão: tun0)')
-    p.add_argument('--client-subnet', default='172.31.66.0/24', help='Sub-rede dos clientes no túnel (padrão: 172.31.66.0/24)')
+    p.add_argument('--client-subnet', action='append', metavar='PREFIXO',
+                   help='Sub-rede(s) dos clientes no túnel, IPv4 ou IPv6; repetível ou separada por vírgulas '
+                        f'(padrão: {DEFAULT_CLIENT_SUBNET})')
+    p.add_argument('-r', '--read', metavar='ARQUIVO', help='Reproduz um arquivo pcap/pcapng em vez de capturar ao vivo')
+    p.add_argument('--replay', choices=['max', 'original'], default='max',
+                   help='Ritmo da reprodução com -r: max (velocidade máxima, mede pps/bps) ou original (tempos gravados)')
+    p.add_argument('--capture-engine', choices=['auto', 'mmap', 'socket'], default='auto',
+                   help='AF_PACKET: anel TPACKET_V3 (mmap), recvfrom por quadro (socket) ou mmap com fallback (auto)')
+    p.add_argument('--ring-size', type=int, default=16, metavar='MiB', help='Tamanho total do anel TPACKET_V3 (padrão: 16 MiB)')
+    p.add_argument('--ring-block-size', type=int, default=1024, metavar='KiB', help='Tamanho de cada bloco do anel (padrão: 1024 KiB)')
+    p.add_argument('--block-timeout', type=int, default=64, metavar='ms',
+                   help='Tempo máximo para o kernel entregar um bloco parcialmente cheio (padrão: 64 ms)')
+    p.add_argument('--batch-size', type=int, default=64,
+                   help='Máximo de quadros processados por iteração da captura (padrão: 64)')
+    p.add_argument('--filter', metavar='EXPR',
+                   help='Filtro de pacotes (host/net/port/proto, and/or/not), ex.: "net 172.31.66.0/24 and port 53". '
+                        'Compilado para BPF no kernel (AF_PACKET) ou avaliado em espaço de usuário (TUN/pcap)')
+    p.add_argument('--workers', type=int, default=1, metavar='N',
+                   help='Processos de processamento: PACKET_FANOUT no AF_PACKET ou despachante por hash de fluxo '
+                        '(TUN/pcap); cada worker grava em logs/worker-<i>/ (padrão: 1)')
+    p.add_argument('--log-rotate-size', type=int, default=0, metavar='MiB',
+                   help='Rotaciona cada log ao atingir este tamanho (padrão: 0 = sem rotação por tamanho)')
+    p.add_argument('--log-rotate-interval', type=float, default=0, metavar='s',
+                   help='Rotaciona cada log após este intervalo, ex.: 3600 (padrão: 0 = sem rotação por tempo)')
+    p.add_argument('--log-keep', type=int, default=10, metavar='N',
+                   help='Arquivos rotacionados mantidos por log; os mais antigos são apagados (padrão: 10)')
+    p.add_argument('--log-compress', choices=list(COMPRESS_MODES), default='auto',
+                   help='Compressão dos CSVs rotacionados em segundo plano: auto (zstd se o pacote zstandard '
+                        'estiver instalado, senão gzip), gzip, zstd ou none')
+    p.add_argument('--no-log-index', dest='log_index', action='store_false',
+                   help='Não mantém os índices auxiliares <log>.csv.idx usados por logtool query')
+    p.add_argument('--no-reassembly', dest='reassembly', action='store_false',
+                   help='Desliga a remontagem de fragmentos IP e fluxos TCP para os parsers de aplicação')
+    p.add_argument('--reassembly-memory', type=int, default=32, metavar='MiB',
+                   help='Memória máxima da remontagem (fragmentos + fluxos TCP; padrão: 32 MiB)')
+    p.add_argument('--dns-cache', type=int, default=65536, metavar='N',
+                   help='Entradas do cache de DNS passivo que dá nome aos endpoints (padrão: 65536; 0 desliga)')
+    p.add_argument('--log-mode', choices=list(LOG_MODES), default='packets',
+                   help='packets: uma linha por pacote em transporte.csv (padrão); flows: registros de fluxo '
+                        'bidirecional (5-tupla, estado TCP) em fluxos.csv no lugar de transporte.csv; both: os dois')
+    p.add_argument('--log-format', choices=list(LOG_FORMATS), default='csv',
+                   help='Formato dos logs por pacote: csv (padrão) ou binary (segmentos logs/<tipo>-NNNNNN.seg com '
+                        'rodapé colunar; exporte com python -m src.monitor.logtool)')
+    p.add_argument('--flow-format', choices=['csv', 'binary'], default='csv',
+                   help='Formato dos registros de fluxo: fluxos.csv ou fluxos.bin (registros fixos)')
+    p.add_argument('--flow-idle-timeout', type=float, default=60.0, metavar='s',
+                   help='Exporta o fluxo após este tempo sem pacotes (padrão: 60 s)')
+    p.add_argument('--flow-active-timeout', type=float, default=1800.0, metavar='s',
+                   help='Exporta fluxos longos periodicamente após este tempo de vida (padrão: 1800 s)')
+    p.add_argument('--sampling', choices=list(SAMPLING_MODES), default='off',
+                   help='Amostragem sob carga: fixed (1 a cada N pacotes), flow (1 a cada N fluxos, por hash), '
+                        'adaptive (N dobra com descartes do kernel ou laço saturado e volta a cair com folga). '
+                        'Contadores são escalados por N; mudanças de taxa em logs/amostragem.csv')
+    p.add_argument('--sample-rate', type=int, default=1, metavar='N',
+                   help='N inicial da amostragem 1-em-N (padrão: 1; no modo adaptive é arredondado para potência de 2)')
+    p.add_argument('--max-endpoints', type=int, default=0, metavar='N',
+                   help='Limita os endpoints rastreados por cliente (top-N Space-Saving; o resto vai para "outros"). '
+                        '0 = sem limite (padrão)')
+    p.add_argument('--max-ports', type=int, default=0, metavar='N',
+                   help='Limita as portas rastreadas por endpoint (top-N; o resto vai para "outros"). 0 = sem limite')
+    p.add_argument('--metrics-port', type=int, default=0, metavar='PORTA',
+                   help='Serve métricas OpenMetrics/Prometheus em http://<addr>:PORTA/metrics (padrão: desligado)')
+    p.add_argument('--metrics-addr', default='0.0.0.0', help='Endereço de escuta das métricas (padrão: 0.0.0.0)')
+    p.add_argument('--metrics-max-clients', type=int, default=50, metavar='N',
+                   help='Máximo de clientes com rótulo próprio nas métricas; o resto vira client="outros" (padrão: 50)')
+    p.add_argument('--self-stats', nargs='?', const='-', default=None, metavar='ARQUIVO',
+                   help='Cronometra os estágios do laço de captura (histogramas de latência) e lê os descartes '
+                        'do kernel; mostra no painel e, ao sair ou com SIGUSR1, escreve o resumo em stderr '
+                        '(ou em JSON no ARQUIVO). Desligado, não tem custo')
+    p.add_argument('--self-stats-sample', type=int, default=64, metavar='N',
+                   help='Cronometra 1 a cada N quadros com --self-stats (padrão: 64)')
+    p.add_argument('--refresh', type=float, default=1.0, metavar='s',
+                   help='Intervalo de atualização do painel (padrão: 1 s; +/- ajustam em tempo real)')
+    p.add_argument('--top', type=int, default=20, metavar='N', help='Linhas da tabela de endpoints do painel (padrão: 20)')
+    p.add_argument('--sort', choices=['pps', 'bytes', 'connections', 'packets'], default='bytes',
+                   help='Ordenação inicial da tabela do painel (tecla s alterna)')
+    p.add_argument('--log-durability', choices=['sync', 'batch', 'fsync'], default='batch',
+                   help='Escrita dos CSV: sync (flush por linha), batch (commit em grupo, padrão) ou fsync (grupo + fsync)')
     return p
 
 
 def main(argv: list[str] | None = None) -> int:
     args = build_argparser().parse_args(argv)
-    mon = Monitor(interface=args.interface, client_subnet=args.client_subnet)
+    if args.filter:
+        try:
+            parse_filter(args.filter)
+        except FilterSyntaxError as e:
+            print(f"Filtro inválido: {e}", file=sys.stderr)
+            return 2
+    if args.sample_rate < 1:
+        print("--sample-rate deve ser >= 1", file=sys.stderr)
+        return 2
+    if args.self_stats_sample < 1:
+        print("--self-stats-sample deve ser >= 1", file=sys.stderr)
+        return 2
+    try:
+        Rotation(compress=args.log_compress)
+    except ValueError as e:
+        print(f"--log-compress: {e}", file=sys.stderr)
+        return 2
+    monitor_kwargs = dict(
+        interface=args.interface, client_subnet=args.client_subnet,
+        read_file=args.read, replay=args.replay, log_durability=args.log_durability,
+        packet_filter=args.filter, log_mode=args.log_mode, log_format=args.log_format,
+        sampling=args.sampling, sample_rate=args.sample_rate,
+        log_index=args.log_index,
+        reassembly=args.reassembly, reassembly_memory=args.reassembly_memory * 1024 * 1024,
+        dns_cache=args.dns_cache,
+        self_stats=args.self_stats_sample if args.self_stats else 0,
+        log_rotation={
+            'max_bytes': args.log_rotate_size * 1024 * 1024,
+            'interval': args.log_rotate_interval,
+            'keep': args.log_keep,
+            'compress': args.log_compress,
+        },
+        stats_opts={'max_endpoints': args.max_endpoints, 'max_ports': args.max_ports},
+        ui_opts={'interval': args.refresh, 'top_n': args.top, 'sort': args.sort},
+        flow_opts={
+            'format': args.flow_format,
+            'idle_timeout': args.flow_idle_timeout,
+            'active_timeout': args.flow_active_timeout,
+        },
+        capture_opts={
+            'engine': args.capture_engine,
+            'ring_size': args.ring_size * 1024 * 1024,
+            'block_size': args.ring_block_size * 1024,
+            'block_timeout_ms': args.block_timeout,
+            'batch_size': args.batch_size,
+        },
+    )
+    if args.workers > 1:
+        from .workers import ShardedMonitor
+        mon = ShardedMonitor(args.workers, monitor_kwargs)
+    else:
+        mon = Monitor(**monitor_kwargs)
+
+    exporter = None
+    if args.metrics_port:
+        from .metrics import MetricsExporter
+        if isinstance(mon, Monitor):
+            mon.pipeline = {'batches': 0, 'frames': 0, 'busy_seconds': 0.0}
+        else:
+            mon.measure_pipeline = True
+        try:
+            exporter = MetricsExporter(mon.metrics_snapshot, args.metrics_port, args.metrics_addr,
+                                       max_clients=args.metrics_max_clients)
+        except OSError as e:
+            print(f"Falha ao abrir porta de métricas {args.metrics_port}: {e}", file=sys.stderr)
+            return 1
+        exporter.start()
 
     def handle_sigint(_sig, _frm):
+        if exporter is not None:
+            exporter.stop()
         mon.stop()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, handle_sigint)
 
+    profiler = getattr(mon, 'profiler', None)
+    if profiler is not None and hasattr(signal, 'SIGUSR1'):
+        # kill -USR1 <pid>: resumo da instrumentação sem parar o monitor
+        signal.signal(signal.SIGUSR1, lambda _sig, _frm: dump_self_stats(profiler.summary(), args.self_stats))
+
     try:
         mon.start()
     except KeyboardInterrupt:
         pass
-    except PermissionError:
+    except (PermissionError, FileNotFoundError):
         return 1
     except Exception as e:
         print(f"Erro: {e}")
         return 1
     finally:
+        if exporter is not None:
+            exporter.stop()
         mon.stop()
+        if profiler is not None:
+            dump_self_stats(profiler.summary(), args.self_stats)
     return 0
 
 
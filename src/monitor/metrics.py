@@ -0,0 +1,203 @@
+"""
+Exportador de métricas no formato de texto OpenMetrics (Prometheus).
+
+Um ThreadingHTTPServer numa thread daemon serve GET /metrics. O texto é
+gerado a partir de um snapshot e fica em cache por `interval` segundos: com
+vários coletores raspando ao mesmo tempo, o snapshot (e a leitura do Stats)
+acontece no máximo uma vez por intervalo.
+
+Para limitar a cardinalidade, só os `max_clients` clientes com mais pacotes
+ganham rótulo próprio; os demais são somados em client="outros".
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from .sketches import OTHER
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class _Family:
+    def __init__(self, name: str, mtype: str, help_text: str) -> None:
+        self.name = name
+        self.mtype = mtype
+        self.help = help_text
+        self.samples: List[str] = []
+
+    def add(self, value, suffix: str = '', **labels) -> None:
+        # suffix: amostras _count/_sum de um summary
+        if self.mtype == 'counter':
+            suffix = '_total'
+        self.samples.append(f"{self.name}{suffix}{_labels(labels)} {value}")
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.mtype}\n"
+        return head + ''.join(s + '\n' for s in self.samples)
+
+
+def render_openmetrics(snap: Dict, max_clients: int = 50) -> str:
+    """Converte um snapshot do Monitor (Stats + extras) em texto OpenMetrics."""
+    fams: List[_Family] = []
+
+    def family(name: str, mtype: str, help_text: str) -> _Family:
+        f = _Family(name, mtype, help_text)
+        fams.append(f)
+        return f
+
+    proto = family('monitor_packets', 'counter', 'Pacotes por protocolo (estimados sob amostragem).')
+    for name, n in sorted(snap.get('global_proto', {}).items()):
+        proto.add(n, protocol=name)
+
+    rates = snap.get('rates')
+    if rates:
+        g = family('monitor_rate_packets_per_second', 'gauge', 'Pacotes no último segundo completo.')
+        g.add(rates['pps'])
+        g = family('monitor_rate_bits_per_second', 'gauge', 'Bits no último segundo completo.')
+        g.add(rates['bps'])
+
+    clients = snap.get('clients', {})
+    ranked = sorted(clients.items(), key=lambda kv: -kv[1]['total_packets'])
+    keep, rest = ranked[:max_clients], ranked[max_clients:]
+    cp = family('monitor_client_packets', 'counter', 'Pacotes por cliente.')
+    cb = family('monitor_client_bytes', 'counter', 'Bytes por cliente.')
+    ce = family('monitor_client_endpoints', 'gauge', 'Endpoints rastreados por cliente.')
+    cr = family('monitor_client_rate_bits_per_second', 'gauge', 'Taxa atual por cliente.')
+    for cip, cs in keep:
+        cp.add(cs['total_packets'], client=cip)
+        cb.add(cs['total_bytes'], client=cip)
+        ce.add(len(cs.get('endpoints', {})), client=cip)
+        if cs.get('rates'):
+            cr.add(cs['rates']['bps'], client=cip)
+    if rest:
+        cp.add(sum(cs['total_packets'] for _, cs in rest), client=OTHER)
+        cb.add(sum(cs['total_bytes'] for _, cs in rest), client=OTHER)
+        ce.add(sum(len(cs.get('endpoints', {})) for _, cs in rest), client=OTHER)
+        cr.add(sum(cs['rates']['bps'] for _, cs in rest if cs.get('rates')), client=OTHER)
+
+    g = family('monitor_log_rows_dropped', 'counter', 'Linhas de log descartadas com a fila de escrita cheia.')
+    g.add(snap.get('log_dropped', 0))
+    capture = snap.get('capture') or {}
+    if capture:
+        g = family('monitor_capture_kernel_packets', 'counter', 'Pacotes vistos pelo socket (PACKET_STATISTICS).')
+        g.add(capture.get('kernel_packets', 0))
+        g = family('monitor_capture_kernel_drops', 'counter', 'Quadros descartados pelo kernel (PACKET_STATISTICS).')
+        g.add(capture.get('kernel_drops', 0))
+    if 'flows_active' in snap:
+        g = family('monitor_flows_active', 'gauge', 'Fluxos na tabela.')
+        g.add(snap['flows_active'])
+        g = family('monitor_flows_exported', 'counter', 'Registros de fluxo exportados.')
+        g.add(snap['flows_exported'])
+    sampling = snap.get('sampling')
+    if sampling:
+        g = family('monitor_sampling_rate', 'gauge', 'N da amostragem 1-em-N atual.')
+        g.add(sampling['rate'], mode=sampling['mode'])
+    pipe = snap.get('pipeline')
+    if pipe:
+        g = family('monitor_pipeline_batches', 'counter', 'Lotes processados pelo laço de captura.')
+        g.add(pipe['batches'])
+        g = family('monitor_pipeline_frames', 'counter', 'Quadros recebidos pelo laço de captura.')
+        g.add(pipe['frames'])
+        g = family('monitor_pipeline_busy_seconds', 'counter', 'Tempo gasto processando lotes.')
+        g.add(round(pipe['busy_seconds'], 6))
+    prof = snap.get('self_stats')
+    if prof:
+        g = family('monitor_self_stage_latency_seconds', 'summary',
+                   'Latência por estágio do laço de captura (quadros amostrados por --self-stats).')
+        for stage, st in prof['stages'].items():
+            for key, q in (('p50', '0.5'), ('p90', '0.9'), ('p99', '0.99'), ('p999', '0.999')):
+                g.add(round(st[f'{key}_us'] / 1e6, 9), stage=stage, quantile=q)
+            g.add(st['count'], suffix='_count', stage=stage)
+            g.add(round(st['mean_us'] * st['count'] / 1e6, 9), suffix='_sum', stage=stage)
+        g = family('monitor_self_sampled_frames', 'counter', 'Quadros cronometrados pela auto-instrumentação.')
+        g.add(prof['sampled'])
+    reasm = snap.get('reassembly')
+    if reasm:
+        frag, streams = reasm['fragments'], reasm['streams']
+        g = family('monitor_reassembly_bytes', 'gauge', 'Memória em uso na remontagem.')
+        g.add(frag['bytes'], kind='fragments')
+        g.add(streams['bytes'], kind='streams')
+        g = family('monitor_reassembly_datagrams', 'counter', 'Datagramas IP fragmentados remontados.')
+        g.add(frag['reassembled'])
+        g = family('monitor_reassembly_messages', 'counter', 'Mensagens de aplicação extraídas dos fluxos TCP.')
+        g.add(streams['messages'])
+        g = family('monitor_reassembly_discarded', 'counter', 'Entradas descartadas por tempo, orçamento ou erro.')
+        g.add(frag['timeouts'], kind='fragments', reason='timeout')
+        g.add(frag['evicted'], kind='fragments', reason='budget')
+        g.add(frag['dropped'], kind='fragments', reason='invalid')
+        g.add(streams['timeouts'], kind='streams', reason='timeout')
+        g.add(streams['evicted'], kind='streams', reason='budget')
+        g.add(streams['gaps'], kind='streams', reason='gap')
+    dns = snap.get('dns_cache')
+    if dns:
+        g = family('monitor_dns_cache_entries', 'gauge', 'Endereços com nome no cache de DNS passivo.')
+        g.add(dns['entries'])
+        g = family('monitor_dns_cache_learned', 'counter', 'Registros A/AAAA aprendidos das respostas DNS.')
+        g.add(dns['learned'])
+        g = family('monitor_dns_cache_hits', 'counter', 'Pacotes cujo endpoint foi nomeado pelo cache.')
+        g.add(dns['hits'])
+    return ''.join(f.render() for f in fams) + '# EOF\n'
+
+
+class MetricsExporter:
+    """Servidor HTTP de /metrics com snapshot em cache."""
+
+    def __init__(self, snapshot_fn: Callable[[], Dict], port: int, host: str = '',
+                 interval: float = 1.0, max_clients: int = 50) -> None:
+        self.snapshot_fn = snapshot_fn
+        self.interval = interval
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._cached: Optional[bytes] = None
+        self._cached_at = 0.0
+        self.renders = 0
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = exporter.render()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args) -> None:
+                pass  # não polui a UI
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    def render(self) -> bytes:
+        # Coletores concorrentes esperam o primeiro e reaproveitam o resultado
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached_at >= self.interval:
+                self._cached = render_openmetrics(self.snapshot_fn(), self.max_clients).encode('utf-8')
+                self._cached_at = now
+                self.renders += 1
+            return self._cached
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
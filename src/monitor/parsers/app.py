@@ -1,16 +1,23 @@
+import re
 import struct
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from .decoder import PacketRecord
+from .dns import decode_dns, format_dns
+from .tls import sniff_quic, sniff_tls
 
+
+TCP, UDP = 6, 17  # protocolos IP de transporte
 HTTP_METHODS = {b'GET', b'POST', b'PUT', b'DELETE', b'HEAD', b'PATCH', b'OPTIONS'}
 
 
 def sniff_http(payload: bytes) -> Optional[str]:
     # Identifica HTTP por método ou prefixo HTTP/. Remove quebras e normaliza espaços.
+    # Aceita bytes ou memoryview (quadros lidos direto do anel de captura).
     try:
-        head = payload[:8]
+        head = bytes(payload[:8])
         if any(head.startswith(m) for m in HTTP_METHODS) or head.startswith(b'HTTP/'):
-            raw = payload.split(b"\r\n\r\n", 1)[0][:256]
+            raw = bytes(payload[:256]).split(b"\r\n\r\n", 1)[0]
             decoded = raw.decode(errors='ignore')
             decoded = decoded.replace('\r', ' ').replace('\n', ' ')
             decoded = ' '.join(decoded.split())  # colapsa múltiplos espaços
@@ -21,17 +28,9 @@ def sniff_http(payload: bytes) -> Optional[str]:
 
 
 def sniff_dns(payload: bytes) -> Optional[str]:
-    # DNS header: 12 bytes mínimo
-    if len(payload) < 12:
-        return None
-    try:
-        (tid, flags, qdcount, ancount, nscount, arcount) = struct.unpack('!HHHHHH', payload[:12])
-        qr = (flags >> 15) & 1
-        opcode = (flags >> 11) & 0xF
-        rcode = flags & 0xF
-        return f"DNS tid={tid} qr={qr} opcode={opcode} rcode={rcode} qd={qdcount} an={ancount}"
-    except struct.error:
-        return None
+    # Cabeçalho, primeira pergunta e respostas A/AAAA/CNAME (ver parsers.dns)
+    msg = decode_dns(payload)
+    return format_dns(msg) if msg is not None else None
 
 
 def sniff_dhcp(payload: bytes) -> Optional[str]:
@@ -59,30 +58,192 @@ def sniff_ntp(payload: bytes) -> Optional[str]:
     return f"NTP v={vn} mode={mode}"
 
 
-def identify_app(src_port: int, dst_port: int, payload: bytes) -> Optional[Dict]:
+# -- registro de classificadores -------------------------------------------
+
+class Classifier:
+    """Um protocolo de aplicação: portas conhecidas, assinaturas e o parser.
+
+    `sniff(payload)` devolve um dict com 'info' (e extras, ex.: 'dns') ou None
+    se a carga não for do protocolo. Com `trust_port`, a porta basta: a carga
+    ilegível ainda é atribuída ao protocolo com info vazia. Com `per_flow`, a
+    primeira identificação vale para o fluxo inteiro (ex.: TLS, QUIC); sem ele
+    o parser continua rodando em cada mensagem (ex.: DNS, HTTP). `transports`
+    são os protocolos IP (6 = TCP, 17 = UDP) em que o protocolo existe.
+    """
+
+    __slots__ = ('name', 'sniff', 'ports', 'signatures', 'trust_port', 'per_flow', 'transports')
+
+    def __init__(self, name: str, sniff: Callable[[bytes], Optional[Dict]], ports: Iterable[int] = (),
+                 signatures: Iterable[bytes] = (), trust_port: bool = False, per_flow: bool = False,
+                 transports: Iterable[int] = (TCP, UDP)) -> None:
+        self.name = name
+        self.sniff = sniff
+        self.ports = tuple(ports)
+        self.signatures = tuple(signatures)
+        self.trust_port = trust_port
+        self.per_flow = per_flow
+        self.transports = tuple(transports)
+
+    def result(self, out: Optional[Dict]) -> Optional[Dict]:
+        if out is None:
+            return {'name': self.name, 'info': ''} if self.trust_port else None
+        return {'name': self.name, **out}
+
+
+class ClassifierRegistry:
+    """Classificadores indexados por (transporte, porta), mais um casador único de assinaturas.
+
+    A detecção tenta primeiro os classificadores das portas de destino e de
+    origem no protocolo de transporte do pacote (consulta em dicionário; ex.:
+    QUIC só em UDP, TLS só em TCP); sem resultado, uma única expressão
+    regular com todas as assinaturas (prefixos da carga, um grupo nomeado
+    por classificador) aponta o candidato independente da porta. Sem
+    transporte informado (ip_proto=None), vale qualquer um.
     """
-    Identifica protocolo de aplicação com base em portas bem conhecidas e/ou assinatura.
+
+    def __init__(self) -> None:
+        self.classifiers: List[Classifier] = []
+        # (ip_proto, porta) -> classificadores; ip_proto None junta todos os transportes
+        self._by_port: Dict[Tuple[Optional[int], int], Tuple[Classifier, ...]] = {}
+        self._signatures = None
+
+    def register(self, classifier: Classifier) -> Classifier:
+        self.classifiers.append(classifier)
+        by_port = self._by_port
+        for port in classifier.ports:
+            for key in [(proto, port) for proto in classifier.transports] + [(None, port)]:
+                by_port[key] = by_port.get(key, ()) + (classifier,)
+        groups = [b'(?P<c%d>%s)' % (i, b'|'.join(re.escape(sig) for sig in c.signatures))
+                  for i, c in enumerate(self.classifiers) if c.signatures]
+        self._signatures = re.compile(b'|'.join(groups), re.DOTALL) if groups else None
+        return classifier
+
+    def by_signature(self, payload) -> Optional[Classifier]:
+        if self._signatures is None:
+            return None
+        m = self._signatures.match(payload)  # ancorado no início; aceita memoryview
+        return self.classifiers[int(m.lastgroup[1:])] if m else None
+
+    def detect(self, src_port: int, dst_port: int, payload,
+               ip_proto: Optional[int] = None) -> Tuple[Optional[Dict], Optional[Classifier]]:
+        """(resultado, classificador) para a carga, ou (None, None)."""
+        by_port = self._by_port
+        candidates = by_port.get((ip_proto, dst_port), ()) + by_port.get((ip_proto, src_port), ())
+        trusted = None
+        for c in candidates:
+            out = c.sniff(payload)
+            if out is not None:
+                return c.result(out), c
+            if trusted is None and c.trust_port:
+                trusted = c
+        c = self.by_signature(payload)
+        if c is not None and c not in candidates and (ip_proto is None or ip_proto in c.transports):
+            out = c.sniff(payload)
+            if out is not None:
+                return c.result(out), c
+        if trusted is not None:
+            return trusted.result(None), trusted
+        return None, None
+
+
+def _text(sniff: Callable[[bytes], Optional[str]]) -> Callable[[bytes], Optional[Dict]]:
+    def run(payload) -> Optional[Dict]:
+        info = sniff(payload)
+        return {'info': info} if info else None
+    return run
+
+
+def _dns(payload) -> Optional[Dict]:
+    msg = decode_dns(payload)
+    # A mensagem decodificada vai junto (cache de DNS passivo)
+    return {'info': format_dns(msg), 'dns': msg} if msg is not None else None
+
+
+REGISTRY = ClassifierRegistry()
+REGISTRY.register(Classifier('HTTP', _text(sniff_http), ports=(80, 8080, 8000),
+                             signatures=[m + b' ' for m in sorted(HTTP_METHODS)] + [b'HTTP/'], transports=(TCP,)))
+REGISTRY.register(Classifier('DNS', _dns, ports=(53,), trust_port=True))
+REGISTRY.register(Classifier('DHCP', _text(sniff_dhcp), ports=(67, 68), trust_port=True, transports=(UDP,)))
+REGISTRY.register(Classifier('NTP', _text(sniff_ntp), ports=(123,), trust_port=True, transports=(UDP,)))
+REGISTRY.register(Classifier('TLS', _text(sniff_tls), ports=(443, 8443, 465, 853, 993, 995),
+                             signatures=(b'\x16\x03\x01', b'\x16\x03\x03'), per_flow=True, transports=(TCP,)))
+REGISTRY.register(Classifier('QUIC', _text(sniff_quic), ports=(443, 8443), per_flow=True, transports=(UDP,)))
+
+
+def identify_app(src_port: int, dst_port: int, payload: bytes, ip_proto: Optional[int] = None) -> Optional[Dict]:
+    """
+    Identifica protocolo de aplicação pelo registro (portas conhecidas e assinaturas).
+    `ip_proto` (6/17) restringe aos protocolos daquele transporte.
     Retorna dict com 'name' e 'info' (string curta) ou None.
     """
-    sp, dp = src_port, dst_port
-    # HTTP: tipicamente 80/8080/8000/443 (TLS impede parse do conteúdo). Assinatura textual ajuda.
-    http_info = sniff_http(payload)
-    if http_info and (sp in (80, 8080, 8000) or dp in (80, 8080, 8000)):
-        return {'name': 'HTTP', 'info': http_info}
-
-    # DNS: porta 53 UDP/TCP
-    if 53 in (sp, dp):
-        info = sniff_dns(payload)
-        return {'name': 'DNS', 'info': info or ''}
-
-    # DHCP: portas 67/68 UDP
-    if (sp, dp) in ((67, 68), (68, 67)) or sp in (67, 68) or dp in (67, 68):
-        info = sniff_dhcp(payload)
-        return {'name': 'DHCP', 'info': info or ''}
-
-    # NTP: porta 123 UDP
-    if 123 in (sp, dp):
-        info = sniff_ntp(payload)
-        return {'name': 'NTP', 'info': info or ''}
+    return REGISTRY.detect(src_port, dst_port, payload, ip_proto)[0]
 
-    return None
+
+_DONE = object()  # fluxo já resolvido (per_flow) ou sem protocolo reconhecido
+
+
+class FlowClassifier:
+    """Classificação por fluxo sobre um registro de classificadores.
+
+    Depois que um fluxo (5-tupla, nos dois sentidos) é identificado, os
+    próximos pacotes pulam a detecção: vão direto ao parser do protocolo, ou
+    são ignorados se ele é per_flow. Fluxos sem protocolo após
+    `max_attempts` cargas também deixam de ser testados. A tabela é limitada
+    a `max_flows` (sai o fluxo mais antigo).
+    """
+
+    def __init__(self, registry: ClassifierRegistry = REGISTRY, max_flows: int = 65536,
+                 max_attempts: int = 4) -> None:
+        self.registry = registry
+        self.max_flows = max_flows
+        self.max_attempts = max_attempts
+        self._flows: Dict[tuple, object] = {}
+        self.detections = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._flows)
+
+    @staticmethod
+    def key(rec: PacketRecord) -> tuple:
+        a = (rec.src_int, rec.src_port)
+        b = (rec.dst_int, rec.dst_port)
+        return (rec.version, rec.ip_proto) + (a + b if a <= b else b + a)
+
+    def done(self, key: tuple) -> bool:
+        return self._flows.get(key) is _DONE
+
+    def skip(self, key: tuple) -> bool:
+        """True (e conta) se o pacote do fluxo não precisa de detecção nem parser."""
+        if self._flows.get(key) is _DONE:
+            self.skipped += 1
+            return True
+        return False
+
+    def forget(self, key: tuple) -> None:
+        self._flows.pop(key, None)
+
+    def _store(self, key: tuple, state: object) -> None:
+        flows = self._flows
+        if key not in flows and len(flows) >= self.max_flows:
+            del flows[next(iter(flows))]
+        flows[key] = state
+
+    def classify(self, key: tuple, src_port: int, dst_port: int, payload,
+                 ip_proto: Optional[int] = None) -> Optional[Dict]:
+        state = self._flows.get(key)
+        if state is _DONE:
+            return None
+        if isinstance(state, Classifier):
+            return state.result(state.sniff(payload))
+        self.detections += 1
+        result, c = self.registry.detect(src_port, dst_port, payload, ip_proto)
+        if c is not None:
+            self._store(key, _DONE if c.per_flow else c)
+        else:
+            attempts = (state or 0) + 1
+            self._store(key, _DONE if attempts >= self.max_attempts else attempts)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {'flows': len(self._flows), 'detections': self.detections, 'skipped': self.skipped}
@@ -0,0 +1,303 @@
+"""
+Decodificador compacto de pacotes (IP + transporte) sem cópias.
+
+Preenche um PacketRecord reutilizável (com __slots__) a partir de um buffer
+(bytes, bytearray ou memoryview) e de um deslocamento para o cabeçalho IP.
+Endereços ficam como inteiros; as strings só são formatadas quando lidas
+(src/dst), com cache. Cargas úteis são expostas como memoryviews para dentro
+do buffer original, então o registro só é válido enquanto o buffer for.
+
+As funções parse_* em ip.py e transport.py são invólucros sobre este módulo.
+"""
+import ipaddress
+import struct
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Cabeçalhos fixos: IPv4 (sem opções), IPv6, fragmento IPv6, TCP (até flags) e UDP
+_V4 = struct.Struct('!BBHHHBBHII')
+_V6 = struct.Struct('!IHBBQQQQ')
+_V6_FRAG = struct.Struct('!BxHI')
+
+# Cabeçalhos de extensão IPv6 percorridos até o protocolo de camada superior:
+# hop-by-hop (0), roteamento (43), destino (60), mobilidade (135), HIP (139),
+# shim6 (140) no formato genérico (tamanho em unidades de 8 bytes além dos 8
+# primeiros), AH (51, em unidades de 4 bytes além de 8) e fragmento (44, fixo).
+_V6_EXT_GENERIC = frozenset((0, 43, 60, 135, 139, 140))
+V6_EXT_HEADERS = _V6_EXT_GENERIC | {44, 51}
+MAX_V6_EXT_HEADERS = 8  # limite da cadeia: pacotes maliciosos não prendem o laço
+_TCP = struct.Struct('!HHIIH')
+_UDP = struct.Struct('!HHH')
+
+
+@lru_cache(maxsize=8192)
+def format_ipv4(addr: int) -> str:
+    return f"{addr >> 24}.{(addr >> 16) & 0xFF}.{(addr >> 8) & 0xFF}.{addr & 0xFF}"
+
+
+@lru_cache(maxsize=8192)
+def format_ipv6(addr: int) -> str:
+    return ipaddress.IPv6Address(addr).compressed
+
+
+class PacketRecord:
+    """Resultado da decodificação de um pacote; reutilizável entre pacotes."""
+
+    __slots__ = (
+        'buf', 'version', 'ip_name', 'ip_proto', 'ip_off', 'ip_hdr_len', 'total_length',
+        'src_int', 'dst_int', 'l4_off', 'l4_end',
+        'l4_name', 'src_port', 'dst_port', 'tcp_flags', 'seq', 'ack', 'l4_hdr_len', 'udp_length',
+        'icmp_type', 'icmp_code', 'app_off', 'app_end',
+        'frag_id', 'frag_off', 'frag_more',
+        '_src', '_dst',
+    )
+
+    def __init__(self) -> None:
+        self.buf: Buffer = b''
+        self.reset()
+
+    def reset(self) -> None:
+        self.version = 0
+        self.ip_name: Optional[str] = None
+        self.ip_proto = -1
+        self.ip_off = 0
+        self.ip_hdr_len = 0
+        self.total_length = 0
+        self.src_int = 0
+        self.dst_int = 0
+        self.l4_off = 0
+        self.l4_end = 0
+        self.l4_name: Optional[str] = None
+        self.src_port = -1
+        self.dst_port = -1
+        self.tcp_flags = 0
+        self.seq = 0
+        self.ack = 0
+        self.l4_hdr_len = 0
+        self.udp_length = 0
+        self.icmp_type = -1
+        self.icmp_code = -1
+        self.app_off = 0
+        self.app_end = 0
+        # Fragmentação: offset em bytes do fragmento e flag "mais fragmentos"
+        self.frag_id = 0
+        self.frag_off = 0
+        self.frag_more = False
+        self._src: Optional[str] = None
+        self._dst: Optional[str] = None
+
+    @property
+    def src(self) -> str:
+        if self._src is None:
+            self._src = format_ipv4(self.src_int) if self.version == 4 else format_ipv6(self.src_int)
+        return self._src
+
+    @property
+    def dst(self) -> str:
+        if self._dst is None:
+            self._dst = format_ipv4(self.dst_int) if self.version == 4 else format_ipv6(self.dst_int)
+        return self._dst
+
+    def _view(self, start: int, end: int) -> memoryview:
+        buf = self.buf
+        if not isinstance(buf, memoryview):
+            buf = memoryview(buf)
+        return buf[start:end]
+
+    @property
+    def is_fragment(self) -> bool:
+        return self.frag_more or self.frag_off > 0
+
+    @property
+    def ip_payload(self) -> memoryview:
+        return self._view(self.l4_off, self.l4_end)
+
+    @property
+    def payload(self) -> memoryview:
+        """Carga útil da aplicação (após TCP/UDP)."""
+        return self._view(self.app_off, self.app_end)
+
+
+def decode_ipv4(rec: PacketRecord, buf: Buffer, off: int = 0) -> bool:
+    n = len(buf) - off
+    if n < 20:
+        return False
+    ver_ihl, _tos, total_length, ident, frag, _ttl, proto, _csum, src, dst = _V4.unpack_from(buf, off)
+    ihl = (ver_ihl & 0x0F) * 4
+    if ver_ihl >> 4 != 4 or ihl < 20 or n < ihl:
+        return False
+    rec.buf = buf
+    rec.version = 4
+    rec.ip_name = 'IPv4'
+    rec.ip_proto = proto
+    rec.ip_off = off
+    rec.ip_hdr_len = ihl
+    rec.total_length = total_length
+    rec.src_int = src
+    rec.dst_int = dst
+    rec._src = rec._dst = None
+    rec.frag_id = ident
+    rec.frag_off = (frag & 0x1FFF) << 3
+    rec.frag_more = bool(frag & 0x2000)
+    rec.l4_off = off + ihl
+    rec.l4_end = off + total_length if total_length <= n else off + n
+    if rec.l4_end < rec.l4_off:
+        rec.l4_end = rec.l4_off
+    return True
+
+
+def decode_ipv6(rec: PacketRecord, buf: Buffer, off: int = 0) -> bool:
+    n = len(buf) - off
+    if n < 40:
+        return False
+    first, payload_len, next_header, _hlim, s_hi, s_lo, d_hi, d_lo = _V6.unpack_from(buf, off)
+    if first >> 28 != 6:
+        return False
+    total_length = 40 + payload_len
+    rec.buf = buf
+    rec.version = 6
+    rec.ip_name = 'IPv6'
+    rec.ip_proto = next_header
+    rec.ip_off = off
+    rec.ip_hdr_len = 40
+    rec.total_length = total_length
+    rec.src_int = (s_hi << 64) | s_lo
+    rec.dst_int = (d_hi << 64) | d_lo
+    rec._src = rec._dst = None
+    rec.frag_id = rec.frag_off = 0
+    rec.frag_more = False
+    end = off + total_length if total_length <= n else off + n
+    l4_off = off + 40
+    if next_header in V6_EXT_HEADERS:
+        next_header, l4_off, frag_at = walk_ipv6_ext(buf, l4_off, end, next_header)
+        rec.ip_proto = next_header
+        rec.ip_hdr_len = l4_off - off
+        if frag_at >= 0:
+            _nh, offlg, ident = _V6_FRAG.unpack_from(buf, frag_at)
+            rec.frag_id = ident
+            rec.frag_off = offlg & 0xFFF8
+            rec.frag_more = bool(offlg & 1)
+    rec.l4_off = l4_off
+    rec.l4_end = end if end > l4_off else l4_off
+    return True
+
+
+def walk_ipv6_ext(buf: Buffer, off: int, end: int, next_header: int) -> Tuple[int, int, int]:
+    """Percorre os cabeçalhos de extensão IPv6 a partir de buf[off] (tipo `next_header`).
+
+    Retorna (protocolo da camada superior, offset da sua carga, offset do
+    cabeçalho de fragmento ou -1). Para logo após um cabeçalho de fragmento
+    (o que vem depois é a parte fragmentável do datagrama original), em
+    ESP/sem próximo cabeçalho, após MAX_V6_EXT_HEADERS cabeçalhos ou num
+    cabeçalho truncado; nesses dois últimos casos o protocolo devolvido é o
+    da extensão onde parou.
+    """
+    frag_at = -1
+    for _ in range(MAX_V6_EXT_HEADERS):
+        if next_header in _V6_EXT_GENERIC:
+            size = (buf[off + 1] + 1) * 8 if off + 2 <= end else 0
+        elif next_header == 51:
+            size = (buf[off + 1] + 2) * 4 if off + 2 <= end else 0
+        elif next_header == 44:
+            size = 8
+        else:
+            break  # camada superior (ou ESP/59)
+        if size == 0 or off + size > end:
+            break  # truncado
+        if next_header == 44:
+            frag_at = off
+        next_header = buf[off]
+        off += size
+        if frag_at >= 0:
+            break  # o resto é a parte fragmentável (vai para a remontagem)
+    return next_header, off, frag_at
+
+
+def decode_tcp(rec: PacketRecord, buf: Buffer, off: int, end: int) -> bool:
+    if end - off < 20:
+        return False
+    sp, dp, seq, ack, orf = _TCP.unpack_from(buf, off)
+    data_offset = (orf >> 12) * 4
+    if data_offset < 20 or end - off < data_offset:
+        return False
+    rec.l4_name = 'TCP'
+    rec.src_port = sp
+    rec.dst_port = dp
+    rec.seq = seq
+    rec.ack = ack
+    rec.tcp_flags = orf & 0x01FF  # 9 bits: NS,CWR,ECE,URG,ACK,PSH,RST,SYN,FIN
+    rec.l4_hdr_len = data_offset
+    rec.app_off = off + data_offset
+    rec.app_end = end
+    return True
+
+
+def decode_udp(rec: PacketRecord, buf: Buffer, off: int, end: int) -> bool:
+    if end - off < 8:
+        return False
+    sp, dp, length = _UDP.unpack_from(buf, off)
+    rec.l4_name = 'UDP'
+    rec.src_port = sp
+    rec.dst_port = dp
+    rec.udp_length = length
+    rec.l4_hdr_len = 8
+    rec.app_off = off + 8
+    # Comprimento UDP menor que o restante do buffer limita a carga útil
+    rec.app_end = max(off + length, off + 8) if length <= end - off else end
+    return True
+
+
+def decode_icmp(rec: PacketRecord, buf: Buffer, off: int, end: int) -> bool:
+    if end - off < 4:
+        return False
+    rec.l4_name = 'ICMP'
+    rec.icmp_type = buf[off]
+    rec.icmp_code = buf[off + 1]
+    rec.app_off = off + 4
+    rec.app_end = end
+    return True
+
+
+def decode(rec: PacketRecord, buf: Buffer, off: int = 0) -> bool:
+    """Decodifica IP e transporte em `rec`. Retorna False se não for IP válido.
+
+    Se o cabeçalho de transporte estiver truncado, rec.l4_name fica None.
+    """
+    rec.l4_name = None
+    rec.src_port = rec.dst_port = -1
+    rec.tcp_flags = 0
+    if len(buf) <= off:
+        return False
+    version = buf[off] >> 4
+    if version == 4:
+        if not decode_ipv4(rec, buf, off):
+            return False
+    elif version != 6 or not decode_ipv6(rec, buf, off):
+        return False
+    if rec.frag_off:
+        return True  # fragmento não inicial: sem cabeçalho de transporte
+    decode_transport(rec, buf, rec.l4_off, rec.l4_end)
+    return True
+
+
+def decode_transport(rec: PacketRecord, buf: Buffer, start: int, end: int) -> bool:
+    """Decodifica o transporte de rec.ip_proto em buf[start:end] (ex.: datagrama remontado)."""
+    proto = rec.ip_proto
+    remounted = buf is not rec.buf
+    if remounted:
+        rec.buf = buf
+        rec.l4_off, rec.l4_end = start, end
+    if rec.version == 6 and proto in V6_EXT_HEADERS and (remounted or rec.frag_more):
+        # Extensões da parte fragmentável (primeiro fragmento ou datagrama remontado);
+        # rec.l4_off continua no início dela, que é o que a remontagem junta
+        proto, start, _ = walk_ipv6_ext(buf, start, end, proto)
+        rec.ip_proto = proto
+    if proto == 6:
+        return decode_tcp(rec, buf, start, end)
+    if proto == 17:
+        return decode_udp(rec, buf, start, end)
+    if (proto == 1 and rec.version == 4) or (proto == 58 and rec.version == 6):
+        return decode_icmp(rec, buf, start, end)
+    return False
@@ -0,0 +1,145 @@
+"""
+Decodificação de mensagens DNS (RFC 1035): cabeçalho, perguntas e respostas.
+
+Das seções de resposta só A, AAAA e CNAME são guardados (o resto é pulado);
+autoridade e adicionais não são lidos. Nomes comprimidos são seguidos com
+proteção contra laços: cada ponteiro precisa apontar para antes do anterior
+e o nome não passa de 255 bytes. Mensagens malformadas devolvem o que foi
+lido até o erro (com `truncated`), ou None se nem o cabeçalho existir.
+"""
+import struct
+from typing import List, Optional, Tuple
+
+from .decoder import format_ipv4, format_ipv6
+
+_HEADER = struct.Struct('!HHHHHH')
+_RR = struct.Struct('!HHIH')  # tipo, classe, TTL, tamanho dos dados
+_Q = struct.Struct('!HH')
+
+TYPE_A, TYPE_CNAME, TYPE_AAAA = 1, 5, 28
+TYPE_NAMES = {1: 'A', 2: 'NS', 5: 'CNAME', 6: 'SOA', 12: 'PTR', 15: 'MX', 16: 'TXT', 28: 'AAAA',
+              33: 'SRV', 65: 'HTTPS', 255: 'ANY'}
+
+MAX_NAME = 255
+MAX_RECORDS = 64  # perguntas/respostas lidas por mensagem
+
+
+class DnsError(ValueError):
+    pass
+
+
+def read_name(buf, off: int) -> Tuple[str, int]:
+    """Nome em buf[off]; retorna (nome em minúsculas, offset após o nome no fluxo original)."""
+    labels: List[str] = []
+    size = 0
+    end = -1  # onde a leitura continua depois do primeiro ponteiro
+    limit = off  # ponteiros só podem apontar para trás (sem laços)
+    n = len(buf)
+    while True:
+        if off >= n:
+            raise DnsError('nome truncado')
+        length = buf[off]
+        if length == 0:
+            off += 1
+            break
+        if length & 0xC0 == 0xC0:
+            if off + 1 >= n:
+                raise DnsError('ponteiro truncado')
+            target = ((length & 0x3F) << 8) | buf[off + 1]
+            if target >= limit:
+                raise DnsError('ponteiro inválido')
+            if end < 0:
+                end = off + 2
+            off = limit = target
+            continue
+        if length & 0xC0:
+            raise DnsError('rótulo inválido')
+        size += length + 1
+        if size > MAX_NAME or off + 1 + length > n:
+            raise DnsError('nome longo demais')
+        labels.append(bytes(buf[off + 1:off + 1 + length]).decode('ascii', 'backslashreplace').lower())
+        off += 1 + length
+    return '.'.join(labels), (end if end >= 0 else off)
+
+
+class DnsAnswer:
+    __slots__ = ('name', 'rtype', 'ttl', 'value')
+
+    def __init__(self, name: str, rtype: int, ttl: int, value) -> None:
+        self.name = name
+        self.rtype = rtype
+        self.ttl = ttl
+        # A/AAAA: endereço inteiro (como no PacketRecord); CNAME: nome
+        self.value = value
+
+    @property
+    def text(self) -> str:
+        if self.rtype == TYPE_A:
+            return format_ipv4(self.value)
+        if self.rtype == TYPE_AAAA:
+            return format_ipv6(self.value)
+        return self.value
+
+
+class DnsMessage:
+    __slots__ = ('tid', 'qr', 'opcode', 'rcode', 'qdcount', 'ancount', 'questions', 'answers', 'truncated')
+
+    def __init__(self) -> None:
+        self.questions: List[Tuple[str, int]] = []  # (nome, tipo)
+        self.answers: List[DnsAnswer] = []
+        self.truncated = False
+
+
+def decode_dns(payload) -> Optional[DnsMessage]:
+    """Decodifica uma mensagem DNS (sem o prefixo de tamanho do TCP)."""
+    if len(payload) < 12:
+        return None
+    tid, flags, qdcount, ancount, _ns, _ar = _HEADER.unpack_from(payload)
+    msg = DnsMessage()
+    msg.tid = tid
+    msg.qr = (flags >> 15) & 1
+    msg.opcode = (flags >> 11) & 0xF
+    msg.rcode = flags & 0xF
+    msg.qdcount = qdcount
+    msg.ancount = ancount
+    off = 12
+    try:
+        for _ in range(min(qdcount, MAX_RECORDS)):
+            name, off = read_name(payload, off)
+            if off + 4 > len(payload):
+                raise DnsError('pergunta truncada')
+            qtype, _qclass = _Q.unpack_from(payload, off)
+            off += 4
+            msg.questions.append((name, qtype))
+        for _ in range(min(ancount, MAX_RECORDS)):
+            name, off = read_name(payload, off)
+            if off + 10 > len(payload):
+                raise DnsError('registro truncado')
+            rtype, _rclass, ttl, rdlen = _RR.unpack_from(payload, off)
+            off += 10
+            if off + rdlen > len(payload):
+                raise DnsError('dados truncados')
+            if rtype == TYPE_A and rdlen == 4:
+                msg.answers.append(DnsAnswer(name, rtype, ttl, int.from_bytes(payload[off:off + 4], 'big')))
+            elif rtype == TYPE_AAAA and rdlen == 16:
+                msg.answers.append(DnsAnswer(name, rtype, ttl, int.from_bytes(payload[off:off + 16], 'big')))
+            elif rtype == TYPE_CNAME:
+                target, _ = read_name(payload, off)
+                msg.answers.append(DnsAnswer(name, rtype, ttl, target))
+            off += rdlen
+    except DnsError:
+        msg.truncated = True
+    return msg
+
+
+def format_dns(msg: DnsMessage) -> str:
+    parts = [f"DNS tid={msg.tid} qr={msg.qr} opcode={msg.opcode} rcode={msg.rcode} "
+             f"qd={msg.qdcount} an={msg.ancount}"]
+    if msg.questions:
+        name, qtype = msg.questions[0]
+        parts.append(f"q={name} {TYPE_NAMES.get(qtype, qtype)}")
+    if msg.answers:
+        parts.append('ans=' + ','.join(a.text for a in msg.answers[:8]))
+    if msg.truncated:
+        parts.append('(malformado)')
+    return ' '.join(parts)
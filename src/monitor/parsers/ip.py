@@ -1,55 +1,36 @@
-import ipaddress
-import struct
 from typing import Dict, Optional, Tuple, Union
 
+from .decoder import PacketRecord, decode_ipv4, decode_ipv6
+
 
 def parse_ipv4(packet: bytes) -> Optional[Dict]:
-    if len(packet) < 20:
-        return None
-    ver_ihl = packet[0]
-    version = ver_ihl >> 4
-    ihl = (ver_ihl & 0x0F) * 4
-    if version != 4 or ihl < 20 or len(packet) < ihl:
+    # Invólucro de compatibilidade sobre o decodificador compacto
+    rec = PacketRecord()
+    if not decode_ipv4(rec, packet):
         return None
-    total_length = struct.unpack('!H', packet[2:4])[0]
-    proto = packet[9]
-    src = ipaddress.IPv4Address(packet[12:16]).compressed
-    dst = ipaddress.IPv4Address(packet[16:20]).compressed
-    payload = packet[ihl:total_length] if total_length <= len(packet) else packet[ihl:]
     return {
         'version': 4,
-        'ihl': ihl,
-        'proto': proto,
-        'src': src,
-        'dst': dst,
-        'total_length': total_length,
-        'payload': payload,
+        'ihl': rec.ip_hdr_len,
+        'proto': rec.ip_proto,
+        'src': rec.src,
+        'dst': rec.dst,
+        'total_length': rec.total_length,
+        'payload': packet[rec.l4_off:rec.l4_end],
     }
 
 
 def parse_ipv6(packet: bytes) -> Optional[Dict]:
-    if len(packet) < 40:
-        return None
-    first = packet[0]
-    version = first >> 4
-    if version != 6:
+    rec = PacketRecord()
+    if not decode_ipv6(rec, packet):
         return None
-    # IPv6 header: 40 bytes
-    payload_len = struct.unpack('!H', packet[4:6])[0]
-    next_header = packet[6]
-    src = ipaddress.IPv6Address(packet[8:24]).compressed
-    dst = ipaddress.IPv6Address(packet[24:40]).compressed
-    header_len = 40
-    total_length = header_len + payload_len
-    payload = packet[header_len:total_length] if total_length <= len(packet) else packet[header_len:]
     return {
         'version': 6,
-        'header_len': header_len,
-        'next_header': next_header,
-        'src': src,
-        'dst': dst,
-        'total_length': total_length,
-        'payload': payload,
+        'header_len': rec.ip_hdr_len,
+        'next_header': rec.ip_proto,
+        'src': rec.src,
+        'dst': rec.dst,
+        'total_length': rec.total_length,
+        'payload': packet[rec.l4_off:rec.l4_end],
     }
 
 
@@ -0,0 +1,142 @@
+"""
+TLS (ClientHello/ServerHello) e cabeçalho longo do QUIC.
+
+Do ClientHello saem o SNI (server_name), a lista ALPN e as versões
+oferecidas; do ServerHello, a versão escolhida. A leitura tolera mensagens
+cortadas (ClientHello maior que um segmento, sem remontagem): o que couber
+no buffer é aproveitado e o resto ignorado.
+
+No QUIC só o cabeçalho longo é legível sem chaves (versão, tipo e IDs de
+conexão). O SNI do QUIC fica no ClientHello dentro do pacote Initial, que é
+cifrado com AES-GCM; a stdlib não tem AES, então ele não é extraído aqui.
+"""
+from typing import Dict, List, Optional
+
+TLS_VERSIONS = {0x0300: 'SSL3', 0x0301: '1.0', 0x0302: '1.1', 0x0303: '1.2', 0x0304: '1.3'}
+_RECORD_TYPES = {20: 'change_cipher_spec', 21: 'alert', 22: 'handshake', 23: 'application_data'}
+_GREASE = 0x0A0A  # valores GREASE (RFC 8701) têm os dois bytes iguais a 0x?A
+
+QUIC_V1, QUIC_V2 = 0x00000001, 0x6B3343CF
+_QUIC_TYPES = {QUIC_V1: ('Initial', '0-RTT', 'Handshake', 'Retry'),
+               QUIC_V2: ('Retry', 'Initial', '0-RTT', 'Handshake')}
+
+
+class _Truncated(Exception):
+    pass
+
+
+class _Reader:
+    __slots__ = ('buf', 'off', 'end')
+
+    def __init__(self, buf, off: int = 0, end: Optional[int] = None) -> None:
+        self.buf = buf
+        self.off = off
+        self.end = len(buf) if end is None else min(end, len(buf))
+
+    def take(self, n: int) -> bytes:
+        if self.off + n > self.end:
+            raise _Truncated
+        out = bytes(self.buf[self.off:self.off + n])
+        self.off += n
+        return out
+
+    def uint(self, n: int) -> int:
+        return int.from_bytes(self.take(n), 'big')
+
+    def sub(self, n: int) -> '_Reader':
+        # Sub-bloco de n bytes; se o buffer acaba antes, o bloco fica truncado
+        r = _Reader(self.buf, self.off, self.off + n)
+        self.off += n
+        return r
+
+
+def _is_grease(v: int) -> bool:
+    return v & 0x0F0F == _GREASE and (v >> 8) == (v & 0xFF)
+
+
+def parse_hello(payload) -> Optional[Dict]:
+    """ClientHello/ServerHello de um registro TLS no início de `payload`."""
+    if len(payload) < 6 or payload[0] != 22 or payload[1] != 3 or payload[5] not in (1, 2):
+        return None
+    hello: Dict = {'type': 'ClientHello' if payload[5] == 1 else 'ServerHello'}
+    r = _Reader(payload, 9)  # registro (5) + tipo e tamanho do handshake (4)
+    try:
+        version = r.uint(2)
+        hello['version'] = version
+        r.take(32)  # random
+        r.take(r.uint(1))  # session id
+        if hello['type'] == 'ClientHello':
+            r.take(r.uint(2))  # cipher suites
+            r.take(r.uint(1))  # compressão
+        else:
+            r.take(3)  # cipher suite + compressão
+        exts = r.sub(r.uint(2))
+        while exts.off + 4 <= exts.end:
+            etype, data = exts.uint(2), exts.sub(exts.uint(2))
+            if etype == 0:  # server_name
+                names = data.sub(data.uint(2))
+                while names.off < names.end:
+                    kind, name = names.uint(1), names.take(names.uint(2))
+                    if kind == 0:
+                        hello['sni'] = name.decode('ascii', 'backslashreplace').lower()
+                        break
+            elif etype == 16:  # ALPN
+                protos = data.sub(data.uint(2))
+                alpn: List[str] = []
+                while protos.off < protos.end:
+                    alpn.append(protos.take(protos.uint(1)).decode('ascii', 'backslashreplace'))
+                hello['alpn'] = alpn
+            elif etype == 43:  # supported_versions
+                if hello['type'] == 'ServerHello':
+                    hello['version'] = data.uint(2)
+                else:
+                    vers = data.sub(data.uint(1))
+                    offered = []
+                    while vers.off + 2 <= vers.end:
+                        v = vers.uint(2)
+                        if not _is_grease(v):
+                            offered.append(v)
+                    if offered:
+                        hello['version'] = max(offered)
+    except _Truncated:
+        hello['truncated'] = True
+    return hello
+
+
+def sniff_tls(payload) -> Optional[str]:
+    # Registro TLS: tipo 20..23, versão 3.x; handshake Hello é decodificado
+    if len(payload) < 5 or payload[0] not in _RECORD_TYPES or payload[1] != 3 or payload[2] > 4:
+        return None
+    hello = parse_hello(payload)
+    if hello is None:
+        return f"TLS {_RECORD_TYPES[payload[0]]}"
+    parts = [f"TLS {hello['type']}"]
+    if 'version' in hello:
+        parts.append(f"versão={TLS_VERSIONS.get(hello['version'], hex(hello['version']))}")
+    if hello.get('sni'):
+        parts.append(f"sni={hello['sni']}")
+    if hello.get('alpn'):
+        parts.append(f"alpn={','.join(hello['alpn'])}")
+    return ' '.join(parts)
+
+
+def sniff_quic(payload) -> Optional[str]:
+    # Cabeçalho longo (RFC 8999/9000): bit de forma 1, versão, DCID e SCID de até 20 bytes
+    if len(payload) < 7 or not payload[0] & 0x80:
+        return None
+    version = int.from_bytes(payload[1:5], 'big')
+    dcid_len = payload[5]
+    if dcid_len > 20 or len(payload) < 7 + dcid_len:
+        return None
+    scid_len = payload[6 + dcid_len]
+    if scid_len > 20 or len(payload) < 7 + dcid_len + scid_len:
+        return None
+    dcid = bytes(payload[6:6 + dcid_len]).hex()
+    if version == 0:
+        return f"QUIC version_negotiation dcid={dcid}"
+    if not payload[0] & 0x40:
+        return None  # bit fixo zerado: não é QUIC v1/v2
+    types = _QUIC_TYPES.get(version)
+    ptype = types[(payload[0] >> 4) & 3] if types else 'long'
+    name = {QUIC_V1: 'v1', QUIC_V2: 'v2'}.get(version, f"0x{version:08x}")
+    return f"QUIC {name} {ptype} dcid={dcid}"
@@ -1,37 +1,33 @@
-import struct
 from typing import Dict, Optional
 
+from .decoder import PacketRecord, decode_tcp, decode_udp
+
 
 def parse_tcp(payload: bytes) -> Optional[Dict]:
-    if len(payload) < 20:
-        return None
-    src_port, dst_port, seq, ack_seq, offset_reserved_flags = struct.unpack('!HHIIH', payload[:14])
-    data_offset = (offset_reserved_flags >> 12) * 4
-    if data_offset < 20 or len(payload) < data_offset:
+    # Invólucro de compatibilidade sobre o decodificador compacto
+    rec = PacketRecord()
+    if not decode_tcp(rec, payload, 0, len(payload)):
         return None
-    flags = offset_reserved_flags & 0x01FF  # 9 bits: NS,CWR,ECE,URG,ACK,PSH,RST,SYN,FIN
     return {
         'protocol': 'TCP',
-        'src_port': src_port,
-        'dst_port': dst_port,
-        'seq': seq,
-        'ack': ack_seq,
-        'flags': flags,
-        'header_len': data_offset,
-        'payload': payload[data_offset:],
+        'src_port': rec.src_port,
+        'dst_port': rec.dst_port,
+        'seq': rec.seq,
+        'ack': rec.ack,
+        'flags': rec.tcp_flags,
+        'header_len': rec.l4_hdr_len,
+        'payload': payload[rec.app_off:],
     }
 
 
 def parse_udp(payload: bytes) -> Optional[Dict]:
-    if len(payload) < 8:
+    rec = PacketRecord()
+    if not decode_udp(rec, payload, 0, len(payload)):
         return None
-    src_port, dst_port, length = struct.unpack('!HHH', payload[:6])
-    # checksum = payload[6:8]
-    app = payload[8:length] if length <= len(payload) else payload[8:]
     return {
         'protocol': 'UDP',
-        'src_port': src_port,
-        'dst_port': dst_port,
-        'length': length,
-        'payload': app,
+        'src_port': rec.src_port,
+        'dst_port': rec.dst_port,
+        'length': rec.udp_length,
+        'payload': payload[rec.app_off:rec.app_end],
     }
@@ -0,0 +1,305 @@
+import struct
+import sys
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+
+# Tipos de enlace (LINKTYPE_*) suportados na leitura de arquivos
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+# Valores DLT_RAW históricos (dependentes de plataforma) ainda vistos em arquivos antigos
+_DLT_RAW_ALIASES = (12, 14)
+
+_ETH_IP_TYPES = (0x0800, 0x86DD)
+_ETH_VLAN_TYPES = (0x8100, 0x88A8, 0x9100)
+
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_IDB = 0x00000001
+_PCAPNG_OPB = 0x00000002  # Packet Block (obsoleto)
+_PCAPNG_SPB = 0x00000003
+_PCAPNG_EPB = 0x00000006
+_PCAPNG_BOM = 0x1A2B3C4D
+
+
+def l3_offset(linktype: int, frame: bytes) -> int:
+    """Retorna o deslocamento do cabeçalho IP no quadro, ou -1 se não for IP."""
+    if linktype == LINKTYPE_ETHERNET:
+        off = 12
+        while len(frame) >= off + 2:
+            eth_type = (frame[off] << 8) | frame[off + 1]
+            if eth_type in _ETH_IP_TYPES:
+                return off + 2
+            if eth_type not in _ETH_VLAN_TYPES:
+                return -1
+            off += 4  # pula tag 802.1Q/802.1ad
+        return -1
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6) or linktype in _DLT_RAW_ALIASES:
+        return 0
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # Família de endereço em 4 bytes (ordem do host que gravou o arquivo)
+        return 4 if len(frame) > 4 else -1
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) >= 16 and ((frame[14] << 8) | frame[15]) in _ETH_IP_TYPES:
+            return 16
+        return -1
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(frame) >= 20 and ((frame[0] << 8) | frame[1]) in _ETH_IP_TYPES:
+            return 20
+        return -1
+    return -1
+
+
+class PcapReader:
+    """Leitor sequencial de arquivos pcap (usec/nsec) e pcapng.
+
+    Itera sobre tuplas (timestamp_segundos, linktype, dados_capturados).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fh: Optional[BinaryIO] = None
+
+    def open(self) -> None:
+        self._fh = open(self.path, 'rb', buffering=1024 * 1024)
+
+    def close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            finally:
+                self._fh = None
+
+    def __iter__(self) -> Iterator[Tuple[float, int, bytes]]:
+        if self._fh is None:
+            self.open()
+        fh = self._fh
+        magic = fh.read(4)
+        if len(magic) < 4:
+            return
+        if struct.unpack('<I', magic)[0] == _PCAPNG_SHB:
+            yield from self._iter_pcapng(fh, magic)
+        else:
+            yield from self._iter_pcap(fh, magic)
+
+    @staticmethod
+    def _iter_pcap(fh: BinaryIO, magic: bytes) -> Iterator[Tuple[float, int, bytes]]:
+        if magic == b'\xd4\xc3\xb2\xa1':
+            endian, ts_div = '<', 1e6
+        elif magic == b'\xa1\xb2\xc3\xd4':
+            endian, ts_div = '>', 1e6
+        elif magic == b'\x4d\x3c\xb2\xa1':
+            endian, ts_div = '<', 1e9
+        elif magic == b'\xa1\xb2\x3c\x4d':
+            endian, ts_div = '>', 1e9
+        else:
+            raise ValueError("Arquivo não é pcap nem pcapng")
+        hdr = fh.read(20)
+        if len(hdr) < 20:
+            return
+        linktype = struct.unpack(endian + 'HHiIII', hdr)[5] & 0x0FFFFFFF
+        rec = struct.Struct(endian + 'IIII')
+        read = fh.read
+        while True:
+            raw = read(16)
+            if len(raw) < 16:
+                return
+            ts_sec, ts_frac, incl_len, _orig_len = rec.unpack(raw)
+            data = read(incl_len)
+            if len(data) < incl_len:
+                return  # arquivo truncado
+            yield ts_sec + ts_frac / ts_div, linktype, data
+
+    @staticmethod
+    def _iter_pcapng(fh: BinaryIO, first: bytes) -> Iterator[Tuple[float, int, bytes]]:
+        endian = '<'
+        # (linktype, snaplen, divisor do timestamp) por interface da seção atual
+        ifaces: list[Tuple[int, int, float]] = []
+        pending = first
+        read = fh.read
+        while True:
+            head = pending + read(8 - len(pending))
+            pending = b''
+            if len(head) < 8:
+                return
+            if struct.unpack('<I', head[:4])[0] == _PCAPNG_SHB:
+                # Nova seção: a ordem dos bytes vem do BOM logo após o tamanho
+                bom = read(4)
+                if len(bom) < 4:
+                    return
+                endian = '<' if struct.unpack('<I', bom)[0] == _PCAPNG_BOM else '>'
+                block_len = struct.unpack(endian + 'I', head[4:8])[0]
+                if block_len < 28:
+                    raise ValueError("Bloco pcapng inválido")
+                read(block_len - 12)  # resto do SHB (versão, opções) não é usado
+                ifaces = []
+                continue
+            block_type, block_len = struct.unpack(endian + 'II', head)
+            if block_len < 12:
+                raise ValueError("Bloco pcapng inválido")
+            body = read(block_len - 8)
+            if len(body) < block_len - 8:
+                return
+            body = body[:-4]  # remove tamanho repetido no final
+            if block_type == _PCAPNG_IDB:
+                linktype, _res, snaplen = struct.unpack(endian + 'HHI', body[:8])
+                ifaces.append((linktype, snaplen, PcapReader._pcapng_tsdiv(body[8:], endian)))
+            elif block_type == _PCAPNG_EPB:
+                if_id, ts_hi, ts_lo, cap_len, _orig = struct.unpack(endian + 'IIIII', body[:20])
+                if if_id >= len(ifaces):
+                    continue
+                linktype, _snap, div = ifaces[if_id]
+                yield ((ts_hi << 32) | ts_lo) / div, linktype, body[20:20 + cap_len]
+            elif block_type == _PCAPNG_SPB:
+                if not ifaces:
+                    continue
+                linktype, snaplen, _div = ifaces[0]
+                orig_len = struct.unpack(endian + 'I', body[:4])[0]
+                cap_len = min(orig_len, snaplen) if snaplen else orig_len
+                yield 0.0, linktype, body[4:4 + cap_len]
+            elif block_type == _PCAPNG_OPB:
+                if_id, _drops, ts_hi, ts_lo, cap_len, _orig = struct.unpack(endian + 'HHIIII', body[:20])
+                if if_id >= len(ifaces):
+                    continue
+                linktype, _snap, div = ifaces[if_id]
+                yield ((ts_hi << 32) | ts_lo) / div, linktype, body[20:20 + cap_len]
+            # Demais blocos (estatísticas, NRB, custom) são ignorados
+
+    @staticmethod
+    def _pcapng_tsdiv(options: bytes, endian: str) -> float:
+        # Procura a opção if_tsresol (código 9); padrão é microssegundos
+        off = 0
+        while off + 4 <= len(options):
+            code, length = struct.unpack(endian + 'HH', options[off:off + 4])
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                v = options[off + 4]
+                return float(2 ** (v & 0x7F)) if v & 0x80 else float(10 ** v)
+            off += 4 + ((length + 3) & ~3)
+        return 1e6
+
+
+class PcapCapture:
+    """Fonte de captura baseada em arquivo pcap/pcapng (reprodução offline).
+
+    Expõe a mesma interface de RawCapture (open/recv/split_l2_l3/close), de modo
+    que o Monitor processa o arquivo pelo mesmo pipeline da captura ao vivo.
+
+    Modos de reprodução:
+    - 'max': entrega os pacotes o mais rápido possível (benchmark do pipeline).
+    - 'original': respeita os intervalos entre os timestamps gravados.
+
+    Ao fim do arquivo, recv() lança EOFError.
+    """
+
+    def __init__(self, path: str, replay: str = 'max', batch_size: int = 64) -> None:
+        if replay not in ('max', 'original'):
+            raise ValueError(f"Modo de reprodução inválido: {replay}")
+        self.path = path
+        self.interface = path
+        self.replay = replay
+        self.batch_size = max(1, batch_size)
+        self.mode: str = 'pcap'
+        self.linktype: int = LINKTYPE_RAW
+        self.packets = 0
+        self.bytes = 0
+        # Timestamp gravado do último pacote lido (relógio dos fluxos na reprodução)
+        self.last_ts = 0.0
+        self._reader: Optional[PcapReader] = None
+        self._it: Optional[Iterator[Tuple[float, int, bytes]]] = None
+        # Referências de tempo para o modo 'original'
+        self._first_ts: Optional[float] = None
+        self._wall_start = 0.0
+        # Registro lido antecipadamente quando o tipo de enlace muda no meio do lote
+        self._lookahead: Optional[Tuple[float, int, bytes]] = None
+
+    def open(self) -> None:
+        try:
+            self._reader = PcapReader(self.path)
+            self._reader.open()
+        except OSError as e:
+            print(f"Falha ao abrir arquivo de captura {self.path}: {e}", file=sys.stderr)
+            raise
+        self._it = iter(self._reader)
+
+    def close(self) -> None:
+        if self._reader is not None:
+            try:
+                self._reader.close()
+            finally:
+                self._reader = None
+                self._it = None
+
+    def l3_offset(self, frame: bytes) -> int:
+        return l3_offset(self.linktype, frame)
+
+    def split_l2_l3(self, frame: bytes) -> Tuple[Optional[bytes], bytes]:
+        off = l3_offset(self.linktype, frame)
+        if off < 0:
+            # Não é IP: L3 vazio faz o parser descartar o quadro
+            return frame, b''
+        if off == 0:
+            return None, frame
+        return frame[:off], frame[off:]
+
+    def _next_record(self) -> Optional[Tuple[float, int, bytes]]:
+        if self._lookahead is not None:
+            rec, self._lookahead = self._lookahead, None
+            return rec
+        if self._it is None:
+            raise RuntimeError("Arquivo de captura não inicializado")
+        return next(self._it, None)
+
+    def _pace(self, ts: float) -> None:
+        if self.replay != 'original' or not ts:
+            return
+        if self._first_ts is None:
+            self._first_ts = ts
+            self._wall_start = time.monotonic()
+            return
+        delay = (ts - self._first_ts) - (time.monotonic() - self._wall_start)
+        if delay > 0:
+            time.sleep(delay)
+
+    def recv(self) -> bytes:
+        rec = self._next_record()
+        if rec is None:
+            raise EOFError("Fim do arquivo de captura")
+        ts, linktype, data = rec
+        self._pace(ts)
+        self.linktype = linktype
+        self.last_ts = ts
+        self.packets += 1
+        self.bytes += len(data)
+        return data
+
+    def recv_batch(self) -> List[bytes]:
+        """Lê até batch_size registros com o mesmo tipo de enlace.
+
+        No modo 'original' cada lote tem um só pacote, para manter o ritmo.
+        """
+        first = self.recv()
+        out = [first]
+        if self.replay == 'original':
+            return out
+        linktype = self.linktype
+        nbytes = 0
+        while len(out) < self.batch_size:
+            rec = self._next_record()
+            if rec is None:
+                break
+            if rec[1] != linktype:
+                self._lookahead = rec
+                break
+            out.append(rec[2])
+            nbytes += len(rec[2])
+            self.last_ts = rec[0]
+        self.packets += len(out) - 1
+        self.bytes += nbytes
+        return out
@@ -0,0 +1,378 @@
+"""
+Remontagem limitada de fragmentos IP e de fluxos TCP para os parsers de aplicação.
+
+FragmentReassembler junta fragmentos IPv4/IPv6 por (versão, origem, destino,
+identificação e, no IPv4, protocolo). Os dados de cada fragmento são copiados (os
+quadros do anel/pool são reaproveitados após o lote); sobreposições
+descartam o datagrama inteiro, como pede a RFC 5722.
+
+StreamReassembler mantém, por sentido de cada conexão TCP, o próximo número
+de sequência esperado, um buffer contíguo ainda não consumido e os segmentos
+fora de ordem. feed() devolve as mensagens completas que ficaram disponíveis:
+DNS sobre TCP pelo prefixo de tamanho, cabeçalhos HTTP até a linha em
+branco, registros de handshake TLS pelo tamanho do registro, e qualquer
+outro dado como veio. No caminho comum (segmento em ordem
+e sem nada pendente) as mensagens são memoryviews do próprio quadro; só as
+sobras são copiadas. Uma mensagem que ocupa vários segmentos é acumulada no
+buffer do sentido sem recopiar o que já estava lá. No FIN/RST, os dados
+guardados depois de um buraco também são entregues (e o buraco contado).
+
+Os dois têm orçamento de memória por entrada e global, e expiram entradas
+ociosas por tempo (expire(now), chamado uma vez por lote). Ao estourar o
+orçamento global, as entradas usadas há mais tempo são descartadas.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .parsers.app import HTTP_METHODS
+from .parsers.decoder import PacketRecord
+
+HTTP_HEADER_MAX = 8192  # cabeçalho HTTP maior que isso é entregue como está
+TLS_RECORD_MAX = 5 + 16384 + 256  # registro TLS (cabeçalho + texto cifrado máximo)
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class _Datagram:
+    __slots__ = ('first_seen', 'pieces', 'total', 'size')
+
+    def __init__(self, now: float) -> None:
+        self.first_seen = now
+        self.pieces: List[Tuple[int, bytes]] = []
+        self.total = -1  # conhecido quando chega o último fragmento
+        self.size = 0
+
+
+class FragmentReassembler:
+    def __init__(self, max_datagram: int = 65535, max_bytes: int = 4 * 1024 * 1024,
+                 timeout: float = 30.0, max_datagrams: int = 4096) -> None:
+        self.max_datagram = max_datagram
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_datagrams = max_datagrams
+        self._pending: 'OrderedDict[tuple, _Datagram]' = OrderedDict()
+        self.bytes = 0
+        self.reassembled = 0
+        self.timeouts = 0
+        self.evicted = 0
+        self.dropped = 0  # sobreposição, tamanho inválido ou acima do limite
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _drop(self, key: tuple) -> None:
+        dg = self._pending.pop(key)
+        self.bytes -= dg.size
+
+    def add(self, rec: PacketRecord, now: float) -> Optional[bytes]:
+        """Guarda um fragmento; devolve a carga IP completa quando o datagrama fecha."""
+        # IPv6 identifica o datagrama só por origem, destino e identificação (RFC 8200)
+        key = (rec.version, rec.src_int, rec.dst_int, rec.ip_proto if rec.version == 4 else 0, rec.frag_id)
+        start = rec.frag_off
+        data = bytes(rec.ip_payload)  # cópia: o quadro volta para o pool
+        end = start + len(data)
+        dg = self._pending.get(key)
+        if dg is None:
+            if len(self._pending) >= self.max_datagrams:
+                self._drop(next(iter(self._pending)))
+                self.evicted += 1
+            dg = self._pending[key] = _Datagram(now)
+        if end > self.max_datagram or (rec.frag_more and len(data) % 8) or \
+                (dg.total >= 0 and end > dg.total) or (not rec.frag_more and dg.total >= 0 and end != dg.total):
+            self._drop(key)
+            self.dropped += 1
+            return None
+        for s, piece in dg.pieces:
+            if start < s + len(piece) and s < end:
+                self._drop(key)  # sobreposição: descarta o datagrama inteiro
+                self.dropped += 1
+                return None
+        if not rec.frag_more:
+            dg.total = end
+        dg.pieces.append((start, data))
+        dg.size += len(data)
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes and self._pending:
+            victim = next(iter(self._pending))
+            self._drop(victim)
+            self.evicted += 1
+            if victim == key:
+                return None
+        if dg.total < 0 or dg.size != dg.total:
+            return None
+        self._drop(key)
+        dg.pieces.sort()
+        self.reassembled += 1
+        return b''.join(p for _, p in dg.pieces)
+
+    def expire(self, now: float) -> int:
+        # Entradas em ordem de chegada: para no primeiro ainda válido
+        n = 0
+        pending = self._pending
+        while pending:
+            key, dg = next(iter(pending.items()))
+            if now - dg.first_seen < self.timeout:
+                break
+            self._drop(key)
+            n += 1
+        self.timeouts += n
+        return n
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': len(self._pending), 'bytes': self.bytes, 'reassembled': self.reassembled,
+                'timeouts': self.timeouts, 'evicted': self.evicted, 'dropped': self.dropped}
+
+
+def frame_message(sport: int, dport: int, data: memoryview) -> Optional[Tuple[memoryview, int]]:
+    """(mensagem, bytes consumidos) do início de `data`, ou None se ainda incompleta."""
+    if sport == 53 or dport == 53:
+        if len(data) < 2:
+            return None
+        need = 2 + ((data[0] << 8) | data[1])
+        if len(data) < need:
+            return None
+        return data[2:need], need
+    if len(data) >= 5 and data[0] == 22 and data[1] == 3:
+        # Handshake TLS (ClientHello com SNI pode ocupar vários segmentos)
+        need = 5 + ((data[3] << 8) | data[4])
+        if len(data) < need:
+            return None if need <= TLS_RECORD_MAX else (data, len(data))
+        return data[:need], need
+    head = bytes(data[:8])
+    if head.startswith(b'HTTP/') or any(head.startswith(m) for m in HTTP_METHODS):
+        end = bytes(data[:HTTP_HEADER_MAX]).find(b'\r\n\r\n')
+        if end >= 0:
+            # Só o cabeçalho interessa; o corpo (se houver) é descartado
+            return data[:end + 4], len(data)
+        if len(data) < HTTP_HEADER_MAX:
+            return None
+    return data, len(data)
+
+
+class _Stream:
+    __slots__ = ('next_seq', 'buf', 'ooo', 'ooo_bytes', 'last_seen')
+
+    def __init__(self, next_seq: int, now: float) -> None:
+        self.next_seq = next_seq
+        self.buf = bytearray()  # dados em ordem ainda não consumidos
+        self.ooo: Dict[int, bytes] = {}
+        self.ooo_bytes = 0
+        self.last_seen = now
+
+    @property
+    def size(self) -> int:
+        return len(self.buf) + self.ooo_bytes
+
+
+class StreamReassembler:
+    def __init__(self, max_stream: int = 64 * 1024, max_bytes: int = 16 * 1024 * 1024,
+                 timeout: float = 60.0, max_streams: int = 65536) -> None:
+        self.max_stream = max_stream
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_streams = max_streams
+        self._streams: 'OrderedDict[tuple, _Stream]' = OrderedDict()
+        self.bytes = 0
+        self.messages = 0
+        self.out_of_order = 0
+        self.gaps = 0  # buracos abandonados (perda na captura ou orçamento)
+        self.evicted = 0
+        self.timeouts = 0
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def _drop(self, key: tuple) -> None:
+        st = self._streams.pop(key)
+        self.bytes -= st.size
+
+    def feed(self, rec: PacketRecord, now: float) -> List[memoryview]:
+        """Processa um segmento TCP; retorna as mensagens de aplicação completadas por ele."""
+        key = (rec.version, rec.src_int, rec.src_port, rec.dst_int, rec.dst_port)
+        flags = rec.tcp_flags
+        payload = rec.payload
+        # Dados num SYN (TCP Fast Open) começam depois do número de sequência do SYN
+        seq = (rec.seq + 1) & _SEQ_MASK if flags & 0x002 else rec.seq
+        streams = self._streams
+        st = streams.get(key)
+        if flags & 0x005:  # FIN ou RST: entrega o que houver e esquece o sentido
+            if st is not None:
+                streams.move_to_end(key)
+            out = self._deliver(st, rec, seq, payload) if st is not None or len(payload) else []
+            if st is not None:
+                while st.ooo and key in streams:
+                    # Buraco que não será mais preenchido: entrega o que veio depois dele
+                    if st.buf:
+                        out.append(memoryview(st.buf))
+                        self.messages += 1
+                    self._skip_gap(st)
+                    parts: List = []
+                    self._drain_ooo(st, parts)
+                    out.extend(self._frame(st, rec, memoryview(b''.join(parts))))
+                if st.buf:
+                    out.append(memoryview(st.buf))  # resto incompleto: entrega como está
+                    self.messages += 1
+                if key in streams:
+                    self._drop(key)
+            return out
+        if st is None:
+            if not (flags & 0x002) and not len(payload):
+                return []
+            # Sem SYN: conexão já em andamento, começa deste segmento
+            st = _Stream(seq, now)
+            if len(streams) >= self.max_streams:
+                self._drop(next(iter(streams)))
+                self.evicted += 1
+            streams[key] = st
+        else:
+            streams.move_to_end(key)
+        st.last_seen = now
+        if not len(payload):
+            return []
+        return self._deliver(st, rec, seq, payload)
+
+    def forget(self, rec: PacketRecord) -> None:
+        """Esquece os dois sentidos da conexão de `rec`."""
+        for key in ((rec.version, rec.src_int, rec.src_port, rec.dst_int, rec.dst_port),
+                    (rec.version, rec.dst_int, rec.dst_port, rec.src_int, rec.src_port)):
+            if key in self._streams:
+                self._drop(key)
+
+    def _deliver(self, st: Optional[_Stream], rec: PacketRecord, seq: int,
+                 payload: memoryview) -> List[memoryview]:
+        if st is None:
+            # Segmento isolado (ex.: FIN com dados e sem estado): entrega direto
+            return self._frame(None, rec, payload)
+        delta = (seq - st.next_seq) & _SEQ_MASK
+        if delta and delta < 0x80000000:
+            # À frente do esperado: guarda fora de ordem (cópia) dentro do orçamento
+            self.out_of_order += 1
+            if seq not in st.ooo:
+                data = bytes(payload)
+                st.ooo[seq] = data
+                st.ooo_bytes += len(data)
+                self.bytes += len(data)
+            if st.ooo_bytes <= self.max_stream:
+                self._enforce_global(st)
+                return []
+            self._skip_gap(st)
+            payload = memoryview(b'')
+        elif delta:
+            # Retransmissão (total ou parcial): aproveita só o que é novo
+            behind = (st.next_seq - seq) & _SEQ_MASK
+            if behind >= len(payload):
+                return []
+            payload = payload[behind:]
+        st.next_seq = (st.next_seq + len(payload)) & _SEQ_MASK
+        if st.ooo:
+            parts = [payload] if len(payload) else []
+            self._drain_ooo(st, parts)
+            if len(parts) > 1:
+                payload = memoryview(b''.join(parts))
+            elif parts:
+                payload = parts[0]
+        return self._frame(st, rec, payload)
+
+    def _drain_ooo(self, st: _Stream, parts: List) -> None:
+        # Anexa os segmentos guardados que ficaram contíguos (aparando sobreposições)
+        ooo = st.ooo
+        while ooo:
+            nxt = ooo.pop(st.next_seq, None)
+            if nxt is None:
+                behind = [s for s in ooo if 0 < (st.next_seq - s) & _SEQ_MASK < 0x80000000]
+                if not behind:
+                    return
+                for s in behind:
+                    d = ooo.pop(s)
+                    st.ooo_bytes -= len(d)
+                    self.bytes -= len(d)
+                    over = (st.next_seq - s) & _SEQ_MASK
+                    if over < len(d) and st.next_seq not in ooo:
+                        ooo[st.next_seq] = d[over:]
+                        st.ooo_bytes += len(d) - over
+                        self.bytes += len(d) - over
+                continue
+            st.ooo_bytes -= len(nxt)
+            self.bytes -= len(nxt)
+            parts.append(memoryview(nxt))
+            st.next_seq = (st.next_seq + len(nxt)) & _SEQ_MASK
+
+    def _skip_gap(self, st: _Stream) -> None:
+        # O buraco não vai ser preenchido a tempo: pula para o menor segmento guardado
+        self.gaps += 1
+        self.bytes -= len(st.buf)
+        st.buf = bytearray()
+        st.next_seq = min(st.ooo, key=lambda s: (s - st.next_seq) & _SEQ_MASK)
+
+    def _frame(self, st: Optional[_Stream], rec: PacketRecord, payload: memoryview) -> List[memoryview]:
+        buffered = st is not None and bool(st.buf)
+        if buffered:
+            # Só anexa o segmento: a parte já guardada não é copiada de novo
+            st.buf += payload
+            self.bytes += len(payload)
+            view = data = memoryview(st.buf)
+        else:
+            data = payload  # caminho sem cópia: direto do quadro
+        out = []
+        sp, dp = rec.src_port, rec.dst_port
+        while len(data):
+            framed = frame_message(sp, dp, data)
+            if framed is None:
+                break
+            msg, used = framed
+            out.append(msg)
+            data = data[used:]
+        self.messages += len(out)
+        if st is None:
+            return out
+        if len(data) > self.max_stream:
+            out.append(data)  # mensagem grande demais: entrega como está e descarta
+            self.messages += 1
+            data = data[:0]
+        if buffered:
+            consumed = len(view) - len(data)
+            data.release()
+            view.release()
+            if consumed:
+                self.bytes -= consumed
+                try:
+                    del st.buf[:consumed]
+                except BufferError:
+                    # As mensagens devolvidas ainda apontam para o buffer: a
+                    # sobra (mensagem incompleta) vai para um buffer novo
+                    st.buf = st.buf[consumed:]
+        elif len(data):
+            # Sobra de um quadro do anel/pool: precisa ser copiada
+            st.buf = bytearray(data)
+            self.bytes += len(st.buf)
+        else:
+            return out
+        self._enforce_global(st)
+        return out
+
+    def _enforce_global(self, keep: _Stream) -> None:
+        # Nunca expulsa `keep` (o sentido em processamento): ele ainda será usado
+        streams = self._streams
+        while self.bytes > self.max_bytes:
+            key = next((k for k, st in streams.items() if st is not keep), None)
+            if key is None:
+                break
+            self._drop(key)
+            self.evicted += 1
+
+    def expire(self, now: float) -> int:
+        # Ordem de uso (LRU): para no primeiro sentido ainda ativo
+        n = 0
+        streams = self._streams
+        while streams:
+            key, st = next(iter(streams.items()))
+            if now - st.last_seen < self.timeout:
+                break
+            self._drop(key)
+            n += 1
+        self.timeouts += n
+        return n
+
+    def stats(self) -> Dict[str, int]:
+        return {'streams': len(self._streams), 'bytes': self.bytes, 'messages': self.messages,
+                'out_of_order': self.out_of_order, 'gaps': self.gaps, 'evicted': self.evicted,
+                'timeouts': self.timeouts}
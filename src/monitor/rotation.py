@@ -0,0 +1,161 @@
+"""
+Rotação dos logs por tamanho e/ou tempo, com retenção e compressão.
+
+A rotação acontece na thread de escrita do logger (QueuedWriter): o arquivo
+atual é descarregado, renomeado atomicamente para <nome>-<UTC>.<ext> e um
+arquivo novo é aberto no mesmo caminho (tail -F segue a troca). A captura só
+enfileira linhas, então continua gravando na fila durante a rotação.
+
+A compressão (zstd quando o módulo `zstandard` está instalado, senão gzip)
+roda numa única thread de fundo compartilhada; o arquivo só substitui o
+original depois de completo (.tmp + os.replace). A retenção apaga os
+arquivos rotacionados mais antigos além de `keep`.
+"""
+import glob
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional
+    zstandard = None
+
+COMPRESS_MODES = ('auto', 'gzip', 'zstd', 'none')
+_EXT = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+INDEX_SUFFIX = '.idx'  # índice auxiliar (logindex), renomeado/podado junto com o log
+
+
+def sidecar_of(path: str) -> str:
+    """Índice auxiliar de um log, comprimido ou não (<log sem .gz/.zst>.idx)."""
+    for ext in ('.gz', '.zst'):
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+    return path + INDEX_SUFFIX
+
+
+class Rotation:
+    """Política de rotação de um logger (0 desliga o critério)."""
+
+    def __init__(self, max_bytes: int = 0, interval: float = 0.0, keep: int = 10,
+                 compress: str = 'auto') -> None:
+        if compress not in COMPRESS_MODES:
+            raise ValueError(f"Compressão inválida: {compress}")
+        if compress == 'zstd' and zstandard is None:
+            raise ValueError("Compressão zstd requer o pacote zstandard")
+        if compress == 'auto':
+            compress = 'zstd' if zstandard is not None else 'gzip'
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.keep = keep
+        self.compress = compress
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_bytes or self.interval)
+
+    def due(self, size: int, opened_at: float, now: float) -> bool:
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.interval) and now - opened_at >= self.interval
+
+
+def rotated_path(path: str, now: Optional[float] = None) -> str:
+    """Nome livre <base>-<AAAAMMDDTHHMMSSffffff><ext> ao lado de `path`."""
+    stem, ext = os.path.splitext(path)
+    stamp = datetime.fromtimestamp(now if now is not None else time.time(), timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    target = f"{stem}-{stamp}{ext}"
+    n = 0
+    while any(os.path.exists(target + e) for e in ('', '.gz', '.zst')):
+        n += 1
+        target = f"{stem}-{stamp}.{n}{ext}"
+    return target
+
+
+def rotated_files(path: str) -> List[str]:
+    """Arquivos já rotacionados de `path` (comprimidos ou não), do mais antigo ao mais novo."""
+    stem, ext = os.path.splitext(path)
+    found = set()
+    for suffix in ('', '.gz', '.zst'):
+        found.update(glob.glob(f"{glob.escape(stem)}-*{ext}{suffix}"))
+    # Descarta temporários da compressão e nomes de outros logs com o mesmo prefixo
+    stamps = []
+    for f in found:
+        rest = f[len(stem) + 1:]
+        stamp = rest.split(ext, 1)[0] if ext else rest
+        if stamp[:8].isdigit() and 'T' in stamp:
+            stamps.append((stamp.split('.')[0], int(stamp.split('.')[1]) if '.' in stamp else 0, f))
+    return [f for _, _, f in sorted(stamps)]
+
+
+def prune(path: str, keep: int) -> List[str]:
+    """Remove os rotacionados mais antigos além de `keep`; retorna os removidos."""
+    files = rotated_files(path)
+    removed = files[:max(0, len(files) - keep)] if keep >= 0 else []
+    for f in removed:
+        for victim in (f, sidecar_of(f)):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+    return removed
+
+
+def compress_file(path: str, method: str) -> str:
+    """Comprime `path` em <path>.gz/.zst e remove o original; retorna o novo nome."""
+    if method == 'none':
+        return path
+    dst = path + _EXT[method]
+    tmp = dst + '.tmp'
+    with open(path, 'rb') as src:
+        if method == 'zstd':
+            with open(tmp, 'wb') as out:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, out)
+        else:
+            with gzip.open(tmp, 'wb', compresslevel=6) as out:
+                shutil.copyfileobj(src, out, 1 << 20)
+    os.replace(tmp, dst)
+    os.remove(path)
+    return dst
+
+
+class Compressor:
+    """Thread de fundo (criada sob demanda) que comprime arquivos rotacionados."""
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.errors = 0
+
+    def submit(self, path: str, method: str, after: Optional[Callable[[], None]] = None) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='log-compress', daemon=True)
+                self._thread.start()
+        self._queue.put((path, method, after))
+
+    def _loop(self) -> None:
+        while True:
+            path, method, after = self._queue.get()
+            try:
+                compress_file(path, method)
+            except OSError:
+                self.errors += 1
+            try:
+                if after is not None:
+                    after()
+            finally:
+                self._queue.task_done()
+
+    def wait(self) -> None:
+        """Bloqueia até esvaziar a fila de compressão."""
+        self._queue.join()
+
+
+COMPRESSOR = Compressor()
@@ -0,0 +1,128 @@
+"""
+Amostragem de pacotes sob sobrecarga.
+
+Modos:
+- 'off': processa todos os pacotes (peso 1).
+- 'fixed': 1 a cada N pacotes, sistemático (contador).
+- 'flow': 1 a cada N fluxos, pelo hash simétrico da 5-tupla; um fluxo
+  amostrado tem todos os seus pacotes processados (registros de fluxo
+  completos, ao custo de mais variância nas estimativas).
+- 'adaptive': como 'flow', mas N (potência de 2) dobra quando o kernel
+  descarta quadros ou a carga do laço de captura passa de `high_load`, e cai
+  pela metade quando a carga fica abaixo de `low_load` sem descartes. Como N é
+  potência de 2, os fluxos amostrados com N maior são subconjunto dos de N
+  menor, então fluxos em andamento não somem ao reduzir a taxa.
+
+Cada pacote aceito recebe peso N: somar os pesos dá uma estimativa não
+enviesada do total (Horvitz-Thompson). Em 'fixed' a variância dessa
+estimativa é a soma de N*(N-1) dos pacotes aceitos, acumulada em Stats.
+Em 'flow'/'adaptive' a unidade sorteada é o fluxo, e a variância passa a ser
+a soma de N*(N-1)*pacotes_do_fluxo² dos fluxos aceitos; como o monitor não
+guarda a contagem de cada fluxo para isso, esses modos não publicam o erro
+(ver Stats.packet_variance).
+"""
+import time
+from typing import Callable, Optional
+
+from .parsers.decoder import PacketRecord
+
+SAMPLING_MODES = ('off', 'fixed', 'flow', 'adaptive')
+FLOW_MODES = ('flow', 'adaptive')  # sorteiam fluxos inteiros
+
+
+def flow_hash(rec: PacketRecord) -> int:
+    # Simétrico (XOR) e determinístico entre processos: inteiros não usam hash aleatório.
+    # Fragmentos ignoram as portas para que todos os de um datagrama tenham a mesma decisão.
+    ports = 0 if rec.is_fragment else (rec.src_port ^ rec.dst_port) & 0xFFFF
+    h = (rec.src_int ^ rec.dst_int) * 0x9E3779B1 + ports * 0x85EBCA6B + rec.ip_proto
+    h ^= h >> 29
+    return (h * 0xC2B2AE3D) >> 16
+
+
+class Sampler:
+    """Decide quais pacotes processar e com que peso."""
+
+    def __init__(self, mode: str = 'off', rate: int = 1, max_rate: int = 1024,
+                 interval: float = 1.0, high_load: float = 0.85, low_load: float = 0.4,
+                 on_change: Optional[Callable[['Sampler', str], None]] = None) -> None:
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Modo de amostragem inválido: {mode}")
+        if rate < 1:
+            raise ValueError("Taxa de amostragem deve ser >= 1")
+        self.mode = mode
+        if mode == 'adaptive':
+            # Arredonda para potência de 2 (teste por máscara)
+            rate = 1 << (rate - 1).bit_length()
+        self.rate = 1 if mode == 'off' else rate
+        self.max_rate = max_rate
+        self.interval = interval
+        self.high_load = high_load
+        self.low_load = low_load
+        self.on_change = on_change
+        self.seen = 0
+        self.sampled = 0
+        # Janela de medição da carga (modo adaptativo)
+        self.load = 0.0
+        self.last_drops = 0
+        self._drops_seen = 0  # total de descartes do kernel na última janela
+        self._busy = 0.0
+        self._window_start: Optional[float] = None
+        self._counter = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 1 or self.mode == 'adaptive'
+
+    def weight(self, rec: PacketRecord) -> int:
+        """Peso do pacote na estimativa (0 = descartado pela amostragem)."""
+        self.seen += 1
+        n = self.rate
+        if n == 1:
+            self.sampled += 1
+            return 1
+        if self.mode == 'fixed':
+            self._counter += 1
+            if self._counter < n:
+                return 0
+            self._counter = 0
+        elif self.mode == 'flow':
+            if flow_hash(rec) % n:
+                return 0
+        elif flow_hash(rec) & (n - 1):
+            return 0
+        self.sampled += 1
+        return n
+
+    def observe(self, busy: float, total_drops: Optional[Callable[[], int]] = None,
+                now: Optional[float] = None) -> None:
+        """Registra `busy` segundos de processamento de um lote (modo adaptativo).
+
+        A cada `interval` calcula a carga (fração do tempo processando) e os
+        descartes do kernel desde a janela anterior (`total_drops` devolve o
+        total acumulado), ajustando a taxa se necessário.
+        """
+        if self.mode != 'adaptive':
+            return
+        now = time.monotonic() if now is None else now
+        if self._window_start is None:
+            self._window_start = now
+        self._busy += busy
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+        self.load = min(1.0, self._busy / elapsed)
+        if total_drops is not None:
+            total = total_drops()
+            self.last_drops = max(0, total - self._drops_seen)
+            self._drops_seen = total
+        self._busy = 0.0
+        self._window_start = now
+        if (self.last_drops or self.load > self.high_load) and self.rate < self.max_rate:
+            self._set_rate(self.rate * 2, 'drops' if self.last_drops else 'carga')
+        elif not self.last_drops and self.load < self.low_load and self.rate > 1:
+            self._set_rate(self.rate // 2, 'folga')
+
+    def _set_rate(self, rate: int, reason: str) -> None:
+        self.rate = rate
+        if self.on_change:
+            self.on_change(self, reason)
@@ -0,0 +1,306 @@
+"""
+Auto-instrumentação do laço de captura (--self-stats).
+
+StageProfiler cronometra 1 a cada `sample_every` quadros, estágio por
+estágio, e guarda os tempos em histogramas logarítmicos (LogHistogram, no
+estilo HDR: 16 sub-faixas por potência de 2, erro relativo de no máximo
+~6%, memória fixa). Estágios por quadro:
+
+- aplicacao: _identify_app (remontagem TCP, classificação, parsers)
+- fluxos: FlowTable.update
+- log: log_rec/log dos loggers (só o enfileiramento; a escrita é de outra thread)
+- stats: Stats.add_packet e a consulta ao cache de DNS passivo
+- decodificacao: o resto do quadro (decode, filtro, amostragem, fragmentos)
+- quadro: o quadro inteiro
+
+e por lote: captura (recv_batch, inclui a espera por pacotes) e lote
+(process_batch inteiro, inclusive a expiração de fluxos e remontagem).
+
+Os quadros amostrados passam por _process_frame com os métodos dos
+componentes trocados por versões cronometradas (atributos de instância,
+removidos logo depois); o tempo de chamadas aninhadas (ex.: app_log dentro
+de _identify_app) conta só no estágio mais interno, e o custo dos próprios
+invólucros fica em decodificacao. Os demais quadros (e todos eles, com a
+instrumentação desligada) seguem o caminho normal, sem custo extra por
+pacote.
+
+Os contadores PACKET_STATISTICS do AF_PACKET (pacotes e descartes do kernel)
+são lidos a cada `kernel_interval` segundos, entre lotes.
+"""
+import json
+import sys
+import time
+from itertools import islice
+from typing import Dict, List, Optional
+
+FRAME_STAGES = ('decodificacao', 'aplicacao', 'fluxos', 'log', 'stats', 'quadro')
+BATCH_STAGES = ('captura', 'lote')
+
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS  # valores abaixo disso têm balde próprio
+_HALF = _SUB >> 1  # sub-faixas por potência de 2 acima de _SUB
+
+
+class LogHistogram:
+    """Histograma de inteiros (ns) com baldes logarítmicos de precisão fixa."""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self) -> None:
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def index(v: int) -> int:
+        if v < _SUB:
+            return v
+        shift = v.bit_length() - _SUB_BITS
+        return _SUB + ((shift - 1) << (_SUB_BITS - 1)) + (v >> shift) - _HALF
+
+    @staticmethod
+    def bucket_range(i: int) -> tuple:
+        """Intervalo [início, fim) de valores do balde i."""
+        if i < _SUB:
+            return i, i + 1
+        k = i - _SUB
+        shift = (k >> (_SUB_BITS - 1)) + 1
+        low = ((k & (_HALF - 1)) + _HALF) << shift
+        return low, low + (1 << shift)
+
+    def record(self, v: int) -> None:
+        if v < 0:
+            v = 0
+        i = self.index(v)
+        counts = self.counts
+        if i >= len(counts):
+            counts.extend([0] * (i + 1 - len(counts)))
+        counts[i] += 1
+        if not self.count or v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+        self.count += 1
+        self.total += v
+
+    def merge(self, other: 'LogHistogram') -> None:
+        if not other.count:
+            return
+        counts = self.counts
+        if len(other.counts) > len(counts):
+            counts.extend([0] * (len(other.counts) - len(counts)))
+        for i, n in enumerate(other.counts):
+            counts[i] += n
+        self.min = other.min if not self.count else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, q: float) -> int:
+        """Valor no quantil q (0..1): meio do balde, limitado ao mínimo/máximo vistos."""
+        if not self.count:
+            return 0
+        target = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                low, high = self.bucket_range(i)
+                return min(max((low + high - 1) // 2, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        us = lambda ns: round(ns / 1000, 2)
+        return {'count': self.count, 'mean_us': us(self.total / self.count) if self.count else 0.0,
+                'p50_us': us(self.percentile(0.5)), 'p90_us': us(self.percentile(0.9)),
+                'p99_us': us(self.percentile(0.99)), 'p999_us': us(self.percentile(0.999)),
+                'max_us': us(self.max)}
+
+
+class StageProfiler:
+    def __init__(self, sample_every: int = 64, kernel_interval: float = 1.0) -> None:
+        self.sample_every = max(1, sample_every)
+        self.kernel_interval = kernel_interval
+        self.hist: Dict[str, LogHistogram] = {name: LogHistogram() for name in BATCH_STAGES + FRAME_STAGES}
+        self.frames = 0
+        self.sampled = 0
+        self.kernel: Optional[Dict] = None
+        self._next = self.sample_every - 1  # posição do próximo quadro amostrado no lote atual
+        self._hooks: List[tuple] = []
+        self._acc = [0] * len(FRAME_STAGES)
+        self._hit = [False] * len(FRAME_STAGES)
+        self._inner = 0  # tempo já atribuído a estágios dentro da chamada atual
+        self._kernel_due = 0.0
+        self._kernel_last = (0, 0)
+        self._clock = time.perf_counter_ns
+
+    def __getstate__(self) -> Dict:
+        # Os invólucros são do processo que captura: só os contadores vão para
+        # o pickle (envio dos workers à UI)
+        state = self.__dict__.copy()
+        state['_hooks'] = []
+        return state
+
+    @classmethod
+    def merged(cls, parts: List['StageProfiler']) -> 'StageProfiler':
+        """Soma os histogramas e contadores de vários perfis (ex.: dos workers)."""
+        out = cls(parts[0].sample_every if parts else 64)
+        for p in parts:
+            out.frames += p.frames
+            out.sampled += p.sampled
+            for name, h in p.hist.items():
+                out.hist[name].merge(h)
+            if p.kernel is not None:
+                k = out.kernel or {'packets': 0, 'drops': 0, 'recent_packets': 0, 'recent_drops': 0}
+                for key in ('packets', 'drops', 'recent_packets', 'recent_drops'):
+                    k[key] += p.kernel[key]
+                k['drop_ratio'] = round(k['drops'] / k['packets'], 6) if k['packets'] else 0.0
+                out.kernel = k
+        return out
+
+    def bind(self, mon) -> None:
+        """Prepara as versões cronometradas dos métodos dos componentes do Monitor."""
+        targets = [(mon, '_identify_app', 'aplicacao'), (mon.internet_log, 'log_rec', 'log'),
+                   (mon.transp_log, 'log_rec', 'log'), (mon.app_log, 'log', 'log'),
+                   (mon.stats, 'add_packet', 'stats')]
+        if mon.flows is not None:
+            targets.append((mon.flows, 'update', 'fluxos'))
+        if mon.dns is not None:
+            targets.append((mon.dns, 'lookup', 'stats'))
+        self._hooks = [(obj, attr, self._wrap(getattr(obj, attr), FRAME_STAGES.index(stage)))
+                       for obj, attr, stage in targets]
+
+    def _wrap(self, fn, i: int):
+        clock = self._clock
+        acc, hit = self._acc, self._hit
+
+        def timed(*args, **kwargs):
+            outer = self._inner
+            self._inner = 0
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                dt = clock() - t0
+                acc[i] += dt - self._inner
+                hit[i] = True
+                self._inner = outer + dt
+        return timed
+
+    def _timed_frame(self, process, frame) -> None:
+        hooks = self._hooks
+        acc, hit = self._acc, self._hit
+        for j in range(len(acc)):
+            acc[j] = 0
+            hit[j] = False
+        for obj, attr, timed in hooks:
+            setattr(obj, attr, timed)
+        self._inner = 0
+        t0 = self._clock()
+        try:
+            process(frame)
+        finally:
+            total = self._clock() - t0
+            for obj, attr, _ in hooks:
+                delattr(obj, attr)
+        hist = self.hist
+        acc[0] = total - self._inner
+        hit[0] = True
+        for j, stage in enumerate(FRAME_STAGES[:-1]):
+            if hit[j]:
+                hist[stage].record(acc[j])
+        hist['quadro'].record(total)
+        self.sampled += 1
+
+    def process(self, mon, batch) -> None:
+        """Substitui o laço de quadros de process_batch, cronometrando os amostrados."""
+        process = mon._process_frame
+        n = len(batch)
+        pos = self._next
+        start = 0
+        while pos < n:
+            for frame in islice(batch, start, pos):
+                process(frame)
+            self._timed_frame(process, batch[pos])
+            start = pos + 1
+            pos += self.sample_every
+        for frame in islice(batch, start, None):
+            process(frame)
+        self._next = pos - n
+        self.frames += n
+        self.poll_kernel(mon)
+
+    def run(self, mon) -> None:
+        """Laço de captura cronometrado (Monitor._loop_capture com --self-stats)."""
+        clock = self._clock
+        capture, lote = self.hist['captura'], self.hist['lote']
+        recv = mon.cap.recv_batch
+        process_batch = mon.process_batch
+        stop = mon._stop
+        while not stop.is_set():
+            t0 = clock()
+            try:
+                batch = recv()
+            except Exception:
+                break
+            t1 = clock()
+            # Lote vazio ainda passa por process_batch (expiração, janela da
+            # amostragem), mas a espera ociosa não entra nos histogramas
+            process_batch(batch)
+            if batch:
+                capture.record(t1 - t0)
+                lote.record(clock() - t1)
+
+    def poll_kernel(self, mon, force: bool = False) -> None:
+        read = mon._read_kernel
+        if read is None:
+            return
+        now = time.monotonic()
+        if not force and now < self._kernel_due:
+            return
+        self._kernel_due = now + self.kernel_interval
+        read()
+        packets, drops = mon.cap.kernel_packets, mon.cap.kernel_drops
+        last_p, last_d = self._kernel_last
+        self._kernel_last = (packets, drops)
+        # tp_packets do kernel já inclui os descartados
+        self.kernel = {'packets': packets, 'drops': drops,
+                       'drop_ratio': round(drops / packets, 6) if packets else 0.0,
+                       'recent_packets': packets - last_p, 'recent_drops': drops - last_d}
+
+    def summary(self) -> Dict:
+        out = {'sample_every': self.sample_every, 'frames': self.frames, 'sampled': self.sampled,
+               'stages': {name: h.summary() for name, h in self.hist.items() if h.count}}
+        if self.kernel is not None:
+            out['kernel'] = dict(self.kernel)
+        return out
+
+
+STAGE_LABELS = {'captura': 'captura (lote)', 'lote': 'lote', 'decodificacao': 'decodificação',
+                'aplicacao': 'aplicação', 'fluxos': 'fluxos', 'log': 'log', 'stats': 'stats', 'quadro': 'quadro'}
+
+
+def format_report(summary: Dict) -> str:
+    lines = [f"Auto-instrumentação: {summary['sampled']} de {summary['frames']} quadros cronometrados "
+             f"(1/{summary['sample_every']})",
+             f"  {'estágio':<16} {'n':>8} {'média':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'p99.9':>9} {'máx':>9}  (µs)"]
+    for name, s in summary['stages'].items():
+        lines.append(f"  {STAGE_LABELS.get(name, name):<16} {s['count']:>8} {s['mean_us']:>9.2f} {s['p50_us']:>9.2f} "
+                     f"{s['p90_us']:>9.2f} {s['p99_us']:>9.2f} {s['p999_us']:>9.2f} {s['max_us']:>9.2f}")
+    k = summary.get('kernel')
+    if k:
+        lines.append(f"  kernel: pacotes={k['packets']} descartes={k['drops']} ({k['drop_ratio']:.2%}), "
+                     f"último intervalo {k['recent_drops']}/{k['recent_packets']}")
+    return "\n".join(lines)
+
+
+def dump(summary: Dict, target: str) -> None:
+    """'-' escreve a tabela em stderr; outro valor grava o resumo em JSON nesse arquivo."""
+    if target == '-':
+        print(format_report(summary), file=sys.stderr)
+        return
+    with open(target, 'w', encoding='utf-8') as fh:
+        json.dump(summary, fh, indent=2, ensure_ascii=False)
+        fh.write('\n')
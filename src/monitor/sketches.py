@@ -0,0 +1,111 @@
+"""
+Sketches de memória limitada para contagem de chaves frequentes.
+
+- SpaceSaving: mantém no máximo `capacity` chaves. Ao chegar uma chave nova
+  com a tabela cheia, a de menor estimativa é expulsa e a nova herda essa
+  estimativa como erro. Garantias (N = soma dos pesos vistos):
+  * toda chave com contagem real > N/capacity está na tabela;
+  * para uma chave rastreada, real ∈ [count, count + error] e error <= N/capacity.
+  Aqui `count` é o que foi somado desde que a chave entrou; o que foi
+  acumulado antes (em estadias anteriores) está no balde "outros".
+
+- CountMinSketch: matriz depth × width de contadores; a estimativa de qualquer
+  chave (rastreada ou não) é >= real e, com probabilidade 1 - e^-depth, excede
+  o real em no máximo (e/width)·N. Usa atualização conservadora.
+"""
+import heapq
+from array import array
+from typing import Dict, Hashable, List, Optional, Tuple
+
+OTHER = 'outros'
+
+
+class SpaceSaving:
+    """Top-k por Space-Saving; `add` retorna a chave expulsa (ou None)."""
+
+    __slots__ = ('capacity', 'counts', 'errors', 'total', '_heap')
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("Capacidade deve ser >= 1")
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self.total = 0
+        # Heap preguiçoso de (estimativa, chave): estimativas só crescem, então
+        # uma entrada antiga é limite inferior e é corrigida ao chegar ao topo
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def estimate(self, key: Hashable) -> int:
+        return self.counts.get(key, 0) + self.errors.get(key, 0)
+
+    def add(self, key: Hashable, weight: int = 1) -> Optional[Hashable]:
+        self.total += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return None
+        evicted = None
+        error = 0
+        if len(counts) >= self.capacity:
+            evicted, error = self._pop_min()
+        counts[key] = weight
+        self.errors[key] = error
+        heapq.heappush(self._heap, (error + weight, key))
+        return evicted
+
+    def _pop_min(self) -> Tuple[Hashable, int]:
+        heap = self._heap
+        while True:
+            est, key = heap[0]
+            if key not in self.counts:
+                heapq.heappop(heap)  # chave já removida
+                continue
+            cur = self.estimate(key)
+            if cur != est:
+                heapq.heapreplace(heap, (cur, key))
+                continue
+            heapq.heappop(heap)
+            del self.counts[key]
+            del self.errors[key]
+            return key, cur
+
+    @property
+    def max_error(self) -> int:
+        # Limite de erro atual para qualquer chave rastreada (<= total/capacity)
+        return max(self.errors.values(), default=0)
+
+
+class CountMinSketch:
+    """Count-Min com atualização conservadora e memória fixa (depth × width)."""
+
+    __slots__ = ('width', 'depth', 'total', '_rows', '_seeds')
+
+    def __init__(self, width: int = 1024, depth: int = 4) -> None:
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._rows = [array('q', bytes(8 * width)) for _ in range(depth)]
+        self._seeds = [0x9E3779B1 * (i + 1) for i in range(depth)]
+
+    def _cols(self, key: Hashable) -> List[int]:
+        h = hash(key)
+        w = self.width
+        return [((h ^ s) * 0x85EBCA6B >> 7) % w for s in self._seeds]
+
+    def add(self, key: Hashable, weight: int = 1) -> None:
+        self.total += weight
+        cols = self._cols(key)
+        rows = self._rows
+        target = min(row[c] for row, c in zip(rows, cols)) + weight
+        for row, c in zip(rows, cols):
+            if row[c] < target:
+                row[c] = target
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[c] for row, c in zip(self._rows, self._cols(key)))
+
+    @property
+    def error_bound(self) -> float:
+        # Sobre-estimativa máxima (com probabilidade 1 - e^-depth)
+        return 2.718281828 / self.width * self.total
@@ -1,6 +1,12 @@
-from collections import defaultdict
+import heapq
+import threading
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
-from typing import Dict, Tuple
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .sketches import OTHER, CountMinSketch, SpaceSaving
+from .timeseries import RateSeries
 
 
 @dataclass
@@ -10,69 +16,522 @@ class EndpointStats:
     tcp_connections: int = 0  # contado via SYN
     ports: Dict[int, int] = field(default_factory=lambda: defaultdict(int))  # porta -> contagem
     protocols: Dict[str, int] = field(default_factory=lambda: defaultdict(int))  # nome -> contagem
+    # Modo limitado: pacotes possivelmente contados em "outros" antes de voltar à tabela
+    error: int = 0
+    port_tracker: Optional[SpaceSaving] = None
+    # pps/bps por segundo (último minuto e última hora); nunca na entrada "outros"
+    series: Optional[RateSeries] = None
+    name: Optional[str] = None  # nome visto no DNS passivo (o mais recente)
 
 
 @dataclass
 class ClientStats:
     total_packets: int = 0
     total_bytes: int = 0
+    packets_var: int = 0  # variância da estimativa de pacotes sob amostragem por pacote (soma de N*(N-1))
     proto_counts: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
     endpoints: Dict[str, EndpointStats] = field(default_factory=dict)  # remote_ip -> EndpointStats
+    # Modo limitado: top-k de endpoints (Space-Saving) e estimativa de qualquer endpoint (Count-Min)
+    tracker: Optional[SpaceSaving] = None
+    sketch: Optional[CountMinSketch] = None
+    series: Optional[RateSeries] = None
 
 
 class Stats:
-    """Agrega estatísticas por cliente (IP da rede túnel) e globais."""
+    """Agrega estatísticas por cliente (IP da rede túnel) e globais.
 
-    def __init__(self) -> None:
+    Com max_endpoints/max_ports o uso de memória fica limitado: cada cliente
+    rastreia no máximo max_endpoints endpoints e cada endpoint no máximo
+    max_ports portas (Space-Saving); o que é expulso é somado na entrada
+    "outros", então os totais continuam exatos. Um Count-Min por cliente
+    estima os pacotes de qualquer endpoint, inclusive os expulsos.
+
+    Snapshots são incrementais: add_packet marca (cliente, endpoint) como
+    sujo; commit() recalcula só as vistas sujas, mantém o top-k de endpoints
+    de cada cliente e publica uma nova versão. delta(versão) devolve apenas o
+    que mudou desde a versão informada (ou tudo, se ela for antiga demais).
+    As vistas publicadas nunca são alteradas depois, só substituídas.
+
+    Com `ts` em add_packet, cada endpoint, cliente e o global mantêm uma
+    RateSeries (pps/bps atuais, média e pico). Só os endpoints que o tracker
+    mantém têm série (~2 KB cada; "outros" não tem). As taxas são calculadas
+    na leitura, no máximo uma vez por segundo e só para os clientes com
+    tráfego no último minuto e, em cada um, os TOP_K endpoints mais ativos
+    agora: entre os que tiveram pacotes no último minuto, os de maior pps no
+    último segundo completo (empate: total de pacotes). Assim um endpoint
+    novo que domina o link ganha taxa no segundo seguinte, mesmo longe do
+    top por total. As vistas dos demais endpoints não trazem 'rates' e só
+    mudam quando eles recebem pacotes.
+    Com amostragem por pacote, a vista de cada cliente traz o desvio padrão
+    da estimativa de pacotes ('packets_stderr'). Com packet_variance=False
+    (amostragem por fluxo) ela não é publicada: fluxos inteiros entram ou
+    saem, e a soma de N*(N-1) por pacote subestimaria o erro.
+    Com track_series=False (buffers de ConcurrentStats) as séries dão lugar a
+    `buckets`, os deltas de pacotes/bytes por (cliente, endpoint, segundo),
+    que o merge soma nas séries do destino em cada segundo certo.
+    """
+
+    TOP_K = 10  # endpoints mantidos no top de cada cliente
+    TOP_ITEMS = 5  # portas/protocolos por endpoint
+    HISTORY = 64  # versões cujo conjunto de mudanças é guardado para deltas
+
+    def __init__(self, max_endpoints: Optional[int] = None, max_ports: Optional[int] = None,
+                 sketch_width: int = 1024, sketch_depth: int = 4, track_series: bool = True,
+                 packet_variance: bool = True) -> None:
         self.clients: Dict[str, ClientStats] = {}
         self.global_proto: Dict[str, int] = defaultdict(int)
+        self.track_series = track_series
+        self.packet_variance = packet_variance
+        self.series = RateSeries() if track_series else None
+        # Sem séries: (cliente, endpoint, segundo) -> [pacotes, bytes]
+        self.buckets: Dict[Tuple[str, str, int], List[int]] = {}
+        self.clock = 0.0  # maior timestamp visto
+        self.max_endpoints = max_endpoints or None
+        self.max_ports = max_ports or None
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        self._init_views()
+
+    def _init_views(self) -> None:
+        self.version = 0
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._removed: Set[Tuple[str, str]] = set()
+        # cliente -> vista publicada (com 'endpoints': rip -> vista do endpoint)
+        self._views: Dict[str, Dict] = {}
+        self._top: Dict[str, List[str]] = {}
+        # (versão, clientes, chaves alteradas, chaves removidas) das últimas versões
+        self._history: deque = deque(maxlen=self.HISTORY)
+        # cliente -> último segundo com tráfego, para atualizar taxas
+        self._recent: Dict[str, int] = {}
+        # cliente -> {endpoint: último segundo com tráfego} e endpoints com taxas
+        self._active: Dict[str, Dict[str, int]] = {}
+        self._rated: Dict[str, List[str]] = {}
+        self._rates_sec = -1  # segundo da última atualização das taxas
+
+    def __getstate__(self) -> Dict:
+        # Vistas são derivadas: não vão para o pickle (envio entre workers)
+        state = self.__dict__.copy()
+        for k in ('version', '_dirty', '_removed', '_views', '_top', '_history', '_recent', '_rates_sec',
+                  '_active', '_rated'):
+            state.pop(k, None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._init_views()
+        self._dirty = {(cip, rip) for cip, cs in self.clients.items() for rip in cs.endpoints}
+
+    @property
+    def bounded(self) -> bool:
+        return bool(self.max_endpoints or self.max_ports)
 
     def _get_client(self, client_ip: str) -> ClientStats:
         cs = self.clients.get(client_ip)
         if not cs:
             cs = ClientStats()
+            if self.max_endpoints:
+                cs.tracker = SpaceSaving(self.max_endpoints)
+                cs.sketch = CountMinSketch(self.sketch_width, self.sketch_depth)
             self.clients[client_ip] = cs
         return cs
 
-    def add_packet(self, client_ip: str, remote_ip: str, proto_name: str, length: int, dst_port: int | None = None, is_tcp_syn: bool = False) -> None:
-        cs = self._get_client(client_ip)
+    def _add_port(self, es: EndpointStats, port, n: int) -> None:
+        if port != OTHER and self.max_ports:
+            if es.port_tracker is None:
+                es.port_tracker = SpaceSaving(self.max_ports)
+            evicted = es.port_tracker.add(port, n)
+            if evicted is not None:
+                es.ports[OTHER] += es.ports.pop(evicted, 0)
+        es.ports[port] += n
+
+    def _fold(self, es: EndpointStats, other: EndpointStats) -> None:
+        # Soma os contadores de `other` em `es` respeitando o limite de portas
+        es.packets += other.packets
+        es.bytes += other.bytes
+        es.tcp_connections += other.tcp_connections
+        es.error += other.error
+        for port, n in other.ports.items():
+            self._add_port(es, port, n)
+        for proto, n in other.protocols.items():
+            es.protocols[proto] += n
+
+    def _bounded_endpoint(self, client_ip: str, cs: ClientStats, remote_ip: str, weight: int) -> EndpointStats:
+        cs.sketch.add(remote_ip, weight)
+        evicted = cs.tracker.add(remote_ip, weight)
+        if evicted is not None:
+            other = cs.endpoints.get(OTHER)
+            if other is None:
+                other = cs.endpoints[OTHER] = EndpointStats()
+            self._fold(other, cs.endpoints.pop(evicted))
+            self._removed.add((client_ip, evicted))
+            self._dirty.add((client_ip, OTHER))
         es = cs.endpoints.get(remote_ip)
         if not es:
-            es = EndpointStats()
-            cs.endpoints[remote_ip] = es
+            es = cs.endpoints[remote_ip] = EndpointStats(error=cs.tracker.errors[remote_ip])
+        return es
+
+    def estimate_endpoint(self, client_ip: str, remote_ip: str) -> int:
+        """Pacotes estimados de um endpoint, mesmo que já expulso da tabela."""
+        cs = self.clients.get(client_ip)
+        if cs is None:
+            return 0
+        if cs.sketch is not None and remote_ip not in cs.endpoints:
+            return cs.sketch.estimate(remote_ip)
+        es = cs.endpoints.get(remote_ip)
+        return es.packets if es else 0
+
+    def add_packet(self, client_ip: str, remote_ip: str, proto_name: str, length: int, dst_port: int | None = None,
+                   is_tcp_syn: bool = False, weight: int = 1, ts: float | None = None,
+                   remote_name: str | None = None) -> None:
+        # weight > 1: pacote amostrado 1 a cada `weight`; os contadores viram estimativas
+        # ts: timestamp do pacote (segundos), alimenta as séries de taxa
+        # remote_name: nome do endpoint no cache de DNS passivo, se houver
+        cs = self._get_client(client_ip)
+        if cs.tracker is not None:
+            es = self._bounded_endpoint(client_ip, cs, remote_ip, weight)
+        else:
+            es = cs.endpoints.get(remote_ip)
+            if not es:
+                es = EndpointStats()
+                cs.endpoints[remote_ip] = es
+        self._dirty.add((client_ip, remote_ip))
         # Atualizações
-        cs.total_packets += 1
-        cs.total_bytes += length
-        cs.proto_counts[proto_name] += 1
-        self.global_proto[proto_name] += 1
-
-        es.packets += 1
-        es.bytes += length
-        es.protocols[proto_name] += 1
+        cs.total_packets += weight
+        cs.total_bytes += length * weight
+        cs.proto_counts[proto_name] += weight
+        self.global_proto[proto_name] += weight
+        if weight > 1:
+            cs.packets_var += weight * (weight - 1)
+
+        es.packets += weight
+        es.bytes += length * weight
+        es.protocols[proto_name] += weight
+        if remote_name is not None:
+            es.name = remote_name
         if dst_port is not None:
-            es.ports[dst_port] += 1
+            if self.max_ports:
+                self._add_port(es, dst_port, weight)
+            else:
+                es.ports[dst_port] += weight
         if is_tcp_syn:
-            es.tcp_connections += 1
+            es.tcp_connections += weight
+        if ts is not None:
+            if ts > self.clock:
+                self.clock = ts
+            if self.track_series:
+                sec = int(ts)
+                nbytes = length * weight
+                if es.series is None:
+                    es.series = RateSeries()
+                es.series.add(sec, weight, nbytes)
+                if cs.series is None:
+                    cs.series = RateSeries()
+                cs.series.add(sec, weight, nbytes)
+                self.series.add(sec, weight, nbytes)
+            else:
+                key = (client_ip, remote_ip, int(ts))
+                b = self.buckets.get(key)
+                if b is None:
+                    self.buckets[key] = [weight, length * weight]
+                else:
+                    b[0] += weight
+                    b[1] += length * weight
+
+    def merge(self, other: 'Stats') -> None:
+        """Soma os contadores de outro Stats (ex.: de um worker) neste."""
+        for proto, n in other.global_proto.items():
+            self.global_proto[proto] += n
+        if other.clock > self.clock:
+            self.clock = other.clock
+        self.packet_variance = self.packet_variance and other.packet_variance
+        if other.series is not None and self.series is not None:
+            self.series.merge(other.series)
+        for cip, ocs in other.clients.items():
+            cs = self._get_client(cip)
+            cs.total_packets += ocs.total_packets
+            cs.total_bytes += ocs.total_bytes
+            cs.packets_var += ocs.packets_var
+            if ocs.series is not None:
+                if cs.series is None:
+                    cs.series = RateSeries()
+                cs.series.merge(ocs.series)
+            for proto, n in ocs.proto_counts.items():
+                cs.proto_counts[proto] += n
+            for rip, oes in ocs.endpoints.items():
+                if cs.tracker is not None and rip != OTHER:
+                    es = self._bounded_endpoint(cip, cs, rip, oes.packets)
+                else:
+                    es = cs.endpoints.get(rip)
+                    if not es:
+                        es = EndpointStats()
+                        cs.endpoints[rip] = es
+                self._fold(es, oes)
+                if oes.name is not None:
+                    es.name = oes.name
+                if rip != OTHER and oes.series is not None:
+                    if es.series is None:
+                        es.series = RateSeries()
+                    es.series.merge(oes.series)
+                self._dirty.add((cip, rip))
+        if self.track_series:
+            self._merge_buckets(other.buckets)
+
+    def _merge_buckets(self, buckets: Dict[Tuple[str, str, int], List[int]]) -> None:
+        # Deltas por segundo de um buffer sem séries
+        clients = self.clients
+        for (cip, rip, sec), (packets, nbytes) in buckets.items():
+            self.series.add(sec, packets, nbytes)
+            cs = clients[cip]
+            if cs.series is None:
+                cs.series = RateSeries()
+            cs.series.add(sec, packets, nbytes)
+            es = cs.endpoints.get(rip)
+            if es is not None and rip != OTHER:
+                if es.series is None:
+                    es.series = RateSeries()
+                es.series.add(sec, packets, nbytes)
+
+    @classmethod
+    def merged(cls, parts) -> 'Stats':
+        # O resultado não é limitado: no máximo a soma dos limites das partes
+        out = cls()
+        for st in parts:
+            out.merge(st)
+        return out
 
-    def snapshot(self) -> Dict:
-        # Retorna vista imutável básica para UI
-        out: Dict[str, Dict] = {
-            'global_proto': dict(self.global_proto),
-            'clients': {}
+    def _endpoint_view(self, es: EndpointStats, now: Optional[int]) -> Dict:
+        # now=None: endpoint sem taxas (fora dos mais ativos)
+        n = self.TOP_ITEMS
+        view = {
+            'packets': es.packets,
+            'bytes': es.bytes,
+            'tcp_connections': es.tcp_connections,
+            'top_ports': heapq.nlargest(n, es.ports.items(), key=itemgetter(1)),
+            'top_protocols': heapq.nlargest(n, es.protocols.items(), key=itemgetter(1)),
+            'error': es.error,
         }
-        for cip, cs in self.clients.items():
-            out['clients'][cip] = {
+        if es.name is not None:
+            view['name'] = es.name
+        if now is not None and es.series is not None:
+            view['rates'] = es.series.rates(now)
+        return view
+
+    def _update_top(self, cip: str, cs: ClientStats, changed: Set[str], removed: Set[str]) -> List[str]:
+        eps = cs.endpoints
+        top = self._top.get(cip)
+        if top is None or removed.intersection(top):
+            # Primeira vez ou saída de um membro do top: recalcula do zero
+            top = heapq.nlargest(self.TOP_K, eps, key=lambda r: eps[r].packets)
+        else:
+            # Contagens só crescem: só endpoints alterados podem entrar no top
+            cand = set(top)
+            cand.update(r for r in changed if r in eps)
+            top = heapq.nlargest(self.TOP_K, cand, key=lambda r: eps[r].packets)
+        self._top[cip] = top
+        return top
+
+    def _update_rated(self, cip: str, cs: ClientStats, now: int) -> List[str]:
+        # Os TOP_K endpoints mais ativos: pps do segundo now-1, depois o total
+        active = self._active.get(cip)
+        if not active:
+            return []
+        for rip in [r for r, last in active.items() if now - last > 61]:
+            del active[rip]
+        eps = cs.endpoints
+
+        def key(rip):
+            es = eps[rip]
+            return (es.series.packets_at(now - 1) if es.series is not None else 0), es.packets
+        rated = heapq.nlargest(self.TOP_K, (r for r in active if r in eps), key=key)
+        self._rated[cip] = rated
+        return rated
+
+    def commit(self, now: Optional[float] = None) -> int:
+        """Recalcula as vistas sujas e publica uma nova versão (se houve mudança).
+
+        `now` é o relógio das taxas (padrão: maior timestamp visto).
+        """
+        # Troca os conjuntos antes de iterar: a captura continua marcando nos novos
+        dirty, self._dirty = self._dirty, set()
+        removed, self._removed = self._removed, set()
+        now_s = int(self.clock if now is None else now)
+        by_client: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        for cip, rip in dirty:
+            by_client.setdefault(cip, (set(), set()))[0].add(rip)
+        for cip, rip in removed:
+            by_client.setdefault(cip, (set(), set()))[1].add(rip)
+        refresh = False
+        if self.series is not None and self.series.sec >= 0:
+            recent = self._recent
+            for cip in by_client:
+                recent[cip] = now_s
+            active = self._active
+            for cip, rip in dirty:
+                if rip != OTHER:
+                    active.setdefault(cip, {})[rip] = now_s
+            for cip, rip in removed:
+                active.get(cip, {}).pop(rip, None)
+            if now_s != self._rates_sec:
+                # Uma vez por segundo: taxas de quem teve tráfego no último minuto
+                self._rates_sec = now_s
+                refresh = True
+                for cip in [c for c, last in recent.items() if now_s - last > 61]:
+                    del recent[cip]
+                for cip in recent:
+                    by_client.setdefault(cip, (set(), set()))
+        if not by_client:
+            return self.version
+        self.version += 1
+        changed_keys: Set[Tuple[str, str]] = set()
+        for cip, (changed, gone) in by_client.items():
+            cs = self.clients[cip]
+            old = self._views.get(cip)
+            top = self._update_top(cip, cs, changed, gone)
+            old_rated = self._rated.get(cip, ())
+            if refresh:
+                rated = set(self._update_rated(cip, cs, now_s))
+                changed |= rated
+                # Quem deixou de estar entre os mais ativos perde as taxas
+                changed.update(r for r in old_rated if r not in rated)
+            else:
+                rated = set(old_rated)
+            endpoints = dict(old['endpoints']) if old else {}
+            for rip in gone:
+                endpoints.pop(rip, None)
+            for rip in changed:
+                es = cs.endpoints.get(rip)
+                if es is not None:
+                    endpoints[rip] = self._endpoint_view(es, now_s if rip in rated else None)
+                    changed_keys.add((cip, rip))
+            view = {
                 'total_packets': cs.total_packets,
                 'total_bytes': cs.total_bytes,
                 'proto_counts': dict(cs.proto_counts),
-                'endpoints': {
-                    rip: {
-                        'packets': es.packets,
-                        'bytes': es.bytes,
-                        'tcp_connections': es.tcp_connections,
-                        'top_ports': sorted(es.ports.items(), key=lambda x: x[1], reverse=True)[:5],
-                        'top_protocols': sorted(es.protocols.items(), key=lambda x: x[1], reverse=True)[:5],
-                    } for rip, es in cs.endpoints.items()
-                }
+                'top_endpoints': top,
+                'endpoints': endpoints,
             }
+            if self.packet_variance:
+                # Desvio padrão da estimativa de total_packets (0 sem amostragem)
+                view['packets_stderr'] = round(cs.packets_var ** 0.5, 1)
+            if cs.tracker is not None:
+                view['endpoint_error'] = cs.tracker.max_error
+            if cs.series is not None:
+                view['rates'] = cs.series.rates(now_s)
+            self._views[cip] = view
+        self._history.append((self.version, set(by_client), changed_keys, removed))
+        return self.version
+
+    def delta(self, since: int = 0, now: Optional[float] = None) -> Dict:
+        """Mudanças desde a versão `since`; 'full' indica snapshot completo."""
+        version = self.commit(now)
+        history = self._history
+        full = since <= 0 or not history or since < history[0][0] - 1
+        out: Dict = {'version': version, 'full': full, 'global_proto': dict(self.global_proto), 'clients': {}}
+        if self.series is not None and self.series.sec >= 0:
+            out['rates'] = self.series.rates(int(self.clock if now is None else now))
+        clients = out['clients']
+        if full:
+            for cip, view in self._views.items():
+                clients[cip] = view
+            return out
+        touched: Set[str] = set()
+        changed: Set[Tuple[str, str]] = set()
+        removed: Set[Tuple[str, str]] = set()
+        for v, cl, ch, rm in history:
+            if v > since:
+                touched |= cl
+                changed |= ch
+                removed |= rm
+        for cip in touched:
+            view = self._views[cip]
+            eps = view['endpoints']
+            part = {k: v for k, v in view.items() if k != 'endpoints'}
+            part['endpoints'] = {r: eps[r] for c, r in changed if c == cip and r in eps}
+            part['removed'] = [r for c, r in removed if c == cip and r not in eps]
+            clients[cip] = part
         return out
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        # Vista completa para UI; reaproveita as vistas de endpoints não alteradas
+        d = self.delta(0, now)
+        out = {'global_proto': d['global_proto'], 'clients': d['clients']}
+        if 'rates' in d:
+            out['rates'] = d['rates']
+        return out
+
+
+class _Writer:
+    __slots__ = ('seq', 'active', 'retired')
+
+    def __init__(self) -> None:
+        self.seq = 0  # ímpar enquanto o escritor atualiza o buffer ativo
+        self.active = Stats(track_series=False)
+        self.retired: List[Stats] = []
+
+
+class ConcurrentStats:
+    """Stats seguro para vários escritores e leitores sem travar a captura.
+
+    Cada thread escritora (descoberta via threading.local) acumula num Stats
+    privado. Na leitura, o buffer ativo de cada escritor é trocado por um novo
+    e o antigo é somado ao Stats principal, que só o leitor toca. O escritor
+    incrementa `seq` antes e depois de cada atualização, e só lê o buffer
+    ativo com `seq` ímpar: se após a troca `seq` estiver par, nenhuma
+    atualização iniciada antes da troca está em curso e o buffer antigo pode
+    ser somado; se estiver ímpar, a soma fica para a próxima leitura.
+    Escritores nunca esperam; leitores se serializam entre si.
+    """
+
+    def __init__(self, **stats_opts) -> None:
+        self.master = Stats(**stats_opts)
+        self._local = threading.local()
+        self._writers: List[_Writer] = []
+        self._register_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+
+    def _register(self) -> _Writer:
+        w = _Writer()
+        with self._register_lock:
+            self._writers = self._writers + [w]
+        self._local.w = w
+        return w
+
+    def add_packet(self, *args, **kwargs) -> None:
+        try:
+            w = self._local.w
+        except AttributeError:
+            w = self._register()
+        w.seq += 1
+        w.active.add_packet(*args, **kwargs)
+        w.seq += 1
+
+    def _merge_writers(self) -> Stats:
+        master = self.master
+        for w in self._writers:
+            buf = w.active
+            if buf.clients or buf.global_proto:
+                w.active = Stats(track_series=False)
+                w.retired.append(buf)
+            if not w.retired or w.seq & 1:
+                continue
+            for part in w.retired:
+                master.merge(part)
+            w.retired = []
+        return master
+
+    def collect(self) -> Stats:
+        """Soma os buffers dos escritores no Stats principal e o retorna."""
+        with self._read_lock:
+            return self._merge_writers()
+
+    def delta(self, since: int = 0, now: Optional[float] = None) -> Dict:
+        with self._read_lock:
+            return self._merge_writers().delta(since, now)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        with self._read_lock:
+            return self._merge_writers().snapshot(now)
+
+    def estimate_endpoint(self, client_ip: str, remote_ip: str) -> int:
+        with self._read_lock:
+            return self._merge_writers().estimate_endpoint(client_ip, remote_ip)
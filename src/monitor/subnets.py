@@ -0,0 +1,72 @@
+import ipaddress
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SubnetClassifier:
+    """Testa se endereços pertencem a um conjunto de prefixos IPv4/IPv6.
+
+    Os prefixos são compilados numa tabela de máscaras por versão: para cada
+    comprimento de prefixo distinto há um conjunto com as redes (inteiras)
+    deslocadas. Uma consulta faz um deslocamento e um teste de pertinência em
+    set por comprimento, do mais longo ao mais curto, trabalhando direto com
+    os inteiros do decodificador (sem ipaddress no caminho quente).
+
+    Um cache LRU guarda o resultado para os endereços vistos recentemente.
+    """
+
+    _V6_TAG = 1 << 128  # distingue chaves IPv6 das IPv4 no cache
+
+    def __init__(self, prefixes: Iterable[str], cache_size: int = 4096) -> None:
+        self.networks: List[ipaddress._BaseNetwork] = []
+        # versão -> lista de (shift, conjunto de redes deslocadas), prefixo mais longo primeiro
+        self._tables: Dict[int, List[Tuple[int, frozenset]]] = {4: [], 6: []}
+        by_len: Dict[Tuple[int, int], set] = {}
+        for text in prefixes:
+            for part in text.split(','):
+                part = part.strip()
+                if not part:
+                    continue
+                net = ipaddress.ip_network(part, strict=False)
+                self.networks.append(net)
+                bits = net.max_prefixlen
+                shift = bits - net.prefixlen
+                by_len.setdefault((net.version, shift), set()).add(int(net.network_address) >> shift)
+        for (version, shift), nets in sorted(by_len.items(), key=lambda kv: kv[0][1]):
+            self._tables[version].append((shift, frozenset(nets)))
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+
+    def _lookup(self, version: int, addr: int) -> bool:
+        for shift, nets in self._tables[version]:
+            if (addr >> shift) in nets:
+                return True
+        return False
+
+    def contains(self, version: int, addr: int) -> bool:
+        key = addr if version == 4 else addr | self._V6_TAG
+        cache = self._cache
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        hit = self._lookup(version, addr)
+        cache[key] = hit
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
+        return hit
+
+    def contains_ip(self, ip: str) -> bool:
+        addr = ipaddress.ip_address(ip)
+        return self.contains(addr.version, int(addr))
+
+    def classify(self, version: int, src: int, dst: int) -> Optional[bool]:
+        """True se o cliente é a origem, False se é o destino, None se nenhum."""
+        if self.contains(version, src):
+            return True
+        if self.contains(version, dst):
+            return False
+        return None
+
+    def __str__(self) -> str:
+        return ', '.join(str(n) for n in self.networks)
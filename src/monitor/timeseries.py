@@ -0,0 +1,127 @@
+"""
+Séries temporais de taxa (pacotes e bytes) em anéis de tamanho fixo.
+
+Cada RateSeries guarda dois anéis: 60 baldes de 1 s (último minuto) e 60
+baldes de 1 min (última hora). Somar num balde é O(1); ao avançar o relógio
+só os baldes que ficaram para trás são zerados (no máximo o tamanho do anel).
+Segundos fora de ordem dentro da janela (ex.: lotes de workers diferentes)
+caem no balde certo; mais antigos que a janela são ignorados.
+"""
+from array import array
+from typing import Dict
+
+FINE = 60  # baldes de 1 s
+COARSE = 60  # baldes de 60 s
+
+
+class RateSeries:
+    __slots__ = ('sec', 'fine_p', 'fine_b', 'coarse_p', 'coarse_b')
+
+    def __init__(self) -> None:
+        self.sec = -1  # segundo mais recente já visto
+        self.fine_p = array('q', bytes(8 * FINE))
+        self.fine_b = array('q', bytes(8 * FINE))
+        self.coarse_p = array('q', bytes(8 * COARSE))
+        self.coarse_b = array('q', bytes(8 * COARSE))
+
+    def _roll(self, sec: int) -> None:
+        old = self.sec
+        if old < 0:
+            self.sec = sec
+            return
+        for s in range(max(old + 1, sec - FINE + 1), sec + 1):
+            i = s % FINE
+            self.fine_p[i] = 0
+            self.fine_b[i] = 0
+        old_m, new_m = old // 60, sec // 60
+        for m in range(max(old_m + 1, new_m - COARSE + 1), new_m + 1):
+            j = m % COARSE
+            self.coarse_p[j] = 0
+            self.coarse_b[j] = 0
+        self.sec = sec
+
+    def add(self, sec: int, packets: int, nbytes: int) -> None:
+        if sec > self.sec:
+            self._roll(sec)
+        cur = self.sec
+        if cur - sec < FINE:
+            i = sec % FINE
+            self.fine_p[i] += packets
+            self.fine_b[i] += nbytes
+        if cur // 60 - sec // 60 < COARSE:
+            j = (sec // 60) % COARSE
+            self.coarse_p[j] += packets
+            self.coarse_b[j] += nbytes
+
+    def merge(self, other: 'RateSeries') -> None:
+        if other.sec < 0:
+            return
+        for s in range(other.sec - FINE + 1, other.sec + 1):
+            i = s % FINE
+            if other.fine_p[i] or other.fine_b[i]:
+                self._add_fine(s, other.fine_p[i], other.fine_b[i])
+        for m in range(other.sec // 60 - COARSE + 1, other.sec // 60 + 1):
+            j = m % COARSE
+            if other.coarse_p[j] or other.coarse_b[j]:
+                self._add_coarse(m, other.coarse_p[j], other.coarse_b[j])
+
+    def _add_fine(self, sec: int, packets: int, nbytes: int) -> None:
+        if sec > self.sec:
+            self._roll(sec)
+        if self.sec - sec < FINE:
+            i = sec % FINE
+            self.fine_p[i] += packets
+            self.fine_b[i] += nbytes
+
+    def _add_coarse(self, minute: int, packets: int, nbytes: int) -> None:
+        if minute * 60 > self.sec:
+            self._roll(minute * 60)
+        if self.sec // 60 - minute < COARSE:
+            j = minute % COARSE
+            self.coarse_p[j] += packets
+            self.coarse_b[j] += nbytes
+
+    def packets_at(self, sec: int) -> int:
+        """Pacotes do segundo `sec` (0 fora da janela fina)."""
+        if sec > self.sec or self.sec - sec >= FINE or sec < 0:
+            return 0
+        return self.fine_p[sec % FINE]
+
+    def rates(self, now: int) -> Dict[str, float]:
+        """Taxas em `now` (segundo): atual (último segundo completo), média e pico.
+
+        'pps'/'bps' usam o segundo now-1; '*_60s' a janela (now-60, now-1];
+        '*_1h' os minutos completos da última hora, em média por segundo.
+        """
+        cur = self.sec
+        fine_p, fine_b = [], []
+        for s in range(now - FINE, now):
+            if s <= cur and cur - s < FINE and s >= 0:
+                i = s % FINE
+                fine_p.append(self.fine_p[i])
+                fine_b.append(self.fine_b[i])
+            else:
+                fine_p.append(0)
+                fine_b.append(0)
+        coarse_p, coarse_b = [], []
+        now_m, cur_m = now // 60, cur // 60
+        for m in range(now_m - COARSE, now_m):
+            if m <= cur_m and cur_m - m < COARSE and m >= 0:
+                j = m % COARSE
+                coarse_p.append(self.coarse_p[j])
+                coarse_b.append(self.coarse_b[j])
+            else:
+                coarse_p.append(0)
+                coarse_b.append(0)
+        return {
+            'pps': fine_p[-1],
+            'bps': fine_b[-1] * 8,
+            'avg_pps_60s': sum(fine_p) / FINE,
+            'avg_bps_60s': sum(fine_b) * 8 / FINE,
+            'peak_pps_60s': max(fine_p),
+            'peak_bps_60s': max(fine_b) * 8,
+            'avg_pps_1h': sum(coarse_p) / (COARSE * 60),
+            'avg_bps_1h': sum(coarse_b) * 8 / (COARSE * 60),
+            'peak_pps_1h': max(coarse_p) / 60,
+            'peak_bps_1h': max(coarse_b) * 8 / 60,
+        }
@@ -1,7 +1,4 @@
-import os
-import shutil
 import sys
-import time
 from typing import Dict
 
 
@@ -14,6 +11,21 @@ def human_bytes(n: int) -> str:
     return f"{n:.1f}PB"
 
 
+def human_rate(bps: float) -> str:
+    for unit in ['bit/s', 'kbit/s', 'Mbit/s', 'Gbit/s']:
+        if bps < 1000:
+            return f"{bps:.0f}{unit}" if unit == 'bit/s' else f"{bps:.1f}{unit}"
+        bps /= 1000
+    return f"{bps:.1f}Tbit/s"
+
+
+def render_rates(r: Dict) -> str:
+    # Taxa atual, média e pico do último minuto (e média da última hora)
+    return (f"{r['pps']:.0f} pps {human_rate(r['bps'])} | média 60s {r['avg_pps_60s']:.1f} pps "
+            f"{human_rate(r['avg_bps_60s'])} | pico {r['peak_pps_60s']:.0f} pps {human_rate(r['peak_bps_60s'])} "
+            f"| média 1h {human_rate(r['avg_bps_1h'])}")
+
+
 def render(snapshot: Dict) -> str:
     lines: list[str] = []
     gp = snapshot.get('global_proto', {})
@@ -23,22 +35,54 @@ def render(snapshot: Dict) -> str:
         lines.append("  " + "  ".join(parts))
     else:
         lines.append("  (sem dados)")
+    if snapshot.get('rates'):
+        lines.append("  Taxa: " + render_rates(snapshot['rates']))
+    if snapshot.get('log_dropped'):
+        lines.append(f"  Linhas de log descartadas (fila cheia): {snapshot['log_dropped']}")
+    if 'flows_active' in snapshot:
+        lines.append(f"  Fluxos ativos: {snapshot['flows_active']}  exportados: {snapshot['flows_exported']}")
+    sampling = snapshot.get('sampling')
+    if sampling:
+        lines.append(f"  Amostragem {sampling['mode']}: 1/{sampling['rate']} (contagens estimadas)  "
+                     f"amostrados={sampling['sampled']}/{sampling['seen']}  descartes kernel={sampling['kernel_drops']}")
+    prof = snapshot.get('self_stats')
+    if prof:
+        stages = prof['stages']
+        parts = [f"{name}={s['p50_us']:.1f}/{s['p99_us']:.1f}" for name, s in stages.items()]
+        lines.append(f"  Latência µs p50/p99 (1/{prof['sample_every']} quadros): " + "  ".join(parts))
+        k = prof.get('kernel')
+        if k:
+            lines.append(f"  Kernel: pacotes={k['packets']} descartes={k['drops']} ({k['drop_ratio']:.2%})  "
+                         f"último intervalo={k['recent_drops']}/{k['recent_packets']}")
 
     clients = snapshot.get('clients', {})
     for cip, cs in clients.items():
         lines.append("")
-        lines.append(f"Cliente {cip}: pkts={cs['total_packets']} bytes={human_bytes(cs['total_bytes'])}")
+        err = f" (±{cs['packets_stderr']:.0f})" if cs.get('packets_stderr') else ''
+        lines.append(f"Cliente {cip}: pkts={cs['total_packets']}{err} bytes={human_bytes(cs['total_bytes'])}")
+        if cs.get('rates'):
+            lines.append("  Taxa: " + render_rates(cs['rates']))
         pc = cs.get('proto_counts', {})
         if pc:
             parts = [f"{k}:{v}" for k, v in sorted(pc.items(), key=lambda x: -x[1])[:6]]
             lines.append("  Prot.: " + ", ".join(parts))
         endpoints = cs.get('endpoints', {})
-        # Mostra top 3 endpoints por número de pacotes
-        top_eps = sorted(endpoints.items(), key=lambda x: -x[1]['packets'])[:3]
+        # Mostra top 3 endpoints por número de pacotes (já mantido pelo Stats, se disponível)
+        if 'top_endpoints' in cs:
+            top_eps = [(rip, endpoints[rip]) for rip in cs['top_endpoints'][:3] if rip in endpoints]
+        else:
+            top_eps = sorted(endpoints.items(), key=lambda x: -x[1]['packets'])[:3]
         for rip, es in top_eps:
             ports = ', '.join(f"{p}:{c}" for p, c in es['top_ports'])
             prots = ', '.join(f"{p}:{c}" for p, c in es['top_protocols'])
-            lines.append(f"  -> {rip}: pkts={es['packets']} bytes={human_bytes(es['bytes'])} conns={es['tcp_connections']}")
+            err = f" (+{es['error']})" if es.get('error') else ''
+            rate = ''
+            if es.get('rates'):
+                r = es['rates']
+                rate = f" agora={r['pps']:.0f}pps/{human_rate(r['bps'])} pico60s={r['peak_pps_60s']:.0f}pps"
+            name = f" ({es['name']})" if es.get('name') else ''
+            lines.append(f"  -> {rip}{name}: pkts={es['packets']}{err} bytes={human_bytes(es['bytes'])} "
+                         f"conns={es['tcp_connections']}{rate}")
             if ports:
                 lines.append(f"     portas: {ports}")
             if prots:
@@ -46,27 +90,58 @@ def render(snapshot: Dict) -> str:
     return "\n".join(lines)
 
 
-def print_periodic(get_snapshot_fn, interval: float = 1.0) -> None:
-    """Atualiza a cada intervalo.
+def render_throughput(packets: int, nbytes: int, elapsed: float) -> str:
+    # Resumo de desempenho ponta a ponta (usado na reprodução de pcap)
+    elapsed = max(elapsed, 1e-9)
+    pps = packets / elapsed
+    bps = nbytes * 8 / elapsed
+    return (f"Processados {packets} pacotes ({human_bytes(nbytes)}) em {elapsed:.3f}s: "
+            f"{pps:,.0f} pps, {bps / 1e6:,.2f} Mbit/s")
+
+
+class SnapshotMirror:
+    """Cópia local do snapshot mantida com os deltas de Stats.delta()."""
+
+    def __init__(self) -> None:
+        self.version = 0
+        self.data: Dict = {'global_proto': {}, 'clients': {}}
+
+    def apply(self, delta: Dict) -> Dict:
+        clients = self.data['clients']
+        if delta['full']:
+            clients.clear()
+        self.data['global_proto'] = delta['global_proto']
+        if 'rates' in delta:
+            self.data['rates'] = delta['rates']
+        for cip, part in delta['clients'].items():
+            cur = clients.get(cip)
+            if cur is None:
+                # Cópia rasa própria: as vistas publicadas pelo Stats não são alteradas
+                clients[cip] = dict(part, endpoints=dict(part['endpoints']))
+                clients[cip].pop('removed', None)
+                continue
+            eps = cur['endpoints']
+            for rip in part.get('removed', ()):
+                eps.pop(rip, None)
+            eps.update(part['endpoints'])
+            cur.update((k, v) for k, v in part.items() if k not in ('endpoints', 'removed'))
+        self.version = delta['version']
+        return self.data
+
+
+def print_periodic(get_snapshot_fn, interval: float = 1.0, until=None, top_n: int = 20,
+                   sort: str = 'bytes') -> None:
+    """Atualiza a cada intervalo até Ctrl+C, 'q' ou until() retornar True.
 
-    Se stdout não for TTY (ex: logs Docker), não tenta limpar a tela
-    para evitar poluir o log com códigos de controle.
+    Em terminal interativo abre o painel com redesenho por diferença (ver
+    dashboard.py); se stdout não for TTY (ex: logs Docker), emite um snapshot
+    compacto em JSON por linha, sem códigos de controle.
     """
-    is_tty = sys.stdout.isatty()
+    from .dashboard import Dashboard, json_lines
     try:
-        while True:
-            snap = get_snapshot_fn()
-            out = render(snap)
-            if is_tty:
-                # Limpa somente em terminal interativo
-                try:
-                    cols = shutil.get_terminal_size((100, 24)).columns  # noqa: F841
-                except Exception:
-                    pass
-                os.system('clear')
-            print(out)
-            if is_tty:
-                print("\nCtrl+C para encerrar.")
-            time.sleep(interval)
+        if sys.stdout.isatty():
+            Dashboard(get_snapshot_fn, interval, top_n, sort, inp=sys.stdin).run(until)
+        else:
+            json_lines(get_snapshot_fn, interval, until, sort, top_n)
     except KeyboardInterrupt:
         print("Encerrando monitor...")
@@ -0,0 +1,330 @@
+"""
+Processamento multi-core: N processos worker, cada um com seu próprio Stats
+e seus próprios CSVs (logs/worker-<i>/).
+
+Distribuição dos pacotes:
+- AF_PACKET ao vivo: cada worker abre seu socket no mesmo grupo PACKET_FANOUT
+  e o kernel divide os quadros por hash simétrico de fluxo.
+- TUN ou pcap: um único despachante lê a fonte e envia lotes, particionados
+  por hash de fluxo, para a fila de cada worker.
+
+Os workers enviam periodicamente seu Stats e os contadores do exportador
+(kernel, logs, pipeline, remontagem, auto-instrumentação) ao processo da UI,
+que combina os mais recentes com Stats.merge() e merge_extras(). Os logs dos workers (CSVs vivos e
+rotacionados, ou binários) podem ser unidos depois em CSVs com:
+
+    python -m src.monitor.workers merge logs/
+"""
+import glob
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import signal
+import sys
+import threading
+import time
+from itertools import chain
+from typing import Dict, List, Optional
+
+from . import ui
+from .capture import RawCapture
+from .logtool import QUERY_LOGS, query_rows, write_csv
+from .parsers.decoder import PacketRecord, decode
+from .pcap import PcapCapture
+from .selfstats import StageProfiler, format_report
+from .stats import Stats
+
+
+class QueueCapture:
+    """Fonte de captura que consome lotes de quadros L3 de uma fila."""
+
+    def __init__(self, q, idle_timeout: Optional[float] = None) -> None:
+        self.q = q
+        self.idle_timeout = idle_timeout
+        self.mode = 'queue'
+        self.interface = 'queue'
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def l3_offset(frame: bytes) -> int:
+        return 0
+
+    @staticmethod
+    def split_l2_l3(frame: bytes):
+        return None, frame
+
+    def recv_batch(self) -> List[bytes]:
+        try:
+            batch = self.q.get(timeout=self.idle_timeout)
+        except queue.Empty:
+            return []
+        if batch is None:
+            raise EOFError("Despachante encerrado")
+        return batch
+
+
+def flow_shard(rec: PacketRecord, n: int) -> int:
+    # XOR torna o hash simétrico: os dois sentidos do fluxo caem no mesmo worker.
+    # Fragmentos vão só pelos endereços, para o datagrama ser remontado num worker só.
+    ports = 0 if rec.is_fragment else rec.src_port ^ rec.dst_port
+    return hash((rec.src_int ^ rec.dst_int, ports)) % n
+
+
+def _report(mon) -> bytes:
+    extras = mon.metrics_extras()
+    if mon.profiler is not None:
+        extras['self_stats'] = mon.profiler  # histogramas, somados na UI
+    return pickle.dumps((mon.stats.collect(), extras), pickle.HIGHEST_PROTOCOL)
+
+
+def _add(total, value):
+    if isinstance(value, dict):
+        total = dict(total or {})
+        for k, v in value.items():
+            total[k] = _add(total.get(k), v)
+        return total
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (total or 0) + value
+    return value if total is None else total
+
+
+def merge_extras(parts: List[dict]) -> dict:
+    """Soma os contadores extras dos workers (ver Monitor.metrics_extras)."""
+    out: dict = {}
+    profiles = []
+    for part in parts:
+        for k, v in part.items():
+            if k == 'self_stats':
+                profiles.append(v)
+            else:
+                out[k] = _add(out.get(k), v)
+    if 'sampling' in out:
+        # Cada worker ajusta a própria taxa: a maior delas, não a soma
+        out['sampling']['rate'] = max(p['sampling']['rate'] for p in parts if 'sampling' in p)
+    if profiles:
+        out['self_stats'] = StageProfiler.merged(profiles).summary()
+    return out
+
+
+def _worker_main(idx: int, monitor_kwargs: dict, frame_q, result_q, stop_ev, interval: float,
+                 measure_pipeline: bool = False) -> None:
+    # Ctrl+C é tratado pelo processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from .main import Monitor
+
+    kwargs = dict(monitor_kwargs)
+    kwargs['log_dir'] = os.path.join(kwargs.get('log_dir', 'logs'), f'worker-{idx}')
+    if frame_q is not None:
+        kwargs['capture'] = QueueCapture(frame_q, idle_timeout=interval)
+    mon = Monitor(**kwargs)
+    if measure_pipeline:
+        mon.pipeline = {'batches': 0, 'frames': 0, 'busy_seconds': 0.0}
+    try:
+        mon.open()
+    except Exception as e:
+        print(f"Worker {idx}: falha ao abrir captura: {e}", file=sys.stderr)
+        result_q.put((idx, None, True))
+        return
+    # Laço de captura na própria thread. O Stats é serializado aqui, entre lotes:
+    # a fila só faz o pickle depois, na thread alimentadora, enquanto o laço já
+    # voltou a alterar o Stats
+    process_batch = mon.process_batch
+    last = time.monotonic()
+    while not stop_ev.is_set():
+        try:
+            batch = mon.cap.recv_batch()
+        except Exception:
+            break
+        process_batch(batch)
+        now = time.monotonic()
+        if now - last >= interval:
+            result_q.put((idx, _report(mon), False))
+            last = now
+    mon.stop()
+    if mon.profiler is not None:
+        print(f"Worker {idx}:\n{format_report(mon.profiler.summary())}", file=sys.stderr)
+    result_q.put((idx, _report(mon), True))
+
+
+class ShardedMonitor:
+    """Orquestra N workers com a mesma interface pública de Monitor."""
+
+    def __init__(self, workers: int, monitor_kwargs: dict, interval: float = 1.0) -> None:
+        if workers < 2:
+            raise ValueError("Modo multi-worker requer pelo menos 2 workers")
+        self.n = workers
+        self.monitor_kwargs = dict(monitor_kwargs)
+        self.interval = interval
+        self._ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+        self._stop = self._ctx.Event()
+        self._results = self._ctx.Queue()
+        self._frame_qs: List = []
+        self._procs: List = []
+        self._latest: Dict[int, Stats] = {}
+        self._extras: Dict[int, dict] = {}
+        # Contadores do laço de captura nos workers (exportador de métricas ativo)
+        self.measure_pipeline = False
+        self._finished: set = set()
+        self._dispatcher: Optional[threading.Thread] = None
+        self.source = None
+        self.interface = monitor_kwargs.get('interface')
+        # UI e exportador de métricas leem de threads diferentes
+        self._snap_lock = threading.Lock()
+
+    def _needs_dispatcher(self) -> bool:
+        # Só AF_PACKET suporta PACKET_FANOUT; TUN e arquivos passam pelo despachante
+        return bool(self.monitor_kwargs.get('read_file')) or str(self.interface).startswith('tun')
+
+    def start(self) -> None:
+        kwargs = self.monitor_kwargs
+        if self._needs_dispatcher():
+            opts = dict(kwargs.get('capture_opts') or {})
+            if kwargs.get('read_file'):
+                self.source = PcapCapture(kwargs['read_file'], kwargs.get('replay', 'max'),
+                                          batch_size=opts.get('batch_size', 64))
+            else:
+                self.source = RawCapture(self.interface, **opts)
+            self.source.open()
+            self._frame_qs = [self._ctx.Queue(maxsize=256) for _ in range(self.n)]
+        else:
+            opts = dict(kwargs.get('capture_opts') or {})
+            opts['fanout_group'] = os.getpid() & 0xFFFF
+            # Acorda periodicamente para publicar o Stats mesmo sem tráfego
+            opts['idle_timeout'] = self.interval
+            kwargs = dict(kwargs, capture_opts=opts)
+        t0 = time.perf_counter()
+        for i in range(self.n):
+            fq = self._frame_qs[i] if self._frame_qs else None
+            p = self._ctx.Process(target=_worker_main, name=f'monitor-worker-{i}',
+                                  args=(i, kwargs, fq, self._results, self._stop, self.interval,
+                                        self.measure_pipeline), daemon=True)
+            p.start()
+            self._procs.append(p)
+        if self.source is not None:
+            self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self._dispatcher.start()
+        if self.source is not None and self.source.mode == 'pcap':
+            if self.source.replay == 'max':
+                while not self._all_finished():
+                    self._collect(timeout=self.interval)
+            else:
+                ui.print_periodic(self.snapshot, until=self._all_finished, **self._ui_opts())
+            elapsed = time.perf_counter() - t0
+            print(ui.render(self.snapshot()))
+            print()
+            print(ui.render_throughput(self.source.packets, self.source.bytes, elapsed))
+            return
+        # Encerra a UI se todos os workers terminarem (ex.: falha ao abrir a captura)
+        ui.print_periodic(self.snapshot, until=self._all_finished, **self._ui_opts())
+
+    def _ui_opts(self) -> dict:
+        return {'interval': self.interval, **(self.monitor_kwargs.get('ui_opts') or {})}
+
+    def _dispatch(self) -> None:
+        rec = PacketRecord()
+        src = self.source
+        n = self.n
+        qs = self._frame_qs
+        while not self._stop.is_set():
+            try:
+                batch = src.recv_batch()
+            except Exception:
+                break
+            shards: List[List[bytes]] = [[] for _ in range(n)]
+            for frame in batch:
+                off = src.l3_offset(frame)
+                if off < 0 or not decode(rec, frame, off):
+                    continue
+                # Copia para bytes: os buffers da fonte são reutilizados no próximo lote
+                shards[flow_shard(rec, n)].append(bytes(frame[off:]))
+            for i, sh in enumerate(shards):
+                if sh:
+                    qs[i].put(sh)
+        for q in qs:
+            q.put(None)
+
+    def _collect(self, timeout: float = 0.0) -> None:
+        try:
+            item = self._results.get(timeout=timeout) if timeout else self._results.get_nowait()
+            while True:
+                idx, st, done = item
+                if st is not None:
+                    self._latest[idx], self._extras[idx] = pickle.loads(st)
+                if done:
+                    self._finished.add(idx)
+                item = self._results.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _all_finished(self) -> bool:
+        self._collect()
+        return len(self._finished) >= self.n
+
+    def snapshot(self) -> dict:
+        with self._snap_lock:
+            self._collect()
+            return Stats.merged(list(self._latest.values())).snapshot()
+
+    def metrics_snapshot(self) -> dict:
+        with self._snap_lock:
+            self._collect()
+            snap = Stats.merged(list(self._latest.values())).snapshot()
+            snap.update(merge_extras(list(self._extras.values())))
+            return snap
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.source is not None:
+            try:
+                self.source.close()
+            except Exception:
+                pass
+        for p in self._procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+
+
+def merge_worker_logs(log_dir: str = 'logs', out_dir: Optional[str] = None) -> List[str]:
+    """Une os logs de logs/worker-*/ em CSVs ordenados por timestamp; retorna arquivos gerados.
+
+    Lê os CSVs vivos e rotacionados (inclusive .gz/.zst) de cada worker e, com
+    --log-format binary, os segmentos e fluxos.bin (ver logtool.query_rows).
+    """
+    out_dir = out_dir or os.path.join(log_dir, 'merged')
+    dirs = sorted(glob.glob(os.path.join(log_dir, 'worker-*')))
+    written: List[str] = []
+    for log in QUERY_LOGS:
+        rows = iter(query_rows(dirs, log))
+        first = next(rows, None)
+        if first is None:
+            continue
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, f"{log}.csv")
+        with open(out_path, 'w', newline='', encoding='utf-8') as out:
+            write_csv(chain((first,), rows), log, out)
+        written.append(out_path)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    p = argparse.ArgumentParser(description='Utilitários do modo multi-worker')
+    sub = p.add_subparsers(dest='cmd', required=True)
+    m = sub.add_parser('merge', help='Une os logs por worker em CSVs ordenados por timestamp')
+    m.add_argument('log_dir', nargs='?', default='logs')
+    m.add_argument('-o', '--out-dir', help='Diretório de saída (padrão: <log_dir>/merged)')
+    args = p.parse_args(argv)
+    for path in merge_worker_logs(args.log_dir, args.out_dir):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
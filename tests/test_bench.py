@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+
+from src.monitor.bench.__main__ import main as bench_main
+from src.monitor.bench.suite import BenchConfig, compare, config_mismatch, run_suite
+from src.monitor.bench.traffic import MemoryCapture, synthetic_traffic
+from src.monitor.main import Monitor
+from src.monitor.parsers.decoder import PacketRecord, decode
+
+
+class TestSyntheticTraffic(unittest.TestCase):
+    def test_deterministic_and_decodable(self):
+        frames = synthetic_traffic(2000, endpoints=50000, seed=7)
+        self.assertEqual(frames, synthetic_traffic(2000, endpoints=50000, seed=7))
+        self.assertNotEqual(frames, synthetic_traffic(2000, endpoints=50000, seed=8))
+        rec = PacketRecord()
+        kinds = Counter()
+        remotes = set()
+        for f in frames:
+            self.assertTrue(decode(rec, f))
+            kinds[(rec.ip_name, rec.l4_name)] += 1
+            remotes.add(rec.dst if rec.src.startswith(('172.31.66.', 'fd00:66:')) else rec.src)
+        for kind in (('IPv4', 'TCP'), ('IPv4', 'UDP'), ('IPv4', 'ICMP'), ('IPv6', 'TCP'), ('IPv6', 'UDP')):
+            self.assertIn(kind, kinds)
+        self.assertGreater(len(remotes), 100)
+        with self.assertRaises(ValueError):
+            synthetic_traffic(1, mix='nada')
+
+    def test_memory_capture_feeds_monitor(self):
+        frames = synthetic_traffic(1500, mix='web', endpoints=64)
+        cap = MemoryCapture(frames, batch_size=32)
+        with tempfile.TemporaryDirectory() as tmp:
+            mon = Monitor('memory', capture=cap, log_dir=tmp)
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+            with open(os.path.join(tmp, 'aplicacao.csv')) as fh:
+                apps = Counter(line.split(',')[1] for line in fh.readlines()[1:])
+        self.assertEqual((cap.packets, cap.bytes), (1500, sum(map(len, frames))))
+        self.assertEqual(set(apps), {'HTTP', 'TLS', 'DNS'})
+        snap = mon.stats.snapshot()
+        self.assertEqual(sum(c['total_packets'] for c in snap['clients'].values()), 1500)
+
+
+class TestSuite(unittest.TestCase):
+    def test_run_suite_report(self):
+        cfg = BenchConfig(packets=300, endpoints=100, repeat=2)
+        report = run_suite(cfg, ['decode', 'identify_app', 'stats_snapshot', 'e2e_binary'])
+        self.assertEqual(list(report['results']), ['decode', 'identify_app', 'stats_snapshot', 'e2e_binary'])
+        res = report['results']['e2e_binary']
+        self.assertEqual((res['n'], res['repeat'], res['unit']), (300, 2, 'pacote'))
+        self.assertLessEqual(res['best_ns'], res['median_ns'])
+        self.assertGreater(res['detections'], 0)
+        json.dumps(report)  # serializável
+        with self.assertRaises(ValueError):
+            run_suite(cfg, ['nada'])
+
+    def test_compare_flags_regressions(self):
+        base = {'config': {'packets': 100, 'seed': 1, 'repeat': 5},
+                'results': {'a': {'median_ns': 100.0}, 'b': {'median_ns': 100.0},
+                            'c': {'median_ns': 100.0}, 'd': {'median_ns': 100.0}}}
+        cur = {'config': {'packets': 200, 'seed': 1, 'repeat': 3},
+               'results': {'a': {'median_ns': 125.0}, 'b': {'median_ns': 105.0},
+                           'c': {'median_ns': 50.0}, 'e': {'median_ns': 1.0}}}
+        status = {row['name']: row['status'] for row in compare(cur, base, tolerance=0.2)}
+        self.assertEqual(status, {'a': 'regressão', 'b': 'ok', 'c': 'melhora', 'e': 'novo', 'd': 'ausente'})
+        self.assertEqual(config_mismatch(cur, base), ['packets'])
+
+    def test_cli_baseline_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'base.json')
+            args = ['--packets', '200', '--repeat', '1', '--only', 'decode,csv_logger']
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(bench_main(args + ['-o', path]), 0)
+            with open(path) as fh:
+                base = json.load(fh)
+            base['results']['decode']['median_ns'] /= 1000  # linha de base "rápida demais"
+            with open(path, 'w') as fh:
+                json.dump(base, fh)
+            out = io.StringIO()
+            with redirect_stdout(out):
+                self.assertEqual(bench_main(args + ['--baseline', path, '--json']), 1)
+        rows = {r['name']: r['status'] for r in json.loads(out.getvalue())['comparison']['rows']}
+        self.assertEqual(rows['decode'], 'regressão')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.binlog import (BinAplicacaoLogger, BinInternetLogger, BinTransporteLogger, Segment,
+                                list_segments)
+from src.monitor.logtool import iter_rows, main, parse_time, write_csv
+from src.monitor.main import Monitor
+from src.monitor.pcap import LINKTYPE_RAW
+from test_parsers import build_ipv4, build_udp
+
+
+def rec(src, dst, sport=1000, dport=80, l4='TCP', version=4, ip_proto=6):
+    return SimpleNamespace(version=version, src_int=src, dst_int=dst, src_port=sport, dst_port=dport,
+                           l4_name=l4, ip_proto=ip_proto)
+
+
+A = 0x0A000001  # 10.0.0.1
+B = 0x0A000002  # 10.0.0.2
+V6 = 0x20010DB8 << 96 | 1  # 2001:db8::1
+
+
+class TestBinlog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip_matches_csv_schema(self):
+        lg = BinInternetLogger(self.dir)
+        lg.log_rec(rec(A, B, ip_proto=1), 'ICMP', 'ICMP type=8 code=0', 84)
+        lg.log_rec(rec(V6, V6 + 1, version=6, ip_proto=17), 'IPv6', '', 120)
+        lg.close()
+        rows = list(iter_rows([self.dir], 'internet'))
+        self.assertEqual([r[1:] for r in rows], [
+            ['ICMP', '10.0.0.1', '10.0.0.2', 1, 'ICMP type=8 code=0', 84],
+            ['IPv6', '2001:db8::1', '2001:db8::2', 17, '', 120],
+        ])
+        self.assertIn('T', rows[0][0])
+        out = io.StringIO()
+        write_csv(iter(rows), 'internet', out)
+        self.assertTrue(out.getvalue().startswith('timestamp,protocolo,src_ip,dst_ip,ip_proto,info,tamanho_bytes'))
+
+    def test_rollover_footer_and_filters(self):
+        lg = BinTransporteLogger(self.dir, segment_records=10)
+        for i in range(25):
+            lg.log_rec(rec(A, B if i % 2 else A + 5, sport=2000 + i, dport=443 if i < 5 else 53,
+                           l4='TCP' if i < 5 else 'UDP'), 60 + i)
+        lg.close()
+        paths = list_segments(self.dir, 'transporte')
+        self.assertEqual(len(paths), 3)
+        segs = [Segment(p) for p in paths]
+        self.assertTrue(all(s.complete for s in segs))
+        self.assertEqual([s.count for s in segs], [10, 10, 5])
+        self.assertEqual(list(segs[0].columns()['size'])[:3], [60, 61, 62])
+        self.assertEqual(len(list(iter_rows([self.dir], 'transporte', port=443))), 5)
+        self.assertEqual(len(list(iter_rows([self.dir], 'transporte', proto='udp', ip='10.0.0.2'))), 10)
+        last = segs[-1].min_ts
+        self.assertEqual(len(list(iter_rows([self.dir], 'transporte', since=last))), 5)
+        self.assertEqual(list(iter_rows([self.dir], 'transporte', until=segs[0].min_ts - 1)), [])
+
+    def test_live_segment_without_footer(self):
+        lg = BinAplicacaoLogger(self.dir, durability='sync')
+        lg.log('DNS', 'query example.com')
+        lg.log('SSH', 'banner')
+        seg = Segment(list_segments(self.dir, 'aplicacao')[0])
+        self.assertFalse(seg.complete)
+        rows = list(iter_rows([self.dir], 'aplicacao'))
+        self.assertEqual([r[1:] for r in rows], [['DNS', 'query example.com'], ['SSH', 'banner']])
+        self.assertEqual([r[1] for r in iter_rows([self.dir], 'aplicacao', proto='SSH')], ['SSH'])
+        lg.close()
+        self.assertTrue(Segment(seg.path).complete)
+
+    def test_new_writer_continues_numbering(self):
+        for _ in range(2):
+            BinAplicacaoLogger(self.dir).close()
+        names = [os.path.basename(p) for p in list_segments(self.dir, 'aplicacao')]
+        self.assertEqual(names, ['aplicacao-000001.seg', 'aplicacao-000002.seg'])
+
+    def test_cli_export(self):
+        lg = BinTransporteLogger(self.dir)
+        lg.log_rec(rec(A, B), 60)
+        lg.close()
+        out = os.path.join(self.dir, 'out.csv')
+        self.assertEqual(main(['filter', '--kind', 'transporte', '--port', '80', '-o', out, self.dir]), 0)
+        with open(out, encoding='utf-8') as fh:
+            lines = fh.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(',TCP,10.0.0.1,1000,10.0.0.2,80,60'))
+        self.assertEqual(main(['filter', '--kind', 'transporte', '--ip', 'x', self.dir]), 2)
+
+    def test_monitor_binary_format(self):
+        path = os.path.join(self.dir, 'in.pcap')
+        pkt = build_ipv4(17, bytes([172, 31, 66, 10]), bytes([8, 8, 8, 8]), build_udp(5000, 53, b'x' * 12))
+        write_pcap(path, LINKTYPE_RAW, [pkt] * 3)
+        log_dir = os.path.join(self.dir, 'logs')
+        mon = Monitor('tun0', '172.31.66.0/24', read_file=path, log_dir=log_dir, log_format='binary')
+        mon.cap.open()
+        mon._loop_capture()
+        mon.stop()
+        self.assertFalse(os.path.exists(os.path.join(log_dir, 'transporte.csv')))
+        rows = list(iter_rows([log_dir], 'transporte'))
+        self.assertEqual([r[1:6] for r in rows], [['UDP', '172.31.66.10', 5000, '8.8.8.8', 53]] * 3)
+        self.assertEqual(mon.stats.snapshot()['clients']['172.31.66.10']['total_packets'], 3)
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time('10'), 10 * 10 ** 9)
+        self.assertEqual(parse_time('1970-01-01T00:00:01'), 10 ** 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import struct
+import unittest
+
+from src.monitor.bpf import (
+    FilterSyntaxError, PacketFilter, SKF_AD_PROTOCOL, SKF_NET_OFF, parse_filter,
+)
+from src.monitor.parsers.decoder import PacketRecord, decode
+from test_parsers import build_ipv4, build_udp
+
+
+def run_bpf(program, pkt: bytes) -> int:
+    # Interpretador mínimo de BPF clássico para as instruções geradas
+    ethertype = 0x0800 if pkt[0] >> 4 == 4 else 0x86DD
+    a = x = 0
+    pc = 0
+
+    def load(off, size):
+        if off == SKF_AD_PROTOCOL:
+            return ethertype
+        off -= SKF_NET_OFF
+        if off + size > len(pkt):
+            raise IndexError
+        return int.from_bytes(pkt[off:off + size], 'big')
+
+    sizes = {0x00: 4, 0x08: 2, 0x10: 1}
+    try:
+        while True:
+            code, jt, jf, k = program[pc]
+            pc += 1
+            cls = code & 0x07
+            if cls == 0x06:
+                return k
+            if cls == 0x00:
+                off = k if code & 0xE0 == 0x20 else (k + x) & 0xFFFFFFFF
+                a = load(off, sizes[code & 0x18])
+            elif cls == 0x01:
+                x = 4 * (load(k, 1) & 0xF)
+            elif cls == 0x04:
+                a &= k
+            elif cls == 0x05:
+                op = code & 0xF0
+                if op == 0x00:
+                    pc += k
+                elif op == 0x10:
+                    pc += jt if a == k else jf
+                elif op == 0x40:
+                    pc += jt if a & k else jf
+    except IndexError:
+        return 0
+
+
+def ipv6_udp(src_last: int, dst_port: int) -> bytes:
+    udp = build_udp(5000, dst_port, b'x')
+    return (struct.pack('!IHBB', 6 << 28, len(udp), 17, 64)
+            + b'\xfd\x00' + b'\x00' * 13 + bytes([src_last]) + b'\x20\x01' + b'\x00' * 13 + b'\x01' + udp)
+
+
+class TestBpf(unittest.TestCase):
+    def setUp(self):
+        self.pkts = [
+            build_ipv4(17, b'\xAC\x1F\x42\x0A', b'\x08\x08\x08\x08', build_udp(40000, 53, b'x' * 12)),
+            build_ipv4(6, b'\xAC\x1F\x42\x0B', b'\x01\x01\x01\x01',
+                       struct.pack('!HHIIHHHH', 40001, 80, 0, 0, (5 << 12) | 2, 0, 0, 0)),
+            build_ipv4(1, b'\x0A\x00\x00\x01', b'\xAC\x1F\x42\x0A', b'\x08\x00\x00\x00'),
+            ipv6_udp(5, 53),
+            ipv6_udp(6, 123),
+        ]
+
+    def check(self, expr: str, expected: list):
+        pf = PacketFilter(expr)
+        rec = PacketRecord()
+        got_user, got_bpf = [], []
+        for pkt in self.pkts:
+            decode(rec, pkt)
+            got_user.append(pf.match(rec))
+            got_bpf.append(run_bpf(pf.program, pkt) > 0)
+        self.assertEqual(got_user, expected, expr)
+        self.assertEqual(got_bpf, expected, expr)
+
+    def test_expressions(self):
+        self.check('net 172.31.66.0/24', [True, True, True, False, False])
+        self.check('src net 172.31.66.0/24', [True, True, False, False, False])
+        self.check('port 53', [True, False, False, True, False])
+        self.check('tcp or icmp', [False, True, True, False, False])
+        self.check('not udp and host 172.31.66.10', [False, False, True, False, False])
+        self.check('ip6 and (dst port 123 || src host fd00::5)', [False, False, False, True, True])
+        self.check('net fd00::/16 and not port 123', [False, False, False, True, False])
+
+    def test_syntax_errors(self):
+        for bad in ('', 'port', 'host 300.1.1.1', 'tcp and', '(udp', 'src tcp', 'foo'):
+            with self.assertRaises(FilterSyntaxError, msg=bad):
+                parse_filter(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import select
+import socket
+import struct
+import threading
+import unittest
+
+from src.monitor.capture import RawCapture, TP_STATUS_USER
+from src.monitor.parsers.ip import parse_ip
+from src.monitor.parsers.transport import parse_udp
+from src.monitor.parsers.app import identify_app
+from test_parsers import build_ipv4, build_udp
+
+
+def build_block(frames: list[bytes], block_size: int = 4096) -> bytearray:
+    # Bloco TPACKET_V3 sintético: descritor de 48 bytes seguido dos quadros
+    blk = bytearray(block_size)
+    first = 48
+    struct.pack_into('=III', blk, 8, TP_STATUS_USER, len(frames), first)
+    off = first
+    for i, fr in enumerate(frames):
+        mac = 68  # cabeçalho tpacket3 + sockaddr_ll, alinhado
+        size = (mac + len(fr) + 15) & ~15
+        next_off = size if i < len(frames) - 1 else 0
+        struct.pack_into('=IIIIIIH', blk, off, next_off, 0, 0, len(fr), len(fr), 0, mac)
+        blk[off + mac:off + mac + len(fr)] = fr
+        off += size
+    return blk
+
+
+class TestRingBlock(unittest.TestCase):
+    def test_block_frames(self):
+        pkts = [b'\x00' * 14 + build_ipv4(17, b'\x0A\x00\x00\x01', b'\x0A\x00\x00\x02', build_udp(1, 123, b'x' * 48)),
+                b'\x00' * 14 + build_ipv4(6, b'\x0A\x00\x00\x03', b'\x0A\x00\x00\x04', b'\x00' * 20)]
+        view = memoryview(build_block(pkts))
+        frames = RawCapture.block_frames(view, 0)
+        self.assertEqual([bytes(f) for f in frames], pkts)
+        self.assertIsInstance(frames[0], memoryview)
+
+    def test_parsers_accept_memoryview(self):
+        http = b'GET /x HTTP/1.1\r\nHost: a\r\n\r\n'
+        pkt = build_ipv4(17, b'\x0A\x00\x00\x01', b'\x0A\x00\x00\x02', build_udp(50000, 80, http))
+        _l2, l3 = RawCapture.split_l2_l3(memoryview(b'\x00' * 12 + b'\x08\x00' + pkt))
+        ip_dict, name = parse_ip(l3)
+        self.assertEqual(name, 'IPv4')
+        self.assertEqual(ip_dict['dst'], '10.0.0.2')
+        udp = parse_udp(ip_dict['payload'])
+        app = identify_app(udp['src_port'], udp['dst_port'], udp['payload'])
+        self.assertEqual(app['name'], 'HTTP')
+        self.assertIn('GET /x HTTP/1.1', app['info'])
+
+
+class TestRecvBatch(unittest.TestCase):
+    def frames(self, n):
+        return [build_ipv4(17, b'\x0A\x00\x00\x01', b'\x0A\x00\x00\x02', build_udp(1000 + i, 53, b'q' * i))
+                for i in range(n)]
+
+    def test_socket_blocking_then_drain(self):
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        cap = RawCapture('lo', batch_size=4, snaplen=2048)
+        cap.sock = a
+        try:
+            pkts = self.frames(6)
+            for p in pkts:
+                b.send(p)
+            # Um recv_into bloqueante e o resto com MSG_DONTWAIT, até batch_size
+            first = cap.recv_batch()
+            self.assertEqual([bytes(f) for f in first], pkts[:4])
+            self.assertIs(first[0].obj, cap._pool[0])  # lido direto no pool, sem cópia
+            second = cap.recv_batch()
+            self.assertEqual([bytes(f) for f in second], pkts[4:])  # fila vazia encerra o lote
+            # O primeiro quadro espera o próximo datagrama
+            threading.Timer(0.05, b.send, args=(pkts[0],)).start()
+            self.assertEqual([bytes(f) for f in cap.recv_batch()], pkts[:1])
+            # Com idle_timeout, o lote volta vazio sem tráfego
+            cap.idle_timeout = 0.02
+            cap._poll = select.poll()
+            cap._poll.register(a.fileno(), select.POLLIN)
+            self.assertEqual(cap.recv_batch(), [])
+        finally:
+            cap.sock = None
+            a.close()
+            b.close()
+
+    def test_tun_readv(self):
+        r, w = os.pipe()
+        os.set_blocking(r, False)
+        cap = RawCapture('tun0', batch_size=4, snaplen=2048, idle_timeout=0.02)
+        cap.mode = 'tun'
+        cap.tun_fd = r
+        cap._poll = select.poll()
+        cap._poll.register(r, select.POLLIN)
+        try:
+            self.assertEqual(cap.recv_batch(), [])  # ocioso
+            pkt = self.frames(3)[2]
+            os.write(w, pkt)
+            batch = cap.recv_batch()
+            self.assertEqual([bytes(f) for f in batch], [pkt])
+            self.assertIs(batch[0].obj, cap._pool[0])
+            # Sem idle_timeout, espera no poll até chegar dado
+            cap.idle_timeout = None
+            threading.Timer(0.05, os.write, args=(w, pkt)).start()
+            self.assertEqual([bytes(f) for f in cap.recv_batch()], [pkt])
+        finally:
+            cap.tun_fd = None
+            os.close(r)
+            os.close(w)
+
+
+if __name__ == '__main__':
+    unittest.main()
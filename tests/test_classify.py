@@ -0,0 +1,155 @@
+import csv
+import os
+import struct
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.main import Monitor
+from src.monitor.parsers.app import REGISTRY, Classifier, ClassifierRegistry, FlowClassifier, identify_app
+from src.monitor.parsers.decoder import PacketRecord, decode
+from src.monitor.parsers.tls import parse_hello, sniff_quic, sniff_tls
+from src.monitor.pcap import LINKTYPE_RAW
+from test_parsers import build_ipv4
+
+CLIENT = b'\xAC\x1F\x42\x0A'
+SERVER = b'\x5D\xB8\xD8\x22'
+
+
+def extension(etype: int, data: bytes) -> bytes:
+    return struct.pack('!HH', etype, len(data)) + data
+
+
+def client_hello(sni: str, alpn=(b'h2', b'http/1.1')) -> bytes:
+    name = sni.encode()
+    exts = extension(0x0A0A, b'')  # GREASE
+    exts += extension(0, struct.pack('!HBH', len(name) + 3, 0, len(name)) + name)
+    protos = b''.join(bytes([len(p)]) + p for p in alpn)
+    exts += extension(16, struct.pack('!H', len(protos)) + protos)
+    exts += extension(43, bytes([6]) + b'\x1a\x1a\x03\x04\x03\x03')
+    body = b'\x03\x03' + b'\x00' * 32 + b'\x00' + struct.pack('!H', 4) + b'\x13\x01\x13\x02' + b'\x01\x00'
+    body += struct.pack('!H', len(exts)) + exts
+    hs = b'\x01' + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(hs)) + hs
+
+
+def quic_initial(dcid: bytes = bytes(range(8))) -> bytes:
+    return bytes([0xC3]) + struct.pack('!I', 1) + bytes([len(dcid)]) + dcid + b'\x00' + b'\x00' * 1180
+
+
+def tcp_rec(flags: int, data: bytes = b'', reply: bool = False) -> PacketRecord:
+    rec = PacketRecord()
+    sport, dport, src, dst = (443, 40000, SERVER, CLIENT) if reply else (40000, 443, CLIENT, SERVER)
+    seg = struct.pack('!HHIIHHHH', sport, dport, 1, 0, (5 << 12) | flags, 0, 0, 0) + data
+    decode(rec, build_ipv4(6, src, dst, seg))
+    return rec
+
+
+class TestTlsQuic(unittest.TestCase):
+    def test_client_hello_sni(self):
+        hello = parse_hello(client_hello('WWW.Example.com'))
+        self.assertEqual((hello['type'], hello['sni'], hello['version']), ('ClientHello', 'www.example.com', 0x0304))
+        self.assertEqual(hello['alpn'], ['h2', 'http/1.1'])
+        self.assertEqual(sniff_tls(client_hello('a.io')), 'TLS ClientHello versão=1.3 sni=a.io alpn=h2,http/1.1')
+
+    def test_truncated_hello_keeps_sni(self):
+        data = client_hello('cut.example.org')
+        hello = parse_hello(data[:len(data) - 12])
+        self.assertTrue(hello['truncated'])
+        self.assertEqual(hello['sni'], 'cut.example.org')
+        self.assertIsNone(sniff_tls(b'\x16\x05\x01\x00\x10'))
+        self.assertEqual(sniff_tls(b'\x17\x03\x03\x00\x10' + b'x' * 16), 'TLS application_data')
+
+    def test_quic_long_header(self):
+        self.assertEqual(sniff_quic(quic_initial()), 'QUIC v1 Initial dcid=0001020304050607')
+        self.assertIsNone(sniff_quic(b'\x43' + b'\x00' * 30))  # cabeçalho curto
+        self.assertIsNone(sniff_quic(b'\xC3\x00\x00\x00\x01\x30' + b'\x00' * 10))  # DCID > 20
+        app = identify_app(51000, 443, quic_initial())
+        self.assertEqual(app['name'], 'QUIC')
+
+
+class TestRegistry(unittest.TestCase):
+    def test_signatures_are_port_agnostic(self):
+        app = identify_app(40000, 3128, b'GET http://x/ HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertEqual(app['name'], 'HTTP')
+        app = identify_app(40000, 5000, client_hello('odd-port.example'))
+        self.assertEqual((app['name'], app['info'].split()[-2]), ('TLS', 'sni=odd-port.example'))
+        self.assertIsNone(identify_app(40000, 5000, b'GETX / HTTP/1.1\r\n'))
+        self.assertEqual(identify_app(40000, 53, b'\x00')['name'], 'DNS')  # porta basta
+
+    def test_port_index_respects_transport(self):
+        self.assertEqual(identify_app(51000, 443, quic_initial(), 17)['name'], 'QUIC')
+        self.assertIsNone(identify_app(51000, 443, quic_initial(), 6))  # QUIC não existe sobre TCP
+        self.assertEqual(identify_app(40000, 443, client_hello('a.io'), 6)['name'], 'TLS')
+        self.assertIsNone(identify_app(40000, 443, client_hello('a.io'), 17))
+        self.assertIsNone(identify_app(40000, 123, b'\x00', 6))  # NTP/DHCP só em UDP
+        self.assertEqual(identify_app(40000, 123, b'\x00', 17)['name'], 'NTP')
+        self.assertEqual(identify_app(40000, 53, b'\x00', 6)['name'], 'DNS')  # DNS nos dois
+
+    def test_custom_classifier(self):
+        reg = ClassifierRegistry()
+        for c in REGISTRY.classifiers:
+            reg.register(c)
+        reg.register(Classifier('SSH', lambda p: {'info': bytes(p[:16]).decode().strip()}
+                                if bytes(p[:4]) == b'SSH-' else None, ports=(22,), signatures=(b'SSH-',)))
+        result, c = reg.detect(40000, 2222, b'SSH-2.0-OpenSSH_9.6\r\n')
+        self.assertEqual((result['name'], c.name), ('SSH', 'SSH'))
+        self.assertEqual(reg.detect(40000, 22, b'\x00\x01')[0], None)
+
+
+class TestFlowClassifier(unittest.TestCase):
+    def test_per_flow_protocol_skips_later_packets(self):
+        fc = FlowClassifier()
+        rec = tcp_rec(0x18, client_hello('a.example'))
+        key = fc.key(rec)
+        self.assertEqual(fc.classify(key, 40000, 443, rec.payload)['name'], 'TLS')
+        reply = tcp_rec(0x18, b'\x17\x03\x03\x00\x01x', reply=True)
+        self.assertEqual(fc.key(reply), key)  # os dois sentidos são o mesmo fluxo
+        self.assertTrue(fc.skip(key))
+        self.assertEqual(fc.stats(), {'flows': 1, 'detections': 1, 'skipped': 1})
+
+    def test_per_message_protocol_and_give_up(self):
+        fc = FlowClassifier(max_attempts=2)
+        self.assertEqual(fc.classify('dns', 5353, 53, b'\x00' * 12)['name'], 'DNS')
+        self.assertEqual(fc.classify('dns', 53, 5353, b'\x00' * 12)['name'], 'DNS')  # parser roda de novo
+        self.assertFalse(fc.done('dns'))
+        self.assertIsNone(fc.classify('x', 40000, 9999, b'abc'))
+        self.assertFalse(fc.done('x'))
+        self.assertIsNone(fc.classify('x', 40000, 9999, b'def'))
+        self.assertTrue(fc.done('x'))
+        self.assertEqual(fc.detections, 3)
+
+    def test_bounded(self):
+        fc = FlowClassifier(max_flows=3)
+        for i in range(10):
+            fc.classify(i, 40000, 443, client_hello('x'))
+        self.assertEqual(len(fc), 3)
+        self.assertFalse(fc.done(0))
+
+
+class TestMonitorTls(unittest.TestCase):
+    def test_split_client_hello_logged_once(self):
+        hello = client_hello('split.example.com')
+        cut = 40
+        seg = lambda flags, seq, data=b'': build_ipv4(6, CLIENT, SERVER, struct.pack(
+            '!HHIIHHHH', 40000, 443, seq, 0, (5 << 12) | flags, 0, 0, 0) + data)
+        packets = [seg(0x02, 0), seg(0x18, 1, hello[:cut]), seg(0x18, 1 + cut, hello[cut:]),
+                   seg(0x18, 1 + len(hello), b'\x17\x03\x03\x00\x05hello')]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cap.pcap')
+            write_pcap(path, LINKTYPE_RAW, packets)
+            log_dir = os.path.join(tmp, 'logs')
+            mon = Monitor('lo', read_file=path, log_dir=log_dir)
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+            with open(os.path.join(log_dir, 'aplicacao.csv'), newline='') as fh:
+                rows = list(csv.reader(fh))[1:]
+        self.assertEqual([r[1] for r in rows], ['TLS'])
+        self.assertIn('sni=split.example.com', rows[0][2])
+        self.assertEqual(len(mon.streams), 0)
+        self.assertEqual(mon.apps.skipped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
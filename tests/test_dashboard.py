@@ -0,0 +1,61 @@
+import io
+import json
+import unittest
+
+from src.monitor.dashboard import Dashboard, json_lines, top_rows
+from src.monitor.stats import Stats
+
+
+def make_snapshot() -> dict:
+    st = Stats()
+    st.add_packet('172.31.66.10', '1.1.1.1', 'TCP', 1500, dst_port=443, is_tcp_syn=True, ts=100.0)
+    for _ in range(5):
+        st.add_packet('172.31.66.10', '8.8.8.8', 'UDP', 60, dst_port=53, ts=100.0)
+    for _ in range(3):
+        st.add_packet('172.31.66.11', '9.9.9.9', 'TCP', 90, dst_port=80, is_tcp_syn=True, ts=100.0)
+    return st.snapshot(now=101)
+
+
+class TestDashboard(unittest.TestCase):
+    def test_sort_keys(self):
+        snap = make_snapshot()
+        self.assertEqual([r[1] for r in top_rows(snap, 'bytes', 3)], ['1.1.1.1', '8.8.8.8', '9.9.9.9'])
+        self.assertEqual([r[1] for r in top_rows(snap, 'pps', 3)], ['8.8.8.8', '9.9.9.9', '1.1.1.1'])
+        self.assertEqual(top_rows(snap, 'connections', 1)[0][1], '9.9.9.9')
+
+    def test_diff_redraw_and_keys(self):
+        snaps = [make_snapshot()]
+        out = io.StringIO()
+        dash = Dashboard(lambda: snaps[0], out=out)
+        dash.snap = snaps[0]
+        lines = dash.build_lines(120, 40)
+        self.assertEqual(dash.draw(lines), len(lines))
+        # Mesmo quadro: nada é reescrito
+        self.assertEqual(dash.draw(dash.build_lines(120, 40)), 0)
+        # Trocar a ordenação muda só o cabeçalho e as linhas da tabela
+        dash.handle_key('s')
+        self.assertEqual(dash.sort, 'connections')
+        changed = dash.draw(dash.build_lines(120, 40))
+        self.assertGreater(changed, 0)
+        self.assertLess(changed, len(lines))
+        dash.handle_key('p')
+        self.assertTrue(dash.paused)
+        dash.handle_key('\x1b[B')
+        self.assertEqual(dash.offset, 1)
+        dash.handle_key('+')
+        self.assertEqual(dash.interval, 0.5)
+        self.assertFalse(dash.handle_key('q'))
+
+    def test_json_lines(self):
+        out = io.StringIO()
+        calls = []
+        json_lines(make_snapshot, interval=0, until=lambda: calls.append(1) or len(calls) > 2, top_n=2, out=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['clients']['172.31.66.10']['total_packets'], 6)
+        self.assertEqual([t['endpoint'] for t in rows[0]['top']], ['1.1.1.1', '8.8.8.8'])
+        self.assertNotIn('endpoints', rows[0]['clients']['172.31.66.10'])
+
+
+if __name__ == '__main__':
+    unittest.main()
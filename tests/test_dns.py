@@ -0,0 +1,122 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.dnscache import PassiveDnsCache
+from src.monitor.main import Monitor
+from src.monitor.parsers.app import identify_app
+from src.monitor.parsers.dns import TYPE_A, TYPE_AAAA, TYPE_CNAME, decode_dns, read_name
+from src.monitor.pcap import LINKTYPE_RAW
+from test_parsers import build_ipv4, build_udp
+
+
+def qname(name: str) -> bytes:
+    return b''.join(bytes([len(p)]) + p.encode() for p in name.split('.')) + b'\x00'
+
+
+def response(name: str, records: list, tid: int = 0x4242) -> bytes:
+    """Resposta para `name` (A); records = [(tipo, ttl, rdata)], donos comprimidos."""
+    out = struct.pack('!HHHHHH', tid, 0x8180, 1, len(records), 0, 0) + qname(name) + b'\x00\x01\x00\x01'
+    owner = b'\xc0\x0c'  # ponteiro para o nome da pergunta
+    for rtype, ttl, rdata in records:
+        start = len(out)
+        out += owner + struct.pack('!HHIH', rtype, 1, ttl, len(rdata)) + rdata
+        if rtype == TYPE_CNAME:
+            owner = struct.pack('!H', 0xC000 | (start + 12))  # próximo dono = alvo do CNAME
+    return out
+
+
+class TestDnsDecode(unittest.TestCase):
+    def test_cname_chain_with_compression(self):
+        msg = decode_dns(response('WWW.Example.com', [
+            (TYPE_CNAME, 300, qname('edge.cdn.net')),
+            (TYPE_A, 60, bytes([93, 184, 216, 34])),
+            (TYPE_A, 60, bytes([93, 184, 216, 35])),
+        ]))
+        self.assertEqual((msg.qr, msg.rcode, msg.truncated), (1, 0, False))
+        self.assertEqual(msg.questions, [('www.example.com', 1)])
+        self.assertEqual([(a.name, a.rtype, a.text) for a in msg.answers], [
+            ('www.example.com', TYPE_CNAME, 'edge.cdn.net'),
+            ('edge.cdn.net', TYPE_A, '93.184.216.34'),
+            ('edge.cdn.net', TYPE_A, '93.184.216.35'),
+        ])
+        app = identify_app(53, 40000, response('a.example.com', [(TYPE_A, 5, b'\x01\x02\x03\x04')]))
+        self.assertIn('q=a.example.com A ans=1.2.3.4', app['info'])
+
+    def test_pointer_loops_rejected(self):
+        buf = b'\x00' * 12 + b'\xc0\x0c'  # aponta para si mesmo
+        with self.assertRaises(ValueError):
+            read_name(buf, 12)
+        buf = b'\x00' * 12 + b'\x01a\xc0\x0e' + b'\x01b\xc0\x0c'  # 12 -> 16 -> 12
+        with self.assertRaises(ValueError):
+            read_name(buf, 12)
+        msg = decode_dns(struct.pack('!HHHHHH', 1, 0x8180, 1, 1, 0, 0) + b'\xc0\x0c')
+        self.assertTrue(msg.truncated)
+        self.assertEqual(msg.questions, [])
+
+    def test_truncated_answers_keep_what_was_read(self):
+        data = response('x.org', [(TYPE_A, 30, b'\x0a\x00\x00\x01'), (TYPE_AAAA, 30, b'\x20\x01' + b'\x00' * 14)])
+        msg = decode_dns(data[:-4])
+        self.assertTrue(msg.truncated)
+        self.assertEqual([a.text for a in msg.answers], ['10.0.0.1'])
+        self.assertIsNone(decode_dns(b'\x00' * 11))
+
+
+class TestPassiveDnsCache(unittest.TestCase):
+    def test_learn_follows_cname_and_expires(self):
+        cache = PassiveDnsCache(grace=10.0)
+        msg = decode_dns(response('www.example.com', [
+            (TYPE_CNAME, 300, qname('edge.cdn.net')),
+            (TYPE_A, 60, bytes([93, 184, 216, 34])),
+            (TYPE_AAAA, 60, b'\x20\x01\x0d\xb8' + b'\x00' * 11 + b'\x01'),
+        ]))
+        self.assertEqual(cache.learn(msg, 100.0), 2)
+        self.assertEqual(cache.lookup(4, 0x5DB8D822, 150.0), 'www.example.com')
+        self.assertEqual(cache.lookup(6, 0x20010DB8 << 96 | 1, 150.0), 'www.example.com')
+        self.assertIsNone(cache.lookup(6, 0x5DB8D822, 150.0))  # mesma chave inteira, outra versão
+        self.assertIsNone(cache.lookup(4, 0x5DB8D822, 171.0))  # TTL 60 + folga 10
+        self.assertEqual(cache.stats()['expired'], 1)
+
+    def test_queries_and_errors_ignored(self):
+        cache = PassiveDnsCache()
+        query = struct.pack('!HHHHHH', 1, 0x0100, 1, 0, 0, 0) + qname('a.b') + b'\x00\x01\x00\x01'
+        self.assertEqual(cache.learn(decode_dns(query), 0.0), 0)
+        nx = bytearray(response('a.b', [(TYPE_A, 60, b'\x01\x01\x01\x01')]))
+        nx[3] |= 3  # NXDOMAIN
+        self.assertEqual(cache.learn(decode_dns(bytes(nx)), 0.0), 0)
+
+    def test_lru_bound(self):
+        cache = PassiveDnsCache(max_entries=4)
+        for i in range(10):
+            cache.add(4, i, f"h{i}", 60, 0.0)
+        self.assertEqual(len(cache), 4)
+        self.assertEqual(cache.evicted, 6)
+        self.assertEqual(cache.lookup(4, 6, 1.0), 'h6')
+        cache.add(4, 100, 'novo', 60, 1.0)  # expulsa o menos usado (7), não o 6 recém consultado
+        self.assertIsNone(cache.lookup(4, 7, 1.0))
+        self.assertEqual(cache.lookup(4, 6, 1.0), 'h6')
+
+
+class TestMonitorNames(unittest.TestCase):
+    def test_endpoint_named_from_dns_answer(self):
+        client, resolver, server = b'\xAC\x1F\x42\x0A', b'\x08\x08\x08\x08', bytes([93, 184, 216, 34])
+        answer = response('www.example.com', [(TYPE_A, 60, server)])
+        syn = struct.pack('!HHIIHHHH', 40000, 443, 0, 0, (5 << 12) | 0x002, 0, 0, 0)
+        packets = [build_ipv4(17, resolver, client, build_udp(53, 5353, answer)), build_ipv4(6, client, server, syn)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cap.pcap')
+            write_pcap(path, LINKTYPE_RAW, packets)
+            mon = Monitor('lo', read_file=path, log_dir=os.path.join(tmp, 'logs'))
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+        eps = mon.stats.snapshot()['clients']['172.31.66.10']['endpoints']
+        self.assertEqual(eps['93.184.216.34']['name'], 'www.example.com')
+        self.assertNotIn('name', eps['8.8.8.8'])
+        self.assertEqual(mon.metrics_snapshot()['dns_cache']['entries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import csv
+import glob
+import os
+import struct
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.flows import FlowBinaryLogger, FlowTable
+from src.monitor.main import Monitor
+from src.monitor.parsers.decoder import PacketRecord, decode
+from src.monitor.pcap import LINKTYPE_RAW
+from src.monitor.rotation import Rotation
+from test_parsers import build_ipv4, build_udp
+
+CLIENT = b'\xAC\x1F\x42\x0A'
+SERVER = b'\x5D\xB8\xD8\x22'
+
+
+def tcp(src: bytes, dst: bytes, sport: int, dport: int, flags: int, data: bytes = b'') -> bytes:
+    seg = struct.pack('!HHIIHHHH', sport, dport, 0, 0, (5 << 12) | flags, 0, 0, 0) + data
+    return build_ipv4(6, src, dst, seg)
+
+
+def handshake_and_close() -> list:
+    return [
+        tcp(CLIENT, SERVER, 40000, 80, 0x02),
+        tcp(SERVER, CLIENT, 80, 40000, 0x12),
+        tcp(CLIENT, SERVER, 40000, 80, 0x10),
+        tcp(CLIENT, SERVER, 40000, 80, 0x18, b'GET / HTTP/1.1\r\n\r\n'),
+        tcp(SERVER, CLIENT, 80, 40000, 0x11),
+        tcp(CLIENT, SERVER, 40000, 80, 0x11),
+        tcp(SERVER, CLIENT, 80, 40000, 0x10),
+    ]
+
+
+class TestFlowTable(unittest.TestCase):
+    def setUp(self):
+        self.out = []
+        self.table = FlowTable(lambda fl, reason: self.out.append((fl, reason)),
+                               idle_timeout=10, active_timeout=100, close_linger=2)
+        self.rec = PacketRecord()
+
+    def feed(self, pkt: bytes, now: float):
+        decode(self.rec, pkt)
+        fl = self.table.update(self.rec, self.rec.total_length, now)
+        self.table.expire(now)
+        return fl
+
+    def test_tcp_lifecycle(self):
+        states = [self.feed(p, 1.0 + i * 0.1).state for i, p in enumerate(handshake_and_close())]
+        self.assertEqual(states, ['SYN_SENT', 'SYN_RECEIVED', 'ESTABLISHED', 'ESTABLISHED',
+                                  'FIN_WAIT', 'CLOSING', 'CLOSED'])
+        self.assertEqual(len(self.table.flows), 1)
+        self.table.expire(5.0)
+        self.assertEqual(len(self.out), 1)
+        fl, reason = self.out[0]
+        self.assertEqual(reason, 'fin')
+        self.assertEqual((fl.src_ip(), fl.sport, fl.dst_ip(), fl.dport), ('172.31.66.10', 40000, '93.184.216.34', 80))
+        self.assertEqual((fl.pkts_fwd, fl.pkts_rev), (4, 3))
+
+    def test_rst_idle_and_active(self):
+        self.feed(tcp(CLIENT, SERVER, 40001, 443, 0x02), 0.0)
+        self.feed(tcp(SERVER, CLIENT, 443, 40001, 0x14), 0.5)
+        udp = build_ipv4(17, CLIENT, b'\x08\x08\x08\x08', build_udp(5353, 53, b'q'))
+        self.feed(udp, 0.5)
+        self.table.expire(3.0)
+        self.assertEqual([r for _, r in self.out], ['rst'])
+        self.table.expire(11.0)
+        self.assertEqual([r for _, r in self.out], ['rst', 'idle'])
+        # Fluxo sempre ativo é exportado pelo tempo de vida máximo
+        for t in range(0, 106, 5):
+            self.feed(udp, 20.0 + t)
+        self.assertEqual(self.out[-1][1], 'active')
+
+    def test_binary_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = FlowBinaryLogger(tmp)
+            table = FlowTable(log.log)
+            rec = PacketRecord()
+            for pkt in handshake_and_close():
+                decode(rec, pkt)
+                table.update(rec, rec.total_length, 1.0)
+            table.flush()
+            log.close()
+            rows = list(FlowBinaryLogger.read(log.path))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['estado_tcp'], 'CLOSED')
+        self.assertEqual(rows[0]['motivo_fim'], 'fin')
+        self.assertEqual(rows[0]['src_ip'], '172.31.66.10')
+
+    def test_binary_rotation_and_sync(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            log = FlowBinaryLogger(tmp, durability='sync',
+                                   rotation=Rotation(max_bytes=400, keep=100, compress='none'))
+            table = FlowTable(log.log)
+            rec = PacketRecord()
+            for i in range(20):
+                decode(rec, build_ipv4(17, CLIENT, SERVER, build_udp(5000 + i, 53, b'q')))
+                table.update(rec, rec.total_length, 1.0)
+            table.flush()
+            # sync: cada registro já está no arquivo antes do close
+            parts = sorted(glob.glob(os.path.join(tmp, 'fluxos-*.bin'))) + [log.path]
+            rows = [r for p in parts for r in FlowBinaryLogger.read(p)]
+            log.close()
+        self.assertGreater(log.rotations, 0)
+        self.assertEqual(sorted(r['src_port'] for r in rows), list(range(5000, 5020)))
+
+
+class TestFlowLogMode(unittest.TestCase):
+    def test_replay_flows_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cap.pcap')
+            write_pcap(path, LINKTYPE_RAW, handshake_and_close())
+            log_dir = os.path.join(tmp, 'logs')
+            mon = Monitor('lo', read_file=path, log_dir=log_dir, log_mode='flows')
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+            with open(os.path.join(log_dir, 'fluxos.csv'), newline='') as fh:
+                rows = list(csv.DictReader(fh))
+            with open(os.path.join(log_dir, 'transporte.csv'), newline='') as fh:
+                transp = list(csv.reader(fh))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['pacotes_ida'], '4')
+        self.assertEqual(rows[0]['estado_tcp'], 'CLOSED')
+        self.assertEqual(len(transp), 1)  # só o cabeçalho
+        self.assertEqual(mon.stats.snapshot()['clients']['172.31.66.10']['total_packets'], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
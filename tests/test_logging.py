@@ -0,0 +1,51 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from src.monitor.logging_csv import CsvLogger, TransporteLogger
+
+
+class TestCsvLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_rows(self, path):
+        with open(path, newline='', encoding='utf-8') as fh:
+            return list(csv.reader(fh))
+
+    def test_batch_rows_written_on_close(self):
+        lg = TransporteLogger(self.tmp.name)
+        for i in range(100):
+            lg.log('TCP', '10.0.0.1', 1000 + i, '10.0.0.2', 80, 60)
+        lg.close()
+        rows = self.read_rows(os.path.join(self.tmp.name, 'transporte.csv'))
+        self.assertEqual(rows[0][0], 'timestamp')
+        self.assertEqual(len(rows), 101)
+        self.assertEqual(rows[-1][3], '1099')
+
+    def test_sync_mode(self):
+        path = os.path.join(self.tmp.name, 'x.csv')
+        lg = CsvLogger(path, ['a'], durability='sync')
+        lg.write_row(['1'])
+        # Sem fechar: a linha já deve estar no arquivo
+        self.assertEqual(self.read_rows(path), [['a'], ['1']])
+        lg.close()
+
+    def test_dropped_when_queue_full(self):
+        path = os.path.join(self.tmp.name, 'y.csv')
+        lg = CsvLogger(path, ['a'], queue_size=10)
+        # Segurando o lock a thread de escrita não consegue esvaziar a fila
+        with lg._lock:
+            for i in range(25):
+                lg.write_row([i])
+        lg.close()
+        self.assertEqual(lg.dropped, 15)
+        self.assertEqual(len(self.read_rows(path)), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from src.monitor.logging_csv import CsvLogger, TransporteLogger
+from src.monitor.logindex import bloom_add, bloom_contains, iso_to_ns, query, read_index
+from src.monitor.logtool import main, parse_time
+from src.monitor.rotation import COMPRESSOR, Rotation, rotated_files
+
+HEADERS = ['timestamp', 'protocolo', 'src_ip', 'src_port', 'dst_ip', 'dst_port', 'tamanho_bytes']
+T0 = datetime(2024, 1, 1, 14, 0, 0)
+
+
+def row(i, ip):
+    return [(T0 + timedelta(seconds=i)).isoformat(), 'TCP', ip, 1000 + i % 50000, '8.8.8.8', 443, 60]
+
+
+class TestLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.path = os.path.join(self.dir, 'transporte.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, n, **opts):
+        lg = CsvLogger(self.path, HEADERS, index=True, ip_cols=(2, 4), **opts)
+        for i in range(n):
+            lg.write_row(row(i, f"10.0.0.{i // 1024}"))
+        lg.close()
+        return lg
+
+    def test_bloom(self):
+        bits = bytearray(512)
+        keys = [f"10.0.{i}.1" for i in range(200)]
+        for k in keys:
+            bloom_add(bits, k)
+        self.assertTrue(all(bloom_contains(bits, k) for k in keys))
+        false_pos = sum(bloom_contains(bits, f"192.168.{i}.9") for i in range(1000))
+        self.assertLess(false_pos, 50)
+
+    def test_blocks_and_ip_skip(self):
+        self.write(5000)
+        blocks = read_index(self.path)
+        self.assertEqual(sum(b.rows for b in blocks), 5000)
+        self.assertEqual(blocks[0].t0, iso_to_ns(T0.isoformat()))
+        stats = {}
+        rows = list(query([self.dir], 'transporte.csv', ip='10.0.0.2', stats=stats))
+        self.assertEqual(len(rows), 1024)
+        self.assertEqual(rows[0][3], str(1000 + 2048))
+        self.assertEqual(stats['blocks_read'], 1)
+        self.assertLess(stats['bytes_read'], os.path.getsize(self.path) / 3)
+        # Também casa pelo destino
+        self.assertEqual(len(list(query([self.dir], 'transporte.csv', ip='8.8.8.8'))), 5000)
+
+    def test_time_range_seeks(self):
+        self.write(5000)
+        since = iso_to_ns((T0 + timedelta(seconds=3000)).isoformat())
+        until = iso_to_ns((T0 + timedelta(seconds=3010)).isoformat())
+        stats = {}
+        rows = list(query([self.dir], 'transporte.csv', since=since, until=until, stats=stats))
+        self.assertEqual([int(r[3]) - 1000 for r in rows], list(range(3000, 3011)))
+        self.assertEqual(stats['blocks_read'], 1)
+
+    def test_live_tail_without_checkpoint(self):
+        lg = CsvLogger(self.path, HEADERS, durability='sync', index=True, ip_cols=(2, 4))
+        lg.write_row(row(0, '10.0.0.7'))
+        lg.write_row(row(1, '10.0.0.8'))
+        self.assertEqual(read_index(self.path), [])
+        stats = {}
+        rows = list(query([self.dir], 'transporte.csv', ip='10.0.0.8', stats=stats))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(stats['unindexed_reads'], 1)
+        lg.close()
+        self.assertEqual(len(read_index(self.path)), 1)
+
+    def test_sync_mode_flushes_index(self):
+        lg = CsvLogger(self.path, HEADERS, durability='sync', index=True, ip_cols=(2, 4))
+        for i in range(1500):
+            lg.write_row(row(i, '10.0.0.1'))
+        # Checkpoint do bloco cheio já no disco, antes do close
+        self.assertEqual([b.rows for b in read_index(self.path)], [1024])
+        lg.close()
+
+    def test_unsorted_rows_use_block_min_max(self):
+        # Como em fluxos.csv: as linhas saem na ordem de término, não de início
+        lg = CsvLogger(self.path, HEADERS, index=True, ip_cols=(2, 4))
+        for i in (3050, -3600, 3055):
+            lg.write_row(row(i, '10.0.0.1'))
+        lg.close()
+        (block,) = read_index(self.path)
+        self.assertEqual((block.t0, block.t1), (iso_to_ns(row(-3600, '')[0]), iso_to_ns(row(3055, '')[0])))
+        until = iso_to_ns((T0 - timedelta(minutes=30)).isoformat())
+        rows = list(query([self.dir], 'transporte.csv', until=until))
+        self.assertEqual([r[0] for r in rows], [row(-3600, '')[0]])
+
+    def test_worker_dirs_merged_by_time(self):
+        for w in range(2):
+            lg = CsvLogger(os.path.join(self.dir, f'worker-{w}', 'transporte.csv'), HEADERS,
+                           index=True, ip_cols=(2, 4))
+            for i in range(w, 200, 2):
+                lg.write_row(row(i, '10.0.0.1'))
+            lg.close()
+        dirs = [os.path.join(self.dir, 'worker-0'), os.path.join(self.dir, 'worker-1')]
+        rows = list(query(dirs, 'transporte.csv'))
+        self.assertEqual([int(r[3]) - 1000 for r in rows], list(range(200)))
+
+    def test_rotated_compressed_files(self):
+        lg = TransporteLogger(self.dir, index=True, durability='sync',
+                              rotation=Rotation(max_bytes=4000, keep=100, compress='gzip'))
+        for i in range(300):
+            lg.log('TCP', f"10.0.0.{i % 3}", i, '8.8.8.8', 443, 60)
+        lg.close()
+        COMPRESSOR.wait()
+        rotated = rotated_files(self.path)
+        self.assertTrue(rotated and all(f.endswith('.csv.gz') for f in rotated))
+        self.assertTrue(all(os.path.exists(f[:-3] + '.idx') for f in rotated))
+        rows = list(query([self.dir], 'transporte.csv', ip='10.0.0.1'))
+        self.assertEqual([int(r[3]) for r in rows], list(range(1, 300, 3)))
+
+    def test_cli_query(self):
+        self.write(3000)
+        out = os.path.join(self.dir, 'q.csv')
+        rc = main(['query', '--ip', '10.0.0.1', '--since', '2024-01-01T14:20:00',
+                   '--until', '2024-01-01T14:20:04', '-o', out, self.dir])
+        self.assertEqual(rc, 0)
+        with open(out, encoding='utf-8') as fh:
+            lines = fh.read().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'timestamp')
+        self.assertEqual(len(lines), 6)
+
+    def test_parse_time_of_day(self):
+        today = datetime.utcnow().date().isoformat()
+        self.assertEqual(parse_time('14:05'), iso_to_ns(f"{today}T14:05"))
+
+
+if __name__ == '__main__':
+    unittest.main()
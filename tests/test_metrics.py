@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+import urllib.request
+
+from src.monitor.bench.traffic import MemoryCapture, synthetic_traffic
+from src.monitor.main import Monitor
+from src.monitor.metrics import CONTENT_TYPE, MetricsExporter, render_openmetrics
+from src.monitor.stats import Stats
+
+
+def sample_snapshot() -> dict:
+    st = Stats()
+    for i in range(5):
+        for _ in range(i + 1):
+            st.add_packet(f'172.31.66.{i}', '8.8.8.8', 'UDP', 100, dst_port=53, ts=1000.0)
+    snap = st.snapshot(now=1001)
+    snap['log_dropped'] = 3
+    snap['capture'] = {'kernel_packets': 20, 'kernel_drops': 2}
+    return snap
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render_with_cardinality_limit(self):
+        text = render_openmetrics(sample_snapshot(), max_clients=2)
+        lines = text.splitlines()
+        self.assertEqual(lines[-1], '# EOF')
+        self.assertIn('# TYPE monitor_packets counter', lines)
+        self.assertIn('monitor_packets_total{protocol="UDP"} 15', lines)
+        self.assertIn('monitor_client_packets_total{client="172.31.66.4"} 5', lines)
+        self.assertIn('monitor_client_packets_total{client="172.31.66.3"} 4', lines)
+        self.assertIn('monitor_client_packets_total{client="outros"} 6', lines)
+        self.assertNotIn('172.31.66.0', text)
+        self.assertIn('monitor_capture_kernel_drops_total 2', lines)
+        self.assertIn('monitor_log_rows_dropped_total 3', lines)
+        self.assertIn('monitor_rate_packets_per_second 15', lines)
+
+    def test_http_scrapes_share_cached_render(self):
+        calls = []
+
+        def snap():
+            calls.append(1)
+            return sample_snapshot()
+
+        exp = MetricsExporter(snap, 0, '127.0.0.1', interval=60.0)
+        exp.start()
+        try:
+            for _ in range(3):
+                with urllib.request.urlopen(f'http://127.0.0.1:{exp.port}/metrics', timeout=5) as resp:
+                    self.assertEqual(resp.headers['Content-Type'], CONTENT_TYPE)
+                    body = resp.read().decode()
+            self.assertTrue(body.endswith('# EOF\n'))
+            self.assertEqual(len(calls), 1)
+        finally:
+            exp.stop()
+
+    def test_scrape_does_not_read_kernel_stats(self):
+        class KernelCapture(MemoryCapture):
+            reads = kernel_packets = kernel_drops = 0
+
+            def read_kernel_stats(self):
+                self.reads += 1
+                self.kernel_packets += 100
+                self.kernel_drops += 1
+
+        cap = KernelCapture(synthetic_traffic(100), batch_size=10)
+        with tempfile.TemporaryDirectory() as tmp:
+            mon = Monitor('memory', capture=cap, log_dir=tmp)
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+        self.assertEqual(cap.reads, 1)  # lido pela captura, no máximo 1x/s
+        for _ in range(3):
+            snap = mon.metrics_snapshot()
+        self.assertEqual(cap.reads, 1)
+        self.assertEqual(snap['capture'], {'kernel_packets': 100, 'kernel_drops': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,39 +1,14 @@
+import os
 import struct
+import tempfile
 import unittest
 
-from src.monitor.parsers.ip import parse_ip
+from src.monitor.parsers.ip import parse_ip, parse_ipv6
 from src.monitor.parsers.transport import parse_tcp, parse_udp
 from src.monitor.parsers.app import identify_app
-
-
-def build_ipv4(proto: int, src: bytes, dst: bytes, payload: bytes) -> bytes:
-    version_ihl = (4 << 4) | 5
-    tos = 0
-    total_length = 20 + len(payload)
-    identification = 0
-    flags_fragment = 0
-    ttl = 64
-    header_checksum = 0
-    header = struct.pack(
-        '!BBHHHBBH4s4s',
-        version_ihl,
-        tos,
-        total_length,
-        identification,
-        flags_fragment,
-        ttl,
-        proto,
-        header_checksum,
-        src,
-        dst,
-    )
-    return header + payload
-
-
-def build_udp(src_port: int, dst_port: int, app_payload: bytes) -> bytes:
-    length = 8 + len(app_payload)
-    header = struct.pack('!HHH', src_port, dst_port, length) + b'\x00\x00'
-    return header + app_payload
+from src.monitor.parsers.decoder import MAX_V6_EXT_HEADERS, PacketRecord, decode
+from src.monitor.bench import traffic
+from src.monitor.bench.traffic import build_ipv4, build_udp, write_pcap
 
 
 class TestParsers(unittest.TestCase):
@@ -98,5 +73,105 @@ class TestParsers(unittest.TestCase):
         self.assertEqual(app['name'], 'DHCP')
 
 
+class TestDecoder(unittest.TestCase):
+    def test_decode_reuses_record(self):
+        rec = PacketRecord()
+        tcp = struct.pack('!HHIIHHHH', 40000, 80, 1, 0, (5 << 12) | 0x002, 1024, 0, 0) + b'GET / HTTP/1.1\r\n\r\n'
+        pkt = b'\x00' * 14 + build_ipv4(6, b'\xAC\x1F\x42\x0A', b'\x01\x01\x01\x01', tcp)
+        self.assertTrue(decode(rec, memoryview(pkt), 14))
+        self.assertEqual((rec.version, rec.l4_name, rec.dst_port, rec.tcp_flags), (4, 'TCP', 80, 0x002))
+        self.assertEqual(rec.src_int, 0xAC1F420A)
+        self.assertEqual(rec.src, '172.31.66.10')
+        self.assertEqual(bytes(rec.payload), b'GET / HTTP/1.1\r\n\r\n')
+
+        udp = build_udp(5353, 53, b'\x00' * 12)
+        v6 = struct.pack('!IHBB', 6 << 28, len(udp), 17, 64) + b'\x20\x01' + b'\x00' * 13 + b'\x01' + b'\x00' * 15 + b'\x02' + udp
+        self.assertTrue(decode(rec, v6))
+        self.assertEqual((rec.version, rec.l4_name, rec.dst_port, rec.tcp_flags), (6, 'UDP', 53, 0))
+        self.assertEqual(rec.src, '2001::1')
+        self.assertEqual(rec.dst, '::2')
+        self.assertEqual(len(rec.payload), 12)
+
+    def test_truncated(self):
+        rec = PacketRecord()
+        self.assertFalse(decode(rec, b'\x45\x00'))
+        pkt = build_ipv4(6, b'\x0A\x00\x00\x01', b'\x0A\x00\x00\x02', b'\x00' * 10)
+        self.assertTrue(decode(rec, pkt))
+        self.assertIsNone(rec.l4_name)
+
+
+V6_CLIENT = b'\xfd\x00\x00\x66' + b'\x00' * 11 + b'\x0a'
+V6_SERVER = b'\x20\x01\x0d\xb8' + b'\x00' * 11 + b'\x01'
+
+
+def ext(next_header: int, units: int = 0) -> bytes:
+    # Extensão genérica (hop-by-hop, roteamento, destino): 8 * (units + 1) bytes
+    return bytes([next_header, units]) + b'\x00' * (6 + 8 * units)
+
+
+def build_ipv6(next_header: int, payload: bytes, src: bytes = V6_CLIENT, dst: bytes = V6_SERVER) -> bytes:
+    return traffic.build_ipv6(next_header, payload, src, dst)
+
+
+class TestIPv6Extensions(unittest.TestCase):
+    def test_hop_by_hop_and_dest_opts(self):
+        tcp = struct.pack('!HHIIHHHH', 40000, 443, 1, 0, (5 << 12) | 0x002, 1024, 0, 0)
+        rec = PacketRecord()
+        self.assertTrue(decode(rec, build_ipv6(0, ext(60, 1) + ext(6) + tcp)))
+        self.assertEqual((rec.ip_proto, rec.l4_name, rec.dst_port), (6, 'TCP', 443))
+        self.assertEqual(rec.ip_hdr_len, 40 + 16 + 8)
+        self.assertFalse(rec.is_fragment)
+
+    def test_routing_and_ah(self):
+        udp = build_udp(5353, 53, b'\x00' * 12)
+        ah = bytes([17, 4]) + b'\x00' * 22  # (4 + 2) * 4 = 24 bytes
+        ip, name = parse_ip(build_ipv6(43, ext(51) + ah + udp))
+        self.assertEqual((name, ip['next_header'], ip['header_len']), ('IPv6', 17, 40 + 8 + 24))
+        self.assertEqual(ip['payload'], udp)
+
+    def test_fragment_offsets(self):
+        udp = build_udp(1000, 53, b'x' * 16)
+        first = build_ipv6(0, ext(44) + struct.pack('!BxHI', 17, 1, 7) + udp)
+        rec = PacketRecord()
+        decode(rec, first)
+        self.assertEqual((rec.ip_proto, rec.frag_id, rec.frag_more, rec.l4_name), (17, 7, True, 'UDP'))
+        # Fragmento não inicial: para no cabeçalho de fragmento, sem transporte
+        later = build_ipv6(44, struct.pack('!BxHI', 17, 24, 7) + b'y' * 16)
+        decode(rec, later)
+        self.assertEqual((rec.ip_proto, rec.frag_off, rec.l4_off, rec.l4_name), (17, 24, 48, None))
+
+    def test_truncated_and_bounded_chain(self):
+        rec = PacketRecord()
+        pkt = build_ipv6(0, ext(6, 2))[:60]  # extensão declara 24 bytes, há 20
+        self.assertTrue(decode(rec, pkt))
+        self.assertEqual((rec.ip_proto, rec.l4_name), (0, None))
+        chain = b''.join(ext(60) for _ in range(MAX_V6_EXT_HEADERS + 1))
+        tcp = struct.pack('!HHIIHHHH', 1, 2, 0, 0, 5 << 12, 0, 0, 0)
+        self.assertTrue(decode(rec, build_ipv6(60, chain + tcp)))
+        self.assertEqual((rec.ip_proto, rec.l4_name), (60, None))
+        self.assertEqual(parse_ipv6(build_ipv6(59, b''))['next_header'], 59)
+
+    def test_ipv6_client_stats(self):
+        from src.monitor.main import Monitor
+        from src.monitor.pcap import LINKTYPE_RAW
+        tcp = struct.pack('!HHIIHHHH', 40000, 443, 1, 0, (5 << 12) | 0x002, 1024, 0, 0)
+        reply = struct.pack('!HHIIHHHH', 443, 40000, 1, 2, (5 << 12) | 0x010, 1024, 0, 0)
+        packets = [build_ipv6(0, ext(6) + tcp), build_ipv6(6, reply, src=V6_SERVER, dst=V6_CLIENT),
+                   build_ipv4(17, b'\xAC\x1F\x42\x0A', b'\x08\x08\x08\x08', build_udp(5353, 53, b'\x00' * 12))]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cap.pcap')
+            write_pcap(path, LINKTYPE_RAW, packets)
+            mon = Monitor('lo', read_file=path, log_dir=os.path.join(tmp, 'logs'),
+                          client_subnet='172.31.66.0/24,fd00:66::/64')
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+        clients = mon.stats.snapshot()['clients']
+        self.assertEqual(set(clients), {'172.31.66.10', 'fd00:66::a'})
+        cs = clients['fd00:66::a']
+        self.assertEqual((cs['total_packets'], cs['proto_counts']['TCP']), (2, 2))
+        self.assertEqual(cs['endpoints']['2001:db8::1']['tcp_connections'], 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,241 @@
+import csv
+import os
+import struct
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.main import Monitor
+from src.monitor.parsers.decoder import PacketRecord, decode, decode_transport
+from src.monitor.pcap import LINKTYPE_RAW
+from src.monitor.reassembly import FragmentReassembler, StreamReassembler
+from test_parsers import build_udp
+
+CLIENT = b'\xAC\x1F\x42\x0A'
+SERVER = b'\x08\x08\x08\x08'
+
+
+def fragment(ident: int, offset: int, more: bool, data: bytes, proto: int = 17,
+             src: bytes = CLIENT, dst: bytes = SERVER) -> bytes:
+    flags = (0x2000 if more else 0) | (offset // 8)
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(data), ident, flags, 64, proto, 0, src, dst) + data
+
+
+def fragments(ident: int, datagram: bytes, size: int = 16) -> list:
+    return [fragment(ident, off, off + size < len(datagram), datagram[off:off + size])
+            for off in range(0, len(datagram), size)]
+
+
+def tcp(seq: int, flags: int, data: bytes = b'', sport: int = 40000, dport: int = 80) -> PacketRecord:
+    seg = struct.pack('!HHIIHHHH', sport, dport, seq, 0, (5 << 12) | flags, 0, 0, 0) + data
+    rec = PacketRecord()
+    decode(rec, fragment(0, 0, False, seg, proto=6))
+    return rec
+
+
+def dns_query(name: str) -> bytes:
+    qname = b''.join(bytes([len(p)]) + p.encode() for p in name.split('.')) + b'\x00'
+    return struct.pack('!HHHHHH', 0x1234, 0x0100, 1, 0, 0, 0) + qname + b'\x00\x01\x00\x01'
+
+
+def decoded(pkt: bytes) -> PacketRecord:
+    rec = PacketRecord()
+    decode(rec, pkt)
+    return rec
+
+
+class TestFragmentReassembler(unittest.TestCase):
+    def test_out_of_order_udp(self):
+        datagram = build_udp(5353, 53, dns_query('a.example.com') + b'\x00' * 40)
+        frags = fragments(7, datagram)
+        ra = FragmentReassembler()
+        self.assertIsNone(decoded(frags[1]).l4_name)  # fragmento não inicial: sem portas
+        whole = None
+        for pkt in reversed(frags):
+            rec = decoded(pkt)
+            self.assertTrue(rec.is_fragment)
+            whole = ra.add(rec, 0.0)
+        self.assertEqual(whole, datagram)
+        self.assertTrue(decode_transport(rec, whole, 0, len(whole)))
+        self.assertEqual((rec.l4_name, rec.dst_port), ('UDP', 53))
+        self.assertEqual(bytes(rec.payload), datagram[8:])
+        self.assertEqual(ra.stats()['bytes'], 0)
+
+    def test_overlap_drops_datagram(self):
+        ra = FragmentReassembler()
+        self.assertIsNone(ra.add(decoded(fragment(1, 0, True, b'A' * 16)), 0.0))
+        self.assertIsNone(ra.add(decoded(fragment(1, 8, False, b'B' * 16)), 0.0))
+        self.assertEqual(ra.stats()['dropped'], 1)
+        self.assertEqual((len(ra), ra.bytes), (0, 0))
+
+    def test_timeout_and_budget(self):
+        ra = FragmentReassembler(max_bytes=64, timeout=30.0)
+        ra.add(decoded(fragment(1, 0, True, b'A' * 48)), 0.0)
+        ra.add(decoded(fragment(2, 0, True, b'B' * 48)), 10.0)  # estoura: descarta o mais antigo
+        self.assertEqual((len(ra), ra.evicted), (1, 1))
+        self.assertEqual(ra.expire(20.0), 0)
+        self.assertEqual(ra.expire(40.0), 1)
+        self.assertEqual((len(ra), ra.bytes), (0, 0))
+
+    def test_ipv6_fragment_header(self):
+        udp = build_udp(1000, 53, b'x' * 8)
+        frag_hdr = struct.pack('!BBHI', 17, 0, 1, 0xABCD)  # offset 0, M=1
+        pkt = struct.pack('!IHBB16s16s', 6 << 28, 8 + len(udp), 44, 64, b'\x20' + b'\x00' * 14 + b'\x01',
+                          b'\x20' + b'\x00' * 14 + b'\x02') + frag_hdr + udp
+        rec = decoded(pkt)
+        self.assertEqual((rec.ip_proto, rec.frag_id, rec.frag_more), (17, 0xABCD, True))
+        self.assertEqual((rec.l4_name, rec.dst_port), ('UDP', 53))
+
+    def test_ipv6_extensions_in_fragmentable_part(self):
+        # Parte fragmentável começa com opções de destino: só o datagrama remontado mostra o UDP
+        datagram = bytes([17, 0]) + b'\x00' * 6 + build_udp(1000, 53, dns_query('v6.example.com'))
+        src, dst = b'\xfd\x00' + b'\x00' * 13 + b'\x01', b'\x20\x01' + b'\x00' * 13 + b'\x02'
+        ra = FragmentReassembler()
+        whole = rec = None
+        for off in range(0, len(datagram), 16):
+            piece = datagram[off:off + 16]
+            hdr = struct.pack('!BxHI', 60, off | (off + 16 < len(datagram)), 0x51)
+            pkt = struct.pack('!IHBB', 6 << 28, 8 + len(piece), 44, 64) + src + dst + hdr + piece
+            rec = decoded(pkt)
+            whole = ra.add(rec, 0.0) or whole
+        self.assertTrue(decode_transport(rec, whole, 0, len(whole)))
+        self.assertEqual((rec.ip_proto, rec.l4_name, rec.dst_port), (17, 'UDP', 53))
+
+
+class TestStreamReassembler(unittest.TestCase):
+    def test_http_header_split(self):
+        ra = StreamReassembler()
+        self.assertEqual(ra.feed(tcp(99, 0x02), 0.0), [])
+        self.assertEqual(ra.feed(tcp(100, 0x18, b'GET /index HTTP/1.1\r\nHo'), 0.0), [])
+        msgs = ra.feed(tcp(123, 0x18, b'st: example\r\n\r\n'), 0.0)
+        self.assertEqual([bytes(m) for m in msgs], [b'GET /index HTTP/1.1\r\nHost: example\r\n\r\n'])
+        self.assertEqual(ra.bytes, 0)
+
+    def test_in_order_is_zero_copy(self):
+        ra = StreamReassembler()
+        rec = tcp(1, 0x18, b'GET / HTTP/1.1\r\n\r\n')
+        (msg,) = ra.feed(rec, 0.0)
+        self.assertIs(msg.obj, rec.payload.obj)
+
+    def test_out_of_order_and_retransmission(self):
+        ra = StreamReassembler()
+        ra.feed(tcp(0, 0x02), 0.0)
+        self.assertEqual(ra.feed(tcp(11, 0x18, b'HTTP/1.1\r\n\r\n'), 0.0), [])
+        self.assertEqual(ra.out_of_order, 1)
+        msgs = ra.feed(tcp(1, 0x18, b'GET /abc '), 0.0)
+        self.assertEqual(msgs, [])  # ainda falta o byte 10
+        msgs = ra.feed(tcp(1, 0x18, b'GET /abc x'), 0.0)  # retransmissão com um byte novo
+        self.assertEqual([bytes(m) for m in msgs], [b'GET /abc xHTTP/1.1\r\n\r\n'])
+
+    def test_dns_length_prefix(self):
+        ra = StreamReassembler()
+        q1, q2 = dns_query('a.example.com'), dns_query('b.example.com')
+        data = struct.pack('!H', len(q1)) + q1 + struct.pack('!H', len(q2)) + q2
+        ra.feed(tcp(0, 0x02, sport=40000, dport=53), 0.0)
+        first = ra.feed(tcp(1, 0x18, data[:len(q1) + 5], dport=53), 0.0)
+        rest = ra.feed(tcp(1 + len(q1) + 5, 0x18, data[len(q1) + 5:], dport=53), 0.0)
+        self.assertEqual([bytes(m) for m in first + rest], [q1, q2])
+
+    def test_gap_skipped_over_budget(self):
+        ra = StreamReassembler(max_stream=32)
+        ra.feed(tcp(0, 0x02, dport=9000), 0.0)
+        self.assertEqual(ra.feed(tcp(100, 0x18, b'a' * 20, dport=9000), 0.0), [])
+        msgs = ra.feed(tcp(120, 0x18, b'b' * 20, dport=9000), 0.0)
+        self.assertEqual(ra.gaps, 1)
+        self.assertEqual(b''.join(bytes(m) for m in msgs), b'a' * 20 + b'b' * 20)
+        self.assertEqual(ra.bytes, 0)
+
+    def test_fin_flushes_and_forgets(self):
+        ra = StreamReassembler()
+        ra.feed(tcp(0, 0x02), 0.0)
+        ra.feed(tcp(1, 0x18, b'GET / HTTP/1.1\r\nHost'), 0.0)
+        msgs = ra.feed(tcp(21, 0x11), 0.0)
+        self.assertEqual([bytes(m) for m in msgs], [b'GET / HTTP/1.1\r\nHost'])
+        self.assertEqual((len(ra), ra.bytes), (0, 0))
+
+    def test_fin_delivers_out_of_order_tail(self):
+        ra = StreamReassembler()
+        ra.feed(tcp(0, 0x02, dport=9000), 0.0)
+        self.assertEqual([bytes(m) for m in ra.feed(tcp(1, 0x18, b'aaaa', dport=9000), 0.0)], [b'aaaa'])
+        self.assertEqual(ra.feed(tcp(10, 0x18, b'bbbb', dport=9000), 0.0), [])
+        msgs = ra.feed(tcp(14, 0x11, dport=9000), 0.0)  # FIN sem os bytes 5-9
+        self.assertEqual([bytes(m) for m in msgs], [b'bbbb'])
+        self.assertEqual((ra.gaps, len(ra), ra.bytes), (1, 0, 0))
+
+    def test_fin_over_budget_evicts_other_streams(self):
+        ra = StreamReassembler(max_bytes=3000)
+        ra.feed(tcp(0, 0x02, dport=9000), 0.0)
+        ra.feed(tcp(10, 0x18, b'a' * 1000, dport=9000), 0.0)  # fora de ordem, primeiro no LRU
+        ra.feed(tcp(0, 0x02, dport=9001), 0.0)
+        ra.feed(tcp(10, 0x18, b'b' * 1500, dport=9001), 0.0)
+        # FIN com dados fora de ordem estoura o orçamento: sai o outro sentido, não este
+        msgs = ra.feed(tcp(2000, 0x11, b'c' * 1000, dport=9000), 0.0)
+        self.assertEqual([bytes(m) for m in msgs], [b'a' * 1000, b'c' * 1000])
+        self.assertEqual((ra.evicted, len(ra), ra.bytes), (1, 0, 0))
+
+    def test_split_record_appends_without_recopy(self):
+        ra = StreamReassembler()
+        body = bytes(range(256)) * 12
+        record = bytes([22, 3, 1]) + struct.pack('!H', len(body)) + body
+        ra.feed(tcp(0, 0x02, dport=443), 0.0)
+        seq = 1
+        ra.feed(tcp(seq, 0x18, record[:100], dport=443), 0.0)
+        seq += 100
+        st = next(iter(ra._streams.values()))
+        buf = st.buf
+        for i in range(100, len(record) - 100, 100):
+            self.assertEqual(ra.feed(tcp(seq, 0x18, record[i:i + 100], dport=443), 0.0), [])
+            seq += 100
+        self.assertIs(st.buf, buf)  # mesmo buffer: só anexado, nunca recopiado
+        nxt = bytes([22, 3, 1, 0, 4]) + b'abcd'
+        tail = record[seq - 1:] + nxt[:7]  # e o início do próximo registro
+        (msg,) = ra.feed(tcp(seq, 0x18, tail, dport=443), 0.0)
+        self.assertEqual(bytes(msg), record)
+        self.assertEqual((bytes(st.buf), ra.bytes), (nxt[:7], 7))  # só a sobra é copiada
+        (msg2,) = ra.feed(tcp(seq + len(tail), 0x18, nxt[7:], dport=443), 0.0)
+        # As mensagens já devolvidas continuam válidas
+        self.assertEqual((bytes(msg), bytes(msg2)), (record, nxt))
+        self.assertEqual(ra.bytes, 0)
+
+    def test_expire(self):
+        ra = StreamReassembler(timeout=60.0)
+        ra.feed(tcp(1, 0x18, b'GET / HTTP/1.1\r\n'), 0.0)
+        self.assertEqual(ra.expire(30.0), 0)
+        self.assertEqual(ra.expire(61.0), 1)
+        self.assertEqual(ra.bytes, 0)
+
+
+class TestMonitorReassembly(unittest.TestCase):
+    def replay(self, packets, **opts):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cap.pcap')
+            write_pcap(path, LINKTYPE_RAW, packets)
+            log_dir = os.path.join(tmp, 'logs')
+            mon = Monitor('lo', read_file=path, log_dir=log_dir, **opts)
+            mon.open()
+            mon._loop_capture()
+            mon.stop()
+            logs = {}
+            for name in ('transporte', 'aplicacao'):
+                with open(os.path.join(log_dir, f"{name}.csv"), newline='') as fh:
+                    logs[name] = list(csv.reader(fh))[1:]
+        return mon, logs
+
+    def test_fragmented_dns(self):
+        datagram = build_udp(5353, 53, dns_query('frag.example.com') + b'\x00' * 60)
+        mon, logs = self.replay(fragments(9, datagram, size=24))
+        self.assertEqual(len(logs['transporte']), 1)
+        self.assertEqual(logs['transporte'][0][5], '53')
+        self.assertEqual([r[1] for r in logs['aplicacao']], ['DNS'])
+        self.assertIn('qd=1', logs['aplicacao'][0][2])
+        self.assertEqual(mon.metrics_snapshot()['reassembly']['fragments']['reassembled'], 1)
+
+    def test_disabled_keeps_first_fragment_only(self):
+        datagram = build_udp(5353, 53, dns_query('frag.example.com') + b'\x00' * 60)
+        mon, logs = self.replay(fragments(9, datagram, size=24), reassembly=False)
+        self.assertEqual(len(logs['transporte']), 1)  # só o primeiro fragmento tem portas
+        self.assertIsNone(mon.frags)
+
+
+if __name__ == '__main__':
+    unittest.main()
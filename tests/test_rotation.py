@@ -0,0 +1,97 @@
+import csv
+import gzip
+import os
+import tempfile
+import time
+import unittest
+
+from src.monitor.binlog import BinAplicacaoLogger, list_segments
+from src.monitor.logging_csv import CsvLogger, TransporteLogger
+from src.monitor.rotation import COMPRESSOR, Rotation, prune, rotated_files, rotated_path
+
+
+class TestRotation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'transporte.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rows_of(self, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', newline='', encoding='utf-8') as fh:
+            return list(csv.reader(fh))
+
+    def test_size_rotation_compresses_and_keeps_all_rows(self):
+        lg = TransporteLogger(self.tmp.name, rotation=Rotation(max_bytes=2000, keep=100, compress='gzip'),
+                              flush_interval=0.01)
+        for i in range(300):
+            lg.log('TCP', '10.0.0.1', i, '10.0.0.2', 80, 60)
+            if i % 20 == 0:
+                time.sleep(0.02)  # deixa a thread de escrita rodar entre rajadas
+        lg.close()
+        COMPRESSOR.wait()
+        rotated = rotated_files(self.path)
+        self.assertGreater(lg.logger.rotations, 0)
+        self.assertEqual(len(rotated), lg.logger.rotations)
+        self.assertTrue(all(f.endswith('.csv.gz') for f in rotated))
+        ports = []
+        for f in rotated + [self.path]:
+            rows = self.rows_of(f)
+            self.assertEqual(rows[0][0], 'timestamp')  # cada arquivo tem cabeçalho
+            ports += [int(r[3]) for r in rows[1:]]
+        self.assertEqual(ports, list(range(300)))
+
+    def test_interval_rotation_sync_mode(self):
+        lg = CsvLogger(self.path, ['a'], durability='sync', rotation=Rotation(interval=0.05, compress='none'))
+        lg.write_row(['1'])
+        time.sleep(0.06)
+        lg.write_row(['2'])  # vence o intervalo: rotaciona depois desta linha
+        lg.write_row(['3'])
+        lg.close()
+        rotated = rotated_files(self.path)
+        self.assertEqual(len(rotated), 1)
+        self.assertEqual(self.rows_of(rotated[0]), [['a'], ['1'], ['2']])
+        self.assertEqual(self.rows_of(self.path), [['a'], ['3']])
+
+    def test_empty_file_not_rotated(self):
+        lg = CsvLogger(self.path, ['a'], rotation=Rotation(interval=0.01), flush_interval=0.01)
+        time.sleep(0.05)
+        lg.close()
+        self.assertEqual(lg.rotations, 0)
+
+    def test_retention(self):
+        for i in range(5):
+            with open(rotated_path(self.path, now=1000 + i), 'w') as fh:
+                fh.write('x')
+        with open(os.path.join(self.tmp.name, 'transporte-nota.csv'), 'w') as fh:
+            fh.write('x')
+        removed = prune(self.path, 2)
+        self.assertEqual(len(removed), 3)
+        left = [os.path.basename(f) for f in rotated_files(self.path)]
+        self.assertEqual(left, ['transporte-19700101T001643000000.csv', 'transporte-19700101T001644000000.csv'])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'transporte-nota.csv')))
+
+    def test_rotated_path_is_unique(self):
+        a = rotated_path(self.path, now=5)
+        open(a + '.gz', 'w').close()
+        b = rotated_path(self.path, now=5)
+        self.assertNotEqual(a, b)
+        open(b, 'w').close()
+        self.assertEqual(rotated_files(self.path), [a + '.gz', b])
+
+    def test_binary_segments_rotate_with_retention(self):
+        lg = BinAplicacaoLogger(self.tmp.name, durability='sync', rotation=Rotation(max_bytes=200, keep=1))
+        for i in range(40):
+            lg.log('DNS', f'query {i}')
+        lg.close()
+        self.assertEqual(len(list_segments(self.tmp.name, 'aplicacao')), 2)
+
+    def test_invalid_compress(self):
+        with self.assertRaises(ValueError):
+            Rotation(compress='lz4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.main import Monitor
+from src.monitor.parsers.decoder import PacketRecord, decode
+from src.monitor.pcap import LINKTYPE_RAW
+from src.monitor.sampling import Sampler, flow_hash
+from src.monitor.stats import Stats
+from test_parsers import build_ipv4, build_udp
+
+
+def udp_packets(n_flows: int, per_flow: int) -> list:
+    pkts = []
+    for i in range(n_flows):
+        for _ in range(per_flow):
+            pkts.append(build_ipv4(17, b'\xAC\x1F\x42\x0A', bytes([10, 0, i >> 8, i & 0xFF]),
+                                   build_udp(30000 + i, 53, b'x' * 20)))
+    return pkts
+
+
+class TestSampler(unittest.TestCase):
+    def test_fixed_is_one_in_n(self):
+        sp = Sampler('fixed', 4)
+        rec = PacketRecord()
+        decode(rec, udp_packets(1, 1)[0])
+        weights = [sp.weight(rec) for _ in range(12)]
+        self.assertEqual(weights.count(4), 3)
+        self.assertEqual(sum(weights), 12)
+
+    def test_flow_hash_symmetric_and_consistent(self):
+        fwd, rev = PacketRecord(), PacketRecord()
+        decode(fwd, build_ipv4(17, b'\x01\x02\x03\x04', b'\x05\x06\x07\x08', build_udp(1000, 53, b'')))
+        decode(rev, build_ipv4(17, b'\x05\x06\x07\x08', b'\x01\x02\x03\x04', build_udp(53, 1000, b'')))
+        self.assertEqual(flow_hash(fwd), flow_hash(rev))
+        sp = Sampler('flow', 8)
+        self.assertEqual(sp.weight(fwd), sp.weight(rev))
+
+    def test_adaptive_raises_and_lowers_rate(self):
+        changes = []
+        sp = Sampler('adaptive', 1, interval=1.0, on_change=lambda s, r: changes.append((s.rate, r)))
+        sp.observe(0.0, now=0.0)
+        sp.observe(0.95, now=1.0)  # laço saturado
+        sp.observe(0.5, lambda: 10, now=2.0)  # descartes no kernel (total acumulado)
+        sp.observe(0.1, lambda: 10, now=3.0)  # folga: nenhum descarte novo
+        self.assertEqual(changes, [(2, 'carga'), (4, 'drops'), (2, 'folga')])
+
+    def test_weighted_stats(self):
+        st = Stats()
+        st.add_packet('c', 'r', 'UDP', 100, dst_port=53, weight=8)
+        snap = st.snapshot()['clients']['c']
+        self.assertEqual(snap['total_packets'], 8)
+        self.assertEqual(snap['total_bytes'], 800)
+        self.assertAlmostEqual(snap['packets_stderr'], 56 ** 0.5, places=1)
+
+
+class TestSampledReplay(unittest.TestCase):
+    def replay(self, tmp, sampling):
+        path = os.path.join(tmp, 'cap.pcap')
+        write_pcap(path, LINKTYPE_RAW, udp_packets(400, 5))
+        log_dir = os.path.join(tmp, sampling)
+        mon = Monitor('lo', read_file=path, log_dir=log_dir, sampling=sampling, sample_rate=4)
+        mon.open()
+        mon._loop_capture()
+        mon.stop()
+        return mon, log_dir
+
+    def test_estimate_close_to_total(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mon, log_dir = self.replay(tmp, 'flow')
+            with open(os.path.join(log_dir, 'amostragem.csv'), newline='') as fh:
+                rows = list(csv.DictReader(fh))
+        cs = mon.stats.snapshot()['clients']['172.31.66.10']
+        # Fluxos inteiros sorteados: desvio padrão ~ sqrt(100 * 4*3 * 5²) ≈ 173
+        self.assertLess(abs(cs['total_packets'] - 2000), 4 * 173)
+        self.assertEqual(cs['total_packets'] % 4, 0)
+        self.assertEqual(rows[0]['taxa'], '4')
+        self.assertEqual(mon.snapshot()['sampling']['seen'], 2000)
+
+    def test_stderr_only_for_packet_sampling(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fixed, _ = self.replay(tmp, 'fixed')
+            flow, _ = self.replay(tmp, 'flow')
+        cs = fixed.stats.snapshot()['clients']['172.31.66.10']
+        self.assertAlmostEqual(cs['packets_stderr'], (500 * 4 * 3) ** 0.5, places=1)
+        # Por fluxo a soma de N*(N-1) por pacote subestimaria o erro: não é publicada
+        self.assertNotIn('packets_stderr', flow.stats.snapshot()['clients']['172.31.66.10'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from src.monitor.bench.traffic import MemoryCapture, synthetic_traffic, write_pcap
+from src.monitor.main import Monitor, main
+from src.monitor.metrics import render_openmetrics
+from src.monitor.pcap import LINKTYPE_RAW
+from src.monitor.selfstats import LogHistogram
+from src.monitor.ui import render
+
+
+def run_monitor(frames, **kwargs) -> Monitor:
+    with tempfile.TemporaryDirectory() as tmp:
+        mon = Monitor('memory', capture=MemoryCapture(frames, batch_size=32), log_dir=tmp, **kwargs)
+        mon.open()
+        mon._loop_capture()
+        mon.stop()
+    return mon
+
+
+class KernelCapture(MemoryCapture):
+    """MemoryCapture com PACKET_STATISTICS simulado: 10 descartes por lote,
+    zerados a cada leitura como no kernel."""
+
+    def __init__(self, frames, batch_size: int = 32) -> None:
+        super().__init__(frames, batch_size)
+        self.kernel_packets = self.kernel_drops = 0
+        self._pending = (0, 0)
+
+    def recv_batch(self):
+        batch = super().recv_batch()
+        packets, drops = self._pending
+        self._pending = (packets + len(batch) + 10, drops + 10)
+        return batch
+
+    def read_kernel_stats(self) -> None:
+        packets, drops = self._pending
+        self._pending = (0, 0)
+        self.kernel_packets += packets
+        self.kernel_drops += drops
+
+
+class IdleCapture(MemoryCapture):
+    """Depois do tráfego, entrega lotes vazios com o relógio avançando."""
+
+    def __init__(self, frames, idle: int) -> None:
+        super().__init__(frames, batch_size=32)
+        self.idle = idle
+
+    def recv_batch(self):
+        if self._pos < len(self._batches) or not self.idle:
+            return super().recv_batch()
+        self.idle -= 1
+        self.last_ts += 60.0
+        return []
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_buckets_contiguous_and_bounded_error(self):
+        prev = -1
+        for v in range(1 << 14):
+            i = LogHistogram.index(v)
+            low, high = LogHistogram.bucket_range(i)
+            self.assertTrue(low <= v < high)
+            self.assertIn(i, (prev, prev + 1))
+            prev = i
+        h = LogHistogram()
+        for v in range(1, 1_000_001):
+            h.record(v * 7)
+        for q in (0.5, 0.9, 0.99):
+            exact = q * 7_000_000
+            self.assertLess(abs(h.percentile(q) - exact) / exact, 0.07)
+        self.assertEqual((h.min, h.max, h.count), (7, 7_000_000, 1_000_000))
+        self.assertLess(len(h.counts), 400)
+
+    def test_merge(self):
+        a, b = LogHistogram(), LogHistogram()
+        for v in (5, 50, 500):
+            a.record(v)
+        b.record(5_000_000)
+        a.merge(b)
+        self.assertEqual((a.count, a.min, a.max), (4, 5, 5_000_000))
+        self.assertEqual(a.percentile(1.0), 5_000_000)
+
+
+class TestStageProfiler(unittest.TestCase):
+    def test_sampled_stages_and_same_results(self):
+        frames = synthetic_traffic(1000, endpoints=64)
+        plain = run_monitor(frames)
+        mon = run_monitor(frames, self_stats=10, log_mode='both')
+        self.assertEqual(mon.stats.snapshot()['global_proto'], plain.stats.snapshot()['global_proto'])
+        summary = mon.profiler.summary()
+        self.assertEqual((summary['frames'], summary['sampled']), (1000, 100))
+        stages = summary['stages']
+        for stage in ('captura', 'lote', 'decodificacao', 'aplicacao', 'fluxos', 'log', 'stats', 'quadro'):
+            self.assertIn(stage, stages)
+        self.assertEqual(stages['quadro']['count'], 100)
+        self.assertEqual(stages['captura']['count'], 1000 // 32 + 1)
+        # Os invólucros só existem durante o quadro amostrado
+        self.assertNotIn('_identify_app', vars(mon))
+        self.assertNotIn('add_packet', vars(mon.stats))
+        self.assertIsNone(plain.profiler)
+        self.assertIn('Latência µs p50/p99 (1/10 quadros)', render(mon.snapshot()))
+        text = render_openmetrics(mon.metrics_snapshot())
+        self.assertIn('# TYPE monitor_self_stage_latency_seconds summary\n', text)
+        self.assertIn('monitor_self_stage_latency_seconds{stage="quadro",quantile="0.99"}', text)
+        self.assertIn('monitor_self_stage_latency_seconds_count{stage="quadro"} 100\n', text)
+        self.assertIn('monitor_self_stage_latency_seconds_sum{stage="quadro"} ', text)
+
+    def test_kernel_counters_polled(self):
+        cap = KernelCapture(synthetic_traffic(200))
+        with tempfile.TemporaryDirectory() as tmp:
+            mon = Monitor('memory', capture=cap, log_dir=tmp, self_stats=64)
+            mon.open()
+            mon.profiler.kernel_interval = 0.0
+            mon._loop_capture()
+            mon.stop()
+        k = mon.profiler.summary()['kernel']
+        # 7 lotes (o último com 8 quadros), 10 descartes em cada
+        self.assertEqual((k['recent_packets'], k['recent_drops']), (18, 10))
+        self.assertEqual((k['packets'], k['drops']), (270, 70))
+        self.assertEqual(k['drops'], cap.kernel_drops)
+        self.assertAlmostEqual(k['drop_ratio'], 70 / 270, places=5)
+        self.assertIn('Kernel: pacotes=', render(mon.snapshot()))
+
+    def test_adaptive_sampling_still_sees_drops(self):
+        def run(self_stats):
+            reasons = []
+            with tempfile.TemporaryDirectory() as tmp:
+                mon = Monitor('memory', capture=KernelCapture(synthetic_traffic(200)), log_dir=tmp,
+                              sampling='adaptive', self_stats=self_stats)
+                mon.open()
+                sp = mon.sampler
+                sp.interval, sp.high_load, sp.low_load = 1e-6, 2.0, -1.0  # só os descartes mudam a taxa
+                sp.on_change = lambda s, reason: reasons.append(reason)
+                if mon.profiler is not None:
+                    mon.profiler.kernel_interval = 0.0
+                mon._loop_capture()
+                mon.stop()
+            return mon, reasons
+
+        plain, plain_reasons = run(None)
+        mon, reasons = run(1)
+        # A leitura da auto-instrumentação não pode esconder descartes da amostragem
+        self.assertEqual(reasons, plain_reasons)
+        self.assertEqual(reasons, ['drops'] * 6)
+        self.assertEqual((mon.sampler.rate, mon.sampler.last_drops), (plain.sampler.rate, 10))
+        self.assertEqual(mon.profiler.summary()['kernel']['drops'], 70)
+
+    def test_idle_batches_still_processed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cap = IdleCapture(synthetic_traffic(100, endpoints=16), idle=3)
+            mon = Monitor('memory', capture=cap, log_dir=tmp, log_mode='flows', self_stats=8,
+                          flow_opts={'idle_timeout': 30.0})
+            mon.open()
+            mon._loop_capture()
+            self.assertEqual(cap.idle, 0)
+            self.assertFalse(mon.flows.flows)  # expirados durante os lotes vazios, antes do stop()
+            self.assertGreater(mon.flows.exported, 0)
+            mon.stop()
+        self.assertEqual(mon.profiler.summary()['stages']['captura']['count'], 4)  # 100 quadros em lotes de 32
+
+    def test_cli_dump(self):
+        cwd = os.getcwd()
+        err = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)  # a CLI grava os logs em ./logs
+            try:
+                write_pcap('cap.pcap', LINKTYPE_RAW, synthetic_traffic(300))
+                with redirect_stdout(io.StringIO()):
+                    self.assertEqual(main(['-r', 'cap.pcap', '--self-stats', 'self.json', '--self-stats-sample', '3']), 0)
+                with open('self.json') as fh:
+                    summary = json.load(fh)
+                with redirect_stdout(io.StringIO()), redirect_stderr(err):
+                    self.assertEqual(main(['-r', 'cap.pcap', '--self-stats']), 0)
+                with redirect_stderr(io.StringIO()):
+                    self.assertEqual(main(['-r', 'cap.pcap', '--self-stats', '--self-stats-sample', '0']), 2)
+            finally:
+                os.chdir(cwd)
+        self.assertEqual((summary['frames'], summary['sampled']), (300, 100))
+        self.assertIn('Auto-instrumentação: 4 de 300 quadros', err.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
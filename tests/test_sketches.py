@@ -0,0 +1,56 @@
+import random
+import unittest
+from collections import Counter
+
+from src.monitor.sketches import OTHER, CountMinSketch, SpaceSaving
+from src.monitor.stats import Stats
+
+
+class TestSketches(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        # Três chaves pesadas no meio de muito ruído (varredura)
+        self.stream = ['a'] * 3000 + ['b'] * 2000 + ['c'] * 1000 + [f'n{rng.randrange(5000)}' for _ in range(6000)]
+        rng.shuffle(self.stream)
+        self.truth = Counter(self.stream)
+
+    def test_space_saving_bounds(self):
+        ss = SpaceSaving(50)
+        for k in self.stream:
+            ss.add(k)
+        self.assertLessEqual(len(ss.counts), 50)
+        bound = ss.total / ss.capacity
+        for key in ('a', 'b', 'c'):
+            self.assertIn(key, ss.counts)
+            self.assertLessEqual(ss.counts[key], self.truth[key])
+            self.assertGreaterEqual(ss.estimate(key), self.truth[key])
+            self.assertLessEqual(ss.errors[key], bound)
+
+    def test_count_min_overestimates_within_bound(self):
+        cm = CountMinSketch(width=512, depth=4)
+        for k in self.stream:
+            cm.add(k)
+        for key in ('a', 'b', 'n1', 'n2'):
+            est = cm.estimate(key)
+            self.assertGreaterEqual(est, self.truth[key])
+            self.assertLessEqual(est - self.truth[key], cm.error_bound)
+
+    def test_bounded_stats_keep_totals(self):
+        st = Stats(max_endpoints=20, max_ports=5)
+        for i, k in enumerate(self.stream):
+            st.add_packet('c1', k, 'TCP', 10, dst_port=i % 40)
+        cs = st.clients['c1']
+        self.assertLessEqual(len(cs.endpoints), 21)
+        self.assertIn(OTHER, cs.endpoints)
+        self.assertEqual(sum(es.packets for es in cs.endpoints.values()), len(self.stream))
+        for es in cs.endpoints.values():
+            self.assertLessEqual(len(es.ports), 6)
+        self.assertEqual(sum(sum(es.ports.values()) for es in cs.endpoints.values()), len(self.stream))
+        self.assertGreaterEqual(st.estimate_endpoint('c1', 'n1'), self.truth['n1'])
+        snap = st.snapshot()['clients']['c1']
+        self.assertIn('a', snap['endpoints'])
+        self.assertGreater(snap['endpoint_error'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
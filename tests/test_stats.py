@@ -1,6 +1,10 @@
 import unittest
 
-from src.monitor.stats import Stats
+import pickle
+import threading
+
+from src.monitor.stats import ConcurrentStats, Stats
+from src.monitor.ui import SnapshotMirror
 
 
 class TestStats(unittest.TestCase):
@@ -21,6 +25,98 @@ class TestStats(unittest.TestCase):
         self.assertEqual(e['tcp_connections'], 1)
         self.assertTrue(any(p == 80 for p, _cnt in e['top_ports']))
 
+    def test_merge(self):
+        a, b = Stats(), Stats()
+        a.add_packet('172.31.66.10', '1.1.1.1', 'TCP', 60, dst_port=80, is_tcp_syn=True)
+        b.add_packet('172.31.66.10', '1.1.1.1', 'UDP', 100, dst_port=53)
+        b.add_packet('172.31.66.11', '8.8.8.8', 'UDP', 80, dst_port=53)
+        snap = Stats.merged([a, b]).snapshot()
+        self.assertEqual(snap['global_proto'], {'TCP': 1, 'UDP': 2})
+        c = snap['clients']['172.31.66.10']
+        self.assertEqual((c['total_packets'], c['total_bytes']), (2, 160))
+        e = c['endpoints']['1.1.1.1']
+        self.assertEqual(e['tcp_connections'], 1)
+        self.assertEqual(dict(e['top_ports']), {80: 1, 53: 1})
+        self.assertIn('172.31.66.11', snap['clients'])
+
+    def test_delta_and_mirror(self):
+        s = Stats()
+        mirror = SnapshotMirror()
+        for i in range(20):
+            s.add_packet('172.31.66.10', f'10.0.0.{i}', 'TCP', 60, dst_port=80)
+        d1 = s.delta(mirror.version)
+        self.assertTrue(d1['full'])
+        mirror.apply(d1)
+        s.add_packet('172.31.66.10', '10.0.0.5', 'UDP', 60, dst_port=53)
+        s.add_packet('172.31.66.10', '10.0.0.5', 'UDP', 60, dst_port=53)
+        d2 = s.delta(mirror.version)
+        self.assertFalse(d2['full'])
+        self.assertEqual(d2['version'], d1['version'] + 1)
+        self.assertEqual(list(d2['clients']['172.31.66.10']['endpoints']), ['10.0.0.5'])
+        data = mirror.apply(d2)
+        self.assertEqual(data['clients']['172.31.66.10']['top_endpoints'][0], '10.0.0.5')
+        self.assertEqual(len(data['clients']['172.31.66.10']['endpoints']), 20)
+        self.assertEqual(data['clients']['172.31.66.10']['total_packets'], 22)
+        # Sem mudanças: delta vazio, mesma versão
+        self.assertEqual(s.delta(mirror.version)['clients'], {})
+        # Espelho igual ao snapshot completo
+        self.assertEqual(data['clients'], s.snapshot()['clients'])
+
+    def test_delta_with_evictions(self):
+        s = Stats(max_endpoints=4)
+        mirror = SnapshotMirror()
+        for i in range(4):
+            s.add_packet('c', f'r{i}', 'TCP', 10)
+        mirror.apply(s.delta(mirror.version))
+        s.add_packet('c', 'new', 'TCP', 10)
+        data = mirror.apply(s.delta(mirror.version))
+        self.assertEqual(set(data['clients']['c']['endpoints']), set(s.clients['c'].endpoints))
+        self.assertEqual(data['clients'], s.snapshot()['clients'])
+
+    def test_pickle_drops_views(self):
+        s = Stats()
+        s.add_packet('c', 'r', 'TCP', 10)
+        s.snapshot()
+        t = pickle.loads(pickle.dumps(s))
+        self.assertEqual(t.snapshot()['clients']['c']['total_packets'], 1)
+
+
+class TestConcurrentStats(unittest.TestCase):
+    def test_writers_and_readers(self):
+        st = ConcurrentStats(max_endpoints=50)
+        n_writers, per_writer = 4, 20000
+        stop = threading.Event()
+        errors = []
+
+        def writer(w):
+            for i in range(per_writer):
+                st.add_packet(f'172.31.66.{w}', f'10.0.{i % 200}.1', 'UDP', 10, dst_port=i % 300)
+
+        def reader():
+            mirror = SnapshotMirror()
+            try:
+                while not stop.is_set():
+                    mirror.apply(st.delta(mirror.version))
+            except Exception as e:  # pragma: no cover - falha do teste
+                errors.append(e)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=(w,)) for w in range(n_writers)]
+        for t in readers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        stop.set()
+        for t in readers:
+            t.join()
+        self.assertEqual(errors, [])
+        snap = st.snapshot()
+        self.assertEqual(snap['global_proto'], {'UDP': n_writers * per_writer})
+        for w in range(n_writers):
+            c = snap['clients'][f'172.31.66.{w}']
+            self.assertEqual(c['total_packets'], per_writer)
+            self.assertLessEqual(len(c['endpoints']), 51)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,41 @@
+import ipaddress
+import unittest
+
+from src.monitor.subnets import SubnetClassifier
+
+
+def v4(ip: str) -> int:
+    return int(ipaddress.IPv4Address(ip))
+
+
+def v6(ip: str) -> int:
+    return int(ipaddress.IPv6Address(ip))
+
+
+class TestSubnetClassifier(unittest.TestCase):
+    def test_multiple_prefixes(self):
+        sc = SubnetClassifier(['172.31.66.0/24,10.8.0.0/16', 'fd00:66::/64'])
+        self.assertTrue(sc.contains(4, v4('172.31.66.5')))
+        self.assertTrue(sc.contains(4, v4('10.8.200.1')))
+        self.assertFalse(sc.contains(4, v4('172.31.67.5')))
+        self.assertTrue(sc.contains(6, v6('fd00:66::1234')))
+        self.assertFalse(sc.contains(6, v6('fd00:67::1')))
+        # Mesmo inteiro em versões diferentes não colide no cache
+        self.assertFalse(sc.contains(6, v4('172.31.66.5')))
+        self.assertTrue(sc.contains(4, v4('172.31.66.5')))
+
+    def test_classify_direction(self):
+        sc = SubnetClassifier(['172.31.66.0/24'])
+        self.assertTrue(sc.classify(4, v4('172.31.66.5'), v4('8.8.8.8')))
+        self.assertFalse(sc.classify(4, v4('8.8.8.8'), v4('172.31.66.5')))
+        self.assertIsNone(sc.classify(4, v4('8.8.8.8'), v4('1.1.1.1')))
+
+    def test_lru_bounded(self):
+        sc = SubnetClassifier(['0.0.0.0/0'], cache_size=8)
+        for i in range(100):
+            self.assertTrue(sc.contains(4, i))
+        self.assertEqual(len(sc._cache), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+
+from src.monitor.dashboard import top_rows
+from src.monitor.sketches import OTHER
+from src.monitor.stats import ConcurrentStats, Stats
+from src.monitor.timeseries import RateSeries
+
+
+class TestRateSeries(unittest.TestCase):
+    def test_rates_window_and_peak(self):
+        rs = RateSeries()
+        for sec in range(1000, 1010):
+            rs.add(sec, 10 if sec != 1005 else 50, 1000)
+        r = rs.rates(1010)
+        self.assertEqual(r['pps'], 10)
+        self.assertEqual(r['bps'], 8000)
+        self.assertEqual(r['peak_pps_60s'], 50)
+        self.assertAlmostEqual(r['avg_pps_60s'], 140 / 60)
+        # Um minuto depois a janela fina esvazia; a hora ainda guarda o tráfego
+        r = rs.rates(1100)
+        self.assertEqual((r['pps'], r['peak_pps_60s'], r['avg_pps_60s']), (0, 0, 0))
+        self.assertAlmostEqual(r['avg_pps_1h'], 140 / 3600)
+
+    def test_roll_and_out_of_order(self):
+        rs = RateSeries()
+        rs.add(100, 1, 1)
+        rs.add(160, 2, 2)  # mesmo índice do anel: balde antigo é zerado
+        rs.add(150, 3, 3)  # fora de ordem, dentro da janela
+        rs.add(50, 9, 9)  # mais antigo que a janela fina: ignorado nela
+        r = rs.rates(161)
+        self.assertEqual(r['pps'], 2)
+        self.assertEqual(r['avg_pps_60s'] * 60, 5)
+        other = RateSeries()
+        other.add(160, 4, 4)
+        rs.merge(other)
+        self.assertEqual(rs.rates(161)['pps'], 6)
+
+
+class TestStatsRates(unittest.TestCase):
+    def test_rates_in_snapshot_and_decay(self):
+        st = Stats()
+        for i in range(30):
+            st.add_packet('c', 'r', 'UDP', 100, ts=2000 + i / 10)
+        snap = st.snapshot(now=2003)
+        self.assertEqual(snap['rates']['pps'], 10)
+        self.assertEqual(snap['clients']['c']['rates']['pps'], 10)
+        self.assertEqual(snap['clients']['c']['endpoints']['r']['rates']['peak_pps_60s'], 10)
+        # Sem tráfego novo, a taxa atual cai a zero nas próximas leituras
+        d = st.delta(st.version, now=2010)
+        self.assertEqual(d['clients']['c']['endpoints']['r']['rates']['pps'], 0)
+
+    def test_rates_only_for_most_active_endpoints(self):
+        st = Stats()
+        for i in range(500):
+            st.add_packet('c', f'r{i}', 'UDP', 100, ts=4000.5)
+        for _ in range(3):
+            st.add_packet('c', 'big', 'UDP', 100, ts=4000.5)
+        snap = st.snapshot(now=4001)
+        eps = snap['clients']['c']['endpoints']
+        rated = {r for r, es in eps.items() if 'rates' in es}
+        self.assertEqual(len(rated), Stats.TOP_K)
+        self.assertEqual(eps['big']['rates']['pps'], 3)
+        # Um pacote no mesmo segundo: o delta traz só o endpoint alterado
+        st.add_packet('c', 'r7', 'UDP', 100, ts=4001.2)
+        d = st.delta(st.version, now=4001)
+        self.assertEqual(set(d['clients']['c']['endpoints']), {'r7'})
+        # No segundo seguinte r7 é o único com pps > 0: entra nas taxas
+        d = st.delta(st.version, now=4002)
+        eps = d['clients']['c']['endpoints']
+        now_rated = {r for r, es in eps.items() if 'rates' in es}
+        self.assertIn('r7', now_rated)
+        self.assertEqual(len(now_rated), Stats.TOP_K)
+        self.assertEqual(eps['r7']['rates']['pps'], 1)
+        # Só mudam os endpoints com taxas e os que as perderam
+        self.assertLessEqual(set(eps), now_rated | rated | {'r7'})
+        # Sem tráfego no último minuto, nada mais muda
+        st.delta(st.version, now=4100)
+        self.assertEqual(st.delta(st.version, now=4101)['clients'], {})
+
+    def test_new_heavy_endpoint_gets_rates(self):
+        st = Stats()
+        for i in range(20):
+            for _ in range(1000):
+                st.add_packet('c', f'old{i}', 'TCP', 100, ts=7000.5)
+        st.snapshot(now=7001)
+        for _ in range(50):
+            st.add_packet('c', 'new', 'UDP', 100, ts=7001.5)
+        snap = st.snapshot(now=7002)
+        cs = snap['clients']['c']
+        self.assertNotIn('new', cs['top_endpoints'])
+        self.assertEqual(cs['endpoints']['new']['rates']['pps'], 50)
+        self.assertEqual(top_rows(snap, 'pps', 1)[0][1], 'new')
+
+    def test_bounded_series_only_for_tracked_endpoints(self):
+        st = Stats(max_endpoints=4)
+        for i in range(50):
+            st.add_packet('c', f'r{i}', 'UDP', 100, ts=5000 + i / 10)
+        eps = st.clients['c'].endpoints
+        self.assertIsNone(eps[OTHER].series)
+        self.assertEqual(sum(es.series is not None for es in eps.values()), len(eps) - 1)
+        self.assertEqual(st.snapshot(now=5005)['clients']['c']['rates']['avg_pps_60s'] * 60, 50)
+
+    def test_concurrent_buffers_feed_series(self):
+        st = ConcurrentStats()
+        for i in range(5):
+            st.add_packet('c', 'r', 'UDP', 100, ts=3000.5)
+        st.collect()
+        for i in range(7):
+            st.add_packet('c', 'r', 'UDP', 100, ts=3001.5)
+        snap = st.snapshot(now=3002)
+        self.assertEqual(snap['clients']['c']['rates']['pps'], 7)
+        self.assertEqual(snap['clients']['c']['rates']['peak_pps_60s'], 7)
+        self.assertEqual(snap['rates']['avg_pps_60s'] * 60, 12)
+
+    def test_concurrent_rates_follow_packet_time(self):
+        # 100 pps em 10 s; o leitor só soma os buffers a cada 5 s
+        st = ConcurrentStats()
+        for i in range(1000):
+            st.add_packet('c', 'r', 'UDP', 100, ts=6000 + i / 100)
+            if i % 500 == 499:
+                st.collect()
+        r = st.snapshot(now=6010)['clients']['c']['endpoints']['r']['rates']
+        self.assertEqual((r['pps'], r['peak_pps_60s']), (100, 100))
+        # Uma única leitura no fim (replay) também
+        st = ConcurrentStats()
+        for i in range(1000):
+            st.add_packet('c', 'r', 'UDP', 100, ts=6000 + i / 100)
+        snap = st.snapshot(now=6010)
+        self.assertEqual((snap['rates']['pps'], snap['rates']['peak_pps_60s']), (100, 100))
+        self.assertAlmostEqual(snap['clients']['c']['rates']['avg_pps_60s'] * 60, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
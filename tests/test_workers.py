@@ -0,0 +1,135 @@
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from src.monitor.bench.traffic import write_pcap
+from src.monitor.binlog import SegmentWriter
+from src.monitor.flows import FlowBinaryLogger, FlowTable
+from src.monitor.logging_csv import TransporteLogger
+from src.monitor.parsers.decoder import PacketRecord, decode
+from src.monitor.pcap import LINKTYPE_ETHERNET
+from src.monitor.rotation import COMPRESSOR, Rotation
+from src.monitor.metrics import render_openmetrics
+from src.monitor.workers import ShardedMonitor, merge_extras, merge_worker_logs
+from test_parsers import build_ipv4, build_udp
+from test_pcap import ether
+
+
+class TestWorkers(unittest.TestCase):
+    def test_sharded_replay_and_merge(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pkts = [ether(build_ipv4(17, bytes([172, 31, 66, 10 + i % 8]), b'\x08\x08\x08\x08',
+                                     build_udp(40000 + i, 53, b'\x00' * 12)))
+                    for i in range(200)]
+            path = os.path.join(tmp, 'x.pcap')
+            write_pcap(path, LINKTYPE_ETHERNET, pkts)
+            log_dir = os.path.join(tmp, 'logs')
+            mon = ShardedMonitor(2, {'interface': 'tun0', 'read_file': path, 'log_dir': log_dir}, interval=0.1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                mon.start()
+            mon.stop()
+            snap = mon.snapshot()
+            self.assertEqual(sum(c['total_packets'] for c in snap['clients'].values()), 200)
+            self.assertEqual(len(snap['clients']), 8)
+            # Cada worker grava seus próprios segmentos; a união preserva todas as linhas
+            self.assertTrue(os.path.exists(os.path.join(log_dir, 'worker-1', 'transporte.csv')))
+            out = merge_worker_logs(log_dir)
+            merged = [p for p in out if p.endswith('transporte.csv')][0]
+            with open(merged, newline='') as fh:
+                rows = list(csv.reader(fh))
+            self.assertEqual(len(rows), 201)
+            self.assertEqual([r[0] for r in rows[1:]], sorted(r[0] for r in rows[1:]))
+
+
+    def test_metrics_include_worker_extras(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pkts = [ether(build_ipv4(17, bytes([172, 31, 66, 10 + i % 8]), b'\x08\x08\x08\x08',
+                                     build_udp(40000 + i, 53, b'\x00' * 12)))
+                    for i in range(200)]
+            path = os.path.join(tmp, 'x.pcap')
+            write_pcap(path, LINKTYPE_ETHERNET, pkts)
+            mon = ShardedMonitor(2, {'interface': 'tun0', 'read_file': path, 'log_dir': os.path.join(tmp, 'logs'),
+                                     'self_stats': 10}, interval=0.1)
+            mon.measure_pipeline = True
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                mon.start()
+            mon.stop()
+            snap = mon.metrics_snapshot()
+        self.assertEqual(snap['pipeline']['frames'], 200)
+        self.assertEqual(snap['log_dropped'], 0)
+        prof = snap['self_stats']
+        # 1 a cada 10 quadros em cada worker: a divisão entre eles arredonda
+        self.assertEqual(prof['frames'], 200)
+        self.assertIn(prof['sampled'], (19, 20))
+        self.assertEqual(prof['stages']['quadro']['count'], prof['sampled'])
+        text = render_openmetrics(snap)
+        self.assertIn('monitor_pipeline_frames_total 200\n', text)
+        self.assertIn(f"monitor_self_sampled_frames_total {prof['sampled']}\n", text)
+
+    def test_merge_extras_sums_counters(self):
+        parts = [{'capture': {'kernel_packets': 100, 'kernel_drops': 3}, 'log_dropped': 1,
+                  'sampling': {'mode': 'adaptive', 'rate': 4, 'seen': 50, 'sampled': 12, 'kernel_drops': 3}},
+                 {'capture': {'kernel_packets': 50, 'kernel_drops': 2}, 'log_dropped': 0,
+                  'sampling': {'mode': 'adaptive', 'rate': 2, 'seen': 40, 'sampled': 20, 'kernel_drops': 2}}]
+        out = merge_extras(parts)
+        self.assertEqual(out['capture'], {'kernel_packets': 150, 'kernel_drops': 5})
+        self.assertEqual(out['log_dropped'], 1)
+        self.assertEqual(out['sampling'], {'mode': 'adaptive', 'rate': 4, 'seen': 90, 'sampled': 32,
+                                           'kernel_drops': 5})
+        self.assertEqual(parts[0]['capture']['kernel_packets'], 100)  # partes não alteradas
+
+    def read_merged(self, paths, name):
+        with open([p for p in paths if p.endswith(name)][0], newline='') as fh:
+            return list(csv.reader(fh))
+
+    def test_merge_rotated_compressed_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for w in range(2):
+                lg = TransporteLogger(os.path.join(tmp, f'worker-{w}'), durability='sync',
+                                      rotation=Rotation(max_bytes=2000, keep=100, compress='gzip'))
+                for i in range(150):
+                    lg.log('TCP', f"10.0.{w}.1", i, '8.8.8.8', 443, 60)
+                lg.close()
+            COMPRESSOR.wait()
+            self.assertTrue(any(f.endswith('.csv.gz') for f in os.listdir(os.path.join(tmp, 'worker-0'))))
+            rows = self.read_merged(merge_worker_logs(tmp), 'transporte.csv')
+        self.assertEqual(rows[0][0], 'timestamp')
+        self.assertEqual(len(rows), 301)
+        self.assertEqual([r[0] for r in rows[1:]], sorted(r[0] for r in rows[1:]))
+
+    def test_merge_binary_logs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rec = PacketRecord()
+            for w in range(2):
+                wdir = os.path.join(tmp, f'worker-{w}')
+                seg = SegmentWriter(wdir, 'transporte', segment_records=16)
+                for i in range(50):
+                    seg.write_row(((1_700_000_000 + 2 * i + w) * 10 ** 9, 5, 4, 0x0A000001 + w, 1000 + i,
+                                   0x08080808, 53, 60))
+                seg.close()
+                flows = FlowBinaryLogger(wdir, durability='sync',
+                                         rotation=Rotation(max_bytes=400, keep=100, compress='gzip'))
+                table = FlowTable(flows.log)
+                for i in range(10):
+                    decode(rec, build_ipv4(17, bytes([172, 31, 66, 10 + w]), b'\x08\x08\x08\x08',
+                                           build_udp(5000 + i, 53, b'q')))
+                    table.update(rec, rec.total_length, 100.0 + i)
+                table.flush()
+                flows.close()
+            COMPRESSOR.wait()
+            self.assertTrue(any(f.endswith('.bin.gz') for f in os.listdir(os.path.join(tmp, 'worker-0'))))
+            out = merge_worker_logs(tmp)
+            transp = self.read_merged(out, 'transporte.csv')
+            fluxos = self.read_merged(out, 'fluxos.csv')
+        self.assertEqual(len(transp), 101)
+        self.assertEqual([int(r[3]) for r in transp[1:3]], [1000, 1000])  # intercalados pelo tempo
+        self.assertEqual(fluxos[0][0], 'inicio')
+        self.assertEqual(len(fluxos), 21)
+        self.assertEqual(sorted(int(r[5]) for r in fluxos[1:]), sorted(list(range(5000, 5010)) * 2))
+
+
+if __name__ == '__main__':
+    unittest.main()